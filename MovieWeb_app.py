@@ -1,49 +1,506 @@
+import asyncio
+import hmac
+import logging
+import click
 import requests
-from flask import Flask, flash, request, render_template, redirect, url_for
-from datamanager import SQLiteDataManager
+from flask import (Flask, Response, abort, current_app, flash, jsonify, request,
+                   render_template, redirect, url_for)
+from api import api_v1
+from asgi import AsyncApp, AsyncRoutes
+from assets import Assets
+from bulk_import import BulkImporter, detect_format, open_text, read_rows
+from datamanager import create_data_manager
+from datamanager.SQLiteDatamanager import CATALOGUE_SORT_KEYS, USER_MOVIE_SORT_KEYS
+from datamanager.models import CATALOGUE_SCOPE, USERS_SCOPE, USER_MOVIES_SCOPE, USER_SCOPE
+from datamanager.projections import ExportedFavorite, ExportedMovie, ExportedReview, as_dict
+from enrichment import EnrichmentQueue
+from export import EXPORT_FORMATS, available_formats, export_rows
+from lazy import Lazy, is_built, resolve
+from metrics import Metrics
+from omdb import (AsyncOMDbClient, CircuitBreaker, DailyQuota, MemoryCache, OMDbCache,
+                  OMDbClient, OMDbLookup, SQLiteCache, TieredCache, is_imdb_id,
+                  parse_movie_details)
+from page_cache import PageCache
+from rate_limit import (ConcurrencyLimiter, DatabaseRateLimitStore, MemoryRateLimitStore,
+                        RateLimiter)
+from routing import Routes
+from werkzeug.middleware.proxy_fix import ProxyFix
 import os
 from dotenv import load_dotenv
 
-load_dotenv()
+# The app's logger, also usable outside an application context
+logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
-app.secret_key = 'SECRET_KEY'
-app.config.from_object(os.environ.get('APP_SETTINGS', 'config.DevelopmentConfig'))
+# The services of the app, bound by create_app. Most are Lazy: built by the first
+# request or command using them, so importing the app, forking a worker or running a
+# CLI command that does not need them opens no database and no OMDb connection pool.
+app = None
+data_manager = None
+async_data_manager = None
+omdb_client = None
+async_omdb_client = None
+omdb_cache = None
+omdb_lookup = None
+enrichment_queue = None
+bulk_importer = None
+recommender = None
+assets = None
+asgi_app = None
 
-# Initialize SQLiteDataManager with the path to your SQLite database
-data_manager = SQLiteDataManager("movieweb_app.sqlite")
-API_KEY = os.environ.get('OMDBAPI_KEY')
-API_URL = "http://www.omdbapi.com/"
+# Views, error handlers and commands, added to the app by create_app
+routes = Routes()
 
+# Coroutine variants of the OMDb- and database-bound routes, served by asgi_app
+async_routes = AsyncRoutes()
 
-def fetch_movie_details(title, api_key=API_KEY):
+# Request, SQL and dependency metrics served at /metrics
+metrics = Metrics()
+
+# Rendered pages are cached under the versions of the data they show; create_app
+# picks the backend and the salt
+page_cache = PageCache(None, lambda scopes: data_manager.get_cache_versions(scopes),
+                       async_versions=lambda scopes:
+                           async_data_manager.get_cache_versions(scopes))
+
+# Write routes are rate limited per client, and requests waiting on OMDb are capped so
+# a burst of them is refused instead of tying up every worker until it times out.
+# create_app sets the limits, the store and the cap.
+rate_limiter = RateLimiter()
+omdb_admission = ConcurrencyLimiter(None)
+limit_writes = rate_limiter.limit('writes')
+limit_added_movies = rate_limiter.limit('add_movie',
+                                        key=lambda user_id, **view_args: f'user:{user_id}')
+
+
+def create_app(config=None):
+    """
+    Creates the application and binds the services of this module to it.
+
+    Nothing is connected to at creation: the data manager, the OMDb clients and caches,
+    the background workers and the recommender are built by the first request or
+    command using them. The database schema is created then only when DB_CREATE_SCHEMA
+    is on; otherwise it is left to `flask init-db` or the migrations.
+
+    The services are module globals, used by the routes, so a process serves one app
+    at a time: calling create_app again rebinds them to the new app.
+
+    Args:
+        config (str or object): The configuration, as an import path such as
+            'config.ProductionConfig' or as an object. Defaults to the APP_SETTINGS
+            environment variable, else 'config.DevelopmentConfig'.
+
+    Returns:
+        Flask: The application.
+    """
+    global app, data_manager, async_data_manager, omdb_client, async_omdb_client, \
+        omdb_cache, omdb_lookup, enrichment_queue, bulk_importer, recommender, assets, \
+        asgi_app
+
+    load_dotenv()
+    app = Flask(__name__)
+    app.secret_key = 'SECRET_KEY'
+    app.config.from_object(config or os.environ.get('APP_SETTINGS',
+                                                    'config.DevelopmentConfig'))
+    config = app.config
+    if config['PROXY_COUNT']:
+        # Request addresses and schemes as seen by the proxies, not of the proxies
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=config['PROXY_COUNT'],
+                                x_proto=config['PROXY_COUNT'])
+    # The SQLite database file, unless DATABASE_URL points to a PostgreSQL database
+    database_url = config['DATABASE_URL'] or f"sqlite:///{config['DATABASE']}"
+
+    def build_data_manager():
+        manager = create_data_manager(database_url,
+                                      pool_size=config['DB_POOL_SIZE'],
+                                      max_overflow=config['DB_MAX_OVERFLOW'],
+                                      pool_timeout=config['DB_POOL_TIMEOUT'],
+                                      pragmas=config['SQLITE_PRAGMAS'],
+                                      serialize_writes=config['SQLITE_SERIALIZE_WRITES'],
+                                      replica_urls=config['DATABASE_REPLICA_URLS'],
+                                      replica_selection=config['DB_REPLICA_SELECTION'],
+                                      max_replica_lag=config['DB_REPLICA_MAX_LAG'],
+                                      read_your_writes=config['DB_READ_YOUR_WRITES'],
+                                      create_schema=config['DB_CREATE_SCHEMA'])
+        # Requests share one session, committed and removed by the hooks below
+        manager.app = app
+        if config['METRICS_ENABLED']:
+            metrics.instrument_engine(manager.engine)
+            if manager.replicas is not None:
+                for replica_engine in manager.replicas.engines:
+                    metrics.instrument_engine(replica_engine)
+        return manager
+
+    data_manager = Lazy(build_data_manager)
+
+    # In async mode the coroutine routes run the same queries on aiosqlite connections
+    async_data_manager = None
+    if config['ASYNC_MODE']:
+        if not database_url.startswith('sqlite:'):
+            raise RuntimeError("ASYNC_MODE requires the SQLite database")
+
+        def build_async_data_manager():
+            from datamanager.AsyncSQLiteDatamanager import AsyncSQLiteDataManager
+            manager = AsyncSQLiteDataManager(
+                config['DATABASE'],
+                pool_size=config['DB_POOL_SIZE'],
+                max_overflow=config['DB_MAX_OVERFLOW'],
+                pool_timeout=config['DB_POOL_TIMEOUT'],
+                pragmas=config['SQLITE_PRAGMAS'],
+                serialize_writes=config['SQLITE_SERIALIZE_WRITES'],
+                create_schema=config['DB_CREATE_SCHEMA'])
+            if config['METRICS_ENABLED']:
+                metrics.instrument_engine(manager.engine.sync_engine)
+            return manager
+
+        async_data_manager = Lazy(build_async_data_manager)
+
+    # One pooled keep-alive client is shared by every request to OMDb
+    omdb_client = Lazy(lambda: OMDbClient(
+        config['OMDB_API_URL'], config['OMDB_API_KEY'],
+        timeout=config['OMDB_TIMEOUT'],
+        pool_size=config['OMDB_POOL_SIZE'],
+        max_retries=config['OMDB_MAX_RETRIES'],
+        backoff_factor=config['OMDB_RETRY_BACKOFF'],
+        breaker=CircuitBreaker(config['OMDB_BREAKER_THRESHOLD'],
+                               config['OMDB_BREAKER_RESET_TIMEOUT'])))
+
+    # The async client shares the breaker and latencies, so both clients see OMDb's
+    # health
+    async_omdb_client = None
+    if config['ASYNC_MODE']:
+        async_omdb_client = Lazy(lambda: AsyncOMDbClient(
+            config['OMDB_API_URL'], config['OMDB_API_KEY'],
+            timeout=config['OMDB_TIMEOUT'],
+            pool_size=config['OMDB_POOL_SIZE'],
+            max_retries=config['OMDB_MAX_RETRIES'],
+            backoff_factor=config['OMDB_RETRY_BACKOFF'],
+            breaker=omdb_client.breaker, latency=omdb_client.latency))
+
+    # OMDb responses are cached in memory and in the omdb_cache table of the database
+    omdb_cache = Lazy(lambda: OMDbCache(
+        TieredCache(MemoryCache(config['OMDB_CACHE_MEMORY_ENTRIES']),
+                    SQLiteCache(data_manager.engine, config['OMDB_CACHE_MAX_ENTRIES'])),
+        ttl=config['OMDB_CACHE_TTL'],
+        negative_ttl=config['OMDB_CACHE_NEGATIVE_TTL']))
+
+    # Every OMDb lookup goes through one service: concurrent lookups of a title share
+    # one call, and calls are counted against the daily quota, shared through the
+    # database
+    omdb_lookup = Lazy(lambda: OMDbLookup(
+        omdb_cache, request_movie_details,
+        quota=DailyQuota(config['OMDB_DAILY_QUOTA'], per_second=config['OMDB_RATE_LIMIT'],
+                         engine=data_manager.engine),
+        max_concurrency=config['OMDB_LOOKUP_CONCURRENCY'],
+        async_fetch=lambda title: async_omdb_client.get_movie(title)))
+
+    # Background workers filling in movies added while OMDb lookups run asynchronously
+    def build_enrichment_queue():
+        queue = EnrichmentQueue(data_manager, lookup_movie_details,
+                                max_workers=config['ENRICHMENT_WORKERS'],
+                                max_attempts=config['ENRICHMENT_MAX_ATTEMPTS'],
+                                retry_delay=config['ENRICHMENT_RETRY_DELAY'],
+                                lease_timeout=config['ENRICHMENT_LEASE_TIMEOUT'],
+                                on_resolved=lambda user_id, movie_id:
+                                    recommender.favorite_changed(user_id, movie_id))
+        if config['OMDB_ASYNC_ENRICHMENT']:
+            queue.resume()
+        return queue
+
+    enrichment_queue = Lazy(build_enrichment_queue)
+
+    # Bulk imports of users and favorites, from the import route and the flask CLI
+    bulk_importer = Lazy(lambda: BulkImporter(data_manager, lookup_movie_details,
+                                              chunk_size=config['BULK_IMPORT_CHUNK_SIZE'],
+                                              lookup_many=omdb_lookup.lookup_many))
+
+    # Similar movies from the index of `flask build-recommendations`, kept up to date
+    # by this process as favorites are added and removed
+    def build_recommender():
+        from recommender import Recommender  # Imports numpy and scipy
+        model = Recommender(data_manager, os.path.join(app.root_path,
+                                                       config['RECOMMENDER_PATH']),
+                            neighbours=config['RECOMMENDER_NEIGHBOURS'],
+                            reload_interval=config['RECOMMENDER_RELOAD_INTERVAL'])
+        model.load()
+        return model
+
+    recommender = Lazy(build_recommender)
+
+    # Fingerprinted, precompressed static files from `flask build-assets`, when built
+    assets = Assets(os.path.join(app.root_path, config['ASSETS_BUILD_DIR']),
+                    max_age=config['ASSETS_MAX_AGE'])
+    assets.init_app(app)
+
+    # Rendered pages are cached in memory, and in the page_cache table when shared
+    # between processes. Pages refer to the built assets by name, so a new build
+    # starts a new cache.
+    page_cache.backend = MemoryCache(config['PAGE_CACHE_MEMORY_ENTRIES'])
+    if config['PAGE_CACHE_SHARED']:
+        page_cache.backend = TieredCache(
+            page_cache.backend,
+            Lazy(lambda: SQLiteCache(data_manager.engine, config['PAGE_CACHE_MAX_ENTRIES'],
+                                     table_name='page_cache')))
+    page_cache.ttl = config['PAGE_CACHE_TTL']
+    page_cache.salt = config['PAGE_CACHE_SALT'] + assets.version
+    page_cache.enabled = config['PAGE_CACHE_ENABLED']
+
+    rate_limiter.store = (Lazy(lambda: DatabaseRateLimitStore(data_manager.engine))
+                          if config['RATE_LIMIT_STORE'] == 'database'
+                          else MemoryRateLimitStore())
+    rate_limiter.limits = {
+        'writes': (config['WRITE_RATE_LIMIT'], config['WRITE_RATE_BURST']),
+        'add_movie': (config['ADD_MOVIE_RATE_LIMIT'], config['ADD_MOVIE_RATE_BURST']),
+    }
+    rate_limiter.enabled = config['RATE_LIMIT_ENABLED']
+    omdb_admission.max_concurrent = config['OMDB_MAX_CONCURRENT_REQUESTS']
+    omdb_admission.retry_after = config['OMDB_SHED_RETRY_AFTER']
+
+    # The metrics hooks are added before the data manager's so the commit after each
+    # request is timed with it
+    if config['METRICS_ENABLED']:
+        metrics.instrument_app(app, slow_request_seconds=config['SLOW_REQUEST_SECONDS'],
+                               max_logged_queries=config['SLOW_REQUEST_MAX_QUERIES'])
+
+    # Blueprints reach the data manager through app.extensions['data_manager']. A
+    # request that did not use it has no session to commit or remove.
+    app.extensions['data_manager'] = data_manager
+
+    @app.after_request
+    def commit_request_session(response):
+        return data_manager.commit_request(response) if is_built(data_manager) else response
+
+    @app.teardown_appcontext
+    def remove_request_session(exception=None):
+        if is_built(data_manager):
+            data_manager.remove_request_session(exception)
+
+    if config['OMDB_ASYNC_ENRICHMENT']:
+        # Movies left waiting by the last run are picked up when a worker serves its
+        # first request, not at import: a master preloading the app for its workers
+        # would fork them without the queue's threads. Scrapes leave the database alone.
+        @app.before_request
+        def resume_enrichment():
+            if request.endpoint != 'metrics_endpoint':
+                resolve(enrichment_queue)
+
+    app.register_blueprint(api_v1)
+    routes.init_app(app)
+
+    # ASGI entry point of the async mode, e.g. uvicorn MovieWeb_app:asgi_app
+    asgi_app = None
+    if config['ASYNC_MODE']:
+        asgi_app = AsyncApp(app, async_routes)
+
+        @asgi_app.on_shutdown
+        async def close_async_services():
+            if is_built(async_omdb_client):
+                await async_omdb_client.aclose()
+            if is_built(async_data_manager):
+                await async_data_manager.dispose()
+
+    return app
+
+
+def dispose_after_fork():
+    """
+    Drops the database connections a forked worker inherited from its parent.
+
+    With gunicorn's preload_app, the app is imported by the master and its workers
+    are forked from it. A connection the master opened must not be used by two
+    processes, so each worker lets go of its copies, without closing them under the
+    master, and opens its own.
     """
-    Fetch movie details from the OMDb API if the movie is not found in the local storage.
-    This function is primarily used as a backup when a movie is not found in the local
-    JSON file.
+    if is_built(data_manager):
+        data_manager.dispose(close=False)
+    if is_built(async_data_manager):
+        async_data_manager.engine.sync_engine.dispose(close=False)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=dispose_after_fork)
+
+
+def request_movie_details(title, api_key=None):
+    """
+    Request movie details from the OMDb API, bypassing the cache.
 
     Parameters:
-        title (str): The title of the movie to fetch.
-        api_key (str): The API key used to access the OMDb API.
+        title (str): The title or IMDb ID of the movie to fetch.
+        api_key (str): The API key used to access the OMDb API, by default OMDB_API_KEY.
+
+    Returns:
+        dict or None: A dictionary containing movie details, or None if OMDb
+                      does not know the movie.
+
+    Raises:
+        requests.exceptions.RequestException: If OMDb cannot be reached.
+    """
+    return omdb_client.get_movie(title, api_key=api_key)
+
+
+def lookup_movie_details(title):
+    """
+    Look up movie details through the OMDb response cache, letting errors propagate.
+
+    Parameters:
+        title (str): The title or IMDb ID of the movie to fetch.
+
+    Returns:
+        dict or None: A dictionary containing movie details, or None if OMDb
+                      does not know the movie.
+
+    Raises:
+        requests.exceptions.RequestException: If OMDb cannot be reached.
+    """
+    return omdb_lookup.lookup(title)
+
+
+def fetch_movie_details(title, api_key=None):
+    """
+    Fetch movie details through the OMDb response cache.
+
+    Titles looked up before are answered from the cache, including titles OMDb
+    did not find. Errors reaching OMDb, or a used up daily quota, are not cached.
+
+    Parameters:
+        title (str): The title or IMDb ID of the movie to fetch.
+        api_key (str): The API key used to access the OMDb API, by default OMDB_API_KEY.
 
     Returns:
         dict or None: A dictionary containing movie details if the movie is found,
                       otherwise None if the movie is not found or if there's an error.
     """
-    url = f"{API_URL}?apikey={api_key}&t={title}"
+    if not title or not title.strip():
+        return None
     try:
-        response = requests.get(url, timeout=5)
-        response.raise_for_status()
-        data = response.json()
-        if data['Response'] == 'False':
-            return None  # Movie not found
-        return data
+        return omdb_lookup.lookup(title, lambda t: request_movie_details(t, api_key))
     except requests.exceptions.RequestException as e:
-        print(f"Error accessing the OMDb API: {e}")
+        logger.warning("Error accessing the OMDb API: %s", e)
         return None
 
 
-@app.route('/')
+async def fetch_movie_details_async(title):
+    """
+    Coroutine version of fetch_movie_details, calling OMDb through the async client.
+
+    Parameters:
+        title (str): The title or IMDb ID of the movie to fetch.
+
+    Returns:
+        dict or None: A dictionary containing movie details if the movie is found,
+                      otherwise None if the movie is not found or if there's an error.
+    """
+    if not title or not title.strip():
+        return None
+    try:
+        return await omdb_lookup.lookup_async(title)
+    except requests.exceptions.RequestException as e:
+        logger.warning("Error accessing the OMDb API: %s", e)
+        return None
+
+
+def collect_built(collect, *services):
+    """
+    Wraps a metrics collector so it reports nothing until the named services of this
+    module are built: a scrape must not open the database or set up the OMDb clients.
+    """
+    def samples():
+        if not all(is_built(globals()[service]) for service in services):
+            return []
+        return collect()
+    return samples
+
+
+def omdb_latency_samples():
+    stats = omdb_client.stats()
+    samples = [('', {'quantile': quantile}, stats[f'latency_p{percentile}'])
+               for quantile, percentile in (('0.5', 50), ('0.95', 95), ('0.99', 99))]
+    return samples + [('_sum', {}, stats['latency_seconds_total']),
+                      ('_count', {}, stats['calls'])]
+
+
+def replica_samples(stat):
+    replicas = data_manager.replicas.stats() if data_manager.replicas is not None else {}
+    return [('', {'replica': name}, float(stats[stat]))
+            for name, stats in replicas.items() if stats[stat] is not None]
+
+
+def cache_samples(stat):
+    samples = [('', {'cache': 'page'}, page_cache.stats()[stat])]
+    if is_built(omdb_cache):
+        samples.insert(0, ('', {'cache': 'omdb'}, omdb_cache.stats()[stat]))
+    return samples
+
+
+metrics.register('omdb_request_duration_seconds', 'summary',
+                 'Latency of OMDb API calls, retries included.',
+                 collect_built(omdb_latency_samples, 'omdb_client'))
+metrics.register('omdb_errors_total', 'counter', 'OMDb API calls that failed.',
+                 collect_built(lambda: omdb_client.errors + (
+                     async_omdb_client.errors if async_omdb_client is not None
+                     and is_built(async_omdb_client) else 0), 'omdb_client'))
+metrics.register('omdb_circuit_open', 'gauge', 'Whether OMDb calls are failing fast.',
+                 collect_built(lambda: int(omdb_client.breaker.state
+                                           == omdb_client.breaker.OPEN), 'omdb_client'))
+metrics.register('omdb_lookups_coalesced_total', 'counter',
+                 'OMDb lookups that shared the call of a concurrent lookup of the same title.',
+                 collect_built(lambda: omdb_lookup.stats()['coalesced'], 'omdb_lookup'))
+metrics.register('omdb_quota_used', 'gauge', "OMDb requests counted against today's quota.",
+                 collect_built(lambda: omdb_lookup.quota.used(), 'omdb_lookup'))
+metrics.register('omdb_quota_limit', 'gauge', 'OMDb requests allowed per day.',
+                 collect_built(lambda: omdb_lookup.quota.daily_limit, 'omdb_lookup'))
+metrics.register('omdb_quota_rejected_total', 'counter',
+                 'OMDb lookups refused because the daily quota was used up.',
+                 collect_built(lambda: omdb_lookup.quota.rejected, 'omdb_lookup'))
+metrics.register('db_replica_available', 'gauge',
+                 'Whether reads may go to a read replica that was reachable when last checked.',
+                 collect_built(lambda: replica_samples('available'), 'data_manager'))
+metrics.register('db_replica_lag_seconds', 'gauge',
+                 'Replication lag of a read replica when last checked.',
+                 collect_built(lambda: replica_samples('lag_seconds'), 'data_manager'))
+metrics.register('db_replica_failures_total', 'counter',
+                 'Times a read replica could not be reached.',
+                 collect_built(lambda: replica_samples('failures'), 'data_manager'))
+metrics.register('cache_hits_total', 'counter', 'Cache lookups answered from the cache.',
+                 lambda: cache_samples('hits'))
+metrics.register('cache_misses_total', 'counter', 'Cache lookups that missed.',
+                 lambda: cache_samples('misses'))
+metrics.register('cache_hit_ratio', 'gauge', 'Share of cache lookups that hit.',
+                 lambda: cache_samples('hit_rate'))
+metrics.register('page_not_modified_total', 'counter',
+                 'Page revalidations answered with 304 Not Modified.',
+                 lambda: page_cache.stats()['not_modified'])
+metrics.register('rate_limited_total', 'counter',
+                 'Requests refused with 429 for going over a rate limit.',
+                 lambda: [('', {'limit': name}, count)
+                          for name, count in rate_limiter.stats().items()])
+metrics.register('omdb_requests_shed_total', 'counter',
+                 'OMDb-bound requests refused with 429 while at the concurrency cap.',
+                 lambda: omdb_admission.stats()['shed'])
+metrics.register('omdb_requests_in_flight', 'gauge',
+                 'OMDb-bound requests being handled.',
+                 lambda: omdb_admission.stats()['in_flight'])
+
+
+@routes.route('/metrics')
+def metrics_endpoint():
+    """
+    Route exposing request, SQL, OMDb and cache metrics to Prometheus.
+
+    Returns:
+        The metrics in the Prometheus text exposition format; 404 when METRICS_ENABLED
+        is off and 403 without METRICS_TOKEN as a bearer token, when one is set.
+    """
+    if not current_app.config['METRICS_ENABLED']:
+        abort(404)
+    token = current_app.config['METRICS_TOKEN']
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''),
+                                         f'Bearer {token}'):
+        abort(403)
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@routes.route('/')
 def home():
     """
     Route for the home page.
@@ -54,7 +511,22 @@ def home():
     return render_template('home.html')
 
 
-@app.route('/users', methods=['GET'])
+def listing_args(sort_keys, default_sort):
+    """
+    Reads the sort, order and after query parameters of a paginated page.
+
+    Returns:
+        tuple: (sort, order, after). Unknown sort keys and orders abort with a 400.
+    """
+    sort = request.args.get('sort', default_sort)
+    order = request.args.get('order', 'asc')
+    if sort not in sort_keys or order not in ('asc', 'desc'):
+        abort(400)
+    return sort, order, request.args.get('after')
+
+
+@routes.route('/users', methods=['GET'])
+@page_cache.cached(USERS_SCOPE)
 def get_all_users():
     """
     Route to get all registered users.
@@ -62,57 +534,333 @@ def get_all_users():
     Returns:
         Rendered 'users.html' template displaying the list of users.
     """
-    users = data_manager.get_all_users()
-    users_list = [{"id": user.id, "name": user.name} for user in users]
-    return render_template('users.html', users=users_list)
+    return render_template('users.html', users=data_manager.get_user_summaries())
 
 
-@app.route('/users/<int:user_id>')
+@async_routes.view('get_all_users')
+@page_cache.cached(USERS_SCOPE)
+async def get_all_users_async():
+    """
+    Coroutine variant of get_all_users for the async mode.
+    """
+    return render_template('users.html', users=await async_data_manager.get_user_summaries())
+
+
+@routes.route('/users/<int:user_id>')
+@page_cache.cached(USER_SCOPE, USER_MOVIES_SCOPE)
 def user_movies(user_id):
     """
-    Route to display movies for a specific user.
+    Route to display movies for a specific user, one page at a time.
 
     Args:
         user_id (int): ID of the user whose movies are being retrieved.
 
+    Query parameters:
+        sort (str): 'added', 'name', 'director', 'year' or 'rating'.
+        order (str): 'asc' or 'desc'.
+        after (str): Cursor of the page to display, as returned in the next-page link.
+
     Returns:
-        Rendered 'user_movies.html' template with the user's movies.
+        Rendered 'user_movies.html' template with the current page of the user's movies.
     """
+    sort, order, after = listing_args(USER_MOVIE_SORT_KEYS, 'added')
+
     user = data_manager.get_user(user_id)
-    movies = data_manager.get_user_movies(user_id)
-    return render_template('user_movies.html', user=user, movies=movies)
+    if not user:
+        abort(404)
+    try:
+        movies, next_cursor = data_manager.get_user_movie_page(
+            user_id, limit=current_app.config['USER_MOVIES_PER_PAGE'], after=after,
+            sort=sort, descending=order == 'desc')
+    except ValueError:
+        abort(400)
+    return render_template('user_movies.html', user=user, movies=movies, sort=sort,
+                           order=order, next_cursor=next_cursor)
+
+
+@async_routes.view('user_movies')
+@page_cache.cached(USER_SCOPE, USER_MOVIES_SCOPE)
+async def user_movies_async(user_id):
+    """
+    Coroutine variant of user_movies for the async mode.
+    """
+    sort, order, after = listing_args(USER_MOVIE_SORT_KEYS, 'added')
+
+    user = await async_data_manager.get_user(user_id)
+    if not user:
+        abort(404)
+    try:
+        movies, next_cursor = await async_data_manager.get_user_movie_page(
+            user_id, limit=current_app.config['USER_MOVIES_PER_PAGE'], after=after,
+            sort=sort, descending=order == 'desc')
+    except ValueError:
+        abort(400)
+    return render_template('user_movies.html', user=user, movies=movies, sort=sort,
+                           order=order, next_cursor=next_cursor)
+
+
+@routes.route('/users/<int:user_id>/movies/<int:movie_id>/reviews')
+def movie_reviews(user_id, movie_id):
+    """
+    Route returning one page of a movie's reviews as JSON, loaded on demand by
+    the user's movie page.
+
+    Args:
+        user_id (int): ID of the user whose movie page requests the reviews.
+        movie_id (int): ID of the movie whose reviews are returned.
+
+    Query parameters:
+        after (str): Cursor of the page to return.
+
+    Returns:
+        JSON with the reviews of the page and the cursor of the next page.
+    """
+    try:
+        reviews, next_cursor = data_manager.get_review_page(
+            movie_id, limit=current_app.config['REVIEWS_PER_PAGE'], after=request.args.get('after'))
+    except ValueError:
+        abort(400)
+    return review_page_response(user_id, reviews, next_cursor)
+
+
+@async_routes.view('movie_reviews')
+async def movie_reviews_async(user_id, movie_id):
+    """
+    Coroutine variant of movie_reviews for the async mode.
+    """
+    try:
+        reviews, next_cursor = await async_data_manager.get_review_page(
+            movie_id, limit=current_app.config['REVIEWS_PER_PAGE'], after=request.args.get('after'))
+    except ValueError:
+        abort(400)
+    return review_page_response(user_id, reviews, next_cursor)
+
+
+@routes.route('/users/<int:user_id>/recommendations')
+def recommendations(user_id):
+    """
+    Route returning the movies liked by the users who liked the user's favorites, as
+    JSON loaded by the user's movie page.
+
+    Args:
+        user_id (int): ID of the user the movies are recommended to.
+
+    Returns:
+        JSON with the recommended movies, best first.
+    """
+    movie_ids = recommender.recommend(user_id, limit=current_app.config['RECOMMENDATIONS_LIMIT'])
+    movies = data_manager.get_movie_summaries(movie_ids)
+    return jsonify(movies=[as_dict(movie) for movie in movies])
+
+
+@routes.route('/users/<int:user_id>/export')
+def export_user(user_id):
+    """
+    Route streaming a user's favorite movies or reviews as a download.
 
+    Args:
+        user_id (int): ID of the user whose data is exported.
+
+    Query parameters:
+        data (str): 'favorites' or 'reviews'.
+        format (str): 'csv', 'ndjson' or 'parquet'.
+
+    Returns:
+        The rows, streamed in batches as they are read.
+    """
+    if not data_manager.get_user(user_id):
+        abort(404)
+    data = request.args.get('data', 'favorites')
+    batch_size = current_app.config['EXPORT_BATCH_SIZE']
+    if data == 'favorites':
+        batches = data_manager.export_favorites(user_id, batch_size=batch_size)
+        projection = ExportedFavorite
+    elif data == 'reviews':
+        batches = data_manager.export_reviews(user_id, batch_size=batch_size)
+        projection = ExportedReview
+    else:
+        abort(400)
+    return export_response(projection, batches, f'user-{user_id}-{data}')
 
-@app.route('/movies', methods=['GET'])
+
+@routes.route('/movies/export')
+def export_catalogue():
+    """
+    Route streaming the whole catalogue, or every review, as a download.
+
+    Query parameters:
+        data (str): 'movies' or 'reviews'.
+        format (str): 'csv', 'ndjson' or 'parquet'.
+
+    Returns:
+        The rows, streamed in batches as they are read; 404 when EXPORT_TOKEN is not
+        set and 403 without it as a bearer token.
+    """
+    token = current_app.config['EXPORT_TOKEN']
+    if not token:
+        abort(404)
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        abort(403)
+    data = request.args.get('data', 'movies')
+    batch_size = current_app.config['EXPORT_BATCH_SIZE']
+    if data == 'movies':
+        batches, projection = data_manager.export_movies(batch_size=batch_size), ExportedMovie
+    elif data == 'reviews':
+        batches, projection = data_manager.export_reviews(batch_size=batch_size), ExportedReview
+    else:
+        abort(400)
+    return export_response(projection, batches, f'catalogue-{data}')
+
+
+def export_response(projection, batches, name):
+    """
+    Streams an export in the format of the 'format' query parameter.
+
+    The rows are read when the response is sent, after the request has ended, in a
+    session of their own.
+    """
+    fmt = request.args.get('format', 'csv')
+    if fmt not in available_formats():
+        abort(400)
+    return Response(export_rows(projection, batches, fmt), mimetype=EXPORT_FORMATS[fmt],
+                    headers={'Content-Disposition': f'attachment; filename="{name}.{fmt}"'})
+
+
+def review_page_response(user_id, reviews, next_cursor):
+    """
+    Renders a page of reviews as JSON, with the URL deleting each review.
+    """
+    reviews = [dict(as_dict(review),
+                    delete_url=url_for('delete_review', user_id=user_id, review_id=review.id))
+               for review in reviews]
+    return jsonify(reviews=reviews, next_cursor=next_cursor)
+
+
+@routes.route('/movies', methods=['GET'])
+@page_cache.cached(CATALOGUE_SCOPE)
 def get_all_movies():
     """
-    Route to display all unique movies across users.
+    Route to display all unique movies across users, one page at a time.
+
+    Query parameters:
+        sort (str): Column to sort by ('name', 'director', 'year' or 'rating').
+        order (str): 'asc' or 'desc'.
+        after (str): Cursor of the page to display, as returned in the next-page link.
+
+    Returns:
+        Rendered 'movies.html' template with the current page of unique movies.
+    """
+    sort, order, after = listing_args(CATALOGUE_SORT_KEYS, 'name')
+
+    try:
+        movies, next_cursor = data_manager.get_movie_catalogue(
+            limit=current_app.config['MOVIES_PER_PAGE'], after=after,
+            sort=sort, descending=order == 'desc')
+    except ValueError:
+        abort(400)
+
+    return render_template('movies.html', movies=movies, sort=sort,
+                           order=order, next_cursor=next_cursor)
+
+
+@async_routes.view('get_all_movies')
+@page_cache.cached(CATALOGUE_SCOPE)
+async def get_all_movies_async():
+    """
+    Coroutine variant of get_all_movies for the async mode.
+    """
+    sort, order, after = listing_args(CATALOGUE_SORT_KEYS, 'name')
+
+    try:
+        movies, next_cursor = await async_data_manager.get_movie_catalogue(
+            limit=current_app.config['MOVIES_PER_PAGE'], after=after,
+            sort=sort, descending=order == 'desc')
+    except ValueError:
+        abort(400)
+
+    return render_template('movies.html', movies=movies, sort=sort,
+                           order=order, next_cursor=next_cursor)
+
+
+@routes.route('/search', methods=['GET'])
+def search():
+    """
+    Route to search the movie catalogue by name, director and review text.
+
+    Query parameters:
+        q (str): The search text. Each word matches whole words or their prefixes.
+        after (str): Cursor of the page to display, as returned in the next-page link.
 
     Returns:
-        Rendered 'movies.html' template with the list of unique movies.
-    """
-    users = data_manager.get_all_users()  # Fetch all users
-    unique_movies = []  # Initialize an empty list to store unique movies
-    movie_set = set()  # Initialize a set to track unique movies
-
-    # Loop through each user and get their favorite movies
-    for user in users:
-        fav_movies = data_manager.get_user_movies(user.id)  # Fetch movies for the user
-        for movie in fav_movies:
-            movie_key = (movie.name, movie.director, movie.year)  # Unique identifier for each movie
-            if movie_key not in movie_set:  # Check if the movie is already added
-                movie_set.add(movie_key)  # Add the movie to the set
-                unique_movies.append({
-                    "name": movie.name,
-                    "director": movie.director,
-                    "year": movie.year,
-                    "rating": movie.rating
-                })
-
-    return render_template('movies.html', movies=unique_movies)
-
-
-@app.route('/add_user', methods=['GET', 'POST'])
+        Rendered 'search.html' template with the current page of matching movies.
+    """
+    terms = request.args.get('q', '').strip()
+    after = request.args.get('after')
+
+    try:
+        movies, next_cursor = data_manager.search(
+            terms, limit=current_app.config['SEARCH_RESULTS_PER_PAGE'], after=after)
+    except ValueError:
+        abort(400)
+
+    return render_template('search.html', terms=terms, movies=movies,
+                           next_cursor=next_cursor)
+
+
+@async_routes.view('search')
+async def search_async():
+    """
+    Coroutine variant of search for the async mode.
+    """
+    terms = request.args.get('q', '').strip()
+    after = request.args.get('after')
+
+    try:
+        movies, next_cursor = await async_data_manager.search(
+            terms, limit=current_app.config['SEARCH_RESULTS_PER_PAGE'], after=after)
+    except ValueError:
+        abort(400)
+
+    return render_template('search.html', terms=terms, movies=movies,
+                           next_cursor=next_cursor)
+
+
+@routes.route('/stats', methods=['GET'])
+def stats():
+    """
+    Route to display the catalogue statistics and leaderboards.
+
+    Every figure is read from the precomputed aggregate tables, so the page costs one
+    indexed read per row shown whatever the size of the catalogue.
+
+    Returns:
+        Rendered 'stats.html' template with the leaderboards and the statistics per year.
+    """
+    size = current_app.config['STATS_LEADERBOARD_SIZE']
+    return render_template('stats.html',
+                           movies=data_manager.get_most_favorited_movies(limit=size),
+                           reviewers=data_manager.get_most_active_reviewers(limit=size),
+                           directors=data_manager.get_top_directors(limit=size),
+                           years=data_manager.get_year_stats())
+
+
+@async_routes.view('stats')
+async def stats_async():
+    """
+    Coroutine variant of stats for the async mode.
+    """
+    size = current_app.config['STATS_LEADERBOARD_SIZE']
+    movies, reviewers, directors, years = await asyncio.gather(
+        async_data_manager.get_most_favorited_movies(limit=size),
+        async_data_manager.get_most_active_reviewers(limit=size),
+        async_data_manager.get_top_directors(limit=size),
+        async_data_manager.get_year_stats())
+    return render_template('stats.html', movies=movies, reviewers=reviewers,
+                           directors=directors, years=years)
+
+
+@routes.route('/add_user', methods=['GET', 'POST'])
+@limit_writes
 def add_user():
     """
     Route to add a new user.
@@ -128,7 +876,7 @@ def add_user():
     return render_template('add_user.html')
 
 
-@app.route('/users/<int:user_id>/delete', methods=['POST', 'DELETE'])
+@routes.route('/users/<int:user_id>/delete', methods=['POST', 'DELETE'])
 def delete_user(user_id):
     """
     Route to delete a user by user_id.
@@ -144,7 +892,27 @@ def delete_user(user_id):
     return redirect(url_for('get_all_users'))
 
 
-@app.route('/users/<int:user_id>/add_movie', methods=['GET', 'POST'])
+def parse_user_rating(value):
+    """
+    Parses the rating a user optionally gives a movie they add.
+
+    Returns:
+        float or None: The rating, or None if the field was left empty.
+
+    Raises:
+        ValueError: If the rating is not a number from 0 to 10.
+    """
+    if value is None or not value.strip():
+        return None
+    rating = float(value)
+    if not 0 <= rating <= 10:
+        raise ValueError(f"Rating out of range: {rating}")
+    return rating
+
+
+@routes.route('/users/<int:user_id>/add_movie', methods=['GET', 'POST'])
+@limit_writes
+@limit_added_movies
 def add_movie(user_id):
     """
     Route to add a movie to a user's favorites by fetching details from OMDb API.
@@ -153,24 +921,46 @@ def add_movie(user_id):
 
     if request.method == 'POST':
         title = request.form.get('title')
+        try:
+            user_rating = parse_user_rating(request.form.get('user_rating'))
+        except ValueError:
+            flash('Your rating must be a number from 0 to 10.', 'error')
+            return render_template('add_movie.html', user=user, movie_name=title)
+
+        # Movies already in the shared catalogue don't need another OMDb lookup. A title
+        # typed as an IMDb ID is matched on it.
+        imdb_id = title.strip() if title and is_imdb_id(title) else None
+        movie = data_manager.find_movie(title, imdb_id=imdb_id) if title else None
+        if movie:
+            added = data_manager.add_movie(user_id=user_id, name=movie.name,
+                                           director=movie.director, year=movie.year,
+                                           rating=movie.rating, imdb_id=movie.imdb_id,
+                                           user_rating=user_rating)
+            recommender.favorite_changed(user_id, added.id)
+            flash(f'Movie "{movie.name}" added successfully!', 'success')
+            return redirect(url_for('user_movies', user_id=user_id))
+
+        # In async mode the details are fetched in the background
+        if current_app.config['OMDB_ASYNC_ENRICHMENT'] and title and title.strip():
+            job = data_manager.add_movie_placeholder(user_id, title, user_rating=user_rating)
+            data_manager.commit()  # The worker must see the job
+            # The recommender learns of the favorite once the job resolves its movie
+            enrichment_queue.enqueue(job.id, job.title)
+            flash(f'Movie "{job.title}" added, its details are being fetched from OMDb.', 'success')
+            return redirect(url_for('user_movies', user_id=user_id))
 
         # Fetch movie details from OMDb API
-        movie_data = fetch_movie_details(title)
+        with omdb_admission.admit():
+            movie_data = fetch_movie_details(title)
         if not movie_data:
             flash(f"Movie '{title}' not found in OMDb.", 'error')
             return render_template('add_movie.html', user=user)
 
-        name = movie_data.get('Title')
-        director = movie_data.get('Director', 'N/A')
-        year = movie_data.get('Year', 0)
-        rating = float(movie_data.get('imdbRating', 0))
-
-        if name and year and rating:
-            year = int(year) if year.isdigit() else 0
-            rating = float(rating) if rating else 0.0
-            data_manager.add_movie(user_id=user_id, name=name,
-                                   director=director, year=year, rating=rating)
-            flash(f'Movie "{name}" added successfully!', 'success')
+        details = parse_movie_details(movie_data)
+        if details['name'] and details['year'] and details['rating']:
+            added = data_manager.add_movie(user_id=user_id, user_rating=user_rating, **details)
+            recommender.favorite_changed(user_id, added.id)
+            flash(f'Movie "{details["name"]}" added successfully!', 'success')
         else:
             flash('Missing movie details from OMDb. Could not add movie.', 'error')
 
@@ -178,25 +968,215 @@ def add_movie(user_id):
     return render_template('add_movie.html', user=user)
 
 
-@app.route('/users/<int:user_id>/delete_movie/<int:movie_id>', methods=['GET', 'POST'])
+async def favorite_changed_async(user_id, movie_id):
+    """
+    Updates the recommender's neighbours after a favorite changed, on a worker thread:
+    the recommender reads through the synchronous data manager.
+    """
+    await asyncio.to_thread(recommender.favorite_changed, user_id, movie_id)
+
+
+@async_routes.view('add_movie')
+@limit_writes
+@limit_added_movies
+async def add_movie_async(user_id):
+    """
+    Coroutine variant of add_movie for the async mode, awaiting OMDb and the database.
+    """
+    user = await async_data_manager.get_user(user_id)
+
+    if request.method == 'POST':
+        title = request.form.get('title')
+        try:
+            user_rating = parse_user_rating(request.form.get('user_rating'))
+        except ValueError:
+            flash('Your rating must be a number from 0 to 10.', 'error')
+            return render_template('add_movie.html', user=user, movie_name=title)
+
+        imdb_id = title.strip() if title and is_imdb_id(title) else None
+        movie = await async_data_manager.find_movie(title, imdb_id=imdb_id) if title else None
+        if movie:
+            added = await async_data_manager.add_movie(
+                user_id=user_id, name=movie.name, director=movie.director, year=movie.year,
+                rating=movie.rating, imdb_id=movie.imdb_id, user_rating=user_rating)
+            await favorite_changed_async(user_id, added.id)
+            flash(f'Movie "{movie.name}" added successfully!', 'success')
+            return redirect(url_for('user_movies', user_id=user_id))
+
+        if current_app.config['OMDB_ASYNC_ENRICHMENT'] and title and title.strip():
+            job = await async_data_manager.add_movie_placeholder(
+                user_id, title, user_rating=user_rating)
+            enrichment_queue.enqueue(job.id, job.title)
+            flash(f'Movie "{job.title}" added, its details are being fetched from OMDb.', 'success')
+            return redirect(url_for('user_movies', user_id=user_id))
+
+        with omdb_admission.admit():
+            movie_data = await fetch_movie_details_async(title)
+        if not movie_data:
+            flash(f"Movie '{title}' not found in OMDb.", 'error')
+            return render_template('add_movie.html', user=user)
+
+        details = parse_movie_details(movie_data)
+        if details['name'] and details['year'] and details['rating']:
+            added = await async_data_manager.add_movie(user_id=user_id,
+                                                       user_rating=user_rating, **details)
+            await favorite_changed_async(user_id, added.id)
+            flash(f'Movie "{details["name"]}" added successfully!', 'success')
+        else:
+            flash('Missing movie details from OMDb. Could not add movie.', 'error')
+
+        return redirect(url_for('user_movies', user_id=user_id))
+    return render_template('add_movie.html', user=user)
+
+
+@routes.route('/users/<int:user_id>/import', methods=['POST'])
+@limit_writes
+def import_favorites(user_id):
+    """
+    Route to bulk import movies into a user's favorites.
+
+    The request carries a CSV file with a 'title' or 'imdb_id' column, or JSON lines
+    with the same keys, either as a 'file' upload or as the request body.
+
+    Args:
+        user_id (int): ID of the user whose favorites are imported.
+
+    Returns:
+        JSON report with row counts, throughput and per-row errors.
+    """
+    if not data_manager.get_user(user_id):
+        abort(404)
+
+    upload = request.files.get('file')
+    if upload:
+        fmt = detect_format(upload.filename, upload.mimetype)
+        stream = upload.stream
+    else:
+        fmt = detect_format(content_type=request.mimetype)
+        stream = request.stream
+    with omdb_admission.admit():
+        report = bulk_importer.import_favorites(user_id, read_rows(open_text(stream), fmt))
+    return jsonify(report.to_dict())
+
+
+@routes.cli.command('import-users')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+def import_users_command(path):
+    """
+    Imports users from a CSV or JSON lines file with a 'name' field.
+    """
+    with open(path, encoding='utf-8-sig', newline='') as stream:
+        report = bulk_importer.import_users(read_rows(stream, detect_format(path)))
+    echo_import_report(report)
+
+
+@routes.cli.command('import-favorites')
+@click.argument('user_id', type=int)
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+def import_favorites_command(user_id, path):
+    """
+    Imports a user's favorites from a CSV or JSON lines file with a 'title' or 'imdb_id' field.
+    """
+    with open(path, encoding='utf-8-sig', newline='') as stream:
+        report = bulk_importer.import_favorites(user_id, read_rows(stream, detect_format(path)))
+    echo_import_report(report)
+
+
+@routes.cli.command('init-db')
+def init_db_command():
+    """
+    Creates the missing tables, full-text indexes and statistics triggers.
+    """
+    data_manager.create_schema()
+    click.echo("Database schema created.")
+
+
+@routes.cli.command('rebuild-stats')
+def rebuild_stats_command():
+    """
+    Recomputes the precomputed catalogue statistics from the stored data.
+    """
+    data_manager.rebuild_stats()
+    click.echo("Statistics rebuilt.")
+
+
+@routes.cli.command('build-assets')
+def build_assets_command():
+    """
+    Bundles, minifies, fingerprints and compresses the static files for production.
+    """
+    from assets import AssetBuilder
+
+    builder = AssetBuilder(current_app.static_folder, assets.build_dir,
+                           template_dirs=[os.path.join(current_app.root_path,
+                                                       current_app.template_folder)],
+                           image_widths=current_app.config['ASSETS_IMAGE_WIDTHS'])
+    manifest = builder.build()
+    click.echo(f"Built {len(manifest['files'])} files into {assets.build_dir}; "
+               f"restart the app to serve them.")
+
+
+@routes.cli.command('build-recommendations')
+def build_recommendations_command():
+    """
+    Computes the similar movies of every movie from the favorites of all users.
+    """
+    summary = recommender.build()
+    click.echo(f"Indexed {summary['neighbours']} neighbours of {summary['movies']} movies "
+               f"favorited by {summary['users']} users in {summary['seconds']:.2f}s.")
+
+
+@routes.cli.command('export-catalogue')
+@click.argument('path', type=click.Path(dir_okay=False, writable=True))
+@click.option('--data', type=click.Choice(['movies', 'reviews']), default='movies')
+@click.option('--format', 'fmt', type=click.Choice(available_formats()), default='csv')
+def export_catalogue_command(path, data, fmt):
+    """
+    Writes the whole catalogue, or every review, to a file.
+    """
+    batch_size = current_app.config['EXPORT_BATCH_SIZE']
+    if data == 'movies':
+        batches, projection = data_manager.export_movies(batch_size=batch_size), ExportedMovie
+    else:
+        batches, projection = data_manager.export_reviews(batch_size=batch_size), ExportedReview
+    with open(path, 'wb') as f:
+        for chunk in export_rows(projection, batches, fmt):
+            f.write(chunk)
+    click.echo(f"Exported {data} to {path}.")
+
+
+def echo_import_report(report):
+    """
+    Prints the summary and the errors of an import report.
+    """
+    click.echo(f"{report.rows} rows, {report.imported} imported, {report.skipped} skipped, "
+               f"{report.error_count} errors in {report.elapsed:.2f}s "
+               f"({report.rows_per_second:.0f} rows/s)")
+    for error in report.errors:
+        click.echo(f"  line {error['line']}: {error['error']}", err=True)
+
+
+@routes.route('/users/<int:user_id>/delete_movie/<int:movie_id>', methods=['GET', 'POST'])
 def delete_movie(user_id, movie_id):
     """
-    Route to delete a movie from a user's favorites.
+    Route to remove a movie from a user's favorites.
 
     Args:
-        user_id (int): ID of the user who owns the movie.
-        movie_id (int): ID of the movie to delete.
+        user_id (int): ID of the user whose favorites are updated.
+        movie_id (int): ID of the movie to remove.
 
     Returns:
         Redirect to the user's movie page after deletion.
         :param user_id:
         :param movie_id:
     """
-    data_manager.delete_movie(movie_id)
+    data_manager.delete_movie(user_id, movie_id)
+    recommender.favorite_changed(user_id, movie_id)
     return redirect(f'/users/{user_id}')
 
 
-@app.route('/users/<int:user_id>/movies/<int:movie_id>/add_review', methods=['GET', 'POST'])
+@routes.route('/users/<int:user_id>/movies/<int:movie_id>/add_review', methods=['GET', 'POST'])
+@limit_writes
 def add_review(user_id, movie_id):
     """
     Route to add a review to a movie.
@@ -216,6 +1196,10 @@ def add_review(user_id, movie_id):
             flash('Review cannot be empty.', 'error')
             return redirect(url_for('user_movies', user_id=user_id))
 
+        if not data_manager.get_user(user_id) or not data_manager.get_movie(movie_id):
+            flash('Movie not found.', 'error')
+            return redirect(url_for('user_movies', user_id=user_id))
+
         data_manager.add_review(user_id=user_id, movie_id=movie_id,
                                 review_text=review_text)
         flash('Review added successfully.', 'success')
@@ -232,7 +1216,7 @@ def add_review(user_id, movie_id):
                            user_id=user_id, movie=movie, movie_id=movie_id)
 
 
-@app.route('/users/<int:user_id>/delete_review/<int:review_id>', methods=['POST', 'GET'])
+@routes.route('/users/<int:user_id>/delete_review/<int:review_id>', methods=['POST', 'GET'])
 def delete_review(user_id, review_id):
     """
     Route to delete a review by review_id.
@@ -249,8 +1233,8 @@ def delete_review(user_id, review_id):
     return redirect(url_for('user_movies', user_id=user_id))
 
 
-@app.errorhandler(404)
-def page_not_found():
+@routes.errorhandler(404)
+def page_not_found(error):
     """
     Custom handler for 404 (Page Not Found) errors.
 
@@ -260,8 +1244,8 @@ def page_not_found():
     return render_template('404.html'), 404
 
 
-@app.errorhandler(500)
-def internal_server_error():
+@routes.errorhandler(500)
+def internal_server_error(error):
     """
     Custom handler for 500 (Internal Server Error) errors.
 
@@ -271,6 +1255,10 @@ def internal_server_error():
     return render_template('500.html'), 500
 
 
+# The app of `flask --app MovieWeb_app`, of WSGI servers (MovieWeb_app:app) and, in
+# async mode, of ASGI servers (MovieWeb_app:asgi_app)
+app = create_app()
+
 # Run the Flask application
 if __name__ == '__main__':
     app.run(debug=True)
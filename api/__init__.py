@@ -0,0 +1,2 @@
+from .v1 import api_v1
+from .compression import compress_response
@@ -0,0 +1,44 @@
+import gzip
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # Optional: without it responses are only gzip-compressed
+    brotli = None
+
+
+def compress_response(response):
+    """
+    Compresses a response body with brotli or gzip, whichever the client prefers.
+
+    Bodies shorter than API_COMPRESS_MIN_SIZE are sent as they are, since compression
+    would not pay for its overhead. Brotli is only offered when the ``brotli`` package
+    is installed.
+
+    Args:
+        response (Response): The response of a view.
+
+    Returns:
+        Response: The same response, compressed in place when worthwhile.
+    """
+    if (response.direct_passthrough or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers):
+        return response
+    response.vary.add('Accept-Encoding')
+
+    data = response.get_data()
+    if len(data) < current_app.config['API_COMPRESS_MIN_SIZE']:
+        return response
+    encoding = request.accept_encodings.best_match(
+        ['br', 'gzip'] if brotli is not None else ['gzip'])
+    if encoding == 'br':
+        data = brotli.compress(data, quality=current_app.config['API_BROTLI_QUALITY'])
+    elif encoding == 'gzip':
+        data = gzip.compress(data, compresslevel=current_app.config['API_GZIP_LEVEL'])
+    else:
+        return response
+
+    response.set_data(data)
+    response.headers['Content-Encoding'] = encoding
+    return response
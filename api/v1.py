@@ -0,0 +1,183 @@
+from flask import Blueprint, abort, current_app, jsonify, request, url_for
+from werkzeug.exceptions import HTTPException
+
+from datamanager.projections import (FavoriteMovie, MovieSummary, ReviewSummary,
+                                     UserSummary, as_dict, field_names)
+from datamanager.SQLiteDatamanager import CATALOGUE_SORT_KEYS, USER_MOVIE_SORT_KEYS
+from .compression import compress_response
+
+api_v1 = Blueprint('api_v1', __name__, url_prefix='/api/v1')
+api_v1.after_request(compress_response)
+
+
+def data_manager():
+    return current_app.extensions['data_manager']
+
+
+def page_size():
+    """
+    Reads the ``limit`` query parameter, bounded by API_MAX_PAGE_SIZE.
+    """
+    limit = request.args.get('limit')
+    if limit is None:
+        return current_app.config['API_DEFAULT_PAGE_SIZE']
+    try:
+        limit = int(limit)
+    except ValueError:
+        abort(400, description=f"Invalid limit: {limit!r}")
+    if not 1 <= limit <= current_app.config['API_MAX_PAGE_SIZE']:
+        abort(400, description=f"limit must be between 1 and "
+                               f"{current_app.config['API_MAX_PAGE_SIZE']}")
+    return limit
+
+
+def selected_fields(projection):
+    """
+    Reads the ``fields`` query parameter, a comma-separated subset of the projection's
+    fields. Returns None when every field is wanted.
+    """
+    fields = request.args.get('fields')
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(',') if name.strip()]
+    unknown = [name for name in names if name not in field_names(projection)]
+    if unknown:
+        abort(400, description=f"Unknown fields: {', '.join(unknown)}")
+    return names
+
+
+def sort_order(sort_keys, default):
+    """
+    Reads the ``sort`` and ``order`` query parameters. Returns (sort, descending).
+    """
+    sort = request.args.get('sort', default)
+    order = request.args.get('order', 'asc')
+    if sort not in sort_keys:
+        abort(400, description=f"sort must be one of: {', '.join(sort_keys)}")
+    if order not in ('asc', 'desc'):
+        abort(400, description="order must be 'asc' or 'desc'")
+    return sort, order == 'desc'
+
+
+def page(fetch, projection):
+    """
+    Runs a paginated query and renders its page as JSON.
+
+    Args:
+        fetch (callable): Called with (limit, after); returns (items, next_cursor).
+            A ValueError from it, raised for malformed cursors, becomes a 400.
+        projection (type): The projection class of the items.
+
+    Returns:
+        Response: {"data": [...], "next_cursor": ..., "links": {"next": ...}}.
+    """
+    only = selected_fields(projection)
+    try:
+        items, next_cursor = fetch(page_size(), request.args.get('after'))
+    except ValueError as e:
+        abort(400, description=str(e))
+
+    links = {}
+    if next_cursor:
+        # URL arguments win over query arguments of the same name, and query arguments
+        # that url_for would read as its own options, such as _external, are dropped
+        args = {name: value for name, value in request.args.items()
+                if not name.startswith('_')}
+        links['next'] = url_for(request.endpoint,
+                                **{**args, **request.view_args, 'after': next_cursor})
+    return jsonify(data=[as_dict(item, only) for item in items],
+                   next_cursor=next_cursor, links=links)
+
+
+@api_v1.errorhandler(HTTPException)
+def json_error(error):
+    """
+    Renders errors raised by the API as JSON instead of HTML pages.
+    """
+    return jsonify(error={"code": error.code, "name": error.name,
+                          "message": error.description}), error.code
+
+
+@api_v1.route('/users')
+def list_users():
+    """
+    Lists users in the order they registered.
+
+    Query parameters:
+        limit (int): Page size.
+        after (str): Cursor of the page to return, from the previous page's next_cursor.
+        fields (str): Comma-separated fields to return: id, name.
+    """
+    return page(lambda limit, after: data_manager().get_users_page(limit=limit, after=after),
+                UserSummary)
+
+
+@api_v1.route('/users/<int:user_id>')
+def get_user(user_id):
+    """
+    Returns one user.
+    """
+    user = data_manager().get_user(user_id)
+    if user is None:
+        abort(404, description=f"No user with ID {user_id}")
+    return jsonify(as_dict(UserSummary(user.id, user.name), selected_fields(UserSummary)))
+
+
+@api_v1.route('/users/<int:user_id>/favorites')
+def list_favorites(user_id):
+    """
+    Lists a user's favorite movies.
+
+    Query parameters:
+        sort (str): 'added', 'name', 'director', 'year' or 'rating'.
+        order (str): 'asc' or 'desc'.
+        limit, after, fields: As for /users.
+    """
+    sort, descending = sort_order(USER_MOVIE_SORT_KEYS, 'added')
+    if data_manager().get_user(user_id) is None:
+        abort(404, description=f"No user with ID {user_id}")
+    return page(lambda limit, after: data_manager().get_user_movie_page(
+        user_id, limit=limit, after=after, sort=sort, descending=descending), FavoriteMovie)
+
+
+@api_v1.route('/movies')
+def list_movies():
+    """
+    Lists the movie catalogue.
+
+    Query parameters:
+        sort (str): 'name', 'director', 'year' or 'rating'.
+        order (str): 'asc' or 'desc'.
+        limit, after, fields: As for /users.
+    """
+    sort, descending = sort_order(CATALOGUE_SORT_KEYS, 'name')
+    return page(lambda limit, after: data_manager().get_movie_catalogue(
+        limit=limit, after=after, sort=sort, descending=descending), MovieSummary)
+
+
+@api_v1.route('/movies/<int:movie_id>/reviews')
+def list_reviews(movie_id):
+    """
+    Lists the reviews of a movie, oldest first.
+
+    Query parameters:
+        limit, after, fields: As for /users.
+    """
+    if data_manager().get_movie(movie_id) is None:
+        abort(404, description=f"No movie with ID {movie_id}")
+    return page(lambda limit, after: data_manager().get_review_page(
+        movie_id, limit=limit, after=after), ReviewSummary)
+
+
+@api_v1.route('/search')
+def search_movies():
+    """
+    Searches the catalogue by name, director and review text, best matches first.
+
+    Query parameters:
+        q (str): The search text.
+        limit, after, fields: As for /users.
+    """
+    terms = request.args.get('q', '')
+    return page(lambda limit, after: data_manager().search(terms, limit=limit, after=after),
+                MovieSummary)
@@ -0,0 +1,182 @@
+import sys
+from io import BytesIO
+
+from flask import request
+from werkzeug.exceptions import HTTPException
+
+try:
+    from asgiref.wsgi import WsgiToAsgi
+except ImportError:  # Only needed when ASYNC_MODE is on
+    WsgiToAsgi = None
+
+
+class AsyncRoutes:
+    """
+    Coroutine variants of Flask views, registered under the endpoint they replace.
+
+    Usage:
+        async_routes = AsyncRoutes()
+
+        @async_routes.view('user_movies')
+        async def user_movies_async(user_id):
+            ...
+    """
+
+    def __init__(self):
+        self.views = {}
+
+    def view(self, endpoint):
+        def decorator(view):
+            self.views[endpoint] = view
+            return view
+        return decorator
+
+
+class AsyncApp:
+    """
+    ASGI application serving a Flask app's coroutine routes on the event loop.
+
+    Requests for an endpoint of ``routes`` run its coroutine view inside a Flask
+    request context, with the app's request hooks and error handlers, so a view
+    waiting on OMDb or the database holds no thread. Every other request is handed to
+    the Flask app through asgiref's WSGI adapter, which runs it on a worker thread.
+
+    Serve it with an ASGI server, e.g. ``uvicorn MovieWeb_app:asgi_app``.
+    """
+
+    def __init__(self, app, routes):
+        """
+        Args:
+            app (Flask): The application whose URL map routes requests.
+            routes (AsyncRoutes): The coroutine views.
+
+        Raises:
+            RuntimeError: If asgiref is not installed.
+        """
+        if WsgiToAsgi is None:
+            raise RuntimeError("The ASGI mode requires the asgiref package")
+        self.app = app
+        self.routes = routes
+        self.wsgi = WsgiToAsgi(app)
+        self.shutdown_hooks = []
+
+    def on_shutdown(self, hook):
+        """
+        Adds a coroutine function awaited when the server shuts down.
+        """
+        self.shutdown_hooks.append(hook)
+        return hook
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        environ = build_environ(scope)
+        try:
+            endpoint, _ = self.app.url_map.bind_to_environ(environ).match()
+        except HTTPException:
+            endpoint = None  # Not found, wrong method or redirect: left to Flask
+        view = self.routes.views.get(endpoint)
+        if view is None:
+            await self.wsgi(scope, receive, send)
+            return
+
+        environ['wsgi.input'] = BytesIO(await read_body(receive))
+        await self.dispatch(view, environ, send)
+
+    async def dispatch(self, view, environ, send):
+        """
+        Runs a coroutine view the way Flask's full_dispatch_request runs a view.
+        """
+        ctx = self.app.request_context(environ)
+        ctx.push()
+        error = None
+        try:
+            try:
+                rv = self.app.preprocess_request()
+                if rv is None:
+                    rv = await view(**request.view_args)
+            except Exception as e:
+                rv = self.app.handle_user_exception(e)
+            response = self.app.finalize_request(rv)
+        except Exception as e:
+            error = e
+            response = self.app.handle_exception(e)
+
+        try:
+            body, status, headers = response.get_wsgi_response(environ)
+            await send({'type': 'http.response.start',
+                        'status': int(status.split(' ', 1)[0]),
+                        'headers': [(name.lower().encode('latin1'), value.encode('latin1'))
+                                    for name, value in headers]})
+            for chunk in body:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            response.close()
+            ctx.pop(error)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                for hook in self.shutdown_hooks:
+                    await hook()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+def build_environ(scope):
+    """
+    Builds the WSGI environ of an ASGI HTTP request, without its body.
+    """
+    script_name = scope.get('root_path', '').encode('utf8').decode('latin1')
+    path_info = scope['path'].encode('utf8').decode('latin1')
+    if path_info.startswith(script_name):
+        path_info = path_info[len(script_name):]
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': script_name,
+        'PATH_INFO': path_info,
+        'QUERY_STRING': scope['query_string'].decode('ascii'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f"HTTP/{scope['http_version']}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin1').upper().replace('-', '_')
+        if name not in ('CONTENT_LENGTH', 'CONTENT_TYPE'):
+            name = f'HTTP_{name}'
+        value = value.decode('latin1')
+        environ[name] = f'{environ[name]},{value}' if name in environ else value
+    return environ
+
+
+async def read_body(receive):
+    """
+    Reads the whole body of an ASGI HTTP request.
+    """
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    return b''.join(chunks)
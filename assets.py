@@ -0,0 +1,428 @@
+import gzip
+import hashlib
+import importlib
+import io
+import json
+import mimetypes
+import os
+import re
+import shutil
+
+from flask import request, send_from_directory, url_for
+from werkzeug.exceptions import NotFound
+from werkzeug.utils import safe_join
+
+# Bundles built from the files of static/, in the order they are loaded
+BUNDLES = {
+    'app.css': ['main.css'],
+    'noscript.css': ['noscript.css'],
+    'app.js': ['assets/js/jquery.min.js', 'assets/js/browser.min.js',
+               'assets/js/breakpoints.min.js', 'assets/js/util.js', 'assets/js/main.js'],
+}
+IMAGES_DIR = 'assets/images'
+FONTS_DIR = 'assets/webfonts'
+FONT_AWESOME_CSS = 'fontawesome-all.min.css'
+IMAGE_WIDTHS = (480, 960, 1600)
+MANIFEST = 'manifest.json'
+
+# Served precompressed, when that makes them smaller
+_COMPRESSIBLE = ('.css', '.js', '.svg')
+_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+# Formats images are resized in, with their encoder settings
+_IMAGE_FORMATS = {
+    'JPEG': ('image/jpeg', '.jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+    'PNG': ('image/png', '.png', {'optimize': True}),
+    'WEBP': ('image/webp', '.webp', {'quality': 80, 'method': 6}),
+}
+
+_CSS_STRING = r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\''
+_CSS_COMMENT = re.compile(rf'({_CSS_STRING})|(/\*!.*?\*/)|/\*.*?\*/', re.S)
+_CSS_TOKENS = re.compile(rf'({_CSS_STRING}|/\*!.*?\*/)|([^"\'/]+|/)', re.S)
+_CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+_CSS_IMPORT = re.compile(r'@import\s+url\(\s*([\'"]?)([^\'")]+)\1\s*\)\s*;')
+_ICON_CLASS = re.compile(r'\bfa-([a-z0-9-]+)')
+_ICON_RULE = re.compile(r'([^{}]+)\{content:"\\([0-9a-f]+)"\}')
+_ICON_SELECTOR = re.compile(r'\.fa-([a-z0-9-]+):before')
+_FONT_FACE = re.compile(r'@font-face\{[^}]*\}')
+_FONT_FILE = re.compile(r'webfonts/([\w-]+)\.')
+
+
+def minify_css(css):
+    """
+    Removes the comments and the whitespace a stylesheet does not need.
+
+    Strings are kept as they are, and so are /*! comments, which carry licenses.
+    """
+    css = _CSS_COMMENT.sub(lambda m: m.group(1) or m.group(2) or '', css)
+    parts = []
+    for kept, code in _CSS_TOKENS.findall(css):
+        if kept:
+            parts.append(kept)
+            continue
+        code = re.sub(r'\s+', ' ', code)
+        code = re.sub(r'\s*([{};,>])\s*', r'\1', code)
+        code = re.sub(r':\s+', ':', code).replace(';}', '}')
+        parts.append(code.lstrip() if parts and parts[-1].startswith('/*') else code)
+    return ''.join(parts).strip()
+
+
+def optional_module(name):
+    """
+    Imports an optional dependency of the build, or returns None when it is missing.
+
+    They are imported by the build only: the app serving the built files needs none of
+    them, and Pillow and fontTools alone would add a fifth to its import time.
+    """
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
+
+
+def minify_js(js):
+    """
+    Minifies a script with rjsmin when it is installed, else returns it unchanged.
+    """
+    rjsmin = optional_module('rjsmin')
+    return rjsmin.jsmin(js, keep_bang_comments=True) if rjsmin is not None else js
+
+
+def fingerprint(name, data):
+    """
+    Returns the file name of ``name`` with a hash of its content, e.g. main.1a2b3c4d5e6f.css.
+    """
+    stem, ext = os.path.splitext(os.path.basename(name))
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+
+
+def used_icons(template_dirs):
+    """
+    Returns the names of the Font Awesome icons the templates refer to, such as 'home'.
+    """
+    icons = set()
+    for directory in template_dirs:
+        for root, _, files in os.walk(directory):
+            for file_name in files:
+                with open(os.path.join(root, file_name), encoding='utf-8') as f:
+                    icons.update(_ICON_CLASS.findall(f.read()))
+    return icons
+
+
+class AssetBuilder:
+    """
+    Builds the static files for production into a directory served with ``Assets``.
+
+    The stylesheets and scripts of BUNDLES are concatenated and minified, local
+    @imports and the files their url()s refer to included. Font Awesome is cut down
+    to the icons the templates use, in WOFF2 and WOFF only. Images get resized and
+    WebP variants. Every output is named after a hash of its content, so it can be
+    cached for good, and the text files are also written gzip- and brotli-compressed.
+    A manifest maps the source names to the built files.
+    """
+
+    def __init__(self, static_dir, output_dir, template_dirs=(), image_widths=IMAGE_WIDTHS):
+        """
+        Args:
+            static_dir (str): The app's static folder.
+            output_dir (str): Where the build is written; its previous content is removed.
+            template_dirs (list): Folders of the templates scanned for icon names.
+            image_widths (tuple): Widths in pixels of the resized images.
+        """
+        self.static_dir = static_dir
+        self.output_dir = output_dir
+        self.template_dirs = template_dirs
+        self.image_widths = image_widths
+        self.files = {}
+        self.images = {}
+
+    def build(self):
+        """
+        Builds every asset and writes the manifest.
+
+        Returns:
+            dict: The manifest, {'files': {source: built}, 'images': {source:
+            {mimetype: [[width, built], ...]}}, 'version': hash of the build}.
+        """
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+        os.makedirs(self.output_dir)
+        self.files, self.images = {}, {}
+
+        for file_name in sorted(os.listdir(os.path.join(self.static_dir, IMAGES_DIR))):
+            self._image(f'{IMAGES_DIR}/{file_name}')
+        for name, sources in BUNDLES.items():
+            if name.endswith('.css'):
+                content = minify_css('\n'.join(self._stylesheet(source) for source in sources))
+                content = self._hoist_imports(content)
+            else:
+                content = ';\n'.join(minify_js(self._read(source).decode('utf-8'))
+                                     for source in sources)
+            self._write(name, content.encode('utf-8'))
+
+        version = hashlib.sha256(json.dumps(self.files, sort_keys=True).encode()).hexdigest()
+        manifest = {'files': self.files, 'images': self.images, 'version': version[:12]}
+        with open(os.path.join(self.output_dir, MANIFEST), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        return manifest
+
+    def _read(self, name):
+        with open(os.path.join(self.static_dir, name), 'rb') as f:
+            return f.read()
+
+    def _write(self, name, data):
+        """
+        Writes a built file under its fingerprinted name, with its compressed variants.
+        """
+        built = fingerprint(name, data)
+        with open(os.path.join(self.output_dir, built), 'wb') as f:
+            f.write(data)
+        if built.endswith(_COMPRESSIBLE):
+            variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+            brotli = optional_module('brotli')  # Without it, files are only gzip-compressed
+            if brotli is not None:
+                variants['.br'] = brotli.compress(data, quality=11)
+            for suffix, compressed in variants.items():
+                if len(compressed) < len(data):
+                    with open(os.path.join(self.output_dir, built + suffix), 'wb') as f:
+                        f.write(compressed)
+        self.files[name] = built
+        return built
+
+    def _image(self, name):
+        """
+        Copies an image and, with Pillow, writes its resized and WebP variants.
+        """
+        data = self._read(name)
+        self._write(name, data)
+        Image = optional_module('PIL.Image')
+        if Image is None:
+            return
+        stem = os.path.splitext(name)[0]
+        variants = {}
+        with Image.open(io.BytesIO(data)) as image:
+            if image.format not in ('JPEG', 'PNG'):
+                return
+            widths = [width for width in self.image_widths if width < image.width]
+            for width in widths + [image.width]:
+                # Images larger than every width are only served whole as they are
+                if width > max(self.image_widths, default=0):
+                    variants.setdefault(_IMAGE_FORMATS[image.format][0], []).append(
+                        [width, self.files[name]])
+                    continue
+                resized = image
+                if width < image.width:
+                    height = round(image.height * width / image.width)
+                    resized = image.resize((width, height), Image.LANCZOS)
+                for image_format in ('WEBP', image.format):
+                    mimetype, ext, options = _IMAGE_FORMATS[image_format]
+                    if width == image.width and image_format == image.format:
+                        # The original is served at its full size
+                        built = self.files[name]
+                    else:
+                        output = io.BytesIO()
+                        frame = resized.convert('RGB') if image_format == 'JPEG' else resized
+                        frame.save(output, image_format, **options)
+                        built = self._write(f'{stem}-{width}{ext}', output.getvalue())
+                    variants.setdefault(mimetype, []).append([width, built])
+        self.images[name] = variants
+
+    def _stylesheet(self, name):
+        """
+        Returns a stylesheet with its local @imports inlined and its url()s pointing
+        to the built files.
+        """
+        css = self._read(name).decode('utf-8')
+        if name == FONT_AWESOME_CSS:
+            return self._font_awesome(css)
+        base = os.path.dirname(name)
+
+        def local(target):
+            source = os.path.normpath(os.path.join(base, target)).replace(os.sep, '/')
+            if '//' in target or target.startswith('data:') \
+                    or not os.path.isfile(os.path.join(self.static_dir, source)):
+                return None
+            return source
+
+        def rewrite(match):
+            source = local(match.group(2))
+            # Stylesheets are @imports, inlined below
+            if source is None or source.endswith('.css'):
+                return match.group(0)
+            if source not in self.files:
+                self._write(source, self._read(source))
+            return f'url("{self.files[source]}")'
+
+        def inline(match):
+            source = local(match.group(2))
+            return match.group(0) if source is None else self._stylesheet(source)
+
+        # url()s missing from static/ are left as they are
+        css = _CSS_URL.sub(rewrite, css)
+        return _CSS_IMPORT.sub(inline, css)
+
+    @staticmethod
+    def _hoist_imports(css):
+        """
+        Moves the remaining (remote) @imports to the top, where CSS requires them.
+        """
+        imports = [match.group(0) for match in _CSS_IMPORT.finditer(css)]
+        return ''.join(imports) + _CSS_IMPORT.sub('', css)
+
+    def _font_awesome(self, css):
+        """
+        Returns the Font Awesome stylesheet reduced to the icons the templates use,
+        with its fonts subset to their glyphs when fontTools is installed.
+        """
+        icons = used_icons(self.template_dirs)
+        codepoints = set()
+
+        def keep_used(match):
+            selectors = [selector for selector in match.group(1).split(',')
+                         if _ICON_SELECTOR.fullmatch(selector)]
+            if len(selectors) != len(match.group(1).split(',')):
+                return match.group(0)
+            selectors = [selector for selector in selectors
+                         if _ICON_SELECTOR.fullmatch(selector).group(1) in icons]
+            if not selectors:
+                return ''
+            codepoints.add(int(match.group(2), 16))
+            return f'{",".join(selectors)}{{content:"\\{match.group(2)}"}}'
+
+        css = _ICON_RULE.sub(keep_used, css)
+
+        def font_face(match):
+            font = _FONT_FILE.search(match.group(0))
+            fonts = self._fonts(font.group(1), codepoints) if font else None
+            if not fonts:
+                return ''
+            src = ','.join(f'url("{built}") format("{flavor}")' for flavor, built in fonts)
+            return re.sub(r'src:.*\}$', f'src:{src}}}', match.group(0))
+
+        return _FONT_FACE.sub(font_face, css)
+
+    def _fonts(self, stem, codepoints):
+        """
+        Returns [(format, built file)] of a Font Awesome font, or [] when it has none of
+        the used glyphs.
+        """
+        path = f'{FONTS_DIR}/{stem}'
+        font_subset = optional_module('fontTools.subset')
+        if font_subset is None:
+            return [(flavor, self._write(f'{path}.{flavor}', self._read(f'{path}.{flavor}')))
+                    for flavor in ('woff2', 'woff')]
+        ttlib = optional_module('fontTools.ttLib')
+        font = ttlib.TTFont(os.path.join(self.static_dir, f'{path}.ttf'))
+        unicodes = codepoints & set(font.getBestCmap())
+        if not unicodes:
+            return []
+        options = font_subset.Options()
+        options.drop_tables.append('FFTM')  # FontForge's timestamps
+        subsetter = font_subset.Subsetter(options)
+        subsetter.populate(unicodes=unicodes)
+        subsetter.subset(font)
+        fonts = []
+        # fontTools writes WOFF2 with brotli only
+        for flavor in ('woff2', 'woff') if optional_module('brotli') else ('woff',):
+            font.flavor = flavor
+            output = io.BytesIO()
+            font.save(output)
+            fonts.append((flavor, self._write(f'{path}.{flavor}', output.getvalue())))
+        return fonts
+
+
+class Assets:
+    """
+    Serves the built assets with long-lived caching and resolves their URLs in templates.
+
+    Templates call ``asset_url(name)`` for a file of static/, ``asset_urls(bundle)``
+    for the files of a bundle and ``asset_srcset(image, mimetype)`` for an image's
+    variants. With a build they point to the fingerprinted files under /assets, served
+    with ``Cache-Control: immutable`` and precompressed when the client accepts it;
+    without one, to the source files of static/ as Flask serves them. The manifest
+    is read at startup, so the app is restarted after a build.
+    """
+
+    def __init__(self, build_dir, max_age=365 * 24 * 3600):
+        """
+        Args:
+            build_dir (str): The output directory of AssetBuilder.
+            max_age (int): Seconds browsers and proxies may cache a built file.
+        """
+        self.build_dir = build_dir
+        self.max_age = max_age
+        self.files = {}
+        self.images = {}
+        self.version = ''
+        self.load()
+
+    def load(self):
+        """
+        Reads the manifest of the build, if there is one.
+        """
+        try:
+            with open(os.path.join(self.build_dir, MANIFEST), encoding='utf-8') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            manifest = {}
+        self.files = manifest.get('files', {})
+        self.images = manifest.get('images', {})
+        self.version = manifest.get('version', '')
+
+    @property
+    def built(self):
+        return bool(self.files)
+
+    def init_app(self, app):
+        app.add_url_rule('/assets/<path:filename>', 'assets', self.send)
+        app.jinja_env.globals.update(assets=self, asset_url=self.url, asset_urls=self.urls,
+                                     asset_srcset=self.srcset)
+        app.extensions['assets'] = self
+
+    def url(self, name):
+        """
+        Returns the URL of a file of static/ or of a bundle.
+        """
+        if name in self.files:
+            return url_for('assets', filename=self.files[name])
+        return url_for('static', filename=name)
+
+    def urls(self, bundle):
+        """
+        Returns the URLs to load for a bundle: the bundle when built, else its sources.
+        """
+        if bundle in self.files:
+            return [self.url(bundle)]
+        return [url_for('static', filename=source) for source in BUNDLES[bundle]]
+
+    def srcset(self, name, mimetype):
+        """
+        Returns the srcset of an image's variants in a format, or its URL without a build.
+        """
+        variants = self.images.get(name, {}).get(mimetype)
+        if not variants:
+            return self.url(name)
+        return ', '.join(f"{url_for('assets', filename=built)} {width}w"
+                         for width, built in variants)
+
+    def send(self, filename):
+        """
+        Route sending a built file, precompressed when the client accepts it.
+        """
+        path = safe_join(self.build_dir, filename)
+        if path is None or filename == MANIFEST or not os.path.isfile(path):
+            raise NotFound()
+        encoding = next((encoding for encoding, suffix in _ENCODINGS
+                         if encoding in request.accept_encodings
+                         and os.path.isfile(path + suffix)), None)
+        if encoding is None:
+            response = send_from_directory(self.build_dir, filename, max_age=self.max_age)
+        else:
+            suffix = dict(_ENCODINGS)[encoding]
+            response = send_from_directory(self.build_dir, filename + suffix,
+                                           mimetype=mimetypes.guess_type(filename)[0],
+                                           max_age=self.max_age)
+            response.headers['Content-Encoding'] = encoding
+        if filename.endswith(_COMPRESSIBLE):
+            response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
@@ -0,0 +1,8 @@
+"""
+Benchmarks of every route against a generated dataset and a local OMDb stand-in.
+
+Run them with ``python -m benchmarks``; see ``python -m benchmarks --help``.
+"""
+from .dataset import generate_dataset, zipf_weights
+from .omdb_stub import start_stub, stop_stub, synthetic_movie
+from .scenarios import SCENARIOS, Result, Scenario, Workload, compare, run_scenario
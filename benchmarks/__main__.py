@@ -0,0 +1,124 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+from lazy import is_built
+
+from .dataset import generate_dataset
+from .omdb_stub import start_stub, stop_stub
+from .scenarios import METRICS_TOKEN, SCENARIOS, Workload, compare, run_scenario
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description="Benchmark every route of the app against a generated dataset.")
+    parser.add_argument('--db', help="Database file to generate, or reuse with --reuse. "
+                                     "Defaults to a temporary file.")
+    parser.add_argument('--reuse', action='store_true',
+                        help="Benchmark an existing --db instead of generating one.")
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--movies', type=int, default=5000)
+    parser.add_argument('--reviews', type=int, default=20000)
+    parser.add_argument('--favorites-per-user', type=int, default=20)
+    parser.add_argument('--skew', type=float, default=1.1,
+                        help="Zipf exponent of movie popularity and user activity.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--duration', type=float, default=3.0,
+                        help="Seconds per scenario.")
+    parser.add_argument('--iterations', type=int,
+                        help="Requests per client and scenario, instead of --duration.")
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--scenario', action='append',
+                        help="Run only this scenario; may be repeated.")
+    parser.add_argument('--reads-only', action='store_true',
+                        help="Skip the scenarios that write.")
+    parser.add_argument('--no-page-cache', action='store_true',
+                        help="Render every page, to measure the data manager itself.")
+    parser.add_argument('--rate-limit', action='store_true',
+                        help="Keep the write rate limits on; the requests they refuse "
+                             "count as errors.")
+    parser.add_argument('--config', default='config.ProductionConfig',
+                        help="Settings object of the app.")
+    parser.add_argument('--output', help="Write the results to this JSON file.")
+    parser.add_argument('--baseline', help="Compare with the results of an earlier run "
+                                           "and fail on regressions.")
+    parser.add_argument('--max-regression', type=float, default=0.25,
+                        help="Allowed relative slowdown against the baseline.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    names = {scenario.name for scenario in SCENARIOS}
+    unknown = set(args.scenario or ()) - names
+    if unknown:
+        sys.exit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    db_file_name = args.db or os.path.join(tempfile.mkdtemp(), 'benchmark.sqlite')
+    if not args.reuse:
+        if os.path.exists(db_file_name):
+            sys.exit(f"{db_file_name} exists; pass --reuse to benchmark it as it is.")
+        counts = generate_dataset(db_file_name, users=args.users, movies=args.movies,
+                                  reviews=args.reviews,
+                                  favorites_per_user=args.favorites_per_user,
+                                  skew=args.skew, seed=args.seed)
+        print("Generated " + ", ".join(f"{count} {table}" for table, count in counts.items())
+              + f" in {db_file_name}")
+    workload = Workload.from_database(db_file_name, skew=args.skew)
+
+    stub = start_stub(synthesize=True)
+    # The app reads its settings when it is imported
+    os.environ['MOVIEWEB_DATABASE'] = db_file_name
+    os.environ['OMDB_API_URL'] = stub.url
+    os.environ['OMDBAPI_KEY'] = 'benchmark'
+    os.environ['APP_SETTINGS'] = args.config
+    os.environ['MOVIEWEB_METRICS_TOKEN'] = METRICS_TOKEN
+    import MovieWeb_app
+    if args.no_page_cache:
+        MovieWeb_app.page_cache.enabled = False
+    # Every benchmark client writes from one address, far beyond a client's limits
+    if not args.rate_limit:
+        MovieWeb_app.rate_limiter.enabled = False
+
+    results = {}
+    print(f"{'scenario':<24}{'requests':>10}{'errors':>8}{'req/s':>10}"
+          f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    try:
+        for scenario in SCENARIOS:
+            if args.scenario and scenario.name not in args.scenario:
+                continue
+            if args.reads_only and scenario.write:
+                continue
+            result = run_scenario(MovieWeb_app.app, scenario, workload,
+                                  duration=args.duration, iterations=args.iterations,
+                                  concurrency=args.concurrency, seed=args.seed).to_dict()
+            results[scenario.name] = result
+            print(f"{scenario.name:<24}{result['requests']:>10}{result['errors']:>8}"
+                  f"{result['requests_per_second']:>10}{result['p50_ms'] or '-':>10}"
+                  f"{result['p95_ms'] or '-':>10}{result['p99_ms'] or '-':>10}")
+            if result['first_error']:
+                print(f"  first error: {result['first_error']}")
+    finally:
+        if is_built(MovieWeb_app.enrichment_queue):
+            MovieWeb_app.enrichment_queue.shutdown()
+        stop_stub(stub)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as stream:
+            json.dump(results, stream, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as stream:
+            regressions = compare(results, json.load(stream), args.max_regression)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+    if any(result['errors'] for result in results.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
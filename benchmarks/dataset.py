@@ -0,0 +1,100 @@
+import itertools
+import random
+
+from sqlalchemy import insert, text
+
+from datamanager import SQLiteDataManager
+from datamanager.models import Favorite, Movie, Review, User
+
+WORDS = ("night", "city", "dream", "star", "river", "ghost", "empire", "summer", "shadow",
+         "heart", "storm", "king", "island", "fire", "glass", "silent", "last", "secret",
+         "wild", "iron", "blue", "golden", "broken", "lost", "winter", "road", "machine",
+         "garden", "ocean", "mirror", "hunter", "echo")
+FIRST_NAMES = ("Ann", "Bob", "Cid", "Dee", "Eli", "Fay", "Gus", "Hal", "Ida", "Jo", "Kai",
+               "Lea", "Max", "Nia", "Oz", "Pia", "Quin", "Rae", "Sam", "Tea")
+REVIEW_PHRASES = ("A masterpiece of suspense.", "Too long, but the ending pays off.",
+                  "The score is unforgettable.", "Great cast, thin plot.",
+                  "I fell asleep twice.", "Visually stunning from start to finish.",
+                  "Better than the book.", "The dialogue feels dated now.",
+                  "A perfect rainy day movie.", "Worth it for the final act alone.")
+
+
+def zipf_weights(count, skew):
+    """
+    Returns cumulative Zipf weights over ``count`` items: item i is picked with a
+    probability proportional to 1 / (i + 1) ** skew. A skew of 0 is uniform.
+    """
+    return list(itertools.accumulate(1 / (rank + 1) ** skew for rank in range(count)))
+
+
+def chunked(rows, size):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def generate_dataset(db_file_name, users=1000, movies=5000, reviews=20000,
+                     favorites_per_user=20, skew=1.1, seed=0, chunk_size=5000):
+    """
+    Populates an empty database with synthetic users, movies, favorites and reviews.
+
+    Movie popularity and user activity follow Zipf distributions of the given skew, so
+    a few movies are favorited and reviewed far more than the rest, as in real
+    catalogues. The same seed always produces the same dataset.
+
+    Args:
+        db_file_name (str): Path to the SQLite database file, created if missing.
+        users (int): Number of users.
+        movies (int): Number of catalogue movies.
+        reviews (int): Number of reviews.
+        favorites_per_user (int): Average number of favorites per user.
+        skew (float): Zipf exponent of movie popularity and user activity.
+        seed (int): Seed of the random generator.
+        chunk_size (int): Rows per multi-row insert.
+
+    Returns:
+        dict: The number of rows written to each table.
+    """
+    rng = random.Random(seed)
+    manager = SQLiteDataManager(db_file_name)
+
+    user_rows = [{"name": f"{rng.choice(FIRST_NAMES)} {index}"} for index in range(users)]
+    movie_rows = [{"imdb_id": f"tt{9_000_000 + index:07d}",
+                   "name": " ".join(rng.sample(WORDS, rng.randint(1, 3))).title()
+                           + f" {index}",
+                   "director": f"{rng.choice(FIRST_NAMES)} {rng.choice(WORDS).title()}",
+                   "year": rng.randint(1950, 2024),
+                   "rating": round(rng.uniform(1, 10), 1),
+                   "status": 'ready'} for index in range(movies)]
+
+    # Popular movies and active users get low IDs, which keeps the skew easy to see
+    movie_weights = zipf_weights(movies, skew)
+    user_weights = zipf_weights(users, skew)
+    favorite_rows = []
+    for user_id in range(1, users + 1):
+        count = min(movies, rng.randint(1, 2 * favorites_per_user - 1))
+        picked = set()
+        while len(picked) < count:
+            picked.update(rng.choices(range(1, movies + 1), cum_weights=movie_weights,
+                                      k=count - len(picked)))
+        favorite_rows.extend({"user_id": user_id, "movie_id": movie_id,
+                              "rating": round(rng.uniform(1, 10), 1)}
+                             for movie_id in sorted(picked))
+
+    review_rows = [{"user_id": user_id, "movie_id": movie_id,
+                    "review_text": rng.choice(REVIEW_PHRASES) + " " + rng.choice(WORDS)}
+                   for user_id, movie_id in zip(
+                       rng.choices(range(1, users + 1), cum_weights=user_weights, k=reviews),
+                       rng.choices(range(1, movies + 1), cum_weights=movie_weights,
+                                   k=reviews))]
+
+    with manager.engine.begin() as connection:
+        for model, rows in ((User, user_rows), (Movie, movie_rows),
+                            (Favorite, favorite_rows), (Review, review_rows)):
+            for chunk in chunked(rows, chunk_size):
+                connection.execute(insert(model), chunk)
+    with manager.engine.begin() as connection:
+        connection.execute(text("ANALYZE"))
+    manager.engine.dispose()
+
+    return {"users": len(user_rows), "movies": len(movie_rows),
+            "favorites": len(favorite_rows), "reviews": len(review_rows)}
@@ -0,0 +1,84 @@
+import hashlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def synthetic_movie(title):
+    """
+    Makes up stable OMDb details for any title, so every lookup finds a movie.
+    """
+    digest = int(hashlib.sha1(title.strip().lower().encode('utf-8')).hexdigest(), 16)
+    return {"Title": title.strip(), "Director": f"Director {digest % 997}",
+            "Year": str(1950 + digest % 75), "imdbRating": f"{1 + digest % 90 / 10:.1f}",
+            "imdbID": f"tt{digest % 10_000_000:07d}", "Response": "True"}
+
+
+class StubOMDbHandler(BaseHTTPRequestHandler):
+    """
+    Answers OMDb-style ?t=<title> and ?i=<imdb id> queries from the server's movies.
+    """
+
+    def do_GET(self):
+        server = self.server
+        params = {key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()}
+        with server.lock:
+            server.requests.append(params)
+            status = server.failures.pop(0) if server.failures else 200
+        if server.delay:
+            threading.Event().wait(server.delay)
+        if status != 200:
+            self.send_response(status)
+            self.end_headers()
+            return
+
+        movie = None
+        if 'i' in params:
+            movie = server.movies.get(params['i'])
+        elif 't' in params:
+            movie = next((m for m in server.movies.values()
+                          if m['Title'].lower() == params['t'].strip().lower()), None)
+            if movie is None and server.synthesize:
+                movie = synthetic_movie(params['t'])
+        body = json.dumps(movie or {"Response": "False", "Error": "Movie not found!"}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub(movies=None, synthesize=False):
+    """
+    Starts a local stand-in for omdbapi.com on a free port.
+
+    The returned server's ``url`` is its address, ``requests`` records the query
+    parameters of every request, ``failures`` is a list of HTTP status codes returned
+    by the next requests and ``delay`` slows responses, in seconds.
+
+    Args:
+        movies (dict): OMDb responses by IMDb ID.
+        synthesize (bool): Answer title queries for unknown movies with made-up details
+            instead of "Movie not found!".
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubOMDbHandler)
+    server.daemon_threads = True
+    server.movies = dict(movies or {})
+    server.synthesize = synthesize
+    server.lock = threading.Lock()
+    server.requests = []
+    server.failures = []
+    server.delay = 0
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def stop_stub(server):
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,298 @@
+import json
+import random
+import threading
+import time
+
+from sqlalchemy import create_engine, func, select
+
+from datamanager.models import Favorite, Review, User
+from .dataset import WORDS, zipf_weights
+
+# The app under benchmark serves /metrics to scrapes with this token
+METRICS_TOKEN = 'benchmark'
+
+
+class Workload:
+    """
+    The IDs scenarios draw their requests from, sampled from a generated database.
+
+    Users are drawn with the same Zipf skew as the dataset, so the most active users
+    are requested the most, as they would be in production.
+    """
+
+    def __init__(self, user_count, favorites, review_ids, skew=1.1):
+        self.user_count = user_count
+        self.favorites = favorites
+        self.review_ids = review_ids
+        self.user_weights = zipf_weights(user_count, skew)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_database(cls, db_file_name, skew=1.1, sample_size=10_000):
+        engine = create_engine(f'sqlite:///{db_file_name}')
+        with engine.connect() as connection:
+            user_count = connection.execute(select(func.max(User.id))).scalar() or 0
+            favorites = [tuple(row) for row in connection.execute(
+                select(Favorite.user_id, Favorite.movie_id)
+                .order_by(func.random()).limit(sample_size))]
+            review_ids = list(connection.execute(
+                select(Review.id).order_by(func.random()).limit(sample_size)).scalars())
+        engine.dispose()
+        return cls(user_count, favorites, review_ids, skew)
+
+    def user(self, rng):
+        return rng.choices(range(1, self.user_count + 1), cum_weights=self.user_weights)[0]
+
+    def favorite(self, rng):
+        return rng.choice(self.favorites)
+
+    def take_favorite(self, rng):
+        """
+        Removes and returns a sampled favorite, for scenarios that delete it.
+        """
+        with self._lock:
+            if not self.favorites:
+                return None
+            return self.favorites.pop(rng.randrange(len(self.favorites)))
+
+    def take_review(self, rng):
+        with self._lock:
+            if not self.review_ids:
+                return None
+            return self.review_ids.pop(rng.randrange(len(self.review_ids)))
+
+
+class Scenario:
+    """
+    One kind of request, built afresh for every call from a random generator.
+
+    ``build`` takes (rng, workload) and returns (method, path, keyword arguments for
+    the test client), or None when the workload has run out of rows to use.
+    """
+
+    def __init__(self, name, build, write=False):
+        self.name = name
+        self.build = build
+        self.write = write
+
+
+def get(path, **kwargs):
+    return lambda rng, workload: ('GET', path(rng, workload), kwargs)
+
+
+def post(path, **kwargs):
+    def build(rng, workload):
+        built = path(rng, workload)
+        if built is None:
+            return None
+        if isinstance(built, tuple):
+            built, extra = built
+            return 'POST', built, dict(kwargs, **extra)
+        return 'POST', built, kwargs
+    return build
+
+
+def favorite_path(template, taking=False):
+    def path(rng, workload):
+        favorite = workload.take_favorite(rng) if taking else workload.favorite(rng)
+        if favorite is None:
+            return None
+        return template.format(user_id=favorite[0], movie_id=favorite[1])
+    return path
+
+
+def import_body(rng, workload):
+    lines = [json.dumps({"title": f"Imported {rng.choice(WORDS)} {rng.randrange(10 ** 6)}"})
+             for _ in range(20)]
+    return (f'/users/{workload.user(rng)}/import',
+            {'data': '\n'.join(lines), 'content_type': 'application/x-ndjson'})
+
+
+def delete_review_path(rng, workload):
+    review_id = workload.take_review(rng)
+    if review_id is None:
+        return None
+    return f'/users/{workload.user(rng)}/delete_review/{review_id}'
+
+
+def least_active_user(rng, workload):
+    # Deletes users from the inactive tail, leaving the heavily requested ones in place
+    return f'/users/{workload.user_count - rng.randrange(workload.user_count // 2 or 1)}/delete'
+
+
+# Every route of MovieWeb_app.py and of the JSON API. Reads come first; writes run in
+# an order where each only removes rows the following ones do not need.
+SCENARIOS = [
+    Scenario('home', get(lambda rng, w: '/')),
+    Scenario('users', get(lambda rng, w: '/users')),
+    Scenario('user_movies', get(lambda rng, w: f'/users/{w.user(rng)}')),
+    Scenario('user_movies_by_rating',
+             get(lambda rng, w: f'/users/{w.user(rng)}?sort=rating&order=desc')),
+    Scenario('movie_reviews',
+             get(favorite_path('/users/{user_id}/movies/{movie_id}/reviews'))),
+    Scenario('movies', get(lambda rng, w: '/movies')),
+    Scenario('movies_by_year', get(lambda rng, w: '/movies?sort=year&order=desc')),
+    Scenario('search', get(lambda rng, w: f'/search?q={rng.choice(WORDS)[:4]}')),
+    Scenario('add_user_form', get(lambda rng, w: '/add_user')),
+    Scenario('add_movie_form', get(lambda rng, w: f'/users/{w.user(rng)}/add_movie')),
+    Scenario('add_review_form',
+             get(favorite_path('/users/{user_id}/movies/{movie_id}/add_review'))),
+    Scenario('metrics', get(lambda rng, w: '/metrics',
+                            headers={'Authorization': f'Bearer {METRICS_TOKEN}'})),
+    Scenario('api_users', get(lambda rng, w: '/api/v1/users')),
+    Scenario('api_favorites', get(lambda rng, w: f'/api/v1/users/{w.user(rng)}/favorites')),
+    Scenario('api_movies', get(lambda rng, w: '/api/v1/movies?sort=rating&order=desc')),
+    Scenario('api_search', get(lambda rng, w: f'/api/v1/search?q={rng.choice(WORDS)}')),
+    Scenario('add_user', post(lambda rng, w: ('/add_user',
+                                              {'data': {'name': f"Bench {rng.random()}"}})),
+             write=True),
+    Scenario('add_movie', post(lambda rng, w: (
+        f'/users/{w.user(rng)}/add_movie',
+        {'data': {'title': f"{rng.choice(WORDS).title()} {rng.randrange(10 ** 6)}"}})),
+             write=True),
+    Scenario('import_favorites', post(import_body), write=True),
+    Scenario('add_review', post(lambda rng, w: (
+        favorite_path('/users/{user_id}/movies/{movie_id}/add_review')(rng, w),
+        {'data': {'review_text': f"Benchmark review {rng.choice(WORDS)}"}})), write=True),
+    Scenario('delete_review', post(delete_review_path), write=True),
+    Scenario('delete_movie',
+             post(favorite_path('/users/{user_id}/delete_movie/{movie_id}', taking=True)),
+             write=True),
+    Scenario('delete_user', post(least_active_user), write=True),
+]
+
+
+class Result:
+    """
+    Latencies and errors of one scenario run.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.errors = 0
+        self.first_error = None
+        self.elapsed = 0.0
+
+    @property
+    def count(self):
+        return len(self.latencies)
+
+    @property
+    def throughput(self):
+        return self.count / self.elapsed if self.elapsed else 0.0
+
+    def percentile(self, q):
+        """
+        Returns the q-th percentile latency in seconds, or None without samples.
+        """
+        samples = sorted(self.latencies)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * q / 100))]
+
+    def to_dict(self):
+        return {
+            "requests": self.count,
+            "errors": self.errors,
+            "first_error": self.first_error,
+            "requests_per_second": round(self.throughput, 1),
+            "p50_ms": _milliseconds(self.percentile(50)),
+            "p95_ms": _milliseconds(self.percentile(95)),
+            "p99_ms": _milliseconds(self.percentile(99)),
+        }
+
+
+def _milliseconds(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+def run_scenario(app, scenario, workload, duration=3.0, iterations=None, concurrency=1,
+                 seed=0):
+    """
+    Sends a scenario's requests to an app from concurrent clients and times them.
+
+    Args:
+        app (Flask): The application, called in-process through test clients.
+        scenario (Scenario): The scenario.
+        workload (Workload): Where request parameters are drawn from.
+        duration (float): Seconds to keep sending requests, unless ``iterations`` is set.
+        iterations (int): Requests per client, instead of a duration.
+        concurrency (int): Concurrent clients, each on its own thread.
+        seed (int): Seed of the clients' random generators.
+
+    Returns:
+        Result: Latencies of successful requests and the error count. Responses with
+            a status of 400 or more count as errors.
+    """
+    result = Result(scenario.name)
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client_loop(index):
+        rng = random.Random(seed * 1000 + index)
+        latencies = []
+        errors = 0
+        first_error = None
+        sent = 0
+        with app.test_client() as client:
+            while (sent < iterations) if iterations else (time.perf_counter() < deadline):
+                built = scenario.build(rng, workload)
+                if built is None:
+                    break
+                method, path, kwargs = built
+                sent += 1
+                started = time.perf_counter()
+                try:
+                    response = client.open(path, method=method, **kwargs)
+                    status = response.status_code
+                    response.close()
+                except Exception as e:
+                    status, error = None, f"{type(e).__name__}: {e}"
+                else:
+                    error = f"{method} {path} returned {status}" if status >= 400 else None
+                if error is None:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors += 1
+                    first_error = first_error or error
+        with lock:
+            result.latencies.extend(latencies)
+            result.errors += errors
+            result.first_error = result.first_error or first_error
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client_loop, args=(index,))
+               for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def compare(results, baseline, max_regression=0.25):
+    """
+    Lists the scenarios that got slower than a baseline run.
+
+    Args:
+        results (dict): Scenario names mapped to Result.to_dict() of this run.
+        baseline (dict): The same, from an earlier run.
+        max_regression (float): Allowed relative increase of p95 latency, and decrease
+            of throughput, before a scenario counts as regressed.
+
+    Returns:
+        list: Messages describing each regression.
+    """
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before or not before.get('p95_ms') or not result.get('p95_ms'):
+            continue
+        if result['p95_ms'] > before['p95_ms'] * (1 + max_regression):
+            regressions.append(f"{name}: p95 {before['p95_ms']} ms -> {result['p95_ms']} ms")
+        if result['requests_per_second'] < before['requests_per_second'] * (1 - max_regression):
+            regressions.append(f"{name}: {before['requests_per_second']} -> "
+                               f"{result['requests_per_second']} requests/s")
+    return regressions
@@ -0,0 +1,139 @@
+"""
+Startup time of the app, as paid by every worker, test run and CLI command: importing
+it, creating an app with create_app and serving the first request, each measured in a
+fresh interpreter.
+
+Run it with ``python -m benchmarks.startup``; see ``python -m benchmarks.startup --help``.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from .dataset import generate_dataset
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Optional dependencies that only some requests or commands need, and that importing
+# the app must not load
+DEFERRED_MODULES = ('numpy', 'scipy', 'pyarrow', 'PIL', 'fontTools', 'httpx', 'aiosqlite')
+
+# Runs in the child interpreter; prints its measurements as JSON
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import MovieWeb_app
+from lazy import is_built
+imported = time.perf_counter()
+loaded = sorted(name for name in json.loads(sys.argv[2]) if name in sys.modules)
+database_opened = is_built(MovieWeb_app.data_manager)
+app = MovieWeb_app.create_app()
+created = time.perf_counter()
+with app.test_client() as client:
+    status = client.get(sys.argv[1]).status_code
+served = time.perf_counter()
+print(json.dumps({'import_ms': (imported - start) * 1000,
+                  'create_app_ms': (created - imported) * 1000,
+                  'first_request_ms': (served - created) * 1000,
+                  'status': status, 'deferred_loaded': loaded,
+                  'database_opened_at_import': database_opened}))
+"""
+
+TIMINGS = ('process_ms', 'import_ms', 'create_app_ms', 'first_request_ms')
+
+
+def measure_startup(db_file_name, config='config.ProductionConfig', path='/users', runs=5):
+    """
+    Starts the app in ``runs`` fresh interpreters and returns the median timings.
+
+    Args:
+        db_file_name (str): The SQLite database the app is pointed at.
+        config (str): Settings object of the app.
+        path (str): The page of the first request.
+        runs (int): Interpreters started.
+
+    Returns:
+        dict: The median of each of TIMINGS in milliseconds, 'process_ms' being the
+              whole child process; the 'status' of the first request; the
+              'deferred_loaded' modules of DEFERRED_MODULES imported by importing the
+              app; and whether importing it opened the database.
+    """
+    env = dict(os.environ, MOVIEWEB_DATABASE=db_file_name, APP_SETTINGS=config)
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        child = subprocess.run([sys.executable, '-c', _PROBE, path,
+                                json.dumps(DEFERRED_MODULES)],
+                               cwd=ROOT, env=env, capture_output=True, text=True,
+                               check=True)
+        sample = json.loads(child.stdout.splitlines()[-1])
+        sample['process_ms'] = (time.perf_counter() - start) * 1000
+        samples.append(sample)
+    result = {timing: round(statistics.median(sample[timing] for sample in samples), 1)
+              for timing in TIMINGS}
+    result.update({key: samples[-1][key] for key in
+                   ('status', 'deferred_loaded', 'database_opened_at_import')})
+    return result
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.startup',
+        description="Measure how long the app takes to import, create and serve its "
+                    "first request.")
+    parser.add_argument('--db', help="Database to start the app on. Defaults to a small "
+                                     "generated one.")
+    parser.add_argument('--config', default='config.ProductionConfig',
+                        help="Settings object of the app.")
+    parser.add_argument('--path', default='/users', help="Page of the first request.")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--output', help="Write the results to this JSON file.")
+    parser.add_argument('--baseline', help="Compare with the results of an earlier run "
+                                           "and fail on regressions.")
+    parser.add_argument('--max-regression', type=float, default=0.25,
+                        help="Allowed relative slowdown against the baseline.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    db_file_name = args.db
+    if db_file_name is None:
+        db_file_name = os.path.join(tempfile.mkdtemp(), 'startup.sqlite')
+        generate_dataset(db_file_name, users=100, movies=500, reviews=1000)
+
+    result = measure_startup(db_file_name, config=args.config, path=args.path,
+                             runs=args.runs)
+    for timing in TIMINGS:
+        print(f"{timing:<20}{result[timing]:>10}")
+    print(f"first request status: {result['status']}")
+    print(f"deferred modules loaded at import: "
+          f"{', '.join(result['deferred_loaded']) or 'none'}")
+    print(f"database opened at import: {result['database_opened_at_import']}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as stream:
+            json.dump(result, stream, indent=2)
+    failures = []
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as stream:
+            baseline = json.load(stream)
+        failures += [f"{timing}: {baseline[timing]} ms -> {result[timing]} ms"
+                     for timing in TIMINGS if baseline.get(timing)
+                     and result[timing] > baseline[timing] * (1 + args.max_regression)]
+    if result['status'] >= 400:
+        failures.append(f"first request answered {result['status']}")
+    if result['deferred_loaded'] or result['database_opened_at_import']:
+        failures.append("importing the app loaded what it should defer")
+    for failure in failures:
+        print(f"Regression: {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
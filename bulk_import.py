@@ -0,0 +1,234 @@
+import csv
+import io
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from itertools import islice
+
+import requests
+
+from omdb import parse_movie_details
+
+# Only the first errors are kept in a report, the rest are just counted
+MAX_REPORTED_ERRORS = 100
+
+
+class ImportReport:
+    """
+    Counts the outcome of a bulk import and records per-row errors.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.imported = 0
+        self.skipped = 0
+        self.error_count = 0
+        self.errors = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+        return self
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def to_dict(self):
+        return {
+            "rows": self.rows,
+            "imported": self.imported,
+            "skipped": self.skipped,
+            "error_count": self.error_count,
+            "errors": self.errors,
+            "elapsed_seconds": round(self.elapsed, 3),
+            "rows_per_second": round(self.rows_per_second, 1),
+        }
+
+
+def read_rows(stream, fmt):
+    """
+    Streams the rows of a CSV file or of a JSON lines file.
+
+    Args:
+        stream: A text stream.
+        fmt (str): 'csv' for CSV with a header line, 'jsonl' for one JSON object per line.
+
+    Yields:
+        tuple: (line number, row dictionary). Rows that cannot be parsed are yielded
+               as (line number, ValueError).
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, {key.strip().lower(): (value or '').strip()
+                                    for key, value in row.items() if key}
+    elif fmt == 'jsonl':
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+                if not isinstance(row, dict):
+                    raise ValueError("Expected a JSON object")
+            except ValueError as e:
+                yield line_number, ValueError(f"Invalid JSON: {e}")
+                continue
+            yield line_number, {str(key).lower(): value for key, value in row.items()}
+    else:
+        raise ValueError(f"Unsupported import format: {fmt!r}")
+
+
+def detect_format(filename=None, content_type=None):
+    """
+    Guesses the import format from a file name or content type, defaulting to JSON lines.
+    """
+    if (filename or '').lower().endswith('.csv') or 'csv' in (content_type or ''):
+        return 'csv'
+    return 'jsonl'
+
+
+def open_text(binary_stream):
+    """
+    Wraps a binary upload stream so it can be read line by line as UTF-8 text.
+    """
+    return io.TextIOWrapper(binary_stream, encoding='utf-8-sig', newline='')
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class BulkImporter:
+    """
+    Imports users and favorites in chunks, one transaction per chunk.
+
+    The distinct titles of a chunk are looked up in parallel, by ``lookup_many`` or on
+    a bounded thread pool, before the chunk is written with bulk inserts through the
+    data manager.
+    """
+
+    def __init__(self, data_manager, lookup, max_workers=8, chunk_size=500,
+                 lookup_many=None):
+        """
+        Args:
+            data_manager (DataManagerInterface): Stores the imported rows.
+            lookup (callable): Called with a title or IMDb ID; returns the OMDb response,
+                None if the movie does not exist, or raises RequestException.
+            max_workers (int): The maximum number of concurrent calls to ``lookup``.
+            chunk_size (int): The number of rows written per transaction.
+            lookup_many (callable): Batch lookup used instead of calling ``lookup`` on
+                the importer's pool, such as OMDbLookup.lookup_many. Called with a list
+                of titles; returns each title's response, None or RequestException.
+        """
+        self.data_manager = data_manager
+        self.lookup = lookup
+        self.lookup_many = lookup_many
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+
+    def import_users(self, rows):
+        """
+        Adds a user for each row with a 'name'.
+
+        Args:
+            rows: (line number, row) pairs as produced by ``read_rows``.
+
+        Returns:
+            ImportReport: The outcome of the import.
+        """
+        report = ImportReport()
+        for chunk in chunked(rows, self.chunk_size):
+            names = []
+            for line, row in chunk:
+                report.rows += 1
+                if isinstance(row, Exception):
+                    report.add_error(line, str(row))
+                elif not str(row.get('name') or '').strip():
+                    report.add_error(line, "Missing name")
+                else:
+                    names.append(str(row['name']).strip())
+            if names:
+                report.imported += self.data_manager.add_users(names)
+        return report.finish()
+
+    def import_favorites(self, user_id, rows):
+        """
+        Adds the movie of each row, given by 'imdb_id' or 'title', to a user's favorites.
+
+        Args:
+            user_id (int): The ID of the user.
+            rows: (line number, row) pairs as produced by ``read_rows``.
+
+        Returns:
+            ImportReport: The outcome of the import. Movies the user already
+                          favorited are counted as skipped.
+        """
+        report = ImportReport()
+        pool = (ThreadPoolExecutor(max_workers=self.max_workers,
+                                   thread_name_prefix='bulk-import')
+                if self.lookup_many is None else nullcontext())
+        with pool as executor:
+            for chunk in chunked(rows, self.chunk_size):
+                wanted = []
+                for line, row in chunk:
+                    report.rows += 1
+                    if isinstance(row, Exception):
+                        report.add_error(line, str(row))
+                        continue
+                    key = str(row.get('imdb_id') or row.get('title') or '').strip()
+                    if not key:
+                        report.add_error(line, "Missing title")
+                        continue
+                    wanted.append((line, key))
+
+                keys = list(dict.fromkeys(key for _, key in wanted))
+                if self.lookup_many is None:
+                    results = dict(zip(keys, executor.map(self._resolve, keys)))
+                else:
+                    outcomes = self.lookup_many(keys)
+                    results = {key: self._details(key, outcomes[key]) for key in keys}
+
+                movies = []
+                for line, key in wanted:
+                    result = results[key]
+                    if isinstance(result, str):
+                        report.add_error(line, result)
+                    else:
+                        movies.append(result)
+                if movies:
+                    added = self.data_manager.add_favorites(user_id, movies)
+                    report.imported += added
+                    report.skipped += len(movies) - added
+        return report.finish()
+
+    def _resolve(self, key):
+        """
+        Returns the movie details for a title, or an error message.
+        """
+        try:
+            data = self.lookup(key)
+        except requests.exceptions.RequestException as e:
+            data = e
+        return self._details(key, data)
+
+    @staticmethod
+    def _details(key, data):
+        """
+        Turns the outcome of a lookup into movie details, or an error message.
+        """
+        if isinstance(data, requests.exceptions.RequestException):
+            return f"Error accessing the OMDb API: {data}"
+        details = parse_movie_details(data) if data else None
+        if not details or not details['name']:
+            return f"Movie '{key}' not found in OMDb."
+        return details
@@ -0,0 +1,187 @@
+import asyncio
+from contextlib import nullcontext
+
+from .DataManager import AsyncDataManagerInterface
+from .SQLiteDatamanager import SQLiteDataManager
+from .engine import apply_pragmas, enable_immediate_transactions
+
+try:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    import aiosqlite  # noqa: F401 -- the driver of sqlite+aiosqlite URLs
+except ImportError:  # Only needed when ASYNC_MODE is on
+    create_async_engine = None
+
+
+class AsyncSQLiteDataManager(AsyncDataManagerInterface):
+    """
+    Serves the data manager's methods as coroutines over aiosqlite.
+
+    The queries are those of SQLiteDataManager: each call runs the synchronous method
+    on an AsyncSession through ``run_sync``, whose statements are awaited on the event
+    loop instead of blocking a thread. A view awaiting the database therefore leaves
+    the loop free to serve other requests.
+    """
+
+    def __init__(self, db_file_name, pool_size=5, max_overflow=10, pool_timeout=30,
+                 pragmas=None, serialize_writes=False, create_schema=True):
+        """
+        Initializes the AsyncSQLiteDataManager with an SQLite database file.
+
+        Args:
+            db_file_name (str): Path to the SQLite database file.
+            pool_size (int): Connections kept open in the pool.
+            max_overflow (int): Extra connections opened when the pool is exhausted.
+            pool_timeout (float): Seconds to wait for a connection.
+            pragmas (dict): PRAGMA settings applied to every connection.
+            serialize_writes (bool): Let one transaction at a time write from this
+                process, started with BEGIN IMMEDIATE.
+            create_schema (bool): Create the missing tables first.
+
+        Raises:
+            RuntimeError: If aiosqlite is not installed.
+        """
+        if create_async_engine is None:
+            raise RuntimeError("AsyncSQLiteDataManager requires the aiosqlite package")
+        # Creates the schema, if asked, and holds the queries; its own engine is not used after that
+        self.queries = SQLiteDataManager(db_file_name, pool_size=1, max_overflow=0,
+                                         pragmas=pragmas, create_schema=create_schema)
+        self.queries.engine.dispose()
+
+        self.engine = create_async_engine(f'sqlite+aiosqlite:///{db_file_name}',
+                                          pool_size=pool_size, max_overflow=max_overflow,
+                                          pool_timeout=pool_timeout)
+        apply_pragmas(self.engine.sync_engine, {'foreign_keys': 'ON', **(pragmas or {})})
+        self.write_lock = None
+        if serialize_writes:
+            enable_immediate_transactions(self.engine.sync_engine)
+            self.write_lock = asyncio.Lock()
+        self.Session = async_sessionmaker(self.engine, expire_on_commit=False)
+
+    async def _run(self, method, *args, write=False, **kwargs):
+        """
+        Runs a SQLiteDataManager method in a transaction of its own and commits it.
+        """
+        lock = self.write_lock if write and self.write_lock is not None else nullcontext()
+        async with lock:
+            async with self.Session() as session:
+                if write and self.write_lock is not None:
+                    await session.connection(
+                        execution_options={'sqlite_begin_immediate': True})
+                result = await session.run_sync(
+                    lambda sync_session: method(*args, session=sync_session, **kwargs))
+                await session.commit()
+        return result
+
+    async def dispose(self):
+        """
+        Closes the pooled connections.
+        """
+        await self.engine.dispose()
+
+    async def get_cache_versions(self, scopes):
+        return await self._run(self.queries.get_cache_versions, scopes)
+
+    async def get_user(self, user_id):
+        return await self._run(self.queries.get_user, user_id)
+
+    async def get_all_users(self):
+        return await self._run(self.queries.get_all_users)
+
+    async def get_user_summaries(self):
+        return await self._run(self.queries.get_user_summaries)
+
+    async def get_users_page(self, limit=50, after=None):
+        return await self._run(self.queries.get_users_page, limit=limit, after=after)
+
+    async def get_user_movies(self, user_id):
+        return await self._run(self.queries.get_user_movies, user_id)
+
+    async def get_user_movie_page(self, user_id, limit=50, after=None, sort='added',
+                                  descending=False):
+        return await self._run(self.queries.get_user_movie_page, user_id, limit=limit,
+                               after=after, sort=sort, descending=descending)
+
+    async def get_movie(self, movie_id):
+        return await self._run(self.queries.get_movie, movie_id)
+
+    async def get_all_movies(self):
+        return await self._run(self.queries.get_all_movies)
+
+    async def get_movie_catalogue(self, limit=50, after=None, sort='name', descending=False):
+        return await self._run(self.queries.get_movie_catalogue, limit=limit, after=after,
+                               sort=sort, descending=descending)
+
+    async def search(self, terms, limit=20, after=None):
+        return await self._run(self.queries.search, terms, limit=limit, after=after)
+
+    async def add_user(self, name):
+        return await self._run(self.queries.add_user, name, write=True)
+
+    async def add_users(self, names):
+        return await self._run(self.queries.add_users, names, write=True)
+
+    async def find_movie(self, title, imdb_id=None):
+        return await self._run(self.queries.find_movie, title, imdb_id=imdb_id)
+
+    async def add_favorites(self, user_id, movies):
+        return await self._run(self.queries.add_favorites, user_id, movies, write=True)
+
+    async def add_movie(self, user_id, name, director, year, rating, imdb_id=None,
+                        user_rating=None):
+        return await self._run(self.queries.add_movie, user_id, name, director, year,
+                               rating, imdb_id=imdb_id, user_rating=user_rating,
+                               write=True)
+
+    async def add_movie_placeholder(self, user_id, title, user_rating=None):
+        return await self._run(self.queries.add_movie_placeholder, user_id, title,
+                               user_rating=user_rating, write=True)
+
+    async def get_pending_enrichment_jobs(self, lease_timeout=300):
+        return await self._run(self.queries.get_pending_enrichment_jobs,
+                               lease_timeout=lease_timeout)
+
+    async def start_enrichment_job(self, job_id, lease_timeout=300):
+        return await self._run(self.queries.start_enrichment_job, job_id,
+                               lease_timeout=lease_timeout, write=True)
+
+    async def complete_enrichment_job(self, job_id, name, director, year, rating,
+                                      imdb_id=None):
+        return await self._run(self.queries.complete_enrichment_job, job_id, name,
+                               director, year, rating, imdb_id=imdb_id, write=True)
+
+    async def fail_enrichment_job(self, job_id, error, retry=False):
+        return await self._run(self.queries.fail_enrichment_job, job_id, error,
+                               retry=retry, write=True)
+
+    async def delete_movie(self, user_id, movie_id):
+        return await self._run(self.queries.delete_movie, user_id, movie_id, write=True)
+
+    async def add_review(self, user_id, movie_id, review_text):
+        return await self._run(self.queries.add_review, user_id, movie_id, review_text,
+                               write=True)
+
+    async def get_movie_reviews(self, movie_id):
+        return await self._run(self.queries.get_movie_reviews, movie_id)
+
+    async def get_review_page(self, movie_id, limit=20, after=None):
+        return await self._run(self.queries.get_review_page, movie_id, limit=limit,
+                               after=after)
+
+    async def delete_review(self, review_id):
+        return await self._run(self.queries.delete_review, review_id, write=True)
+
+    async def get_most_favorited_movies(self, limit=10):
+        return await self._run(self.queries.get_most_favorited_movies, limit=limit)
+
+    async def get_most_active_reviewers(self, limit=10):
+        return await self._run(self.queries.get_most_active_reviewers, limit=limit)
+
+    async def get_top_directors(self, limit=10, min_movies=1):
+        return await self._run(self.queries.get_top_directors, limit=limit,
+                               min_movies=min_movies)
+
+    async def get_year_stats(self):
+        return await self._run(self.queries.get_year_stats)
+
+    async def rebuild_stats(self):
+        return await self._run(self.queries.rebuild_stats, write=True)
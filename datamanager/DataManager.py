@@ -7,6 +7,21 @@ class DataManagerInterface(ABC):
     Classes that implement this interface are responsible for interacting with a specific data source.
     """
 
+    @abstractmethod
+    def get_cache_versions(self, scopes):
+        """
+        Retrieve the versions of cache scopes, bumped by every write that changes them.
+
+        Args:
+            scopes (list): Scope names, such as 'users', 'catalogue' or 'user:1'. The
+                version of 'user_movies:1' sums those of the movies user 1 favorites.
+
+        Returns:
+            A dictionary mapping each scope written so far to a tuple of
+            (version, updated_at), where updated_at is in seconds since the epoch.
+        """
+        pass
+
     @abstractmethod
     def get_all_users(self):
         """
@@ -17,6 +32,31 @@ class DataManagerInterface(ABC):
         """
         pass
 
+    @abstractmethod
+    def get_user_summaries(self):
+        """
+        Retrieve the ID and name of every user.
+
+        Returns:
+            A list of UserSummary projections.
+        """
+        pass
+
+    @abstractmethod
+    def get_users_page(self, limit=50, after=None):
+        """
+        Retrieve one page of users, in the order they registered.
+
+        Args:
+            limit (int): The maximum number of users to return.
+            after (str): The cursor returned with the previous page, or None for the first page.
+
+        Returns:
+            A tuple of (users, next_cursor) where users is a list of UserSummary
+            projections and next_cursor is None on the last page.
+        """
+        pass
+
     @abstractmethod
     def get_user_movies(self, user_id):
         """
@@ -30,6 +70,25 @@ class DataManagerInterface(ABC):
         """
         pass
 
+    @abstractmethod
+    def get_user_movie_page(self, user_id, limit=50, after=None, sort='added', descending=False):
+        """
+        Retrieve one page of a user's favorite movies.
+
+        Args:
+            user_id (int): The ID of the user.
+            limit (int): The maximum number of movies to return.
+            after (str): The cursor returned with the previous page, or None for the first page.
+            sort (str): 'added' for the order the movies were favorited, or 'name',
+                'director', 'year' or 'rating'.
+            descending (bool): Whether to sort in descending order.
+
+        Returns:
+            A tuple of (movies, next_cursor) where movies is a list of FavoriteMovie
+            projections and next_cursor is None on the last page.
+        """
+        pass
+
     @abstractmethod
     def get_all_movies(self):
         """
@@ -40,6 +99,39 @@ class DataManagerInterface(ABC):
         """
         pass
 
+    @abstractmethod
+    def get_movie_catalogue(self, limit=50, after=None, sort='name', descending=False):
+        """
+        Retrieve one page of the distinct movie catalogue.
+
+        Args:
+            limit (int): The maximum number of movies to return.
+            after (str): The cursor returned with the previous page, or None for the first page.
+            sort (str): The column to sort by: 'name', 'director', 'year' or 'rating'.
+            descending (bool): Whether to sort in descending order.
+
+        Returns:
+            A tuple of (movies, next_cursor) where movies is a list of MovieSummary
+            projections and next_cursor is None on the last page.
+        """
+        pass
+
+    @abstractmethod
+    def search(self, terms, limit=20, after=None):
+        """
+        Search the movie catalogue by name, director and review text.
+
+        Args:
+            terms (str): The search text. Each word matches whole words or their prefixes.
+            limit (int): The maximum number of movies to return.
+            after (str): The cursor returned with the previous page, or None for the first page.
+
+        Returns:
+            A tuple of (movies, next_cursor) where movies is a list of MovieSummary
+            projections, best matches first, and next_cursor is None on the last page.
+        """
+        pass
+
     @abstractmethod
     def add_user(self, name):
         """
@@ -51,26 +143,155 @@ class DataManagerInterface(ABC):
         pass
 
     @abstractmethod
-    def add_movie(self, user_id, name, director, year, rating):
+    def add_users(self, names):
+        """
+        Add several users to the data source in one transaction.
+
+        Args:
+            names (list): The names of the new users.
+
+        Returns:
+            The number of users added.
+        """
+        pass
+
+    @abstractmethod
+    def find_movie(self, title, imdb_id=None):
+        """
+        Look up a movie in the shared catalogue by its IMDb ID or its title.
+
+        Args:
+            title (str): The title of the movie, compared case-insensitively. It only
+                matches when a single catalogue movie carries it.
+            imdb_id (str): The IMDb ID of the movie, matched first when known.
+
+        Returns:
+            The matching movie, or None if the catalogue does not contain it.
+        """
+        pass
+
+    @abstractmethod
+    def add_favorites(self, user_id, movies):
+        """
+        Add several movies to a user's favorite list in one transaction.
+
+        Args:
+            user_id (int): The ID of the user.
+            movies (list): Dictionaries with name, director, year, rating and imdb_id keys.
+
+        Returns:
+            The number of favorites added. Movies the user already favorited are skipped.
+        """
+        pass
+
+    @abstractmethod
+    def add_movie(self, user_id, name, director, year, rating, imdb_id=None,
+                  user_rating=None):
         """
         Add a movie to a user's favorite list.
 
+        The movie is stored once in the shared catalogue and linked to the user.
+
+        Args:
+            user_id (int): The ID of the user adding the movie.
+            name (str): The name of the movie.
+            director (str): The director of the movie.
+            year (int): The year the movie was released.
+            rating (float): The IMDb rating of the movie.
+            imdb_id (str): The IMDb ID of the movie, if known.
+            user_rating (float): The user's own rating of the movie, if given.
+
+        Returns:
+            The catalogue movie.
+        """
+        pass
+
+    @abstractmethod
+    def add_movie_placeholder(self, user_id, title, user_rating=None):
+        """
+        Add a movie whose details are still to be fetched to a user's favorite list.
+
         Args:
             user_id (int): The ID of the user adding the movie.
+            title (str): The title the user asked for.
+            user_rating (float): The user's own rating of the movie, if given.
+
+        Returns:
+            The enrichment job that will fetch the movie's details.
+        """
+        pass
+
+    @abstractmethod
+    def get_pending_enrichment_jobs(self, lease_timeout=300):
+        """
+        Retrieve the enrichment jobs waiting for a worker.
+
+        Args:
+            lease_timeout (float): Seconds after which a running job whose worker has
+                not finished it is considered abandoned and returned as well.
+
+        Returns:
+            A list of enrichment jobs, oldest first.
+        """
+        pass
+
+    @abstractmethod
+    def start_enrichment_job(self, job_id, lease_timeout=300):
+        """
+        Claim an enrichment job for this worker and count the attempt.
+
+        Only one of several workers claiming the same job at once succeeds.
+
+        Args:
+            job_id (int): The ID of the job.
+            lease_timeout (float): Seconds after which a running job may be claimed
+                again, its worker being presumed gone.
+
+        Returns:
+            The number of attempts including this one, or None if the job no longer
+            needs to run or another worker claimed it.
+        """
+        pass
+
+    @abstractmethod
+    def complete_enrichment_job(self, job_id, name, director, year, rating, imdb_id=None):
+        """
+        Store the details fetched for a pending movie and finish its job.
+
+        Args:
+            job_id (int): The ID of the job.
             name (str): The name of the movie.
             director (str): The director of the movie.
             year (int): The year the movie was released.
-            rating (int): The user's rating of the movie.
+            rating (float): The IMDb rating of the movie.
+            imdb_id (str): The IMDb ID of the movie, if known.
+
+        Returns:
+            A list of the (user_id, movie_id) favorites of catalogue movies the job
+            added, the pending movie having been filled in or merged into another.
         """
         pass
 
     @abstractmethod
-    def delete_movie(self, movie_id):
+    def fail_enrichment_job(self, job_id, error, retry=False):
         """
-        Remove a movie from the data source.
+        Record a failed enrichment attempt.
 
         Args:
-            movie_id (int): The ID of the movie to delete.
+            job_id (int): The ID of the job.
+            error (str): A description of the failure.
+            retry (bool): Whether the job should be attempted again.
+        """
+        pass
+
+    @abstractmethod
+    def delete_movie(self, user_id, movie_id):
+        """
+        Remove a movie from a user's favorite list.
+
+        Args:
+            user_id (int): The ID of the user.
+            movie_id (int): The ID of the movie to remove.
         """
         pass
 
@@ -99,6 +320,22 @@ class DataManagerInterface(ABC):
         """
         pass
 
+    @abstractmethod
+    def get_review_page(self, movie_id, limit=20, after=None):
+        """
+        Retrieve one page of the reviews of a movie, oldest first.
+
+        Args:
+            movie_id (int): The ID of the movie.
+            limit (int): The maximum number of reviews to return.
+            after (str): The cursor returned with the previous page, or None for the first page.
+
+        Returns:
+            A tuple of (reviews, next_cursor) where reviews is a list of ReviewSummary
+            projections and next_cursor is None on the last page.
+        """
+        pass
+
     @abstractmethod
     def delete_review(self, review_id):
         """
@@ -108,3 +345,325 @@ class DataManagerInterface(ABC):
             review_id (int): The ID of the review to delete.
         """
         pass
+
+    @abstractmethod
+    def get_most_favorited_movies(self, limit=10):
+        """
+        Retrieve the catalogue movies favorited by the most users.
+
+        Args:
+            limit (int): The maximum number of movies to return.
+
+        Returns:
+            A list of PopularMovie projections, most favorited first.
+        """
+        pass
+
+    @abstractmethod
+    def get_most_active_reviewers(self, limit=10):
+        """
+        Retrieve the users who wrote the most reviews.
+
+        Args:
+            limit (int): The maximum number of users to return.
+
+        Returns:
+            A list of ActiveReviewer projections, most reviews first.
+        """
+        pass
+
+    @abstractmethod
+    def get_top_directors(self, limit=10, min_movies=1):
+        """
+        Retrieve the directors with the best average movie rating.
+
+        Args:
+            limit (int): The maximum number of directors to return.
+            min_movies (int): The fewest rated movies a director needs to be listed.
+
+        Returns:
+            A list of DirectorRating projections, best average first.
+        """
+        pass
+
+    @abstractmethod
+    def get_year_stats(self):
+        """
+        Retrieve the number of catalogue movies and their average rating per year.
+
+        Returns:
+            A list of YearRating projections, most recent year first.
+        """
+        pass
+
+    @abstractmethod
+    def rebuild_stats(self):
+        """
+        Recompute the precomputed statistics from the stored movies, favorites and reviews.
+        """
+        pass
+
+    @abstractmethod
+    def iter_favorite_pairs(self, batch_size=10000):
+        """
+        Iterate over every favorite of a catalogue movie, in batches.
+
+        Args:
+            batch_size (int): The number of favorites per batch.
+
+        Returns:
+            An iterator of lists of (user_id, movie_id) tuples.
+        """
+        pass
+
+    @abstractmethod
+    def get_favorite_movie_ids(self, user_id):
+        """
+        Retrieve the IDs of the catalogue movies in a user's favorites.
+
+        Args:
+            user_id (int): The ID of the user.
+
+        Returns:
+            A list of movie IDs.
+        """
+        pass
+
+    @abstractmethod
+    def get_co_favorites(self, movie_id):
+        """
+        Count the users a movie shares with every other catalogue movie.
+
+        Args:
+            movie_id (int): The ID of the movie.
+
+        Returns:
+            A tuple of the movie's favorite count and a list of (movie_id, shared users,
+            favorite count) tuples of the movies sharing at least one user with it.
+        """
+        pass
+
+    @abstractmethod
+    def add_neighbour_updates(self, updates):
+        """
+        Store movies' neighbours recomputed since the last recommendations build.
+
+        Args:
+            updates (list): Dictionaries with movie_id, neighbours and scores keys, the
+                latter two as bytes.
+        """
+        pass
+
+    @abstractmethod
+    def get_neighbour_updates(self, after=0):
+        """
+        Retrieve the neighbour updates stored after a given one.
+
+        Args:
+            after (int): The ID of the last update already read.
+
+        Returns:
+            A list of (id, movie_id, neighbours, scores) rows, oldest first.
+        """
+        pass
+
+    @abstractmethod
+    def clear_neighbour_updates(self, up_to):
+        """
+        Delete the neighbour updates a recommendations build includes.
+
+        Args:
+            up_to (int): The ID of the last update to delete.
+        """
+        pass
+
+    @abstractmethod
+    def get_movie_summaries(self, movie_ids):
+        """
+        Retrieve catalogue movies by their IDs.
+
+        Args:
+            movie_ids (list): The IDs of the movies.
+
+        Returns:
+            A list of MovieSummary projections in the order of ``movie_ids``, without
+            the movies that are not in the catalogue.
+        """
+        pass
+
+    @abstractmethod
+    def export_movies(self, batch_size=1000):
+        """
+        Iterate over the whole catalogue, in batches.
+
+        Args:
+            batch_size (int): The number of movies per batch.
+
+        Returns:
+            An iterator of lists of tuples in the order of the ExportedMovie fields.
+        """
+        pass
+
+    @abstractmethod
+    def export_favorites(self, user_id, batch_size=1000):
+        """
+        Iterate over a user's favorite movies, in batches.
+
+        Args:
+            user_id (int): The ID of the user.
+            batch_size (int): The number of movies per batch.
+
+        Returns:
+            An iterator of lists of tuples in the order of the ExportedFavorite fields.
+        """
+        pass
+
+    @abstractmethod
+    def export_reviews(self, user_id=None, batch_size=1000):
+        """
+        Iterate over the reviews of a user, or of every user, in batches.
+
+        Args:
+            user_id (int): The ID of the user, or None for every review.
+            batch_size (int): The number of reviews per batch.
+
+        Returns:
+            An iterator of lists of tuples in the order of the ExportedReview fields.
+        """
+        pass
+
+
+class AsyncDataManagerInterface(ABC):
+    """
+    The methods of DataManagerInterface as coroutines, for views served by an event loop.
+
+    Arguments and results are those of the synchronous methods. Every call runs in its
+    own transaction, committed before the coroutine returns.
+    """
+
+    @abstractmethod
+    async def get_cache_versions(self, scopes):
+        pass
+
+    @abstractmethod
+    async def get_user(self, user_id):
+        pass
+
+    @abstractmethod
+    async def get_all_users(self):
+        pass
+
+    @abstractmethod
+    async def get_user_summaries(self):
+        pass
+
+    @abstractmethod
+    async def get_users_page(self, limit=50, after=None):
+        pass
+
+    @abstractmethod
+    async def get_user_movies(self, user_id):
+        pass
+
+    @abstractmethod
+    async def get_user_movie_page(self, user_id, limit=50, after=None, sort='added',
+                                  descending=False):
+        pass
+
+    @abstractmethod
+    async def get_movie(self, movie_id):
+        pass
+
+    @abstractmethod
+    async def get_all_movies(self):
+        pass
+
+    @abstractmethod
+    async def get_movie_catalogue(self, limit=50, after=None, sort='name', descending=False):
+        pass
+
+    @abstractmethod
+    async def search(self, terms, limit=20, after=None):
+        pass
+
+    @abstractmethod
+    async def add_user(self, name):
+        pass
+
+    @abstractmethod
+    async def add_users(self, names):
+        pass
+
+    @abstractmethod
+    async def find_movie(self, title, imdb_id=None):
+        pass
+
+    @abstractmethod
+    async def add_favorites(self, user_id, movies):
+        pass
+
+    @abstractmethod
+    async def add_movie(self, user_id, name, director, year, rating, imdb_id=None,
+                        user_rating=None):
+        pass
+
+    @abstractmethod
+    async def add_movie_placeholder(self, user_id, title, user_rating=None):
+        pass
+
+    @abstractmethod
+    async def get_pending_enrichment_jobs(self, lease_timeout=300):
+        pass
+
+    @abstractmethod
+    async def start_enrichment_job(self, job_id, lease_timeout=300):
+        pass
+
+    @abstractmethod
+    async def complete_enrichment_job(self, job_id, name, director, year, rating,
+                                      imdb_id=None):
+        pass
+
+    @abstractmethod
+    async def fail_enrichment_job(self, job_id, error, retry=False):
+        pass
+
+    @abstractmethod
+    async def delete_movie(self, user_id, movie_id):
+        pass
+
+    @abstractmethod
+    async def add_review(self, user_id, movie_id, review_text):
+        pass
+
+    @abstractmethod
+    async def get_movie_reviews(self, movie_id):
+        pass
+
+    @abstractmethod
+    async def get_review_page(self, movie_id, limit=20, after=None):
+        pass
+
+    @abstractmethod
+    async def delete_review(self, review_id):
+        pass
+
+    @abstractmethod
+    async def get_most_favorited_movies(self, limit=10):
+        pass
+
+    @abstractmethod
+    async def get_most_active_reviewers(self, limit=10):
+        pass
+
+    @abstractmethod
+    async def get_top_directors(self, limit=10, min_movies=1):
+        pass
+
+    @abstractmethod
+    async def get_year_stats(self):
+        pass
+
+    @abstractmethod
+    async def rebuild_stats(self):
+        pass
@@ -0,0 +1,220 @@
+from contextlib import contextmanager
+
+from sqlalchemy import cast, create_engine, func, literal_column, select, text, union_all
+from sqlalchemy.dialects.postgresql import DOUBLE_PRECISION
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.engine import make_url
+
+from .models import Base, Movie, Review, CATALOGUE_SCOPE, USERS_SCOPE, USER_SCOPE
+from .SQLiteDatamanager import SQLiteDataManager
+from .search import build_tsquery
+from .stats import rebuild_stats, stats_triggers
+
+# Full-text search runs on tsvector expressions with GIN indexes over the same
+# expressions, so no column or trigger is needed to keep them up to date. Names weigh
+# more than directors ('A' over 'B'), which weigh more than reviews (unweighted 'D').
+_CONFIG = "'simple'"
+MOVIE_VECTOR = (f"setweight(to_tsvector({_CONFIG}, name), 'A') || "
+                f"setweight(to_tsvector({_CONFIG}, coalesce(director, '')), 'B')")
+REVIEW_VECTOR = f"to_tsvector({_CONFIG}, review_text)"
+
+SEARCH_DDL = [
+    f"CREATE INDEX IF NOT EXISTS ix_movies_search ON movies USING gin (({MOVIE_VECTOR}))",
+    f"CREATE INDEX IF NOT EXISTS ix_reviews_search ON reviews USING gin (({REVIEW_VECTOR}))",
+]
+
+# Matches an imported movie without an IMDb ID to the catalogue, like add_movie
+_SAME_MOVIE = ("SELECT {} FROM movies m WHERE i.imdb_id IS NULL AND m.status = 'ready' "
+               "AND m.name = i.name AND m.director IS NOT DISTINCT FROM i.director "
+               "AND m.year IS NOT DISTINCT FROM i.year")
+
+# Serializes schema creation between app servers starting at the same time
+_SCHEMA_LOCK = 0x6d6f7669
+
+
+def postgres_url(database_url):
+    """
+    Returns a database URL with the psycopg driver, which the COPY imports use.
+
+    Args:
+        database_url (str or URL): A postgresql:// or postgres:// URL.
+    """
+    url = make_url(database_url)
+    if url.drivername in ('postgres', 'postgresql'):
+        url = url.set(drivername='postgresql+psycopg')
+    return url
+
+
+def create_stats_functions(connection):
+    """
+    Creates the trigger functions and triggers maintaining the aggregate tables,
+    filling the tables if the triggers are new.
+
+    Args:
+        connection (Connection): A connection in an open transaction.
+    """
+    triggers = stats_triggers('postgresql')
+    existing = set(connection.execute(text(
+        "SELECT tgname FROM pg_trigger WHERE NOT tgisinternal")).scalars())
+    for name, (event, body) in triggers.items():
+        connection.execute(text(
+            f"CREATE OR REPLACE FUNCTION {name}() RETURNS trigger LANGUAGE plpgsql "
+            f"AS $$ BEGIN {body}RETURN NULL; END $$"))
+        if name not in existing:
+            connection.execute(text(
+                f"CREATE TRIGGER {name} {event} FOR EACH ROW EXECUTE FUNCTION {name}()"))
+    if not existing.issuperset(triggers):
+        rebuild_stats(connection)
+
+
+class PostgresDataManager(SQLiteDataManager):
+    """
+    Manages database interactions using PostgreSQL, so several app servers can share
+    one database.
+
+    The queries are those of SQLiteDataManager; the differences are in how they reach
+    the database:
+
+    * connections come from a pool of psycopg connections checked on checkout;
+    * the lag of read replicas is read from the standby's WAL replay position;
+    * favorites are written with INSERT ... ON CONFLICT DO NOTHING, so adding one
+      twice, even from two servers at once, stores it once;
+    * the listings of every user or movie stream rows through server-side cursors;
+    * bulk imports load rows with COPY;
+    * search uses tsvector indexes, and the statistics triggers are PL/pgSQL functions.
+    """
+
+    _insert = staticmethod(postgresql_insert)
+    # Fetch full listings in batches through a named (server-side) cursor
+    listing_options = {'stream_results': True, 'max_row_buffer': 1000}
+    # A standby that has replayed all the WAL it received is not behind
+    replica_lag_query = (
+        "SELECT CASE WHEN NOT pg_is_in_recovery() "
+        "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+        "ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp())::float END")
+
+    def __init__(self, database_url, pool_size=5, max_overflow=10, pool_timeout=30,
+                 create_schema=True):
+        """
+        Initializes the PostgresDataManager with a database URL.
+
+        Args:
+            database_url (str): URL of the database, e.g. postgresql://user:pw@host/db.
+            pool_size (int): Connections kept open in the pool.
+            max_overflow (int): Extra connections opened when the pool is exhausted.
+            pool_timeout (float): Seconds to wait for a connection.
+            create_schema (bool): Create the missing tables first.
+        """
+        self.pool_options = {'pool_size': pool_size, 'max_overflow': max_overflow,
+                             'pool_timeout': pool_timeout}
+        self.engine = self._create_engine(database_url)
+        # PostgreSQL runs concurrent writers itself, so writes are never queued here
+        self.writer_queue = None
+        if create_schema:
+            self.create_schema()
+        self._create_sessions()
+
+    def _create_engine(self, database_url, replica=False):
+        # Replica sessions are read-only, as on a hot standby
+        options = {'options': '-c default_transaction_read_only=on'} if replica else {}
+        return create_engine(postgres_url(database_url), pool_pre_ping=True,
+                             connect_args=options, **self.pool_options)
+
+    def create_schema(self):
+        with self.engine.begin() as connection:
+            connection.execute(text("SELECT pg_advisory_xact_lock(:key)"),
+                               {'key': _SCHEMA_LOCK})
+            Base.metadata.create_all(connection)
+            for statement in SEARCH_DDL:
+                connection.execute(text(statement))
+            create_stats_functions(connection)
+
+    def _search_hits(self, terms):
+        query = build_tsquery(terms)
+        if query is None:
+            return None
+        tsquery = func.to_tsquery(literal_column(_CONFIG), query)
+        movie_vector = literal_column(f"({MOVIE_VECTOR})")
+        review_vector = literal_column(f"({REVIEW_VECTOR})")
+        # Negated ranks, so lower scores are better as with SQLite's bm25(). ts_rank()
+        # returns a real, whose text form would not round-trip through a page cursor.
+        return union_all(
+            select(Movie.id.label('movie_id'),
+                   (-cast(func.ts_rank(movie_vector, tsquery), DOUBLE_PRECISION))
+                   .label('score'))
+            .where(movie_vector.op('@@')(tsquery)),
+            select(Review.movie_id,
+                   -cast(func.ts_rank(review_vector, tsquery), DOUBLE_PRECISION))
+            .where(review_vector.op('@@')(tsquery)),
+        ).subquery()
+
+    @contextmanager
+    def _copy(self, session, statement):
+        """
+        Runs a COPY ... FROM STDIN in the session's transaction and yields its writer.
+        """
+        session.flush()
+        dbapi_connection = session.connection().connection.driver_connection
+        with dbapi_connection.cursor() as cursor:
+            with cursor.copy(statement) as copy:
+                yield copy
+
+    def add_users(self, names, session=None):
+        """
+        Adds several users, loaded with COPY.
+        """
+        if not names:
+            return 0
+        with self.session_scope(session, write=True) as session:
+            with self._copy(session, "COPY users (name) FROM STDIN") as copy:
+                for name in names:
+                    copy.write_row((name,))
+            self._touch(session, USERS_SCOPE)
+            return len(names)
+
+    def add_favorites(self, user_id, movies, session=None):
+        """
+        Adds several movies to a user's favorites in one transaction.
+
+        The movies are loaded with COPY into a temporary table, from which the missing
+        catalogue movies and favorites are inserted by three statements.
+        """
+        rows = {}
+        for movie in movies:
+            key = movie.get('imdb_id') or (movie['name'], movie['director'], movie['year'])
+            rows.setdefault(key, movie)
+
+        with self.session_scope(session, write=True) as session:
+            connection = session.connection()
+            connection.execute(text(
+                "CREATE TEMPORARY TABLE IF NOT EXISTS import_movies (imdb_id VARCHAR, "
+                "name VARCHAR NOT NULL, director VARCHAR, year INTEGER, "
+                "rating DOUBLE PRECISION) ON COMMIT DROP"))
+            connection.execute(text("TRUNCATE import_movies"))
+            with self._copy(session, "COPY import_movies (imdb_id, name, director, year, "
+                                     "rating) FROM STDIN") as copy:
+                for movie in rows.values():
+                    copy.write_row((movie.get('imdb_id') or None, movie['name'],
+                                    movie['director'], movie['year'], movie['rating']))
+
+            connection.execute(text(
+                "INSERT INTO movies (imdb_id, name, director, year, rating, status) "
+                "SELECT imdb_id, name, director, year, rating, 'ready' FROM import_movies "
+                "WHERE imdb_id IS NOT NULL ON CONFLICT (imdb_id) DO NOTHING"))
+            connection.execute(text(
+                "INSERT INTO movies (name, director, year, rating, status) "
+                "SELECT name, director, year, rating, 'ready' FROM import_movies i "
+                "WHERE imdb_id IS NULL AND NOT EXISTS (" + _SAME_MOVIE.format('1') + ")"))
+            added = len(connection.execute(text(
+                "INSERT INTO favorites (user_id, movie_id) "
+                "SELECT DISTINCT :user_id, movie_id FROM ("
+                "SELECT coalesce((SELECT m.id FROM movies m WHERE m.imdb_id = i.imdb_id), "
+                "(" + _SAME_MOVIE.format('min(m.id)') + ")) AS movie_id "
+                "FROM import_movies i) AS matched "
+                "ORDER BY movie_id "
+                "ON CONFLICT (user_id, movie_id) DO NOTHING RETURNING movie_id"),
+                {'user_id': user_id}).all())
+            if added:
+                self._touch(session, CATALOGUE_SCOPE, USER_SCOPE.format(user_id=user_id))
+            return added
+
@@ -1,174 +1,1063 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, joinedload
-from .Models import Base, User, Movie, Review
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from flask import has_request_context, session as flask_session
+from flask.globals import app_ctx
+from sqlalchemy import (String, and_, cast, create_engine, delete, event, exists, func,
+                        insert, literal, or_, select, union_all, update)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import scoped_session, sessionmaker, joinedload
+from .models import (Base, User, Movie, Favorite, Review, EnrichmentJob, CacheVersion,
+                     NeighbourUpdate,
+                     DirectorStats, MovieStats, UserStats, YearStats,
+                     CATALOGUE_SORT_EXPRESSIONS, CATALOGUE_SCOPE, USERS_SCOPE, USER_SCOPE,
+                     MOVIE_SCOPE, USER_MOVIES_SCOPE)
 from .DataManager import DataManagerInterface
+from .engine import WriterQueue, apply_pragmas, enable_immediate_transactions
+from .pagination import apply_keyset, split_page
+from .replicas import ReplicaSet, RoutingSession
+from .projections import (ActiveReviewer, DirectorRating, FavoriteMovie, MovieSummary,
+                          PopularMovie, ReviewSummary, UserSummary, YearRating, project)
+from .search import (build_match_query, create_search_index, match, movie_search,
+                     review_search)
+from .stats import create_stats_triggers, rebuild_stats
+
+CATALOGUE_SORT_KEYS = tuple(CATALOGUE_SORT_EXPRESSIONS)
+USER_MOVIE_SORT_KEYS = ('added',) + CATALOGUE_SORT_KEYS
+
+
+# Flask session key holding the time until which the client's reads go to the primary
+_READ_PRIMARY_UNTIL = '_read_primary_until'
+
+
+def _app_context_id():
+    return id(app_ctx._get_current_object())
+
+
+# Seconds a worker's claim on a running enrichment job lasts before another may take
+# the job over; longer than the OMDb lookup of one attempt, retries included
+ENRICHMENT_LEASE_TIMEOUT = 300
+
+
+def _utcnow():
+    # Naive UTC, as CURRENT_TIMESTAMP stores it in the DateTime columns
+    return datetime.now(timezone.utc).replace(tzinfo=None)
 
 
 class SQLiteDataManager(DataManagerInterface):
     """
     Manages database interactions using SQLite with SQLAlchemy ORM.
+
+    Inside a Flask request bound with ``init_app`` every method shares one session, so
+    a request checks out one connection and commits one transaction after the view
+    returns. Outside a request each call runs in its own short transaction, unless a
+    session from ``unit_of_work`` is passed in through the ``session`` argument.
+
+    The queries are written against SQLAlchemy's portable constructs; subclasses for
+    other databases override the dialect-specific parts: ``_insert``, the extra schema
+    of ``create_schema``, the full-text ``_search_hits``, ``_create_engine`` and the
+    ``replica_lag_query``.
+
+    With ``use_replicas`` the plain SELECT statements of a session go to read replicas
+    until the session writes; see RoutingSession.
     """
 
-    def __init__(self, db_file_name):
+    # INSERT construct with ON CONFLICT support for this database
+    _insert = staticmethod(sqlite_insert)
+    # Execution options of the listings that return every row of a table
+    listing_options = {}
+    # SQL returning a read replica's replication lag in seconds, None if unknown
+    replica_lag_query = None
+
+    def __init__(self, db_file_name, pool_size=5, max_overflow=10, pool_timeout=30,
+                 pragmas=None, serialize_writes=False, create_schema=True):
         """
         Initializes the SQLiteDataManager with an SQLite database file.
+
+        Args:
+            db_file_name (str): Path to the SQLite database file.
+            pool_size (int): Connections kept open in the pool.
+            max_overflow (int): Extra connections opened when the pool is exhausted.
+            pool_timeout (float): Seconds to wait for a connection, or for the turn to write.
+            pragmas (dict): PRAGMA settings applied to every connection,
+                e.g. {'journal_mode': 'WAL', 'busy_timeout': 5000}.
+            serialize_writes (bool): Queue writing transactions in this process and
+                start them with BEGIN IMMEDIATE.
+            create_schema (bool): Create the missing tables first. Off where the schema
+                is set up by `flask init-db` or the migrations, so starting does not
+                take the write lock.
+        """
+        self.pool_options = {'pool_size': pool_size, 'max_overflow': max_overflow,
+                             'pool_timeout': pool_timeout}
+        # Foreign keys are always enforced so ON DELETE CASCADE removes child rows
+        self.pragmas = {'foreign_keys': 'ON', **(pragmas or {})}
+        self.engine = self._create_engine(db_file_name)
+        self.writer_queue = None
+        if serialize_writes:
+            enable_immediate_transactions(self.engine)
+            self.writer_queue = WriterQueue(timeout=pool_timeout)
+        if create_schema:
+            self.create_schema()
+        self._create_sessions()
+        if serialize_writes:
+            event.listen(self.Session, 'after_transaction_end', self._release_writer)
+
+    def create_schema(self):
+        """
+        Creates the missing tables, the full-text indexes and the statistics triggers.
         """
-        self.engine = create_engine(f'sqlite:///{db_file_name}')
         Base.metadata.create_all(self.engine)
-        self.Session = sessionmaker(bind=self.engine)
+        with self.engine.begin() as connection:
+            create_search_index(connection)
+            create_stats_triggers(connection)
 
-    def get_user(self, user_id):
+    def _create_engine(self, db_file_name, replica=False):
         """
-        Retrieves a user by their ID.
+        Creates the engine of the database, or of one of its read replicas.
+        """
+        # Pooled connections are handed to whichever thread checks them out, so
+        # sqlite3's same-thread check is disabled; a session is never shared by threads.
+        engine = create_engine(f'sqlite:///{db_file_name}', pool_pre_ping=True,
+                               connect_args={'check_same_thread': False},
+                               **self.pool_options)
+        apply_pragmas(engine, {**self.pragmas, 'query_only': 'ON'} if replica else self.pragmas)
+        return engine
+
+    def _create_sessions(self):
+        self.Session = sessionmaker(bind=self.engine, class_=RoutingSession,
+                                    expire_on_commit=False)
+        self.request_session = scoped_session(self.Session, scopefunc=_app_context_id)
+        self.replicas = None
+        self.read_your_writes = 0
+        self.app = None
+
+    def use_replicas(self, databases, selection='round_robin', max_lag=None,
+                     read_your_writes=5.0, check_interval=5.0, retry_after=30.0):
+        """
+        Sends the reads of sessions that have not written to read replicas.
+
+        Writes, and the reads of a session after it writes, stay on the primary. So do
+        the reads of a Flask client for ``read_your_writes`` seconds after a request of
+        theirs wrote, so the page it redirects to shows the change. Replicas that lag or
+        cannot be reached are skipped, down to reading from the primary.
+
+        Args:
+            databases (list): The replicas, given like the primary database.
+            selection (str): 'round_robin' or 'least_latency'.
+            max_lag (float): Seconds of replication lag above which a replica is not
+                read from, or None to ignore the lag.
+            read_your_writes (float): Seconds a client reads from the primary after
+                writing.
+            check_interval (float): Seconds between checks of each replica's lag.
+            retry_after (float): Seconds an unreachable replica is left alone.
+
+        Raises:
+            ValueError: If the selection policy is unknown.
         """
+        self.replicas = ReplicaSet([self._create_engine(database, replica=True)
+                                    for database in databases],
+                                   selection=selection, max_lag=max_lag,
+                                   check_interval=check_interval, retry_after=retry_after,
+                                   lag_query=self.replica_lag_query)
+        self.read_your_writes = read_your_writes
+        self.Session.configure(replicas=self.replicas)
+
+    def init_app(self, app):
+        """
+        Binds the request-scoped session to a Flask application.
+
+        The request's session is committed after a successful response and removed
+        when the application context ends. Blueprints reach the data manager through
+        ``app.extensions['data_manager']``.
+        """
+        self.app = app
+        app.extensions['data_manager'] = self
+        app.after_request(self.commit_request)
+        app.teardown_appcontext(self.remove_request_session)
+
+    def commit_request(self, response):
+        """
+        Commits the request's session unless the response is a server error, as an
+        ``after_request`` hook.
+        """
+        if response.status_code < 500:
+            self.commit()
+            if self.replicas is not None and self.request_session.registry.has() \
+                    and self.request_session().info.get('wrote'):
+                flask_session[_READ_PRIMARY_UNTIL] = time.time() + self.read_your_writes
+        return response
+
+    def remove_request_session(self, exception=None):
+        """
+        Removes the request's session, as a ``teardown_appcontext`` hook.
+        """
+        self.request_session.remove()
+
+    def dispose(self, close=True):
+        """
+        Drops the pooled connections of the database and of its replicas.
+
+        Args:
+            close (bool): Close the connections. A forked worker passes False: its
+                copies of the parent's connections are let go without closing them,
+                which would break them for the parent.
+        """
+        self.engine.dispose(close=close)
+        if self.replicas is not None:
+            self.replicas.dispose(close=close)
+
+    def in_request(self):
+        """
+        Returns whether calls share the session of the current Flask request.
+        """
+        return self.app is not None and has_request_context()
+
+    @contextmanager
+    def session_scope(self, session=None, write=False):
+        """
+        Provides the session a data manager method runs in.
+
+        A session passed in by the caller, or the current request's session, is only
+        flushed: committing is left to its owner. Otherwise a new session is opened,
+        committed on success and closed. With ``write`` the session reads from the
+        primary, and waits for its turn in the writer queue when writes are serialized.
+        """
+        owned = False
+        if session is None and self.in_request():
+            session = self._request_session()
+            owned = True
+        if write and session is not None:
+            session.info['primary'] = session.info['wrote'] = True
+        if session is not None:
+            if write:
+                self._begin_write(session, owned=owned)
+            yield session
+            session.flush()
+            return
+
         session = self.Session()
         try:
-            return session.query(User).filter_by(id=user_id).first()
+            if write:
+                session.info['primary'] = session.info['wrote'] = True
+                self._begin_write(session)
+            yield session
+            session.commit()
+        except BaseException:
+            session.rollback()
+            raise
         finally:
             session.close()
 
-    def get_user_by_id(self, user_id):
+    def _request_session(self):
         """
-        Fetches a user by ID.
+        Returns the current request's session, reading from the primary for a client
+        that wrote within the last ``read_your_writes`` seconds.
+        """
+        new = not self.request_session.registry.has()
+        session = self.request_session()
+        if new and self.replicas is not None \
+                and flask_session.get(_READ_PRIMARY_UNTIL, 0) > time.time():
+            session.info['primary'] = True
+        return session
+
+    @contextmanager
+    def unit_of_work(self):
+        """
+        Opens a session shared by several data manager calls and commits it once.
+
+        Usage:
+            with data_manager.unit_of_work() as session:
+                data_manager.add_user("Ann", session=session)
+                data_manager.add_user("Bob", session=session)
         """
         session = self.Session()
         try:
-            return session.query(User).filter_by(id=user_id).first()
+            session.info['primary'] = session.info['wrote'] = True
+            self._begin_write(session)
+            yield session
+            session.commit()
+        except BaseException:
+            session.rollback()
+            raise
         finally:
             session.close()
 
-    def get_all_users(self):
+    def _begin_write(self, session, owned=True):
         """
-        Retrieves all users from the database.
+        Takes this process's turn to write and starts an immediate transaction.
+
+        A transaction already open on the request's session has only read so far, as
+        writes always come through here; it is committed first since SQLite cannot turn
+        it into an immediate one. A caller's open transaction is left as it is.
         """
-        session = self.Session()
+        if self.writer_queue is None or session.info.get('writer'):
+            return
+        if owned and session.in_transaction():
+            session.commit()
+        self.writer_queue.acquire()
+        session.info['writer'] = True
         try:
-            return session.query(User).all()
-        finally:
-            session.close()
+            if not session.in_transaction():
+                session.connection(execution_options={'sqlite_begin_immediate': True})
+        except BaseException:
+            session.info.pop('writer', None)
+            self.writer_queue.release()
+            raise
+
+    def _release_writer(self, session, transaction):
+        if transaction.parent is None and session.info.pop('writer', False):
+            self.writer_queue.release()
+
+    def commit(self):
+        """
+        Commits the current request's session, if a request is using one.
+        """
+        if self.in_request() and self.request_session.registry.has():
+            self.request_session.commit()
 
-    def get_user_movies(self, user_id):
+    def get_cache_versions(self, scopes, session=None):
+        """
+        Returns the versions of cache scopes as {scope: (version, updated_at)}.
+
+        Scopes that were never written are missing from the result. A USER_MOVIES_SCOPE
+        is versioned by the sum of the versions of the user's favorite movies.
+        """
+        user_movies_prefix = USER_MOVIES_SCOPE.split('{')[0]
+        movie_scope = literal(MOVIE_SCOPE.split('{')[0]) + cast(Favorite.movie_id, String)
+        with self.session_scope(session) as session:
+            rows = session.execute(select(CacheVersion.scope, CacheVersion.version,
+                                          CacheVersion.updated_at)
+                                   .where(CacheVersion.scope.in_(list(scopes))))
+            versions = {row.scope: (row.version, row.updated_at) for row in rows}
+            for scope in scopes:
+                if not scope.startswith(user_movies_prefix):
+                    continue
+                version, updated_at = session.execute(
+                    select(func.sum(CacheVersion.version), func.max(CacheVersion.updated_at))
+                    .select_from(Favorite)
+                    .join(CacheVersion, CacheVersion.scope == movie_scope)
+                    .where(Favorite.user_id == int(scope[len(user_movies_prefix):]))).one()
+                if version is not None:
+                    versions[scope] = (version, updated_at)
+            return versions
+
+    def _touch(self, session, *scopes, movie_ids=()):
+        """
+        Bumps the versions of the cache scopes a write changes, in the write's transaction.
+
+        ``movie_ids`` are the movies whose details or review count changed; the pages
+        showing them follow through USER_MOVIES_SCOPE.
+        """
+        scopes = scopes + tuple(MOVIE_SCOPE.format(movie_id=movie_id)
+                                for movie_id in movie_ids)
+        if not scopes:
+            return
+        now = time.time()
+        statement = self._insert(CacheVersion).values(
+            [{'scope': scope, 'version': 1, 'updated_at': now} for scope in scopes])
+        session.execute(statement.on_conflict_do_update(
+            index_elements=[CacheVersion.scope],
+            set_={'version': CacheVersion.version + 1,
+                  'updated_at': statement.excluded.updated_at}))
+
+    def get_user(self, user_id, session=None):
+        """
+        Retrieves a user by their ID.
+        """
+        with self.session_scope(session) as session:
+            return session.query(User).filter_by(id=user_id).first()
+
+    def get_user_by_id(self, user_id, session=None):
+        """
+        Fetches a user by ID.
+        """
+        with self.session_scope(session) as session:
+            return session.query(User).filter_by(id=user_id).first()
+
+    def get_all_users(self, session=None):
+        """
+        Retrieves all users from the database.
+        """
+        with self.session_scope(session) as session:
+            return session.query(User).execution_options(**self.listing_options).all()
+
+    def get_user_summaries(self, session=None):
+        """
+        Retrieves the ID and name of every user, without loading User objects.
+        """
+        with self.session_scope(session) as session:
+            rows = session.execute(select(User.id, User.name).order_by(User.id),
+                                   execution_options=self.listing_options).mappings()
+            return [project(UserSummary, row) for row in rows]
+
+    def get_users_page(self, limit=50, after=None, session=None):
+        """
+        Fetches one page of users' IDs and names, in the order they registered.
+        """
+        query = apply_keyset(select(User.id, User.name), [User.id], after, limit)
+
+        with self.session_scope(session) as session:
+            rows = session.execute(query).mappings().all()
+
+        rows, next_cursor = split_page(rows, limit, lambda row: [row['id']])
+        return [project(UserSummary, row) for row in rows], next_cursor
+
+    def get_user_movies(self, user_id, session=None):
         """
         Retrieves all movies favorite by a specific user.
         """
-        session = self.Session()
-        try:
-            user = session.query(User).options(joinedload(User.movies)
-                                               .joinedload(Movie.reviews)).filter_by(id=user_id).first()
-            return user.movies if user else []
-        finally:
-            session.close()
+        with self.session_scope(session) as session:
+            return (session.query(Movie)
+                    .join(Favorite, Favorite.movie_id == Movie.id)
+                    .filter(Favorite.user_id == user_id)
+                    .options(joinedload(Movie.reviews))
+                    .order_by(Favorite.id)
+                    .all())
 
-    def get_movie_with_reviews(self, movie_id):
-        session = self.Session()
-        try:
+    def get_user_movie_page(self, user_id, limit=50, after=None, sort='added',
+                            descending=False, session=None):
+        """
+        Fetches one page of a user's favorite movies with their review counts.
+
+        Review counts come from an aggregate over the reviews index instead of loading
+        the reviews themselves, and pages are addressed by keyset cursors.
+        """
+        if sort not in USER_MOVIE_SORT_KEYS:
+            raise ValueError(f"Unsupported sort key: {sort!r}")
+
+        if sort == 'added':
+            sort_column = Favorite.id
+            key = [Favorite.id]
+        else:
+            sort_column = CATALOGUE_SORT_EXPRESSIONS[sort]
+            key = [sort_column, Movie.id]
+
+        review_count = (select(func.count(Review.id))
+                        .where(Review.movie_id == Movie.id)
+                        .scalar_subquery())
+        query = (select(Movie.id, Movie.name, Movie.director, Movie.year, Movie.rating,
+                        Movie.status, Favorite.rating.label('user_rating'),
+                        review_count.label('review_count'), sort_column.label('sort_value'))
+                 .join(Favorite, Favorite.movie_id == Movie.id)
+                 .where(Favorite.user_id == user_id))
+        query = apply_keyset(query, key, after, limit, descending)
+
+        with self.session_scope(session) as session:
+            rows = session.execute(query).mappings().all()
+
+        rows, next_cursor = split_page(
+            rows, limit, lambda row: [row['sort_value']] if sort == 'added'
+            else [row['sort_value'], row['id']])
+        return [project(FavoriteMovie, row) for row in rows], next_cursor
+
+    def get_movie_with_reviews(self, movie_id, session=None):
+        with self.session_scope(session) as session:
             # Eagerly load reviews when fetching the movie
             return session.query(Movie).options(joinedload(Movie.reviews)).filter_by(id=movie_id).first()
-        finally:
-            session.close()
 
-    def get_all_movies(self):
+    def get_all_movies(self, session=None):
         """
         Fetches all movies in the database.
         """
-        session = self.Session()
-        try:
-            return session.query(Movie).all()
-        finally:
-            session.close()
+        with self.session_scope(session) as session:
+            return session.query(Movie).execution_options(**self.listing_options).all()
+
+    def get_movie_catalogue(self, limit=50, after=None, sort='name', descending=False,
+                            session=None):
+        """
+        Fetches one page of the movie catalogue in a single query.
+
+        Each movie is stored once in the shared catalogue, so only movies that at
+        least one user still favorites need filtering out. Pages are addressed by
+        keyset cursors so the cost of a page does not grow with its offset.
+        """
+        if sort not in CATALOGUE_SORT_KEYS:
+            raise ValueError(f"Unsupported sort key: {sort!r}")
+
+        sort_column = CATALOGUE_SORT_EXPRESSIONS[sort]
+        key = [sort_column, Movie.id] if sort == 'name' else [sort_column, Movie.name, Movie.id]
+
+        query = (select(Movie.id, Movie.name, Movie.director, Movie.year, Movie.rating,
+                        sort_column.label('sort_value'))
+                 .where(Movie.status == 'ready',
+                        exists().where(Favorite.movie_id == Movie.id)))
+        query = apply_keyset(query, key, after, limit, descending)
+
+        with self.session_scope(session) as session:
+            rows = session.execute(query).mappings().all()
+
+        rows, next_cursor = split_page(
+            rows, limit, lambda row: [row['sort_value'], row['id']] if sort == 'name'
+            else [row['sort_value'], row['name'], row['id']])
+        return [project(MovieSummary, row) for row in rows], next_cursor
+
+    def search(self, terms, limit=20, after=None, session=None):
+        """
+        Searches the catalogue through the full-text indexes, best matches first.
+
+        A movie scores the sum of the BM25 ranks of its name and director, weighted
+        above review text, and of each of its reviews that matches. Pages are addressed
+        by keyset cursors over (score, id).
+        """
+        hits = self._search_hits(terms)
+        if hits is None:
+            return [], None
+
+        scores = (select(hits.c.movie_id, func.sum(hits.c.score).label('score'))
+                  .group_by(hits.c.movie_id)
+                  .subquery())
+
+        query = (select(Movie.id, Movie.name, Movie.director, Movie.year, Movie.rating,
+                        scores.c.score)
+                 .join_from(scores, Movie, Movie.id == scores.c.movie_id)
+                 .where(Movie.status == 'ready',
+                        exists().where(Favorite.movie_id == Movie.id)))
+        query = apply_keyset(query, [scores.c.score, Movie.id], after, limit)
+
+        with self.session_scope(session) as session:
+            rows = session.execute(query).mappings().all()
+
+        rows, next_cursor = split_page(rows, limit, lambda row: [row['score'], row['id']])
+        return [project(MovieSummary, row) for row in rows], next_cursor
 
-    def add_user(self, user_name):
+    def _search_hits(self, terms):
+        """
+        Returns a subquery of (movie_id, score) rows, one per matching movie name or
+        review, where a lower score is a better match; None if the terms hold no words.
+        """
+        match_query = build_match_query(terms)
+        if match_query is None:
+            return None
+        return union_all(
+            select(movie_search.c.rowid.label('movie_id'), movie_search.c.rank.label('score'))
+            .where(match(movie_search, match_query)),
+            select(Review.movie_id, review_search.c.rank)
+            .join_from(review_search, Review, Review.id == review_search.c.rowid)
+            .where(match(review_search, match_query)),
+        ).subquery()
+
+    def find_movie(self, title, imdb_id=None, session=None):
+        """
+        Looks up a catalogue movie by its IMDb ID, or by its title, ignoring case.
+
+        The title is only a fallback and only matches when a single catalogue movie
+        carries it; remakes sharing a title are left for OMDb to tell apart.
+        """
+        with self.session_scope(session) as session:
+            if imdb_id:
+                movie = session.query(Movie).filter_by(imdb_id=imdb_id, status='ready').first()
+                if movie is not None:
+                    return movie
+            if not title or not title.strip():
+                return None
+            movies = (session.query(Movie)
+                      .filter(func.lower(Movie.name) == title.strip().lower(),
+                              Movie.status == 'ready')
+                      .limit(2)
+                      .all())
+            return movies[0] if len(movies) == 1 else None
+
+    def add_user(self, user_name, session=None):
         """
         Adds a new user to the database.
         """
-        session = self.Session()
-        try:
+        with self.session_scope(session, write=True) as session:
             new_user = User(name=user_name)
             session.add(new_user)
-            session.commit()
-        finally:
-            session.close()
+            self._touch(session, USERS_SCOPE)
+
+    def add_users(self, names, session=None):
+        """
+        Adds several users with a single multi-row insert.
+        """
+        if not names:
+            return 0
+        with self.session_scope(session, write=True) as session:
+            session.execute(insert(User), [{"name": name} for name in names])
+            self._touch(session, USERS_SCOPE)
+            return len(names)
 
-    def delete_user(self, user_id):
+    def delete_user(self, user_id, session=None):
         """
         Deletes a user from the database by ID.
         """
-        session = self.Session()
-        try:
-            user = session.query(User).filter_by(id=user_id).first()
-            if user:
-                session.delete(user)
-                session.commit()
-        finally:
-            session.close()
+        with self.session_scope(session, write=True) as session:
+            # Favorites and reviews go with the user through ON DELETE CASCADE, changing
+            # the review counts of the movies the user reviewed
+            reviewed = session.scalars(select(Review.movie_id)
+                                       .where(Review.user_id == user_id).distinct()).all()
+            session.execute(delete(User).where(User.id == user_id))
+            self._touch(session, USERS_SCOPE, CATALOGUE_SCOPE,
+                        USER_SCOPE.format(user_id=user_id), movie_ids=reviewed)
 
-    def get_movie(self, movie_id):
+    def get_movie(self, movie_id, session=None):
         """
         Retrieves a movie by its ID.
         """
-        session = self.Session()
-        try:
+        with self.session_scope(session) as session:
             return session.query(Movie).filter_by(id=movie_id).first()
-        finally:
-            session.close()
 
-    def add_movie(self, user_id, name, director, year, rating):
+    def add_movie(self, user_id, name, director, year, rating, imdb_id=None,
+                  user_rating=None, session=None):
         """
         Adds a movie to a user's list of favorite movies.
+
+        The movie is stored once in the shared catalogue, matched on its IMDb ID when
+        one is known and on (name, director, year) otherwise, and linked to the user
+        through a favorite carrying the user's own rating. Re-adding a favorite with a
+        rating updates it.
         """
-        session = self.Session()
-        try:
-            new_movie = Movie(name=name, director=director, year=year, rating=rating, user_id=user_id)
-            session.add(new_movie)
-            session.commit()
-        finally:
-            session.close()
+        with self.session_scope(session, write=True) as session:
+            movie = None
+            if imdb_id:
+                movie = session.query(Movie).filter_by(imdb_id=imdb_id).first()
+            if movie is None:
+                movie = session.query(Movie).filter_by(name=name, director=director,
+                                                       year=year, status='ready').first()
+            if movie is None:
+                movie = Movie(imdb_id=imdb_id, name=name, director=director,
+                              year=year, rating=rating)
+                session.add(movie)
+                session.flush()
+            elif imdb_id and not movie.imdb_id:
+                movie.imdb_id = imdb_id
 
-    def delete_movie(self, movie_id):
+            # A favorite the user already has, even one added concurrently, is skipped
+            # unless the user rated it again
+            favorite = self._insert(Favorite).values(user_id=user_id, movie_id=movie.id,
+                                                      rating=user_rating)
+            if user_rating is None:
+                favorite = favorite.on_conflict_do_nothing(
+                    index_elements=['user_id', 'movie_id'])
+            else:
+                favorite = favorite.on_conflict_do_update(
+                    index_elements=['user_id', 'movie_id'],
+                    set_={'rating': favorite.excluded.rating})
+            added = session.execute(favorite).rowcount
+            if added:
+                self._touch(session, CATALOGUE_SCOPE, USER_SCOPE.format(user_id=user_id))
+            return movie
+
+    def add_favorites(self, user_id, movies, session=None):
         """
-        Deletes a movie from the database by ID.
+        Adds several movies to a user's favorites in one transaction.
+
+        Catalogue movies and favorites are written with multi-row inserts that skip
+        rows already present, so re-importing the same list is harmless.
         """
-        session = self.Session()
-        try:
-            movie = session.query(Movie).filter_by(id=movie_id).first()
-            if movie:
+        with self.session_scope(session, write=True) as session:
+            by_imdb_id = {}
+            by_key = {}
+            for movie in movies:
+                if movie.get('imdb_id'):
+                    by_imdb_id.setdefault(movie['imdb_id'], movie)
+                else:
+                    by_key.setdefault((movie['name'], movie['director'], movie['year']), movie)
+
+            movie_ids = set()
+            if by_imdb_id:
+                session.execute(
+                    self._insert(Movie).on_conflict_do_nothing(index_elements=['imdb_id']),
+                    [dict(movie, status='ready') for movie in by_imdb_id.values()])
+                movie_ids.update(session.scalars(
+                    select(Movie.id).where(Movie.imdb_id.in_(list(by_imdb_id)))))
+            for (name, director, year), movie in by_key.items():
+                existing = session.query(Movie.id).filter_by(
+                    name=name, director=director, year=year, status='ready').first()
+                if existing is None:
+                    existing = Movie(status='ready', **movie)
+                    session.add(existing)
+                    session.flush()
+                movie_ids.add(existing.id)
+
+            added = 0
+            if movie_ids:
+                added = len(session.execute(
+                    self._insert(Favorite)
+                    .values([{"user_id": user_id, "movie_id": movie_id}
+                             for movie_id in sorted(movie_ids)])
+                    .on_conflict_do_nothing(index_elements=['user_id', 'movie_id'])
+                    .returning(Favorite.movie_id)).all())
+            if added:
+                self._touch(session, CATALOGUE_SCOPE, USER_SCOPE.format(user_id=user_id))
+            return added
+
+    def add_movie_placeholder(self, user_id, title, user_rating=None, session=None):
+        """
+        Adds a movie whose details are not known yet to a user's favorites.
+
+        A pending catalogue movie named after the title, the user's favorite and an
+        enrichment job are created in one transaction. Returns the job.
+        """
+        with self.session_scope(session, write=True) as session:
+            movie = Movie(name=title.strip(), status='pending')
+            session.add(movie)
+            session.flush()
+            session.add(Favorite(user_id=user_id, movie_id=movie.id, rating=user_rating))
+            job = EnrichmentJob(movie_id=movie.id, title=title.strip(), status='pending',
+                                attempts=0)
+            session.add(job)
+            self._touch(session, USER_SCOPE.format(user_id=user_id))
+            return job
+
+    @staticmethod
+    def _claimable_job(lease_timeout):
+        """
+        Matches the jobs a worker may claim: pending ones, and running ones whose
+        worker has not renewed its claim for ``lease_timeout`` seconds, as when the
+        process running them stopped.
+        """
+        expired = _utcnow() - timedelta(seconds=lease_timeout)
+        return or_(EnrichmentJob.status == 'pending',
+                   and_(EnrichmentJob.status == 'running', EnrichmentJob.updated_at < expired))
+
+    def get_pending_enrichment_jobs(self, lease_timeout=ENRICHMENT_LEASE_TIMEOUT,
+                                    session=None):
+        """
+        Returns the enrichment jobs waiting for a worker, including ones that were
+        running when their process stopped.
+        """
+        with self.session_scope(session) as session:
+            return (session.query(EnrichmentJob)
+                    .filter(self._claimable_job(lease_timeout))
+                    .order_by(EnrichmentJob.id)
+                    .all())
+
+    def start_enrichment_job(self, job_id, lease_timeout=ENRICHMENT_LEASE_TIMEOUT,
+                             session=None):
+        """
+        Claims an enrichment job for this worker and counts the attempt.
+
+        The claim is a single conditional update, so of several workers resuming the
+        same job only one runs it. Returns the number of attempts so far, or None if
+        the job is finished or claimed by another worker.
+        """
+        with self.session_scope(session, write=True) as session:
+            return session.execute(
+                update(EnrichmentJob)
+                .where(EnrichmentJob.id == job_id, self._claimable_job(lease_timeout))
+                .values(status='running', attempts=EnrichmentJob.attempts + 1,
+                        updated_at=_utcnow())
+                .returning(EnrichmentJob.attempts)
+                .execution_options(synchronize_session=False)).scalar_one_or_none()
+
+    def complete_enrichment_job(self, job_id, name, director, year, rating, imdb_id=None,
+                                session=None):
+        """
+        Fills in a pending movie with the details fetched from OMDb.
+
+        If the catalogue already holds the movie under the same IMDb ID, the pending
+        movie's favorites and reviews are moved onto it and the pending movie is removed.
+
+        Returns the (user_id, movie_id) favorites of catalogue movies the job added.
+        """
+        resolved = []
+        with self.session_scope(session, write=True) as session:
+            job = session.query(EnrichmentJob).filter_by(id=job_id).first()
+            if job is None:
+                return resolved
+            movie = session.get(Movie, job.movie_id) if job.movie_id else None
+            if movie is not None:
+                self._touch(session, CATALOGUE_SCOPE, movie_ids=[movie.id])
+            existing = None
+            if imdb_id:
+                existing = session.query(Movie).filter_by(imdb_id=imdb_id).first()
+            if existing is None:
+                existing = session.query(Movie).filter_by(name=name, director=director,
+                                                          year=year, status='ready').first()
+
+            if movie is not None and existing is not None and existing.id != movie.id:
+                taken = {favorite.user_id: favorite for favorite in
+                         session.query(Favorite).filter_by(movie_id=existing.id)}
+                for favorite in session.query(Favorite).filter_by(movie_id=movie.id):
+                    kept = taken.get(favorite.user_id)
+                    if kept is None:
+                        favorite.movie_id = existing.id
+                        resolved.append((favorite.user_id, existing.id))
+                        continue
+                    if favorite.rating is not None:
+                        kept.rating = favorite.rating
+                    session.delete(favorite)
+                session.query(Review).filter_by(movie_id=movie.id) \
+                    .update({Review.movie_id: existing.id})
+                session.query(EnrichmentJob).filter_by(movie_id=movie.id) \
+                    .update({EnrichmentJob.movie_id: existing.id})
+                session.flush()
+                self._touch(session, movie_ids=[existing.id])
                 session.delete(movie)
-                session.commit()
-        finally:
-            session.close()
+            elif movie is not None:
+                movie.name = name
+                movie.director = director
+                movie.year = year
+                movie.rating = rating
+                movie.imdb_id = imdb_id
+                movie.status = 'ready'
+                resolved.extend((user_id, movie.id) for (user_id,) in
+                                session.query(Favorite.user_id).filter_by(movie_id=movie.id))
+
+            job.status = 'done'
+            job.error = None
+        return resolved
 
-    def add_review(self, user_id, movie_id, review_text):
+    def fail_enrichment_job(self, job_id, error, retry=False, session=None):
+        """
+        Records a failed enrichment attempt.
+
+        With ``retry`` the job goes back to pending; otherwise the job and its movie
+        are marked as failed.
+        """
+        with self.session_scope(session, write=True) as session:
+            job = session.query(EnrichmentJob).filter_by(id=job_id).first()
+            if job is None:
+                return
+            job.error = error
+            job.status = 'pending' if retry else 'failed'
+            if not retry and job.movie_id:
+                movie = session.get(Movie, job.movie_id)
+                if movie is not None and movie.status == 'pending':
+                    movie.status = 'failed'
+                    self._touch(session, movie_ids=[movie.id])
+
+    def delete_movie(self, user_id, movie_id, session=None):
+        """
+        Removes a movie from a user's favorites, leaving the catalogue entry in place.
+        """
+        with self.session_scope(session, write=True) as session:
+            favorite = session.query(Favorite).filter_by(user_id=user_id,
+                                                         movie_id=movie_id).first()
+            if favorite:
+                session.delete(favorite)
+                self._touch(session, CATALOGUE_SCOPE, USER_SCOPE.format(user_id=user_id))
+
+    def add_review(self, user_id, movie_id, review_text, session=None):
         """
         Adds a review for a movie by a specific user.
         """
-        session = self.Session()
-        try:
+        with self.session_scope(session, write=True) as session:
             new_review = Review(user_id=user_id, movie_id=movie_id, review_text=review_text)
             session.add(new_review)
-            session.commit()
+            self._touch(session, movie_ids=[movie_id])
             return new_review
-        finally:
-            session.close()
 
-    def get_movie_reviews(self, movie_id):
+    def get_movie_reviews(self, movie_id, session=None):
         """
         Fetches all reviews for a specific movie.
         """
-        session = self.Session()
-        try:
+        with self.session_scope(session) as session:
             return session.query(Review).filter_by(movie_id=movie_id).all()
-        finally:
-            session.close()
 
-    def delete_review(self, review_id):
+    def get_review_page(self, movie_id, limit=20, after=None, session=None):
+        """
+        Fetches one page of a movie's reviews, oldest first.
+        """
+        query = (select(Review.id, Review.user_id, Review.review_text)
+                 .where(Review.movie_id == movie_id))
+        query = apply_keyset(query, [Review.id], after, limit)
+
+        with self.session_scope(session) as session:
+            rows = session.execute(query).mappings().all()
+
+        rows, next_cursor = split_page(rows, limit, lambda row: [row['id']])
+        return [project(ReviewSummary, row) for row in rows], next_cursor
+
+    def delete_review(self, review_id, session=None):
         """
         Deletes a review from the database by review ID.
         """
-        session = self.Session()
-        try:
+        with self.session_scope(session, write=True) as session:
             review = session.query(Review).filter_by(id=review_id).first()
             if review:
                 session.delete(review)
-                session.commit()
-        finally:
-            session.close()
\ No newline at end of file
+                self._touch(session, movie_ids=[review.movie_id])
+
+    def get_most_favorited_movies(self, limit=10, session=None):
+        """
+        Lists the catalogue movies with the most favorites, read off the movie_stats
+        index without counting favorites.
+        """
+        query = (select(Movie.id, Movie.name, Movie.director, Movie.year, Movie.rating,
+                        MovieStats.favorite_count, MovieStats.review_count)
+                 .join_from(MovieStats, Movie, Movie.id == MovieStats.movie_id)
+                 .where(MovieStats.favorite_count > 0, Movie.status == 'ready')
+                 .order_by(MovieStats.favorite_count.desc(), MovieStats.movie_id.desc())
+                 .limit(limit))
+        with self.session_scope(session) as session:
+            return [project(PopularMovie, row) for row in session.execute(query).mappings()]
+
+    def get_most_active_reviewers(self, limit=10, session=None):
+        """
+        Lists the users who wrote the most reviews, read off the user_stats index.
+        """
+        query = (select(User.id, User.name, UserStats.review_count, UserStats.favorite_count)
+                 .join_from(UserStats, User, User.id == UserStats.user_id)
+                 .where(UserStats.review_count > 0)
+                 .order_by(UserStats.review_count.desc(), UserStats.user_id.desc())
+                 .limit(limit))
+        with self.session_scope(session) as session:
+            return [project(ActiveReviewer, row) for row in session.execute(query).mappings()]
+
+    def get_top_directors(self, limit=10, min_movies=1, session=None):
+        """
+        Lists the directors whose rated catalogue movies have the best average rating.
+
+        Directors with fewer than ``min_movies`` rated movies are left out, as is the
+        'N/A' OMDb gives for unknown directors.
+        """
+        query = (select(DirectorStats.director, DirectorStats.movie_count,
+                        DirectorStats.average_rating)
+                 .where(DirectorStats.rated_count >= max(min_movies, 1),
+                        DirectorStats.director.not_in(('', 'N/A')))
+                 .order_by(DirectorStats.average_rating.desc(), DirectorStats.director.desc())
+                 .limit(limit))
+        with self.session_scope(session) as session:
+            return [project(DirectorRating, row) for row in session.execute(query).mappings()]
+
+    def get_year_stats(self, session=None):
+        """
+        Lists the number of catalogue movies and their average rating per release year,
+        most recent first.
+        """
+        query = (select(YearStats.year, YearStats.movie_count, YearStats.average_rating)
+                 .where(YearStats.movie_count > 0, YearStats.year > 0)
+                 .order_by(YearStats.year.desc()))
+        with self.session_scope(session) as session:
+            return [project(YearRating, row) for row in session.execute(query).mappings()]
+
+    def rebuild_stats(self, session=None):
+        """
+        Recomputes the aggregate tables behind the statistics from scratch.
+        """
+        with self.session_scope(session, write=True) as session:
+            rebuild_stats(session.connection())
+
+    def iter_favorite_pairs(self, batch_size=10000, session=None):
+        """
+        Yields the (user_id, movie_id) pairs of the favorites of catalogue movies, in
+        lists of up to ``batch_size``, from one streamed query.
+        """
+        query = (select(Favorite.user_id, Favorite.movie_id)
+                 .join_from(Favorite, Movie, Movie.id == Favorite.movie_id)
+                 .where(Movie.status == 'ready')
+                 .order_by(Favorite.user_id, Favorite.movie_id))
+        yield from self._stream(query, batch_size, session)
+
+    def _stream(self, query, batch_size, session=None):
+        """
+        Yields the rows of a query as lists of up to ``batch_size`` tuples, fetched
+        through a server-side cursor so only one batch is held in memory at a time.
+
+        Outside a request the session is owned by the generator, and closed when it
+        is exhausted or closed; a streamed response outlives its request's session.
+        """
+        with self.session_scope(session) as session:
+            result = session.execute(query, execution_options={'stream_results': True,
+                                                               'yield_per': batch_size})
+            for rows in result.partitions():
+                yield [tuple(row) for row in rows]
+
+    def get_favorite_movie_ids(self, user_id, session=None):
+        """
+        Lists the IDs of the catalogue movies among a user's favorites, off the
+        favorites' user_id index.
+        """
+        query = (select(Favorite.movie_id)
+                 .join_from(Favorite, Movie, Movie.id == Favorite.movie_id)
+                 .where(Favorite.user_id == user_id, Movie.status == 'ready'))
+        with self.session_scope(session) as session:
+            return list(session.execute(query).scalars())
+
+    def get_co_favorites(self, movie_id, session=None):
+        """
+        Counts the users a movie shares with each other catalogue movie, with the
+        favorite counts of movie_stats.
+        """
+        others = Favorite.__table__.alias('others')
+        query = (select(others.c.movie_id, func.count(), MovieStats.favorite_count)
+                 .select_from(Favorite)
+                 .join(others, (others.c.user_id == Favorite.user_id)
+                       & (others.c.movie_id != Favorite.movie_id))
+                 .join(Movie, Movie.id == others.c.movie_id)
+                 .join(MovieStats, MovieStats.movie_id == others.c.movie_id)
+                 .where(Favorite.movie_id == movie_id, Movie.status == 'ready')
+                 .group_by(others.c.movie_id, MovieStats.favorite_count))
+        with self.session_scope(session) as session:
+            count = session.execute(select(MovieStats.favorite_count)
+                                    .where(MovieStats.movie_id == movie_id)).scalar()
+            return count or 0, [tuple(row) for row in session.execute(query)]
+
+    def add_neighbour_updates(self, updates, session=None):
+        """
+        Stores recomputed neighbour rows for the recommenders of every process.
+        """
+        if not updates:
+            return
+        with self.session_scope(session, write=True) as session:
+            session.execute(insert(NeighbourUpdate), updates)
+
+    def get_neighbour_updates(self, after=0, session=None):
+        """
+        Lists the neighbour updates stored after the one with ID ``after``, oldest first.
+        """
+        query = (select(NeighbourUpdate.id, NeighbourUpdate.movie_id,
+                        NeighbourUpdate.neighbours, NeighbourUpdate.scores)
+                 .where(NeighbourUpdate.id > after)
+                 .order_by(NeighbourUpdate.id))
+        with self.session_scope(session) as session:
+            return session.execute(query).all()
+
+    def clear_neighbour_updates(self, up_to, session=None):
+        """
+        Deletes the neighbour updates up to the one with ID ``up_to``, once a build
+        of the index includes them.
+        """
+        with self.session_scope(session, write=True) as session:
+            session.execute(delete(NeighbourUpdate).where(NeighbourUpdate.id <= up_to))
+
+    def get_movie_summaries(self, movie_ids, session=None):
+        """
+        Looks up catalogue movies by ID, in the order of ``movie_ids``.
+        """
+        if not movie_ids:
+            return []
+        query = (select(Movie.id, Movie.name, Movie.director, Movie.year, Movie.rating)
+                 .where(Movie.id.in_(list(movie_ids)), Movie.status == 'ready'))
+        with self.session_scope(session) as session:
+            movies = {row['id']: project(MovieSummary, row)
+                      for row in session.execute(query).mappings()}
+        return [movies[movie_id] for movie_id in movie_ids if movie_id in movies]
+
+    def export_movies(self, batch_size=1000, session=None):
+        """
+        Streams the catalogue in ID order, with the counts of movie_stats.
+        """
+        query = (select(Movie.id, Movie.imdb_id, Movie.name, Movie.director, Movie.year,
+                        Movie.rating, Movie.status,
+                        func.coalesce(MovieStats.favorite_count, 0),
+                        func.coalesce(MovieStats.review_count, 0))
+                 .outerjoin(MovieStats, MovieStats.movie_id == Movie.id)
+                 .order_by(Movie.id))
+        yield from self._stream(query, batch_size, session)
+
+    def export_favorites(self, user_id, batch_size=1000, session=None):
+        """
+        Streams a user's favorite movies in the order they were added.
+        """
+        query = (select(Favorite.movie_id, Movie.imdb_id, Movie.name, Movie.director,
+                        Movie.year, Movie.rating, Movie.status, Favorite.rating)
+                 .join(Movie, Movie.id == Favorite.movie_id)
+                 .where(Favorite.user_id == user_id)
+                 .order_by(Favorite.id))
+        yield from self._stream(query, batch_size, session)
+
+    def export_reviews(self, user_id=None, batch_size=1000, session=None):
+        """
+        Streams reviews in ID order, with the names of their movies.
+        """
+        query = (select(Review.id, Review.user_id, Review.movie_id, Movie.name,
+                        Review.review_text)
+                 .join(Movie, Movie.id == Review.movie_id)
+                 .order_by(Review.id))
+        if user_id is not None:
+            query = query.where(Review.user_id == user_id)
+        yield from self._stream(query, batch_size, session)
@@ -1 +1,3 @@
-from .SQLiteDatamanager import SQLiteDataManager
\ No newline at end of file
+from .SQLiteDatamanager import SQLiteDataManager
+from .PostgresDatamanager import PostgresDataManager
+from .backends import create_data_manager
@@ -0,0 +1,64 @@
+from sqlalchemy.engine import make_url
+
+from .PostgresDatamanager import PostgresDataManager
+from .SQLiteDatamanager import SQLiteDataManager
+
+
+def _backend(url):
+    backend = url.get_backend_name()
+    return 'postgresql' if backend == 'postgres' else backend
+
+
+def create_data_manager(database_url, pool_size=5, max_overflow=10, pool_timeout=30,
+                        pragmas=None, serialize_writes=False, replica_urls=(),
+                        replica_selection='round_robin', max_replica_lag=None,
+                        read_your_writes=5.0, create_schema=True):
+    """
+    Creates the data manager for a database URL.
+
+    Args:
+        database_url (str): sqlite:///path/to/file.sqlite, or postgresql://... (also
+            postgres://...) for a PostgreSQL database.
+        pool_size (int): Connections kept open in the pool.
+        max_overflow (int): Extra connections opened when the pool is exhausted.
+        pool_timeout (float): Seconds to wait for a connection.
+        pragmas (dict): PRAGMA settings of SQLite connections.
+        serialize_writes (bool): Queue the writes of SQLite transactions.
+        replica_urls (list): URLs of read replicas of the same database.
+        replica_selection (str): 'round_robin' or 'least_latency'.
+        max_replica_lag (float): Seconds of replication lag above which a replica is
+            not read from, or None to ignore the lag.
+        read_your_writes (float): Seconds a client reads from the primary after writing.
+        create_schema (bool): Create the missing tables of the database.
+
+    Returns:
+        DataManagerInterface: A SQLiteDataManager or a PostgresDataManager.
+
+    Raises:
+        ValueError: If a URL names another database, or a replica another backend than
+            the primary.
+    """
+    url = make_url(database_url)
+    backend = _backend(url)
+    if backend == 'postgresql':
+        manager = PostgresDataManager(url, pool_size=pool_size, max_overflow=max_overflow,
+                                      pool_timeout=pool_timeout, create_schema=create_schema)
+    elif backend == 'sqlite':
+        manager = SQLiteDataManager(url.database, pool_size=pool_size,
+                                    max_overflow=max_overflow, pool_timeout=pool_timeout,
+                                    pragmas=pragmas, serialize_writes=serialize_writes,
+                                    create_schema=create_schema)
+    else:
+        raise ValueError(f"Unsupported database: {url.drivername}")
+
+    if replica_urls:
+        replicas = [make_url(replica_url) for replica_url in replica_urls]
+        for replica in replicas:
+            if _backend(replica) != backend:
+                raise ValueError(f"Replica {replica.render_as_string()} is not a "
+                                 f"{backend} database")
+        manager.use_replicas([replica.database if backend == 'sqlite' else replica
+                              for replica in replicas],
+                             selection=replica_selection, max_lag=max_replica_lag,
+                             read_your_writes=read_your_writes)
+    return manager
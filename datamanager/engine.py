@@ -0,0 +1,106 @@
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+# Values safe to interpolate into PRAGMA statements
+_PRAGMA_NAMES = {'journal_mode', 'synchronous', 'cache_size', 'mmap_size', 'busy_timeout',
+                 'temp_store', 'foreign_keys', 'wal_autocheckpoint', 'journal_size_limit',
+                 'query_only'}
+
+
+def apply_pragmas(engine, pragmas):
+    """
+    Runs the given PRAGMA statements on every new connection of an SQLite engine.
+
+    Args:
+        engine (Engine): The SQLAlchemy engine.
+        pragmas (dict): Maps pragma names, such as 'journal_mode' or 'busy_timeout',
+            to their values.
+    """
+    unknown = set(pragmas) - _PRAGMA_NAMES
+    if unknown:
+        raise ValueError(f"Unsupported SQLite pragmas: {', '.join(sorted(unknown))}")
+    statements = [f"PRAGMA {name} = {value}" for name, value in pragmas.items()]
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+
+def enable_immediate_transactions(engine):
+    """
+    Lets sessions start SQLite transactions with BEGIN IMMEDIATE.
+
+    sqlite3 normally issues a deferred BEGIN itself. Here it is switched to
+    autocommit and the BEGIN is emitted from SQLAlchemy instead, as IMMEDIATE for
+    connections with the ``sqlite_begin_immediate`` execution option. An immediate
+    transaction takes the database write lock up front, waiting up to busy_timeout
+    for it. A deferred transaction that reads first cannot wait, and fails with
+    "database is locked" when another writer got in first.
+    """
+
+    @event.listens_for(engine, 'connect')
+    def disable_driver_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, 'begin')
+    def begin(connection):
+        if connection.get_execution_options().get('sqlite_begin_immediate'):
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+        else:
+            connection.exec_driver_sql("BEGIN")
+
+
+class WriterQueue:
+    """
+    First-in, first-out lock letting one transaction at a time write from this process.
+
+    Writers wait in arrival order instead of all retrying against SQLite's lock.
+    Readers never take it, and in WAL mode they are not blocked by the writer.
+    """
+
+    def __init__(self, timeout=30):
+        self.timeout = timeout
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self._condition = threading.Condition()
+        self._next_ticket = 0
+        self._serving = 0
+        self._abandoned = set()
+
+    def acquire(self):
+        """
+        Waits for this writer's turn.
+
+        Raises:
+            OperationalError: If the turn does not come within ``timeout`` seconds.
+        """
+        with self._condition:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            if ticket == self._serving:
+                return
+            start = time.perf_counter()
+            self.waits += 1
+            served = self._condition.wait_for(lambda: self._serving == ticket, self.timeout)
+            self.wait_seconds += time.perf_counter() - start
+            if not served:
+                # Give up the ticket: the writer ahead of it hands the turn on past it
+                self._abandoned.add(ticket)
+                raise OperationalError("WriterQueue.acquire", None,
+                                       TimeoutError("Timed out waiting to write"))
+
+    def release(self):
+        with self._condition:
+            self._serving += 1
+            while self._serving in self._abandoned:
+                self._abandoned.discard(self._serving)
+                self._serving += 1
+            self._condition.notify_all()
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import (Column, Computed, DateTime, Integer, Float, LargeBinary, String,
+                        ForeignKey, Index, UniqueConstraint, func, literal_column)
 from sqlalchemy.orm import relationship
 from sqlalchemy.orm import declarative_base
 
@@ -15,26 +16,56 @@ class User(Base):
     name = Column(String, nullable=False)
 
     # Relationships
-    movies = relationship("Movie", back_populates="user")
-    reviews = relationship("Review", back_populates="user")
+    # Children are removed by ON DELETE CASCADE without loading them
+    favorites = relationship("Favorite", back_populates="user", cascade="all, delete-orphan",
+                             passive_deletes=True)
+    movies = relationship("Movie", secondary="favorites", viewonly=True)
+    reviews = relationship("Review", back_populates="user", cascade="all, delete-orphan",
+                           passive_deletes=True)
 
 
 class Movie(Base):
     """
-    Represents a movie added by a user.
+    Represents a movie in the shared catalogue, stored once however many users favorite it.
     """
     __tablename__ = 'movies'
 
     id = Column(Integer, primary_key=True)
+    imdb_id = Column(String, unique=True)
     name = Column(String, nullable=False)
     director = Column(String)
     year = Column(Integer)
-    rating = Column(Integer)
-    user_id = Column(Integer, ForeignKey('users.id'))
+    rating = Column(Float)
+    # 'pending' while details are being fetched from OMDb, 'failed' if OMDb did not find it
+    status = Column(String, nullable=False, default='ready', server_default='ready')
 
     # Relationships
-    user = relationship("User", back_populates="movies")
-    reviews = relationship("Review", back_populates="movie")
+    favorites = relationship("Favorite", back_populates="movie", cascade="all, delete-orphan",
+                             passive_deletes=True)
+    reviews = relationship("Review", back_populates="movie", cascade="all, delete-orphan",
+                           passive_deletes=True)
+
+
+class Favorite(Base):
+    """
+    Associates a user with a catalogue movie they added to their favorites.
+    """
+    __tablename__ = 'favorites'
+    __table_args__ = (
+        UniqueConstraint('user_id', 'movie_id', name='uq_favorites_user_movie'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    # The user_id index keeps a user's favorites in insertion (rowid) order
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False,
+                     index=True)
+    movie_id = Column(Integer, ForeignKey('movies.id', ondelete='CASCADE'), nullable=False,
+                      index=True)
+    rating = Column(Float)
+
+    # Relationships
+    user = relationship("User", back_populates="favorites")
+    movie = relationship("Movie", back_populates="favorites")
 
 
 class Review(Base):
@@ -44,10 +75,151 @@ class Review(Base):
     __tablename__ = 'reviews'
 
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey('users.id'))
-    movie_id = Column(Integer, ForeignKey('movies.id'))
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), index=True)
+    movie_id = Column(Integer, ForeignKey('movies.id', ondelete='CASCADE'), index=True)
     review_text = Column(String, nullable=False)
 
     # Relationships
     user = relationship("User", back_populates="reviews")
     movie = relationship("Movie", back_populates="reviews")
+
+
+class EnrichmentJob(Base):
+    """
+    Represents a pending OMDb lookup for a movie added before its details were known.
+    """
+    __tablename__ = 'enrichment_jobs'
+
+    id = Column(Integer, primary_key=True)
+    movie_id = Column(Integer, ForeignKey('movies.id', ondelete='CASCADE'), index=True)
+    title = Column(String, nullable=False)
+    # 'pending', 'running', 'done' or 'failed'
+    status = Column(String, nullable=False, default='pending', index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(String)
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    # Relationships
+    movie = relationship("Movie")
+
+
+# Aggregates kept up to date by the triggers of datamanager.stats, so the statistics
+# pages read one row per movie, user, director or year instead of scanning the catalogue.
+
+class MovieStats(Base):
+    """
+    Counts the favorites and reviews of a catalogue movie.
+    """
+    __tablename__ = 'movie_stats'
+
+    movie_id = Column(Integer, ForeignKey('movies.id', ondelete='CASCADE'), primary_key=True)
+    favorite_count = Column(Integer, nullable=False, default=0, server_default='0')
+    review_count = Column(Integer, nullable=False, default=0, server_default='0')
+
+
+class UserStats(Base):
+    """
+    Counts the favorites and reviews of a user.
+    """
+    __tablename__ = 'user_stats'
+
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    favorite_count = Column(Integer, nullable=False, default=0, server_default='0')
+    review_count = Column(Integer, nullable=False, default=0, server_default='0')
+
+
+# Movies without an IMDb rating, stored as NULL or 0, count towards movie_count only.
+# The average is stored, as PostgreSQL can only index stored generated columns.
+_AVERAGE_RATING = "CASE WHEN rated_count > 0 THEN rating_sum / rated_count END"
+
+
+class DirectorStats(Base):
+    """
+    Counts the ready catalogue movies of a director and sums their ratings.
+    """
+    __tablename__ = 'director_stats'
+
+    director = Column(String, primary_key=True)
+    movie_count = Column(Integer, nullable=False, default=0, server_default='0')
+    rated_count = Column(Integer, nullable=False, default=0, server_default='0')
+    rating_sum = Column(Float, nullable=False, default=0, server_default='0')
+    average_rating = Column(Float, Computed(_AVERAGE_RATING, persisted=True))
+
+
+class YearStats(Base):
+    """
+    Counts the ready catalogue movies of a release year and sums their ratings.
+    """
+    __tablename__ = 'year_stats'
+
+    year = Column(Integer, primary_key=True)
+    movie_count = Column(Integer, nullable=False, default=0, server_default='0')
+    rated_count = Column(Integer, nullable=False, default=0, server_default='0')
+    rating_sum = Column(Float, nullable=False, default=0, server_default='0')
+    average_rating = Column(Float, Computed(_AVERAGE_RATING, persisted=True))
+
+
+class CacheVersion(Base):
+    """
+    Counts the changes to a group of cached pages, such as one user's movie list.
+
+    Writes bump the versions of the scopes they change, so a cached page rendered
+    under older versions is known to be stale without re-running its queries.
+    """
+    __tablename__ = 'cache_versions'
+
+    scope = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    # Seconds since the epoch, served as the pages' Last-Modified date
+    updated_at = Column(Float, nullable=False)
+
+
+class NeighbourUpdate(Base):
+    """
+    A movie's similar movies, recomputed after a favorite changed since the last build
+    of the recommendations index.
+
+    Every process's recommender reads the updates it has not seen yet, later ones
+    replacing earlier ones of the same movie; the next build deletes them.
+    """
+    __tablename__ = 'neighbour_updates'
+
+    id = Column(Integer, primary_key=True)
+    movie_id = Column(Integer, nullable=False)
+    # The neighbours' movie IDs (little-endian int64) and similarities (float32)
+    neighbours = Column(LargeBinary, nullable=False)
+    scores = Column(LargeBinary, nullable=False)
+
+
+# Cache scopes, formatted with the arguments of the view that renders the page
+USERS_SCOPE = 'users'
+CATALOGUE_SCOPE = 'catalogue'
+USER_SCOPE = 'user:{user_id}'
+# A movie's details and review count, shown on the pages of every user who favorites
+# it. Writes bump the movie's scope once; USER_MOVIES_SCOPE is read, not written: its
+# version sums the versions of the user's favorites, so their pages follow the movies
+# without each write bumping the page of every user who favorites the movie.
+MOVIE_SCOPE = 'movie:{movie_id}'
+USER_MOVIES_SCOPE = 'user_movies:{user_id}'
+
+
+# Catalogue sort keys. NULLs are replaced so keyset comparisons on them stay total, and
+# each key has an index in the same order so a page is read straight off the index.
+CATALOGUE_SORT_EXPRESSIONS = {
+    'name': Movie.name,
+    'director': func.coalesce(Movie.director, literal_column("''")),
+    'year': func.coalesce(Movie.year, literal_column('0')),
+    'rating': func.coalesce(Movie.rating, literal_column('0')),
+}
+
+Index('ix_movies_name', Movie.name)
+Index('ix_movies_lower_name', func.lower(Movie.name))
+Index('ix_movies_director_name', CATALOGUE_SORT_EXPRESSIONS['director'], Movie.name)
+Index('ix_movies_year_name', CATALOGUE_SORT_EXPRESSIONS['year'], Movie.name)
+Index('ix_movies_rating_name', CATALOGUE_SORT_EXPRESSIONS['rating'], Movie.name)
+
+# Leaderboards are read in index order, best first, and stop after their limit
+Index('ix_movie_stats_favorites', MovieStats.favorite_count, MovieStats.movie_id)
+Index('ix_user_stats_reviews', UserStats.review_count, UserStats.user_id)
+Index('ix_director_stats_rating', DirectorStats.average_rating, DirectorStats.director)
@@ -0,0 +1,92 @@
+import base64
+import json
+
+from sqlalchemy import tuple_
+
+
+def encode_cursor(values):
+    """
+    Encodes the sort key of the last row on a page into an opaque cursor.
+
+    Args:
+        values (list): The sort key values of the last row.
+
+    Returns:
+        str: A URL-safe token that can be passed back as the ``after`` argument.
+    """
+    raw = json.dumps(list(values), separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, size):
+    """
+    Decodes a cursor produced by ``encode_cursor``.
+
+    Args:
+        token (str): The cursor token, or None for the first page.
+        size (int): The number of values the cursor is expected to hold.
+
+    Returns:
+        list or None: The decoded sort key, or None for the first page.
+
+    Raises:
+        ValueError: If the token is malformed.
+    """
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {token!r}") from e
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError(f"Invalid cursor: {token!r}")
+    return values
+
+
+def apply_keyset(query, key, after, limit, descending=False):
+    """
+    Orders a select by a keyset and restricts it to the page following a cursor.
+
+    One row more than ``limit`` is fetched so ``split_page`` can tell whether another
+    page follows.
+
+    Args:
+        query (Select): The query to paginate.
+        key (list): Column expressions that uniquely order the rows.
+        after (str): The cursor of the previous page, or None for the first page.
+        limit (int): The page size.
+        descending (bool): Whether to walk the keyset in descending order.
+
+    Returns:
+        Select: The paginated query.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    cursor = decode_cursor(after, len(key))
+    if cursor is not None:
+        # The extra bound on the leading column lets SQLite seek into an index
+        if descending:
+            query = query.where(key[0] <= cursor[0], tuple_(*key) < tuple_(*cursor))
+        else:
+            query = query.where(key[0] >= cursor[0], tuple_(*key) > tuple_(*cursor))
+    order = [column.desc() for column in key] if descending else key
+    return query.order_by(*order).limit(limit + 1)
+
+
+def split_page(rows, limit, cursor_values):
+    """
+    Splits the rows fetched by an ``apply_keyset`` query into a page and the next cursor.
+
+    Args:
+        rows (list): The fetched rows.
+        limit (int): The page size.
+        cursor_values (callable): Returns the key values of a row.
+
+    Returns:
+        tuple: (rows of the page, cursor of the next page or None on the last page).
+    """
+    if len(rows) > limit:
+        return rows[:limit], encode_cursor(cursor_values(rows[limit - 1]))
+    return rows, None
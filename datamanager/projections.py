@@ -0,0 +1,171 @@
+from dataclasses import dataclass, fields
+
+
+# Read-only rows returned by the listing queries. They hold only the selected columns,
+# so building them skips the identity map and change tracking of ORM objects.
+
+@dataclass(frozen=True, slots=True)
+class UserSummary:
+    """
+    A user as listed: their ID and name.
+    """
+    id: int
+    name: str
+
+
+@dataclass(frozen=True, slots=True)
+class MovieSummary:
+    """
+    A catalogue movie as listed in the catalogue and in search results.
+    """
+    id: int
+    name: str
+    director: str
+    year: int
+    rating: float
+
+
+@dataclass(frozen=True, slots=True)
+class FavoriteMovie:
+    """
+    A movie on a user's list, with the user's own rating and the movie's review count.
+    """
+    id: int
+    name: str
+    director: str
+    year: int
+    rating: float
+    status: str
+    user_rating: float
+    review_count: int
+
+
+@dataclass(frozen=True, slots=True)
+class ReviewSummary:
+    """
+    A review of a movie.
+    """
+    id: int
+    user_id: int
+    review_text: str
+
+
+@dataclass(frozen=True, slots=True)
+class PopularMovie:
+    """
+    A catalogue movie on the most favorited leaderboard.
+    """
+    id: int
+    name: str
+    director: str
+    year: int
+    rating: float
+    favorite_count: int
+    review_count: int
+
+
+@dataclass(frozen=True, slots=True)
+class ActiveReviewer:
+    """
+    A user on the most active reviewers leaderboard.
+    """
+    id: int
+    name: str
+    review_count: int
+    favorite_count: int
+
+
+@dataclass(frozen=True, slots=True)
+class DirectorRating:
+    """
+    A director's number of catalogue movies and their average rating.
+    """
+    director: str
+    movie_count: int
+    average_rating: float
+
+
+@dataclass(frozen=True, slots=True)
+class YearRating:
+    """
+    A release year's number of catalogue movies and their average rating.
+    """
+    year: int
+    movie_count: int
+    average_rating: float
+
+
+# Rows of the exports. Exports stream plain tuples in the order of these fields, which
+# also give the columns and their types.
+
+@dataclass(frozen=True, slots=True)
+class ExportedMovie:
+    """
+    A catalogue movie with its favorite and review counts.
+    """
+    id: int
+    imdb_id: str
+    name: str
+    director: str
+    year: int
+    rating: float
+    status: str
+    favorite_count: int
+    review_count: int
+
+
+@dataclass(frozen=True, slots=True)
+class ExportedFavorite:
+    """
+    A movie on a user's list, with the user's own rating.
+    """
+    movie_id: int
+    imdb_id: str
+    name: str
+    director: str
+    year: int
+    rating: float
+    status: str
+    user_rating: float
+
+
+@dataclass(frozen=True, slots=True)
+class ExportedReview:
+    """
+    A review with the name of its movie.
+    """
+    id: int
+    user_id: int
+    movie_id: int
+    movie_name: str
+    review_text: str
+
+
+def field_names(projection):
+    """
+    Returns the field names of a projection class, in declaration order.
+    """
+    return tuple(field.name for field in fields(projection))
+
+
+def project(projection, row):
+    """
+    Builds a projection from a result row holding at least its fields.
+
+    Args:
+        projection (type): The projection class.
+        row (Mapping): The row, as returned by ``Result.mappings()``.
+    """
+    return projection(*(row[name] for name in field_names(projection)))
+
+
+def as_dict(item, only=None):
+    """
+    Converts a projection to a dictionary, optionally restricted to some fields.
+
+    Args:
+        item: The projection.
+        only (iterable): The fields to keep, or None for all of them.
+    """
+    names = field_names(type(item)) if only is None else only
+    return {name: getattr(item, name) for name in names}
@@ -0,0 +1,186 @@
+import itertools
+import threading
+import time
+
+from sqlalchemy import event, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.selectable import CompoundSelect, Select
+
+SELECTION_POLICIES = ('round_robin', 'least_latency')
+
+# Weight of the newest sample in a replica's moving average latency
+_LATENCY_SMOOTHING = 0.2
+
+
+class Replica:
+    """
+    A read replica's engine with its health: moving average latency of its queries,
+    replication lag and whether it failed recently.
+    """
+
+    def __init__(self, engine, lag_query=None, retry_after=30.0):
+        self.engine = engine
+        self.lag_query = lag_query
+        self.retry_after = retry_after
+        self.latency = None
+        self.lag = None
+        self.failures = 0
+        self.checked_at = None
+        self.down_until = 0.0
+        self._checking = threading.Lock()
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def start_timer(conn, cursor, statement, parameters, context, executemany):
+            context.replica_query_start = time.perf_counter()
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def stop_timer(conn, cursor, statement, parameters, context, executemany):
+            self.record_latency(time.perf_counter() - context.replica_query_start)
+
+        @event.listens_for(engine, 'handle_error')
+        def mark_down(context):
+            # Lost connections and failed connection attempts, not failing statements
+            if context.is_disconnect or context.connection is None:
+                self.mark_down()
+
+    @property
+    def name(self):
+        return self.engine.url.render_as_string(hide_password=True)
+
+    def record_latency(self, seconds):
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            self.latency += _LATENCY_SMOOTHING * (seconds - self.latency)
+
+    def mark_down(self):
+        self.failures += 1
+        self.down_until = time.monotonic() + self.retry_after
+
+    def check(self):
+        """
+        Measures the replica's lag, marking it down when it cannot be reached.
+        """
+        try:
+            with self.engine.connect() as connection:
+                self.lag = connection.execute(text(self.lag_query or "SELECT 0")).scalar()
+        except DBAPIError:
+            if time.monotonic() >= self.down_until:  # Unless handle_error marked it
+                self.mark_down()
+        else:
+            self.down_until = 0.0
+        self.checked_at = time.monotonic()
+
+    def available(self, max_lag, check_interval):
+        """
+        Returns whether reads may go to the replica, checking it again when its last
+        check is older than ``check_interval`` seconds.
+        """
+        if time.monotonic() < self.down_until:
+            return False
+        stale = (self.checked_at is None
+                 or time.monotonic() - self.checked_at >= check_interval)
+        # One thread checks the replica while the others go by the last result
+        if stale and self._checking.acquire(blocking=self.checked_at is None):
+            try:
+                self.check()
+            finally:
+                self._checking.release()
+        if time.monotonic() < self.down_until:
+            return False
+        return max_lag is None or self.lag is None or self.lag <= max_lag
+
+
+class ReplicaSet:
+    """
+    Chooses the replica each read-only statement runs on.
+
+    Replicas are taken in turn ('round_robin') or by the lowest moving average
+    latency of their queries ('least_latency'). A replica is skipped while it lags
+    more than ``max_lag`` seconds behind the primary, or for ``retry_after`` seconds
+    after it could not be reached; with no replica left, reads go to the primary.
+    """
+
+    def __init__(self, engines, selection='round_robin', max_lag=None, check_interval=5.0,
+                 retry_after=30.0, lag_query=None):
+        """
+        Args:
+            engines (list): Engines of the replicas.
+            selection (str): 'round_robin' or 'least_latency'.
+            max_lag (float): Seconds of replication lag above which a replica is not
+                read from, or None to ignore the lag.
+            check_interval (float): Seconds between checks of each replica's lag.
+            retry_after (float): Seconds an unreachable replica is left alone.
+            lag_query (str): SQL returning a replica's lag in seconds, or None when
+                the database cannot tell.
+
+        Raises:
+            ValueError: If the selection policy is unknown.
+        """
+        if selection not in SELECTION_POLICIES:
+            raise ValueError(f"Unknown replica selection: {selection!r}")
+        self.replicas = [Replica(engine, lag_query, retry_after) for engine in engines]
+        self.selection = selection
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._turns = itertools.count()
+
+    @property
+    def engines(self):
+        return [replica.engine for replica in self.replicas]
+
+    def choose(self):
+        """
+        Returns the engine of the replica to read from, or None to read from the primary.
+        """
+        candidates = [replica for replica in self.replicas
+                      if replica.available(self.max_lag, self.check_interval)]
+        if not candidates:
+            return None
+        if self.selection == 'least_latency':
+            return min(candidates, key=lambda replica: replica.latency or 0.0).engine
+        return candidates[next(self._turns) % len(candidates)].engine
+
+    def stats(self):
+        """
+        Returns each replica's health as {name: {...}}.
+        """
+        now = time.monotonic()
+        return {replica.name: {'available': now >= replica.down_until,
+                               'latency_seconds': replica.latency,
+                               'lag_seconds': replica.lag,
+                               'failures': replica.failures}
+                for replica in self.replicas}
+
+    def dispose(self, close=True):
+        for engine in self.engines:
+            engine.dispose(close=close)
+
+
+def _is_read(clause):
+    return (isinstance(clause, (Select, CompoundSelect))
+            and getattr(clause, '_for_update_arg', None) is None)
+
+
+class RoutingSession(Session):
+    """
+    Session sending its plain SELECT statements to a replica until it writes.
+
+    Anything else, flushes and connections asked for without a statement included,
+    goes to the primary and makes the session read from the primary from then on,
+    so it sees its own writes. Setting ``info['primary']`` does the same up front.
+    """
+
+    def __init__(self, *args, replicas=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replicas = replicas
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        primary = super().get_bind(mapper, clause=clause, **kwargs)
+        if self.replicas is None or self.info.get('primary'):
+            return primary
+        if self._flushing or not _is_read(clause):
+            self.info['primary'] = True
+            return primary
+        return self.replicas.choose() or primary
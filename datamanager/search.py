@@ -0,0 +1,139 @@
+import re
+
+from sqlalchemy import Float, Integer, column, inspect, literal_column, table, text
+
+# Full-text indexes over movie names and directors, and over each review. Both are
+# external-content FTS5 tables: they index the rows of movies and reviews without
+# copying their text, and triggers keep them in step with those tables. Reviews are
+# indexed one by one, so adding a review costs the same however many the movie has.
+MOVIE_SEARCH_TABLE = 'movie_search'
+REVIEW_SEARCH_TABLE = 'review_search'
+
+movie_search = table(MOVIE_SEARCH_TABLE, column('rowid', Integer), column('rank', Float))
+review_search = table(REVIEW_SEARCH_TABLE, column('rowid', Integer), column('rank', Float))
+
+# Matches on the name outweigh matches on the director, which outweigh one review
+MOVIE_RANK = 'bm25(10.0, 5.0)'
+
+# Two and three letter prefix indexes keep "abc*" queries off a full term scan
+_OPTIONS = "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'"
+
+SEARCH_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {MOVIE_SEARCH_TABLE} USING fts5("
+    f"name, director, content = 'movies', content_rowid = 'id', {_OPTIONS})",
+
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {REVIEW_SEARCH_TABLE} USING fts5("
+    f"review_text, content = 'reviews', content_rowid = 'id', {_OPTIONS})",
+
+    "CREATE TRIGGER IF NOT EXISTS movies_search_insert AFTER INSERT ON movies BEGIN "
+    f"INSERT INTO {MOVIE_SEARCH_TABLE} (rowid, name, director) "
+    "VALUES (new.id, new.name, new.director); "
+    "END",
+
+    "CREATE TRIGGER IF NOT EXISTS movies_search_update "
+    "AFTER UPDATE OF name, director ON movies BEGIN "
+    f"INSERT INTO {MOVIE_SEARCH_TABLE} ({MOVIE_SEARCH_TABLE}, rowid, name, director) "
+    "VALUES ('delete', old.id, old.name, old.director); "
+    f"INSERT INTO {MOVIE_SEARCH_TABLE} (rowid, name, director) "
+    "VALUES (new.id, new.name, new.director); "
+    "END",
+
+    "CREATE TRIGGER IF NOT EXISTS movies_search_delete AFTER DELETE ON movies BEGIN "
+    f"INSERT INTO {MOVIE_SEARCH_TABLE} ({MOVIE_SEARCH_TABLE}, rowid, name, director) "
+    "VALUES ('delete', old.id, old.name, old.director); "
+    "END",
+
+    "CREATE TRIGGER IF NOT EXISTS reviews_search_insert AFTER INSERT ON reviews BEGIN "
+    f"INSERT INTO {REVIEW_SEARCH_TABLE} (rowid, review_text) "
+    "VALUES (new.id, new.review_text); "
+    "END",
+
+    "CREATE TRIGGER IF NOT EXISTS reviews_search_update "
+    "AFTER UPDATE OF review_text ON reviews BEGIN "
+    f"INSERT INTO {REVIEW_SEARCH_TABLE} ({REVIEW_SEARCH_TABLE}, rowid, review_text) "
+    "VALUES ('delete', old.id, old.review_text); "
+    f"INSERT INTO {REVIEW_SEARCH_TABLE} (rowid, review_text) "
+    "VALUES (new.id, new.review_text); "
+    "END",
+
+    "CREATE TRIGGER IF NOT EXISTS reviews_search_delete AFTER DELETE ON reviews BEGIN "
+    f"INSERT INTO {REVIEW_SEARCH_TABLE} ({REVIEW_SEARCH_TABLE}, rowid, review_text) "
+    "VALUES ('delete', old.id, old.review_text); "
+    "END",
+]
+
+_TERM = re.compile(r'\w+', re.UNICODE)
+# Underscores separate words in PostgreSQL's tsquery syntax
+_TSQUERY_TERM = re.compile(r'[^\W_]+', re.UNICODE)
+
+
+def create_search_index(connection):
+    """
+    Creates the full-text indexes and their triggers, filling them if they are new.
+
+    Args:
+        connection (Connection): A connection in an open transaction.
+    """
+    tables = inspect(connection).get_table_names()
+    created = MOVIE_SEARCH_TABLE not in tables or REVIEW_SEARCH_TABLE not in tables
+    for statement in SEARCH_DDL:
+        connection.execute(text(statement))
+    if created:
+        connection.execute(text(
+            f"INSERT INTO {MOVIE_SEARCH_TABLE} ({MOVIE_SEARCH_TABLE}, rank) "
+            "VALUES ('rank', :rank)"), {'rank': MOVIE_RANK})
+        rebuild_search_index(connection)
+
+
+def rebuild_search_index(connection):
+    """
+    Rebuilds the full-text indexes from the movies and reviews tables.
+
+    Args:
+        connection (Connection): A connection in an open transaction.
+    """
+    for name in (MOVIE_SEARCH_TABLE, REVIEW_SEARCH_TABLE):
+        connection.execute(text(f"INSERT INTO {name} ({name}) VALUES ('rebuild')"))
+
+
+def build_match_query(terms):
+    """
+    Turns free text typed by a user into an FTS5 query.
+
+    Every word must match, either whole or as the prefix of a longer word. Words are
+    quoted, so FTS5 operators and punctuation in the input are matched literally.
+
+    Args:
+        terms (str): The search text.
+
+    Returns:
+        str or None: The FTS5 query, or None if the text holds no words.
+    """
+    words = _TERM.findall(terms or '')
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def build_tsquery(terms):
+    """
+    Turns free text typed by a user into a PostgreSQL tsquery, matching like
+    ``build_match_query``: every word, whole or as a prefix.
+
+    Args:
+        terms (str): The search text.
+
+    Returns:
+        str or None: The tsquery, or None if the text holds no words.
+    """
+    words = _TSQUERY_TERM.findall(terms or '')
+    if not words:
+        return None
+    return ' & '.join(f"{word}:*" for word in words)
+
+
+def match(index, query):
+    """
+    Returns the WHERE clause restricting a full-text index to rows matching a query.
+    """
+    return literal_column(index.name).op('MATCH')(query)
@@ -0,0 +1,156 @@
+from sqlalchemy import text
+
+# The aggregate tables of models.py (movie_stats, user_stats, director_stats and
+# year_stats) are maintained by triggers, like the full-text indexes: every write to
+# favorites, reviews or movies adjusts the rows it affects, including rows removed by
+# ON DELETE CASCADE and favorites moved by a completed enrichment job. Director and
+# year statistics cover the ready movies of the catalogue.
+
+
+def _count(table, key, value, column, delta):
+    """
+    Returns the statement adding ``delta`` to a counter of the row ``key = value``.
+
+    Increments create the row when it is missing; decrements never do, so a row
+    removed by a cascade is not brought back by its children's delete triggers. The
+    existing row's columns are qualified, as PostgreSQL requires in ON CONFLICT.
+    """
+    if delta > 0:
+        return (f"INSERT INTO {table} ({key}, {column}) SELECT {value}, 1 "
+                f"WHERE {value} IS NOT NULL "
+                f"ON CONFLICT ({key}) DO UPDATE SET {column} = {table}.{column} + 1; ")
+    return f"UPDATE {table} SET {column} = {column} - 1 WHERE {key} = {value}; "
+
+
+# Ratings count as rated when positive; PostgreSQL needs the comparison cast to add it up
+_RATED = {
+    'sqlite': "(coalesce({row}.rating, 0) > 0)",
+    'postgresql': "CAST(coalesce({row}.rating, 0) > 0 AS INTEGER)",
+}
+
+
+def _rating(row):
+    return f"(CASE WHEN {row}.rating > 0 THEN {row}.rating ELSE 0 END)"
+
+
+def _add_movie(table, key, row, dialect):
+    """
+    Returns the statement counting a movie in its director's or year's row.
+    """
+    return (f"INSERT INTO {table} ({key}, movie_count, rated_count, rating_sum) "
+            f"SELECT {row}.{key}, 1, {_RATED[dialect].format(row=row)}, {_rating(row)} "
+            f"WHERE {row}.status = 'ready' AND {row}.{key} IS NOT NULL "
+            f"ON CONFLICT ({key}) DO UPDATE SET movie_count = {table}.movie_count + 1, "
+            f"rated_count = {table}.rated_count + excluded.rated_count, "
+            f"rating_sum = {table}.rating_sum + excluded.rating_sum; ")
+
+
+def _remove_movie(table, key, row, dialect):
+    """
+    Returns the statement taking a movie out of its director's or year's row.
+    """
+    return (f"UPDATE {table} SET movie_count = movie_count - 1, "
+            f"rated_count = rated_count - {_RATED[dialect].format(row=row)}, "
+            f"rating_sum = rating_sum - {_rating(row)} "
+            f"WHERE {key} = {row}.{key} AND {row}.status = 'ready'; ")
+
+
+def _movie_rows(change, row, dialect):
+    return ''.join(change(table, key, row, dialect)
+                   for table, key in (('director_stats', 'director'), ('year_stats', 'year')))
+
+
+def stats_triggers(dialect='sqlite'):
+    """
+    Returns the triggers maintaining the aggregate tables as {name: (event, body)}.
+
+    The body is the list of statements run for each row, in the SQL of ``dialect``,
+    'sqlite' or 'postgresql'.
+    """
+    favorites = ('favorite_count', 'favorites')
+    reviews = ('review_count', 'reviews')
+    triggers = {}
+    for column, source in (favorites, reviews):
+        triggers[f'{source}_stats_insert'] = (
+            f"AFTER INSERT ON {source}",
+            _count('movie_stats', 'movie_id', 'new.movie_id', column, 1)
+            + _count('user_stats', 'user_id', 'new.user_id', column, 1))
+        triggers[f'{source}_stats_update'] = (
+            f"AFTER UPDATE OF user_id, movie_id ON {source}",
+            _count('movie_stats', 'movie_id', 'old.movie_id', column, -1)
+            + _count('user_stats', 'user_id', 'old.user_id', column, -1)
+            + _count('movie_stats', 'movie_id', 'new.movie_id', column, 1)
+            + _count('user_stats', 'user_id', 'new.user_id', column, 1))
+        triggers[f'{source}_stats_delete'] = (
+            f"AFTER DELETE ON {source}",
+            _count('movie_stats', 'movie_id', 'old.movie_id', column, -1)
+            + _count('user_stats', 'user_id', 'old.user_id', column, -1))
+    triggers['movies_stats_insert'] = (
+        "AFTER INSERT ON movies", _movie_rows(_add_movie, 'new', dialect))
+    triggers['movies_stats_update'] = (
+        "AFTER UPDATE OF director, year, rating, status ON movies",
+        _movie_rows(_remove_movie, 'old', dialect) + _movie_rows(_add_movie, 'new', dialect))
+    triggers['movies_stats_delete'] = (
+        "AFTER DELETE ON movies", _movie_rows(_remove_movie, 'old', dialect))
+    return triggers
+
+
+STATS_TRIGGERS = stats_triggers()
+
+STATS_DDL = [f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body}END"
+             for name, (event, body) in STATS_TRIGGERS.items()]
+
+_MOVIE_AGGREGATE = ("SELECT {key}, count(*), count(CASE WHEN rating > 0 THEN 1 END), "
+                    "sum(CASE WHEN rating > 0 THEN rating ELSE 0 END) FROM movies "
+                    "WHERE status = 'ready' AND {key} IS NOT NULL GROUP BY {key}")
+
+REBUILD_STATEMENTS = [
+    "DELETE FROM movie_stats",
+    "DELETE FROM user_stats",
+    "DELETE FROM director_stats",
+    "DELETE FROM year_stats",
+    "INSERT INTO movie_stats (movie_id, favorite_count, review_count) "
+    "SELECT movie_id, sum(favorite), sum(review) FROM ("
+    "SELECT movie_id, 1 AS favorite, 0 AS review FROM favorites UNION ALL "
+    "SELECT movie_id, 0, 1 FROM reviews WHERE movie_id IS NOT NULL) AS counts GROUP BY movie_id",
+    "INSERT INTO user_stats (user_id, favorite_count, review_count) "
+    "SELECT user_id, sum(favorite), sum(review) FROM ("
+    "SELECT user_id, 1 AS favorite, 0 AS review FROM favorites UNION ALL "
+    "SELECT user_id, 0, 1 FROM reviews WHERE user_id IS NOT NULL) AS counts GROUP BY user_id",
+    "INSERT INTO director_stats (director, movie_count, rated_count, rating_sum) "
+    + _MOVIE_AGGREGATE.format(key='director'),
+    "INSERT INTO year_stats (year, movie_count, rated_count, rating_sum) "
+    + _MOVIE_AGGREGATE.format(key='year'),
+]
+
+
+def create_stats_triggers(connection):
+    """
+    Creates the triggers maintaining the aggregate tables, filling the tables if the
+    triggers are new.
+
+    Args:
+        connection (Connection): A connection in an open transaction, after the
+            aggregate tables have been created.
+    """
+    existing = set(connection.execute(text(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger'")).scalars())
+    for statement in STATS_DDL:
+        connection.execute(text(statement))
+    if not existing.issuperset(STATS_TRIGGERS):
+        rebuild_stats(connection)
+
+
+def rebuild_stats(connection):
+    """
+    Recomputes the aggregate tables from the favorites, reviews and movies tables.
+
+    The triggers keep the aggregates exact; a rebuild repairs them after the tables
+    were written with the triggers missing, and clears the rounding drift of the
+    rating sums.
+
+    Args:
+        connection (Connection): A connection in an open transaction.
+    """
+    for statement in REBUILD_STATEMENTS:
+        connection.execute(text(statement))
@@ -0,0 +1,112 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from omdb import parse_movie_details
+
+
+class EnrichmentQueue:
+    """
+    Fetches OMDb details for movies added as placeholders on a background thread pool.
+
+    Jobs are persisted by the data manager, so the queue only keeps work in memory:
+    ``resume`` re-submits every unfinished job after a restart. Several processes may
+    resume the same jobs; each attempt first claims its job, so only one runs it.
+    Lookups that fail to reach OMDb are retried with exponential backoff up to
+    ``max_attempts`` times.
+    """
+
+    def __init__(self, data_manager, lookup, max_workers=4, max_attempts=3, retry_delay=5,
+                 lease_timeout=300, on_resolved=None):
+        """
+        Args:
+            data_manager (DataManagerInterface): Stores the jobs and their results.
+            lookup (callable): Called with a title; returns the OMDb response, None if
+                the movie does not exist, or raises RequestException if OMDb fails.
+            max_workers (int): The number of worker threads.
+            max_attempts (int): How many times a job is tried before it fails.
+            retry_delay (float): Seconds before the first retry, doubled on each attempt.
+            lease_timeout (float): Seconds after which a job left running, as by a
+                process that stopped, is taken over by another worker.
+            on_resolved (callable): Called with the user and movie IDs of each favorite
+                whose movie a job filled in, once it is a catalogue movie.
+        """
+        self.data_manager = data_manager
+        self.lookup = lookup
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.lease_timeout = lease_timeout
+        self.on_resolved = on_resolved
+        self.executor = ThreadPoolExecutor(max_workers=max_workers,
+                                           thread_name_prefix='omdb-enrichment')
+        self._timers = set()
+        self._lock = threading.Lock()
+
+    def enqueue(self, job_id, title):
+        """
+        Schedules a job to run as soon as a worker is free.
+        """
+        return self.executor.submit(self.run, job_id, title)
+
+    def resume(self):
+        """
+        Re-submits the unfinished jobs stored by the data manager.
+
+        Returns:
+            int: The number of jobs submitted.
+        """
+        jobs = self.data_manager.get_pending_enrichment_jobs(lease_timeout=self.lease_timeout)
+        for job in jobs:
+            self.enqueue(job.id, job.title)
+        return len(jobs)
+
+    def run(self, job_id, title):
+        """
+        Runs one attempt of a job.
+        """
+        attempts = self.data_manager.start_enrichment_job(job_id,
+                                                          lease_timeout=self.lease_timeout)
+        if attempts is None:
+            return
+
+        try:
+            data = self.lookup(title)
+        except requests.exceptions.RequestException as e:
+            retry = attempts < self.max_attempts
+            self.data_manager.fail_enrichment_job(job_id, str(e), retry=retry)
+            if retry:
+                self._schedule_retry(job_id, title, self.retry_delay * 2 ** (attempts - 1))
+            return
+
+        details = parse_movie_details(data) if data else None
+        if not details or not details['name']:
+            self.data_manager.fail_enrichment_job(job_id, "Movie not found in OMDb.")
+            return
+        resolved = self.data_manager.complete_enrichment_job(job_id, **details)
+        if self.on_resolved is not None:
+            for user_id, movie_id in resolved or ():
+                self.on_resolved(user_id, movie_id)
+
+    def _schedule_retry(self, job_id, title, delay):
+        def submit():
+            with self._lock:
+                self._timers.discard(timer)
+            self.enqueue(job_id, title)
+
+        timer = threading.Timer(delay, submit)
+        timer.daemon = True
+        with self._lock:
+            self._timers.add(timer)
+        timer.start()
+
+    def shutdown(self, wait=True):
+        """
+        Cancels scheduled retries and stops the workers. Unfinished jobs stay pending
+        in the database and are picked up by ``resume`` on the next start.
+        """
+        with self._lock:
+            for timer in self._timers:
+                timer.cancel()
+            self._timers.clear()
+        self.executor.shutdown(wait=wait)
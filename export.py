@@ -0,0 +1,116 @@
+import csv
+import importlib.util
+import io
+import json
+from dataclasses import fields
+
+# Export formats and their content types
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+def available_formats():
+    """
+    Returns the export formats whose dependencies are installed.
+    """
+    # pyarrow is optional, and only imported by a Parquet export: it takes longer to
+    # import than the rest of the app
+    return tuple(fmt for fmt in EXPORT_FORMATS
+                 if fmt != 'parquet' or importlib.util.find_spec('pyarrow') is not None)
+
+
+def export_rows(projection, batches, fmt):
+    """
+    Encodes batches of rows in an export format, one chunk of bytes per batch, so a
+    response or a file can be written while the rows are still being read.
+
+    Args:
+        projection (type): The projection class whose fields name the columns of the
+            rows, in order, and give their types.
+        batches (iterable): Lists of row tuples.
+        fmt (str): 'csv', 'ndjson' or 'parquet'.
+
+    Yields:
+        bytes: The encoded rows.
+
+    Raises:
+        ValueError: If the format is unknown or its dependency is not installed.
+    """
+    if fmt not in available_formats():
+        raise ValueError(f"Unsupported export format: {fmt!r}")
+    columns = fields(projection)
+    if fmt == 'csv':
+        return _csv_chunks([column.name for column in columns], batches)
+    if fmt == 'ndjson':
+        return _ndjson_chunks([column.name for column in columns], batches)
+    return _parquet_chunks(columns, batches)
+
+
+def _csv_chunks(names, batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+    for batch in batches:
+        writer.writerows(batch)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():  # The header of an empty export
+        yield buffer.getvalue().encode()
+
+
+def _ndjson_chunks(names, batches):
+    for batch in batches:
+        yield ''.join(json.dumps(dict(zip(names, row)), ensure_ascii=False) + '\n'
+                      for row in batch).encode()
+
+
+class _Chunks:
+    """
+    File-like sink collecting what a ParquetWriter writes until it is taken.
+    """
+
+    closed = False
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data, self.chunks = b''.join(self.chunks), []
+        return data
+
+
+_ARROW_TYPES = {int: 'int64', float: 'float64', str: 'string'}
+
+
+def _parquet_chunks(columns, batches):
+    import pyarrow
+    import pyarrow.parquet
+
+    # Each batch is written as a row group, so readers can skip through the file
+    schema = pyarrow.schema([(column.name, getattr(pyarrow, _ARROW_TYPES[column.type])())
+                             for column in columns])
+    sink = _Chunks()
+    writer = pyarrow.parquet.ParquetWriter(sink, schema, compression='zstd')
+    try:
+        for batch in batches:
+            arrays = [pyarrow.array(values, type=field.type)
+                      for values, field in zip(zip(*batch), schema)]
+            writer.write_batch(pyarrow.RecordBatch.from_arrays(arrays, schema=schema))
+            yield sink.take()
+    finally:
+        writer.close()
+    yield sink.take()
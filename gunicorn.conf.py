@@ -0,0 +1,8 @@
+# gunicorn.conf.py, read by `gunicorn MovieWeb_app:app` from this directory
+import os
+
+# The master imports the app once and forks the workers from it, so they start
+# without importing it again. The app connects to nothing at import; connections a
+# worker inherits anyway are dropped after the fork (see dispose_after_fork).
+preload_app = True
+workers = int(os.environ.get('WEB_CONCURRENCY', 4))
@@ -0,0 +1,58 @@
+import threading
+
+
+class Lazy:
+    """
+    Stands in for a service built the first time it is used.
+
+    Reading or setting an attribute of the stand-in builds the service with
+    ``factory``, once, and passes the access on to it. A process that never uses the
+    service, such as a CLI command or a worker serving only static pages, never pays
+    for building it.
+
+    Usage:
+        data_manager = Lazy(lambda: create_data_manager(url))
+        data_manager.get_all_users()  # Creates the data manager, then queries it
+    """
+
+    __slots__ = ('_lazy_factory', '_lazy_instance', '_lazy_lock')
+
+    def __init__(self, factory):
+        object.__setattr__(self, '_lazy_factory', factory)
+        object.__setattr__(self, '_lazy_instance', None)
+        object.__setattr__(self, '_lazy_lock', threading.Lock())
+
+    def __getattr__(self, name):
+        return getattr(resolve(self), name)
+
+    def __setattr__(self, name, value):
+        setattr(resolve(self), name, value)
+
+    def __delattr__(self, name):
+        delattr(resolve(self), name)
+
+    def __repr__(self):
+        if self._lazy_instance is None:
+            return f'<Lazy {getattr(self._lazy_factory, "__name__", self._lazy_factory)}>'
+        return repr(self._lazy_instance)
+
+
+def resolve(service):
+    """
+    Returns the service a Lazy stands for, building it if needed; anything else is
+    returned as it is.
+    """
+    if not isinstance(service, Lazy):
+        return service
+    if service._lazy_instance is None:
+        with service._lazy_lock:
+            if service._lazy_instance is None:
+                object.__setattr__(service, '_lazy_instance', service._lazy_factory())
+    return service._lazy_instance
+
+
+def is_built(service):
+    """
+    Returns whether a service exists, without building it.
+    """
+    return not isinstance(service, Lazy) or service._lazy_instance is not None
@@ -0,0 +1,246 @@
+import logging
+import threading
+import time
+
+from flask import g, has_app_context, request
+from sqlalchemy import event
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+slow_request_log = logging.getLogger('movieweb.slow_requests')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = ('{}="{}"'.format(name, str(value).replace('\\', '\\\\')
+                                .replace('"', '\\"').replace('\n', '\\n'))
+               for name, value in labels)
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value):
+    if value is None:
+        return 'NaN'
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    A monotonically increasing value per label set.
+    """
+
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        return [('', tuple(zip(self.labels, key)), value) for key, value in values.items()]
+
+
+class Histogram:
+    """
+    Counts observations into cumulative buckets per label set, as Prometheus expects.
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, buckets, labels=()):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.labels = tuple(labels)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # One count per bucket, then the sum and the count of observations
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        samples = []
+        for key, values in series.items():
+            labels = tuple(zip(self.labels, key))
+            for bound, count in zip(self.buckets, values):
+                samples.append(('_bucket', labels + (('le', _format_value(float(bound))),),
+                                count))
+            samples.append(('_bucket', labels + (('le', '+Inf'),), values[-1]))
+            samples.append(('_sum', labels, values[-2]))
+            samples.append(('_count', labels, values[-1]))
+        return samples
+
+
+class Collector:
+    """
+    Reads values kept elsewhere, such as cache statistics, when metrics are rendered.
+    """
+
+    def __init__(self, name, kind, help, collect):
+        self.name = name
+        self.kind = kind
+        self.help = help
+        self.collect = collect
+
+    def samples(self):
+        value = self.collect()
+        if isinstance(value, (list, tuple)):
+            return [(suffix, tuple(labels.items()), sample) for suffix, labels, sample in value]
+        return [('', (), value)]
+
+
+class Metrics:
+    """
+    Request, database and dependency metrics rendered in the Prometheus text format.
+
+    ``instrument_app`` times every request and counts the SQL statements it runs, which
+    ``instrument_engine`` observes through SQLAlchemy engine events. Values kept by
+    other components, such as the OMDb client's latencies, are read through collectors
+    added with ``register``.
+    """
+
+    def __init__(self, prefix='movieweb'):
+        self.prefix = prefix
+        self.requests = Counter(
+            f'{prefix}_http_requests_total', 'HTTP requests handled.',
+            ('endpoint', 'method', 'status'))
+        self.request_duration = Histogram(
+            f'{prefix}_http_request_duration_seconds', 'Time spent handling requests.',
+            DURATION_BUCKETS, ('endpoint',))
+        self.request_queries = Histogram(
+            f'{prefix}_http_request_queries', 'SQL statements run per request.',
+            QUERY_COUNT_BUCKETS, ('endpoint',))
+        self.request_query_duration = Counter(
+            f'{prefix}_http_request_query_seconds_total',
+            'Time spent running SQL statements for requests.', ('endpoint',))
+        self.queries = Counter(f'{prefix}_db_queries_total', 'SQL statements run.')
+        self.query_duration = Counter(
+            f'{prefix}_db_query_duration_seconds_total', 'Time spent running SQL statements.')
+        self.slow_requests = Counter(
+            f'{prefix}_http_slow_requests_total', 'Requests slower than the slow request threshold.',
+            ('endpoint',))
+        self.slow_request_seconds = None
+        self.max_logged_queries = 20
+        self._metrics = [self.requests, self.request_duration, self.request_queries,
+                         self.request_query_duration, self.queries, self.query_duration, self.slow_requests]
+
+    def register(self, name, kind, help, collect):
+        """
+        Adds a metric whose value is read from elsewhere each time metrics are rendered.
+
+        Args:
+            name (str): The metric name, without the prefix.
+            kind (str): 'counter', 'gauge' or 'summary'.
+            help (str): The description shown by Prometheus.
+            collect (callable): Returns a number, or a list of (suffix, labels, value)
+                samples such as ('_count', {'cache': 'omdb'}, 12).
+        """
+        self._metrics.append(Collector(f'{self.prefix}_{name}', kind, help, collect))
+
+    def instrument_app(self, app, slow_request_seconds=None, max_logged_queries=20):
+        """
+        Times the requests of a Flask app and logs those slower than a threshold.
+
+        Register it before other after_request hooks, such as the data manager's
+        commit, so their work counts towards the request.
+
+        Args:
+            app (Flask): The application.
+            slow_request_seconds (float): Requests taking at least this long are logged
+                with their slowest SQL statements. None disables the log.
+            max_logged_queries (int): The most statements logged per slow request.
+        """
+        self.slow_request_seconds = slow_request_seconds
+        self.max_logged_queries = max_logged_queries
+
+        @app.before_request
+        def start_request_metrics():
+            g._request_metrics = {'start': time.perf_counter(), 'queries': 0,
+                                  'query_seconds': 0.0,
+                                  'statements': [] if slow_request_seconds is not None
+                                  else None}
+
+        @app.after_request
+        def record_request_metrics(response):
+            state = g.pop('_request_metrics', None)
+            if state is None:
+                return response
+            elapsed = time.perf_counter() - state['start']
+            endpoint = request.endpoint or 'unmatched'
+            self.requests.inc(endpoint=endpoint, method=request.method,
+                              status=str(response.status_code))
+            self.request_duration.observe(elapsed, endpoint=endpoint)
+            self.request_queries.observe(state['queries'], endpoint=endpoint)
+            self.request_query_duration.inc(state['query_seconds'], endpoint=endpoint)
+            if slow_request_seconds is not None and elapsed >= slow_request_seconds:
+                self.slow_requests.inc(endpoint=endpoint)
+                self.log_slow_request(elapsed, state)
+            return response
+
+    def instrument_engine(self, engine):
+        """
+        Counts and times the SQL statements run through an SQLAlchemy engine.
+        """
+        @event.listens_for(engine, 'before_cursor_execute')
+        def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+            context._metrics_start = time.perf_counter()
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def record_query(conn, cursor, statement, parameters, context, executemany):
+            elapsed = time.perf_counter() - context._metrics_start
+            self.queries.inc()
+            self.query_duration.inc(elapsed)
+            state = g.get('_request_metrics') if has_app_context() else None
+            if state is not None:
+                state['queries'] += 1
+                state['query_seconds'] += elapsed
+                if state['statements'] is not None:
+                    state['statements'].append((elapsed, statement))
+
+    def log_slow_request(self, elapsed, state):
+        statements = sorted(state['statements'], key=lambda item: item[0], reverse=True)
+        lines = [f"  {seconds * 1000:8.1f} ms  {' '.join(statement.split())}"
+                 for seconds, statement in statements[:self.max_logged_queries]]
+        slow_request_log.warning(
+            "Slow request: %s %s took %.3f s and ran %d SQL statements%s\n%s",
+            request.method, request.full_path.rstrip('?'), elapsed, state['queries'],
+            ", slowest first:" if lines else ".", '\n'.join(lines))
+
+    def render(self):
+        """
+        Renders every metric in the Prometheus text exposition format.
+        """
+        lines = []
+        for metric in self._metrics:
+            samples = metric.samples()
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, labels, value in samples:
+                lines.append(f"{metric.name}{suffix}{_format_labels(labels)} "
+                             f"{_format_value(value)}")
+        return '\n'.join(lines) + '\n'
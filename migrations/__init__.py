@@ -0,0 +1,73 @@
+"""
+Schema migrations for existing MovieWeb App databases.
+
+Each module in ``migrations/versions`` defines a ``revision``, the ``down_revision``
+it builds on and an ``upgrade(connection)`` function. Applied revisions are recorded
+in the ``schema_version`` table so every migration runs at most once per database.
+"""
+import importlib
+import pkgutil
+
+from sqlalchemy import create_engine, text
+
+from . import versions
+
+
+def load_revisions():
+    """
+    Loads the migration modules ordered from the oldest to the newest revision.
+
+    Returns:
+        list: The migration modules.
+    """
+    modules = {}
+    for info in pkgutil.iter_modules(versions.__path__):
+        module = importlib.import_module(f"{versions.__name__}.{info.name}")
+        modules[module.down_revision] = module
+
+    ordered = []
+    revision = None
+    while revision in modules:
+        module = modules[revision]
+        ordered.append(module)
+        revision = module.revision
+    return ordered
+
+
+def applied_revisions(connection):
+    """
+    Returns the set of revisions already applied to a database.
+    """
+    connection.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_version ("
+        "revision VARCHAR NOT NULL PRIMARY KEY, "
+        "applied_at DATETIME DEFAULT CURRENT_TIMESTAMP)"))
+    return {row[0] for row in connection.execute(text("SELECT revision FROM schema_version"))}
+
+
+def upgrade(db_file_name):
+    """
+    Applies every pending migration to an SQLite database, each in its own transaction.
+
+    Args:
+        db_file_name (str): Path to the SQLite database file.
+
+    Returns:
+        list: The revisions applied by this call.
+    """
+    engine = create_engine(f'sqlite:///{db_file_name}')
+    applied = []
+    try:
+        with engine.begin() as connection:
+            done = applied_revisions(connection)
+        for module in load_revisions():
+            if module.revision in done:
+                continue
+            with engine.begin() as connection:
+                module.upgrade(connection)
+                connection.execute(text("INSERT INTO schema_version (revision) VALUES (:revision)"),
+                                   {"revision": module.revision})
+            applied.append(module.revision)
+    finally:
+        engine.dispose()
+    return applied
@@ -0,0 +1,11 @@
+import sys
+
+from . import upgrade
+
+if __name__ == '__main__':
+    db_file_name = sys.argv[1] if len(sys.argv) > 1 else "movieweb_app.sqlite"
+    revisions = upgrade(db_file_name)
+    if revisions:
+        print(f"Applied migrations to {db_file_name}: {', '.join(revisions)}")
+    else:
+        print(f"{db_file_name} is up to date.")
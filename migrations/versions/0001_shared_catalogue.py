@@ -0,0 +1,70 @@
+"""
+Move movies into a shared catalogue linked to users through favorites.
+
+Legacy databases store one ``movies`` row per user who added a title. Rows that
+describe the same movie (case-insensitive name, director and year) are collapsed
+onto the oldest one, each former owner gets a ``favorites`` row pointing at it and
+reviews are repointed at the surviving movie.
+"""
+from sqlalchemy import inspect, text
+
+revision = '0001_shared_catalogue'
+down_revision = None
+
+
+def upgrade(connection):
+    inspector = inspect(connection)
+    if 'movies' not in inspector.get_table_names():
+        return  # Fresh database, the application creates the current schema
+    if 'user_id' not in {column['name'] for column in inspector.get_columns('movies')}:
+        return  # Already on the shared catalogue schema
+
+    connection.execute(text(
+        "CREATE TEMP TABLE movie_canonical AS "
+        "SELECT id, MIN(id) OVER (PARTITION BY lower(trim(name)), coalesce(director, ''), "
+        "coalesce(year, 0)) AS canonical_id FROM movies"))
+
+    connection.execute(text(
+        "CREATE TABLE movies_catalogue ("
+        "id INTEGER NOT NULL, "
+        "imdb_id VARCHAR, "
+        "name VARCHAR NOT NULL, "
+        "director VARCHAR, "
+        "year INTEGER, "
+        "rating FLOAT, "
+        "PRIMARY KEY (id), "
+        "UNIQUE (imdb_id))"))
+    connection.execute(text(
+        "INSERT INTO movies_catalogue (id, name, director, year, rating) "
+        "SELECT m.id, m.name, m.director, m.year, "
+        "(SELECT MAX(o.rating) FROM movies o JOIN movie_canonical oc ON oc.id = o.id "
+        "WHERE oc.canonical_id = m.id) "
+        "FROM movies m JOIN movie_canonical c ON c.id = m.id "
+        "WHERE c.canonical_id = m.id"))
+
+    connection.execute(text(
+        "CREATE TABLE IF NOT EXISTS favorites ("
+        "id INTEGER NOT NULL, "
+        "user_id INTEGER NOT NULL, "
+        "movie_id INTEGER NOT NULL, "
+        "rating FLOAT, "
+        "PRIMARY KEY (id), "
+        "CONSTRAINT uq_favorites_user_movie UNIQUE (user_id, movie_id), "
+        "FOREIGN KEY(user_id) REFERENCES users (id), "
+        "FOREIGN KEY(movie_id) REFERENCES movies (id))"))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_favorites_movie_id ON favorites (movie_id)"))
+    connection.execute(text(
+        "INSERT OR IGNORE INTO favorites (user_id, movie_id) "
+        "SELECT m.user_id, c.canonical_id FROM movies m "
+        "JOIN movie_canonical c ON c.id = m.id "
+        "WHERE m.user_id IS NOT NULL ORDER BY m.id"))
+
+    connection.execute(text(
+        "UPDATE reviews SET movie_id = "
+        "(SELECT canonical_id FROM movie_canonical WHERE movie_canonical.id = reviews.movie_id) "
+        "WHERE movie_id IN (SELECT id FROM movie_canonical)"))
+
+    connection.execute(text("DROP TABLE movies"))
+    connection.execute(text("ALTER TABLE movies_catalogue RENAME TO movies"))
+    connection.execute(text("DROP TABLE movie_canonical"))
@@ -0,0 +1,34 @@
+"""
+Add movie enrichment status and the persistent enrichment job table.
+"""
+from sqlalchemy import inspect, text
+
+revision = '0002_enrichment_jobs'
+down_revision = '0001_shared_catalogue'
+
+
+def upgrade(connection):
+    inspector = inspect(connection)
+    tables = inspector.get_table_names()
+    if 'movies' not in tables:
+        return  # Fresh database, the application creates the current schema
+
+    if 'status' not in {column['name'] for column in inspector.get_columns('movies')}:
+        connection.execute(text(
+            "ALTER TABLE movies ADD COLUMN status VARCHAR DEFAULT 'ready' NOT NULL"))
+
+    if 'enrichment_jobs' not in tables:
+        connection.execute(text(
+            "CREATE TABLE enrichment_jobs ("
+            "id INTEGER NOT NULL, "
+            "movie_id INTEGER, "
+            "title VARCHAR NOT NULL, "
+            "status VARCHAR NOT NULL, "
+            "attempts INTEGER NOT NULL, "
+            "error VARCHAR, "
+            "created_at DATETIME DEFAULT (CURRENT_TIMESTAMP), "
+            "updated_at DATETIME DEFAULT (CURRENT_TIMESTAMP), "
+            "PRIMARY KEY (id), "
+            "FOREIGN KEY(movie_id) REFERENCES movies (id))"))
+        connection.execute(text(
+            "CREATE INDEX ix_enrichment_jobs_status ON enrichment_jobs (status)"))
@@ -0,0 +1,94 @@
+"""
+Index foreign keys and catalogue sort keys, and cascade deletes in the database.
+
+SQLite cannot alter a foreign key, so tables whose foreign keys lack ON DELETE
+CASCADE are rebuilt. Rows pointing at users or movies that no longer exist are
+dropped on the way, as foreign key enforcement would reject them from now on.
+"""
+from sqlalchemy import inspect, text
+
+revision = '0003_indexes_and_cascades'
+down_revision = '0002_enrichment_jobs'
+
+TABLES = {
+    'favorites': (
+        "CREATE TABLE favorites_rebuilt ("
+        "id INTEGER NOT NULL, "
+        "user_id INTEGER NOT NULL, "
+        "movie_id INTEGER NOT NULL, "
+        "rating FLOAT, "
+        "PRIMARY KEY (id), "
+        "CONSTRAINT uq_favorites_user_movie UNIQUE (user_id, movie_id), "
+        "FOREIGN KEY(user_id) REFERENCES users (id) ON DELETE CASCADE, "
+        "FOREIGN KEY(movie_id) REFERENCES movies (id) ON DELETE CASCADE)",
+        "id, user_id, movie_id, rating",
+        "user_id IN (SELECT id FROM users) AND movie_id IN (SELECT id FROM movies)",
+    ),
+    'reviews': (
+        "CREATE TABLE reviews_rebuilt ("
+        "id INTEGER NOT NULL, "
+        "user_id INTEGER, "
+        "movie_id INTEGER, "
+        "review_text VARCHAR NOT NULL, "
+        "PRIMARY KEY (id), "
+        "FOREIGN KEY(user_id) REFERENCES users (id) ON DELETE CASCADE, "
+        "FOREIGN KEY(movie_id) REFERENCES movies (id) ON DELETE CASCADE)",
+        "id, user_id, movie_id, review_text",
+        "(user_id IS NULL OR user_id IN (SELECT id FROM users)) "
+        "AND (movie_id IS NULL OR movie_id IN (SELECT id FROM movies))",
+    ),
+    'enrichment_jobs': (
+        "CREATE TABLE enrichment_jobs_rebuilt ("
+        "id INTEGER NOT NULL, "
+        "movie_id INTEGER, "
+        "title VARCHAR NOT NULL, "
+        "status VARCHAR NOT NULL, "
+        "attempts INTEGER NOT NULL, "
+        "error VARCHAR, "
+        "created_at DATETIME DEFAULT (CURRENT_TIMESTAMP), "
+        "updated_at DATETIME DEFAULT (CURRENT_TIMESTAMP), "
+        "PRIMARY KEY (id), "
+        "FOREIGN KEY(movie_id) REFERENCES movies (id) ON DELETE CASCADE)",
+        "id, movie_id, title, status, attempts, error, created_at, updated_at",
+        "movie_id IS NULL OR movie_id IN (SELECT id FROM movies)",
+    ),
+}
+
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_favorites_user_id ON favorites (user_id)",
+    "CREATE INDEX IF NOT EXISTS ix_favorites_movie_id ON favorites (movie_id)",
+    "CREATE INDEX IF NOT EXISTS ix_reviews_user_id ON reviews (user_id)",
+    "CREATE INDEX IF NOT EXISTS ix_reviews_movie_id ON reviews (movie_id)",
+    "CREATE INDEX IF NOT EXISTS ix_enrichment_jobs_status ON enrichment_jobs (status)",
+    "CREATE INDEX IF NOT EXISTS ix_enrichment_jobs_movie_id ON enrichment_jobs (movie_id)",
+    "CREATE INDEX IF NOT EXISTS ix_movies_name ON movies (name)",
+    "CREATE INDEX IF NOT EXISTS ix_movies_lower_name ON movies (lower(name))",
+    "CREATE INDEX IF NOT EXISTS ix_movies_director_name ON movies (coalesce(director, ''), name)",
+    "CREATE INDEX IF NOT EXISTS ix_movies_year_name ON movies (coalesce(year, 0), name)",
+    "CREATE INDEX IF NOT EXISTS ix_movies_rating_name ON movies (coalesce(rating, 0), name)",
+]
+
+
+def cascades(inspector, table):
+    return all((key.get('options') or {}).get('ondelete', '').upper() == 'CASCADE'
+               for key in inspector.get_foreign_keys(table))
+
+
+def upgrade(connection):
+    inspector = inspect(connection)
+    tables = inspector.get_table_names()
+    if 'movies' not in tables:
+        return  # Fresh database, the application creates the current schema
+
+    for table, (create, columns, keep) in TABLES.items():
+        if table not in tables or cascades(inspector, table):
+            continue
+        connection.execute(text(create))
+        connection.execute(text(
+            f"INSERT INTO {table}_rebuilt ({columns}) SELECT {columns} FROM {table} WHERE {keep}"))
+        connection.execute(text(f"DROP TABLE {table}"))
+        connection.execute(text(f"ALTER TABLE {table}_rebuilt RENAME TO {table}"))
+
+    for statement in INDEXES:
+        connection.execute(text(statement))
+    connection.execute(text("ANALYZE"))
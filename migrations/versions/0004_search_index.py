@@ -0,0 +1,58 @@
+"""
+Add the FTS5 full-text index over movie names, directors and review text.
+
+The index is filled from the existing movies and reviews, and triggers keep it in step
+with both tables from then on.
+"""
+from sqlalchemy import inspect, text
+
+revision = '0004_search_index'
+down_revision = '0003_indexes_and_cascades'
+
+STATEMENTS = [
+    "CREATE VIRTUAL TABLE movie_search USING fts5("
+    "name, director, reviews, "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+    "INSERT INTO movie_search (movie_search, rank) VALUES ('rank', 'bm25(10.0, 5.0, 1.0)')",
+    "INSERT INTO movie_search (rowid, name, director, reviews) "
+    "SELECT movies.id, movies.name, movies.director, "
+    "coalesce((SELECT group_concat(review_text, ' ') FROM reviews "
+    "WHERE reviews.movie_id = movies.id), '') "
+    "FROM movies",
+    "CREATE TRIGGER IF NOT EXISTS movies_search_insert AFTER INSERT ON movies BEGIN "
+    "INSERT INTO movie_search (rowid, name, director, reviews) "
+    "VALUES (new.id, new.name, new.director, ''); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS movies_search_update "
+    "AFTER UPDATE OF name, director ON movies BEGIN "
+    "UPDATE movie_search SET name = new.name, director = new.director "
+    "WHERE rowid = new.id; "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS movies_search_delete AFTER DELETE ON movies BEGIN "
+    "DELETE FROM movie_search WHERE rowid = old.id; "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS reviews_search_insert AFTER INSERT ON reviews BEGIN "
+    "UPDATE movie_search SET reviews = (SELECT group_concat(review_text, ' ') "
+    "FROM reviews WHERE movie_id = new.movie_id) WHERE rowid = new.movie_id; "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS reviews_search_update "
+    "AFTER UPDATE OF review_text, movie_id ON reviews BEGIN "
+    "UPDATE movie_search SET reviews = (SELECT group_concat(review_text, ' ') "
+    "FROM reviews WHERE movie_id = old.movie_id) WHERE rowid = old.movie_id; "
+    "UPDATE movie_search SET reviews = (SELECT group_concat(review_text, ' ') "
+    "FROM reviews WHERE movie_id = new.movie_id) WHERE rowid = new.movie_id; "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS reviews_search_delete AFTER DELETE ON reviews BEGIN "
+    "UPDATE movie_search SET reviews = (SELECT group_concat(review_text, ' ') "
+    "FROM reviews WHERE movie_id = old.movie_id) WHERE rowid = old.movie_id; "
+    "END",
+]
+
+
+def upgrade(connection):
+    tables = inspect(connection).get_table_names()
+    if 'movies' not in tables or 'movie_search' in tables:
+        return  # Fresh database, or the application has created the index already
+
+    for statement in STATEMENTS:
+        connection.execute(text(statement))
@@ -0,0 +1,65 @@
+"""
+Index reviews one by one in the full-text search.
+
+The movie_search index of 0004 held the text of all of a movie's reviews in the
+movie's row, so each new review re-indexed every earlier one. It is replaced by
+external-content indexes over movies and over each review.
+"""
+from sqlalchemy import inspect, text
+
+revision = '0005_review_search_index'
+down_revision = '0004_search_index'
+
+OPTIONS = "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'"
+
+STATEMENTS = [
+    "DROP TRIGGER IF EXISTS movies_search_insert",
+    "DROP TRIGGER IF EXISTS movies_search_update",
+    "DROP TRIGGER IF EXISTS movies_search_delete",
+    "DROP TRIGGER IF EXISTS reviews_search_insert",
+    "DROP TRIGGER IF EXISTS reviews_search_update",
+    "DROP TRIGGER IF EXISTS reviews_search_delete",
+    "DROP TABLE IF EXISTS movie_search",
+    "CREATE VIRTUAL TABLE movie_search USING fts5("
+    f"name, director, content = 'movies', content_rowid = 'id', {OPTIONS})",
+    "CREATE VIRTUAL TABLE review_search USING fts5("
+    f"review_text, content = 'reviews', content_rowid = 'id', {OPTIONS})",
+    "INSERT INTO movie_search (movie_search, rank) VALUES ('rank', 'bm25(10.0, 5.0)')",
+    "INSERT INTO movie_search (movie_search) VALUES ('rebuild')",
+    "INSERT INTO review_search (review_search) VALUES ('rebuild')",
+    "CREATE TRIGGER movies_search_insert AFTER INSERT ON movies BEGIN "
+    "INSERT INTO movie_search (rowid, name, director) "
+    "VALUES (new.id, new.name, new.director); "
+    "END",
+    "CREATE TRIGGER movies_search_update AFTER UPDATE OF name, director ON movies BEGIN "
+    "INSERT INTO movie_search (movie_search, rowid, name, director) "
+    "VALUES ('delete', old.id, old.name, old.director); "
+    "INSERT INTO movie_search (rowid, name, director) "
+    "VALUES (new.id, new.name, new.director); "
+    "END",
+    "CREATE TRIGGER movies_search_delete AFTER DELETE ON movies BEGIN "
+    "INSERT INTO movie_search (movie_search, rowid, name, director) "
+    "VALUES ('delete', old.id, old.name, old.director); "
+    "END",
+    "CREATE TRIGGER reviews_search_insert AFTER INSERT ON reviews BEGIN "
+    "INSERT INTO review_search (rowid, review_text) VALUES (new.id, new.review_text); "
+    "END",
+    "CREATE TRIGGER reviews_search_update AFTER UPDATE OF review_text ON reviews BEGIN "
+    "INSERT INTO review_search (review_search, rowid, review_text) "
+    "VALUES ('delete', old.id, old.review_text); "
+    "INSERT INTO review_search (rowid, review_text) VALUES (new.id, new.review_text); "
+    "END",
+    "CREATE TRIGGER reviews_search_delete AFTER DELETE ON reviews BEGIN "
+    "INSERT INTO review_search (review_search, rowid, review_text) "
+    "VALUES ('delete', old.id, old.review_text); "
+    "END",
+]
+
+
+def upgrade(connection):
+    tables = inspect(connection).get_table_names()
+    if 'movies' not in tables or 'review_search' in tables:
+        return  # Fresh database, or the application has created the indexes already
+
+    for statement in STATEMENTS:
+        connection.execute(text(statement))
@@ -0,0 +1,153 @@
+"""
+Add the aggregate tables behind the catalogue statistics and leaderboards.
+
+movie_stats and user_stats count favorites and reviews, director_stats and year_stats
+count ready movies and sum their ratings. The tables are filled from the existing rows,
+and triggers keep them up to date from then on.
+"""
+from sqlalchemy import inspect, text
+
+revision = '0006_stats_tables'
+down_revision = '0005_review_search_index'
+
+STATEMENTS = [
+    "CREATE TABLE movie_stats (movie_id INTEGER NOT NULL, "
+    "favorite_count INTEGER DEFAULT '0' NOT NULL, "
+    "review_count INTEGER DEFAULT '0' NOT NULL, PRIMARY KEY (movie_id), "
+    "FOREIGN KEY(movie_id) REFERENCES movies (id) ON DELETE CASCADE)",
+    "CREATE INDEX ix_movie_stats_favorites ON movie_stats (favorite_count, movie_id)",
+    "CREATE TABLE user_stats (user_id INTEGER NOT NULL, "
+    "favorite_count INTEGER DEFAULT '0' NOT NULL, "
+    "review_count INTEGER DEFAULT '0' NOT NULL, PRIMARY KEY (user_id), "
+    "FOREIGN KEY(user_id) REFERENCES users (id) ON DELETE CASCADE)",
+    "CREATE INDEX ix_user_stats_reviews ON user_stats (review_count, user_id)",
+    "CREATE TABLE director_stats (director VARCHAR NOT NULL, "
+    "movie_count INTEGER DEFAULT '0' NOT NULL, "
+    "rated_count INTEGER DEFAULT '0' NOT NULL, "
+    "rating_sum FLOAT DEFAULT '0' NOT NULL, "
+    "average_rating FLOAT GENERATED ALWAYS AS (CASE WHEN rated_count > 0 THEN "
+    "rating_sum / rated_count END), PRIMARY KEY (director))",
+    "CREATE INDEX ix_director_stats_rating ON director_stats (average_rating, "
+    "director)",
+    "CREATE TABLE year_stats (year INTEGER NOT NULL, "
+    "movie_count INTEGER DEFAULT '0' NOT NULL, "
+    "rated_count INTEGER DEFAULT '0' NOT NULL, "
+    "rating_sum FLOAT DEFAULT '0' NOT NULL, "
+    "average_rating FLOAT GENERATED ALWAYS AS (CASE WHEN rated_count > 0 THEN "
+    "rating_sum / rated_count END), PRIMARY KEY (year))",
+    "CREATE TRIGGER favorites_stats_insert AFTER INSERT ON favorites BEGIN "
+    "INSERT INTO movie_stats (movie_id, favorite_count) SELECT new.movie_id, 1 WHERE "
+    "new.movie_id IS NOT NULL ON CONFLICT (movie_id) DO UPDATE SET favorite_count = "
+    "favorite_count + 1; "
+    "INSERT INTO user_stats (user_id, favorite_count) SELECT new.user_id, 1 WHERE "
+    "new.user_id IS NOT NULL ON CONFLICT (user_id) DO UPDATE SET favorite_count = "
+    "favorite_count + 1; END",
+    "CREATE TRIGGER favorites_stats_update AFTER UPDATE OF user_id, movie_id ON "
+    "favorites BEGIN "
+    "UPDATE movie_stats SET favorite_count = favorite_count - 1 WHERE movie_id = "
+    "old.movie_id; "
+    "UPDATE user_stats SET favorite_count = favorite_count - 1 WHERE user_id = "
+    "old.user_id; "
+    "INSERT INTO movie_stats (movie_id, favorite_count) SELECT new.movie_id, 1 WHERE "
+    "new.movie_id IS NOT NULL ON CONFLICT (movie_id) DO UPDATE SET favorite_count = "
+    "favorite_count + 1; "
+    "INSERT INTO user_stats (user_id, favorite_count) SELECT new.user_id, 1 WHERE "
+    "new.user_id IS NOT NULL ON CONFLICT (user_id) DO UPDATE SET favorite_count = "
+    "favorite_count + 1; END",
+    "CREATE TRIGGER favorites_stats_delete AFTER DELETE ON favorites BEGIN "
+    "UPDATE movie_stats SET favorite_count = favorite_count - 1 WHERE movie_id = "
+    "old.movie_id; "
+    "UPDATE user_stats SET favorite_count = favorite_count - 1 WHERE user_id = "
+    "old.user_id; END",
+    "CREATE TRIGGER reviews_stats_insert AFTER INSERT ON reviews BEGIN "
+    "INSERT INTO movie_stats (movie_id, review_count) SELECT new.movie_id, 1 WHERE "
+    "new.movie_id IS NOT NULL ON CONFLICT (movie_id) DO UPDATE SET review_count = "
+    "review_count + 1; "
+    "INSERT INTO user_stats (user_id, review_count) SELECT new.user_id, 1 WHERE "
+    "new.user_id IS NOT NULL ON CONFLICT (user_id) DO UPDATE SET review_count = "
+    "review_count + 1; END",
+    "CREATE TRIGGER reviews_stats_update AFTER UPDATE OF user_id, movie_id ON reviews"
+    " BEGIN UPDATE movie_stats SET review_count = review_count - 1 WHERE movie_id = "
+    "old.movie_id; "
+    "UPDATE user_stats SET review_count = review_count - 1 WHERE user_id = "
+    "old.user_id; "
+    "INSERT INTO movie_stats (movie_id, review_count) SELECT new.movie_id, 1 WHERE "
+    "new.movie_id IS NOT NULL ON CONFLICT (movie_id) DO UPDATE SET review_count = "
+    "review_count + 1; "
+    "INSERT INTO user_stats (user_id, review_count) SELECT new.user_id, 1 WHERE "
+    "new.user_id IS NOT NULL ON CONFLICT (user_id) DO UPDATE SET review_count = "
+    "review_count + 1; END",
+    "CREATE TRIGGER reviews_stats_delete AFTER DELETE ON reviews BEGIN "
+    "UPDATE movie_stats SET review_count = review_count - 1 WHERE movie_id = "
+    "old.movie_id; "
+    "UPDATE user_stats SET review_count = review_count - 1 WHERE user_id = "
+    "old.user_id; END",
+    "CREATE TRIGGER movies_stats_insert AFTER INSERT ON movies BEGIN "
+    "INSERT INTO director_stats (director, movie_count, rated_count, rating_sum) "
+    "SELECT new.director, 1, (coalesce(new.rating, 0) > 0), (CASE WHEN new.rating > 0"
+    " THEN new.rating ELSE 0 END) WHERE new.status = 'ready' AND new.director IS NOT "
+    "NULL ON CONFLICT (director) DO UPDATE SET movie_count = movie_count + 1, "
+    "rated_count = rated_count + excluded.rated_count, rating_sum = rating_sum + "
+    "excluded.rating_sum; "
+    "INSERT INTO year_stats (year, movie_count, rated_count, rating_sum) SELECT "
+    "new.year, 1, (coalesce(new.rating, 0) > 0), (CASE WHEN new.rating > 0 THEN "
+    "new.rating ELSE 0 END) WHERE new.status = 'ready' AND new.year IS NOT NULL ON "
+    "CONFLICT (year) DO UPDATE SET movie_count = movie_count + 1, rated_count = "
+    "rated_count + excluded.rated_count, rating_sum = rating_sum + "
+    "excluded.rating_sum; END",
+    "CREATE TRIGGER movies_stats_update AFTER UPDATE OF director, year, rating, "
+    "status ON movies BEGIN "
+    "UPDATE director_stats SET movie_count = movie_count - 1, rated_count = "
+    "rated_count - (coalesce(old.rating, 0) > 0), rating_sum = rating_sum - (CASE "
+    "WHEN old.rating > 0 THEN old.rating ELSE 0 END) WHERE director = old.director "
+    "AND old.status = 'ready'; "
+    "UPDATE year_stats SET movie_count = movie_count - 1, rated_count = rated_count -"
+    " (coalesce(old.rating, 0) > 0), rating_sum = rating_sum - (CASE WHEN old.rating "
+    "> 0 THEN old.rating ELSE 0 END) WHERE year = old.year AND old.status = 'ready'; "
+    "INSERT INTO director_stats (director, movie_count, rated_count, rating_sum) "
+    "SELECT new.director, 1, (coalesce(new.rating, 0) > 0), (CASE WHEN new.rating > 0"
+    " THEN new.rating ELSE 0 END) WHERE new.status = 'ready' AND new.director IS NOT "
+    "NULL ON CONFLICT (director) DO UPDATE SET movie_count = movie_count + 1, "
+    "rated_count = rated_count + excluded.rated_count, rating_sum = rating_sum + "
+    "excluded.rating_sum; "
+    "INSERT INTO year_stats (year, movie_count, rated_count, rating_sum) SELECT "
+    "new.year, 1, (coalesce(new.rating, 0) > 0), (CASE WHEN new.rating > 0 THEN "
+    "new.rating ELSE 0 END) WHERE new.status = 'ready' AND new.year IS NOT NULL ON "
+    "CONFLICT (year) DO UPDATE SET movie_count = movie_count + 1, rated_count = "
+    "rated_count + excluded.rated_count, rating_sum = rating_sum + "
+    "excluded.rating_sum; END",
+    "CREATE TRIGGER movies_stats_delete AFTER DELETE ON movies BEGIN "
+    "UPDATE director_stats SET movie_count = movie_count - 1, rated_count = "
+    "rated_count - (coalesce(old.rating, 0) > 0), rating_sum = rating_sum - (CASE "
+    "WHEN old.rating > 0 THEN old.rating ELSE 0 END) WHERE director = old.director "
+    "AND old.status = 'ready'; "
+    "UPDATE year_stats SET movie_count = movie_count - 1, rated_count = rated_count -"
+    " (coalesce(old.rating, 0) > 0), rating_sum = rating_sum - (CASE WHEN old.rating "
+    "> 0 THEN old.rating ELSE 0 END) WHERE year = old.year AND old.status = 'ready'; "
+    "END",
+    "INSERT INTO movie_stats (movie_id, favorite_count, review_count) SELECT "
+    "movie_id, sum(favorite), sum(review) FROM (SELECT movie_id, 1 AS favorite, 0 AS "
+    "review FROM favorites UNION ALL SELECT movie_id, 0, 1 FROM reviews WHERE "
+    "movie_id IS NOT NULL) GROUP BY movie_id",
+    "INSERT INTO user_stats (user_id, favorite_count, review_count) SELECT user_id, "
+    "sum(favorite), sum(review) FROM (SELECT user_id, 1 AS favorite, 0 AS review FROM"
+    " favorites UNION ALL SELECT user_id, 0, 1 FROM reviews WHERE user_id IS NOT "
+    "NULL) GROUP BY user_id",
+    "INSERT INTO director_stats (director, movie_count, rated_count, rating_sum) "
+    "SELECT director, count(*), sum(coalesce(rating, 0) > 0), sum(CASE WHEN rating > "
+    "0 THEN rating ELSE 0 END) FROM movies WHERE status = 'ready' AND director IS NOT"
+    " NULL GROUP BY director",
+    "INSERT INTO year_stats (year, movie_count, rated_count, rating_sum) SELECT year,"
+    " count(*), sum(coalesce(rating, 0) > 0), sum(CASE WHEN rating > 0 THEN rating "
+    "ELSE 0 END) FROM movies WHERE status = 'ready' AND year IS NOT NULL GROUP BY "
+    "year",
+]
+
+
+def upgrade(connection):
+    tables = inspect(connection).get_table_names()
+    if 'movies' not in tables or 'movie_stats' in tables:
+        return  # Fresh database, or the application has created the tables already
+
+    for statement in STATEMENTS:
+        connection.execute(text(statement))
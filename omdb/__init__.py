@@ -0,0 +1,6 @@
+from .cache import (CacheBackend, MemoryCache, SQLiteCache, TieredCache, OMDbCache,
+                    normalize_title, is_imdb_id)
+from .client import (OMDbClient, CircuitBreaker, CircuitOpenError, LatencyRecorder,
+                     parse_movie_details)
+from .async_client import AsyncOMDbClient
+from .lookup import DailyQuota, OMDbLookup, QuotaExceededError, SingleFlight
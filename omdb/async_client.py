@@ -0,0 +1,140 @@
+import asyncio
+import time
+
+import requests
+
+from .cache import is_imdb_id
+from .client import CircuitBreaker, CircuitOpenError, LatencyRecorder, OMDbClient
+
+RETRY_STATUSES = (500, 502, 503, 504)
+
+
+class AsyncOMDbClient:
+    """
+    Asynchronous counterpart of OMDbClient over a pooled httpx.AsyncClient.
+
+    Retries, backoff and the circuit breaker behave as in OMDbClient, and failures
+    are raised as the same ``requests`` exceptions, so callers handle both clients
+    alike. The breaker and latency recorder can be shared with a synchronous client
+    to keep one view of OMDb's health.
+    """
+
+    def __init__(self, api_url, api_key, timeout=5, pool_size=10, max_retries=2,
+                 backoff_factor=0.5, breaker=None, latency=None):
+        # Imported by the first async client, as only ASYNC_MODE needs it
+        try:
+            import httpx
+        except ImportError:
+            raise RuntimeError("AsyncOMDbClient requires the httpx package") from None
+        self.httpx = httpx
+        self.api_url = api_url
+        self.api_key = api_key
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.breaker = breaker or CircuitBreaker()
+        self.latency = latency or LatencyRecorder()
+        self.errors = 0
+        # The HTTP client of each event loop, with the task closing it
+        self._clients = {}
+
+    def client(self):
+        """
+        Returns the HTTP client of the running event loop.
+
+        httpx connections belong to the loop that opened them, so each loop gets its
+        own client, as successive asyncio.run() calls do. A client is closed on its
+        loop when the loop finishes and cancels its remaining tasks, as asyncio.run()
+        does, since it can no longer be closed once the loop is.
+        """
+        loop = asyncio.get_running_loop()
+        entry = self._clients.get(loop)
+        if entry is None:
+            limits = self.httpx.Limits(max_connections=self.pool_size,
+                                       max_keepalive_connections=self.pool_size)
+            client = self.httpx.AsyncClient(timeout=self.timeout, limits=limits)
+            entry = self._clients[loop] = (client,
+                                           loop.create_task(self._close_with_loop(client)))
+        return entry[0]
+
+    async def _close_with_loop(self, client):
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.create_future()
+        finally:
+            if self._clients.get(loop, (None,))[0] is client:
+                del self._clients[loop]
+            await client.aclose()
+
+    async def get_movie(self, title, api_key=None):
+        """
+        Requests movie details by title or IMDb ID.
+
+        Args:
+            title (str): The title or IMDb ID of the movie.
+            api_key (str): Overrides the client's API key for this call.
+
+        Returns:
+            dict or None: The OMDb response, or None if OMDb does not know the movie.
+
+        Raises:
+            requests.exceptions.RequestException: If OMDb cannot be reached, including
+                CircuitOpenError while the circuit breaker is open.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError("OMDb circuit breaker is open")
+
+        params = {'apikey': api_key or self.api_key,
+                  'i' if is_imdb_id(title) else 't': title.strip()}
+        start = time.perf_counter()
+        try:
+            data = await self._get(params)
+        except requests.exceptions.RequestException:
+            self.errors += 1
+            self.breaker.record_failure()
+            raise
+        finally:
+            self.latency.record(time.perf_counter() - start)
+
+        self.breaker.record_success()
+        if data.get('Response') == 'False':
+            return None  # Movie not found
+        return data
+
+    async def _get(self, params):
+        """
+        Sends the request, retrying connection errors, timeouts and 5xx responses.
+        """
+        for attempt in range(self.max_retries + 1):
+            retry = attempt < self.max_retries
+            try:
+                response = await self.client().get(self.api_url, params=params)
+            except self.httpx.TimeoutException as e:
+                if not retry:
+                    raise requests.exceptions.Timeout(str(e)) from e
+            except self.httpx.HTTPError as e:
+                if not retry:
+                    raise requests.exceptions.ConnectionError(str(e)) from e
+            else:
+                if response.status_code not in RETRY_STATUSES or not retry:
+                    if response.is_error:
+                        raise requests.exceptions.HTTPError(
+                            f"{response.status_code} Error for url: {response.url}")
+                    try:
+                        return response.json()
+                    except ValueError as e:
+                        raise requests.exceptions.InvalidJSONError(str(e)) from e
+            await asyncio.sleep(self.backoff_factor * 2 ** attempt)
+
+    stats = OMDbClient.stats
+
+    async def aclose(self):
+        """
+        Closes the HTTP client of the running event loop.
+        """
+        entry = self._clients.pop(asyncio.get_running_loop(), None)
+        if entry is not None:
+            client, closer = entry
+            closer.cancel()
+            await client.aclose()
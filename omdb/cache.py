@@ -0,0 +1,340 @@
+import asyncio
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from sqlalchemy import Column, Float, MetaData, String, Table, Text, delete, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+# Returned by cache backends for keys they do not hold. ``None`` is a valid cached
+# value: it records that OMDb has no such movie.
+MISS = object()
+
+
+def upsert(engine, table):
+    """
+    Returns an INSERT into ``table`` supporting ON CONFLICT in the engine's dialect,
+    SQLite or PostgreSQL.
+    """
+    dialect = postgresql if engine.dialect.name == 'postgresql' else sqlite
+    return dialect.insert(table)
+
+
+def normalize_title(title):
+    """
+    Normalizes a movie title or IMDb ID into a cache key.
+
+    Args:
+        title (str): The title as typed by the user, or an IMDb ID such as 'tt1375666'.
+
+    Returns:
+        str: 'imdb:<id>' for IMDb IDs, 'title:<casefolded title>' otherwise.
+    """
+    normalized = " ".join(title.split()).casefold()
+    if is_imdb_id(normalized):
+        return f"imdb:{normalized}"
+    return f"title:{normalized}"
+
+
+def is_imdb_id(value):
+    """
+    Returns whether a string looks like an IMDb title ID.
+    """
+    value = value.strip().lower()
+    return value.startswith('tt') and value[2:].isdigit() and len(value) > 2
+
+
+class CacheBackend(ABC):
+    """
+    Interface for the storage tiers behind the OMDb response and page caches.
+    """
+
+    @abstractmethod
+    def get(self, key):
+        """
+        Retrieve a cached value.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            The cached value, or MISS if the key is absent or expired.
+        """
+        pass
+
+    @abstractmethod
+    def set(self, key, value, ttl):
+        """
+        Store a value.
+
+        Args:
+            key (str): The cache key.
+            value: A JSON-serializable value, or None to record a negative result.
+            ttl (float): Seconds until the entry expires.
+        """
+        pass
+
+    @abstractmethod
+    def delete(self, key):
+        """
+        Remove a value if present.
+
+        Args:
+            key (str): The cache key.
+        """
+        pass
+
+    @abstractmethod
+    def clear(self):
+        """
+        Remove every cached value.
+        """
+        pass
+
+
+class MemoryCache(CacheBackend):
+    """
+    Thread-safe in-process LRU cache bounded to a maximum number of entries.
+    """
+
+    def __init__(self, max_entries=1024, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.clock = clock
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISS
+            expires_at, value = entry
+            if expires_at <= self.clock():
+                del self._entries[key]
+                return MISS
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (self.clock() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCache(CacheBackend):
+    """
+    Persistent cache stored in a table (``omdb_cache`` by default) of an SQLAlchemy engine,
+    SQLite or PostgreSQL.
+
+    Entries survive restarts and are shared by every process using the database.
+    Once the table grows past ``max_entries`` the entries closest to expiry are
+    evicted, checked every ``prune_interval`` writes to keep writes cheap.
+    """
+
+    def __init__(self, engine, max_entries=100_000, prune_interval=100, clock=time.time,
+                 table_name='omdb_cache'):
+        self.metadata = MetaData()
+        self.table = Table(
+            table_name, self.metadata,
+            Column('key', String, primary_key=True),
+            Column('payload', Text),
+            Column('expires_at', Float, nullable=False, index=True),
+        )
+        self.engine = engine
+        self.max_entries = max_entries
+        self.prune_interval = prune_interval
+        self.clock = clock
+        self.evictions = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self.metadata.create_all(engine)
+
+    def get(self, key):
+        query = select(self.table.c.payload).where(self.table.c.key == key,
+                                                   self.table.c.expires_at > self.clock())
+        with self.engine.connect() as connection:
+            row = connection.execute(query).first()
+        if row is None:
+            return MISS
+        return json.loads(row.payload) if row.payload is not None else None
+
+    def set(self, key, value, ttl):
+        payload = json.dumps(value) if value is not None else None
+        statement = upsert(self.engine, self.table).values(
+            key=key, payload=payload, expires_at=self.clock() + ttl)
+        statement = statement.on_conflict_do_update(
+            index_elements=[self.table.c.key],
+            set_={'payload': statement.excluded.payload,
+                  'expires_at': statement.excluded.expires_at})
+        with self.engine.begin() as connection:
+            connection.execute(statement)
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % self.prune_interval == 0
+        if prune:
+            self.prune()
+
+    def delete(self, key):
+        with self.engine.begin() as connection:
+            connection.execute(delete(self.table).where(self.table.c.key == key))
+
+    def clear(self):
+        with self.engine.begin() as connection:
+            connection.execute(delete(self.table))
+
+    def prune(self):
+        """
+        Removes expired entries, then the entries closest to expiry beyond ``max_entries``.
+        """
+        with self.engine.begin() as connection:
+            connection.execute(delete(self.table).where(self.table.c.expires_at <= self.clock()))
+            count = connection.execute(select(func.count()).select_from(self.table)).scalar()
+            excess = count - self.max_entries
+            if excess > 0:
+                oldest = (select(self.table.c.key)
+                          .order_by(self.table.c.expires_at)
+                          .limit(excess))
+                connection.execute(delete(self.table).where(self.table.c.key.in_(oldest)))
+                self.evictions += excess
+
+
+class TieredCache(CacheBackend):
+    """
+    Checks a fast near tier (usually MemoryCache) before a slower far tier.
+
+    Far-tier hits are copied into the near tier for at most ``promote_ttl`` seconds,
+    which bounds how long the near tier can serve an entry the far tier has dropped.
+    """
+
+    def __init__(self, near, far, promote_ttl=300):
+        self.near = near
+        self.far = far
+        self.promote_ttl = promote_ttl
+
+    def get(self, key):
+        value = self.near.get(key)
+        if value is not MISS:
+            return value
+        value = self.far.get(key)
+        if value is not MISS:
+            self.near.set(key, value, self.promote_ttl)
+        return value
+
+    def set(self, key, value, ttl):
+        self.far.set(key, value, ttl)
+        self.near.set(key, value, min(ttl, self.promote_ttl))
+
+    def delete(self, key):
+        self.far.delete(key)
+        self.near.delete(key)
+
+    def clear(self):
+        self.far.clear()
+        self.near.clear()
+
+
+class OMDbCache:
+    """
+    Caches OMDb lookups, including negative results, in front of a fetch function.
+    """
+
+    def __init__(self, backend, ttl=7 * 24 * 3600, negative_ttl=3600):
+        self.backend = backend
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, title, fetch):
+        """
+        Returns the cached OMDb response for a title, calling ``fetch`` on a miss.
+
+        Args:
+            title (str): The movie title or IMDb ID.
+            fetch (callable): Called with the title on a cache miss. Returns the OMDb
+                response, or None if OMDb has no such movie. Exceptions raised by
+                ``fetch`` propagate and nothing is cached for them.
+
+        Returns:
+            dict or None: The OMDb response, or None if the movie does not exist.
+        """
+        key = normalize_title(title)
+        value = self.get(key)
+        if value is MISS:
+            value = fetch(title)
+            self.store(key, value)
+        return value
+
+    async def lookup_async(self, title, fetch):
+        """
+        Coroutine version of ``lookup`` for a ``fetch`` coroutine function.
+
+        The backend is read and written on a worker thread, since its SQLite tier
+        blocks while it queries the database.
+        """
+        key = normalize_title(title)
+        value = await asyncio.to_thread(self.get, key)
+        if value is MISS:
+            value = await fetch(title)
+            await asyncio.to_thread(self.store, key, value)
+        return value
+
+    def get(self, key):
+        """
+        Returns the cached value of a key, or MISS, counting the hit or miss.
+        """
+        value = self.backend.get(key)
+        with self._lock:
+            if value is MISS:
+                self.misses += 1
+            else:
+                self.hits += 1
+                if value is None:
+                    self.negative_hits += 1
+        return value
+
+    def store(self, key, value):
+        """
+        Stores an OMDb response under its key, and under its IMDb ID when it has one.
+        """
+        if value is None:
+            self.backend.set(key, None, self.negative_ttl)
+            return
+        self.backend.set(key, value, self.ttl)
+        imdb_id = value.get('imdbID')
+        if imdb_id and is_imdb_id(imdb_id):
+            imdb_key = normalize_title(imdb_id)
+            if imdb_key != key:
+                self.backend.set(imdb_key, value, self.ttl)
+
+    def stats(self):
+        """
+        Returns the hit and miss counters of the cache.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,221 @@
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .cache import is_imdb_id
+
+
+def parse_movie_details(data):
+    """
+    Converts an OMDb response into the fields stored for a movie.
+
+    Years of series come as ranges such as '2010–2014' and unknown ratings as 'N/A';
+    the first year and a rating of 0.0 are stored for them.
+
+    Args:
+        data (dict): The OMDb response.
+
+    Returns:
+        dict: The name, director, year, rating and imdb_id of the movie.
+    """
+    year = (data.get('Year') or '')[:4]
+    try:
+        rating = float(data.get('imdbRating'))
+    except (TypeError, ValueError):
+        rating = 0.0
+    return {
+        "name": data.get('Title'),
+        "director": data.get('Director', 'N/A'),
+        "year": int(year) if year.isdigit() else 0,
+        "rating": rating,
+        "imdb_id": data.get('imdbID'),
+    }
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """
+    Raised instead of calling OMDb while the circuit breaker is open.
+    """
+
+
+class CircuitBreaker:
+    """
+    Fails fast after repeated upstream failures instead of waiting on every call.
+
+    After ``failure_threshold`` consecutive failures the breaker opens and rejects
+    calls for ``reset_timeout`` seconds. It then lets a single trial call through:
+    success closes the breaker, failure opens it again.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self.opened_at is None:
+            return self.CLOSED
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        """
+        Returns whether a call may go upstream now.
+        """
+        with self._lock:
+            state = self._state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+
+
+class LatencyRecorder:
+    """
+    Keeps the most recent call durations and reports percentiles over them.
+    """
+
+    def __init__(self, window=1024):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+            self.total += seconds
+
+    def percentiles(self, *quantiles):
+        """
+        Returns the requested percentiles, in seconds, of the recorded window.
+
+        Args:
+            quantiles (float): Percentiles between 0 and 100.
+
+        Returns:
+            dict: Maps each percentile to its latency, or None if nothing was recorded.
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return {q: None for q in quantiles}
+        return {q: samples[min(len(samples) - 1, int(len(samples) * q / 100))]
+                for q in quantiles}
+
+
+class OMDbClient:
+    """
+    HTTP client for the OMDb API sharing one pooled keep-alive session.
+
+    Connection errors, read timeouts and 5xx responses are retried with exponential
+    backoff, and a circuit breaker fails calls fast while OMDb keeps failing.
+    """
+
+    def __init__(self, api_url, api_key, timeout=5, pool_size=10, max_retries=2,
+                 backoff_factor=0.5, breaker=None):
+        self.api_url = api_url
+        self.api_key = api_key
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.latency = LatencyRecorder()
+        self.errors = 0
+
+        retry = Retry(total=max_retries, connect=max_retries, read=max_retries,
+                      status=max_retries, backoff_factor=backoff_factor,
+                      status_forcelist=(500, 502, 503, 504),
+                      allowed_methods=frozenset(['GET']), raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+                              pool_block=True, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get_movie(self, title, api_key=None):
+        """
+        Requests movie details by title or IMDb ID.
+
+        Args:
+            title (str): The title or IMDb ID of the movie.
+            api_key (str): Overrides the client's API key for this call.
+
+        Returns:
+            dict or None: The OMDb response, or None if OMDb does not know the movie.
+
+        Raises:
+            requests.exceptions.RequestException: If OMDb cannot be reached, including
+                CircuitOpenError while the circuit breaker is open.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError("OMDb circuit breaker is open")
+
+        params = {'apikey': api_key or self.api_key,
+                  'i' if is_imdb_id(title) else 't': title.strip()}
+        start = time.perf_counter()
+        try:
+            response = self.session.get(self.api_url, params=params, timeout=self.timeout)
+            response.raise_for_status()
+            data = response.json()
+        except requests.exceptions.RequestException:
+            self.errors += 1
+            self.breaker.record_failure()
+            raise
+        finally:
+            self.latency.record(time.perf_counter() - start)
+
+        self.breaker.record_success()
+        if data.get('Response') == 'False':
+            return None  # Movie not found
+        return data
+
+    def stats(self):
+        """
+        Returns call counts, the breaker state and latency percentiles for monitoring.
+        """
+        percentiles = self.latency.percentiles(50, 95, 99)
+        return {
+            "calls": self.latency.count,
+            "errors": self.errors,
+            "breaker_state": self.breaker.state,
+            "latency_seconds_total": self.latency.total,
+            "latency_p50": percentiles[50],
+            "latency_p95": percentiles[95],
+            "latency_p99": percentiles[99],
+        }
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,305 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+from sqlalchemy import Column, Integer, MetaData, String, Table, select
+
+from .cache import normalize_title, upsert
+
+
+class QuotaExceededError(requests.exceptions.RequestException):
+    """
+    Raised instead of calling OMDb once the day's quota of requests is used up.
+    """
+
+
+class SingleFlight:
+    """
+    Lets one call per key run at a time; concurrent callers of the same key wait for
+    that call and share its result or exception.
+    """
+
+    def __init__(self):
+        self.coalesced = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """
+        Calls ``fn`` unless a call for ``key`` is already running, then returns its result.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return call.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+class DailyQuota:
+    """
+    Counts OMDb requests against a daily quota and spaces them by a rate limit.
+
+    OMDb keys allow a fixed number of requests per day, 1,000 for free keys. Calls
+    beyond ``daily_limit`` in a UTC day raise QuotaExceededError instead of being
+    refused upstream. With an engine, the count is kept in the ``omdb_quota`` table
+    so every process using the database shares it; otherwise it is per process.
+    """
+
+    def __init__(self, daily_limit=1000, per_second=None, engine=None, clock=time.time,
+                 sleep=time.sleep):
+        """
+        Args:
+            daily_limit (int): Requests allowed per UTC day, or None for no limit.
+            per_second (float): Most requests started per second by this process, or
+                None for no spacing.
+            engine (Engine): Database holding the shared count, or None.
+            clock (callable): Returns the current time in seconds since the epoch.
+            sleep (callable): Waits for a number of seconds.
+        """
+        self.daily_limit = daily_limit
+        self.per_second = per_second
+        self.engine = engine
+        self.clock = clock
+        self.sleep = sleep
+        self.rejected = 0
+        self.waits = 0
+        self._day = None
+        self._used = 0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+        self.table = None
+        if engine is not None:
+            self.metadata = MetaData()
+            self.table = Table('omdb_quota', self.metadata,
+                               Column('day', String, primary_key=True),
+                               Column('used', Integer, nullable=False))
+            self.metadata.create_all(engine)
+
+    def today(self):
+        return time.strftime('%Y-%m-%d', time.gmtime(self.clock()))
+
+    def acquire(self):
+        """
+        Waits for the rate limit and counts one request.
+
+        Raises:
+            QuotaExceededError: If the day's quota is used up.
+        """
+        delay = self.reserve()
+        if delay > 0:
+            self.sleep(delay)
+
+    def reserve(self):
+        """
+        Counts one request and returns the seconds to wait before sending it.
+
+        Raises:
+            QuotaExceededError: If the day's quota is used up.
+        """
+        if not self._consume(self.today()):
+            with self._lock:
+                self.rejected += 1
+            raise QuotaExceededError(f"OMDb daily quota of {self.daily_limit} requests "
+                                     "is used up")
+        if not self.per_second:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + 1 / self.per_second
+            if slot > now:
+                self.waits += 1
+        return slot - now
+
+    def _consume(self, day):
+        if self.table is None:
+            with self._lock:
+                if self._day != day:
+                    self._day, self._used = day, 0
+                if self.daily_limit is not None and self._used >= self.daily_limit:
+                    return False
+                self._used += 1
+                return True
+
+        statement = upsert(self.engine, self.table).values(day=day, used=1)
+        statement = statement.on_conflict_do_update(
+            index_elements=[self.table.c.day], set_={'used': self.table.c.used + 1},
+            where=(self.table.c.used < self.daily_limit
+                   if self.daily_limit is not None else None))
+        with self.engine.begin() as connection:
+            return connection.execute(statement.returning(self.table.c.used)).first() \
+                is not None
+
+    def used(self):
+        """
+        Returns the number of requests counted today.
+        """
+        day = self.today()
+        if self.table is None:
+            with self._lock:
+                return self._used if self._day == day else 0
+        with self.engine.connect() as connection:
+            return connection.execute(select(self.table.c.used)
+                                      .where(self.table.c.day == day)).scalar() or 0
+
+    def stats(self):
+        """
+        Returns today's consumption of the quota for monitoring.
+        """
+        used = self.used()
+        return {
+            "daily_limit": self.daily_limit,
+            "used": used,
+            "remaining": (max(0, self.daily_limit - used)
+                          if self.daily_limit is not None else None),
+            "rejected": self.rejected,
+            "rate_limited": self.waits,
+        }
+
+
+class OMDbLookup:
+    """
+    Looks titles up through the OMDb response cache with one upstream call per title.
+
+    Concurrent lookups of the same normalized title, e.g. several users adding a
+    trending movie at once, share a single cache lookup and OMDb call. Calls that
+    reach OMDb are counted against the daily quota. ``lookup_many`` resolves a list
+    of titles in parallel on a pool bounded to ``max_concurrency`` lookups, shared by
+    every batch.
+    """
+
+    def __init__(self, cache, fetch, quota=None, max_concurrency=8, async_fetch=None):
+        """
+        Args:
+            cache (OMDbCache): The OMDb response cache.
+            fetch (callable): Called with a title on a cache miss; returns the OMDb
+                response, None if the movie does not exist, or raises RequestException.
+            quota (DailyQuota): Counts and spaces the calls to ``fetch``.
+            max_concurrency (int): The most lookups ``lookup_many`` runs at once.
+            async_fetch (callable): Coroutine function like ``fetch``, used by
+                ``lookup_async``.
+        """
+        self.cache = cache
+        self.fetch = fetch
+        self.async_fetch = async_fetch
+        self.quota = quota
+        self.flight = SingleFlight()
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency,
+                                           thread_name_prefix='omdb-lookup')
+        self._async_calls = {}
+        self._async_coalesced = 0
+
+    def lookup(self, title, fetch=None):
+        """
+        Returns the OMDb response for a title, from the cache or from one shared call.
+
+        Args:
+            title (str): The movie title or IMDb ID.
+            fetch (callable): Overrides the fetch function for this call.
+
+        Returns:
+            dict or None: The OMDb response, or None if the movie does not exist.
+
+        Raises:
+            requests.exceptions.RequestException: If OMDb cannot be reached, including
+                QuotaExceededError once the day's quota is used up.
+        """
+        fetch = fetch or self.fetch
+        return self.flight.do(normalize_title(title),
+                              lambda: self.cache.lookup(title, self._counted(fetch)))
+
+    def _counted(self, fetch):
+        if self.quota is None:
+            return fetch
+
+        def counted_fetch(title):
+            self.quota.acquire()
+            return fetch(title)
+        return counted_fetch
+
+    def lookup_many(self, titles):
+        """
+        Looks up several titles in parallel.
+
+        Args:
+            titles (iterable): Movie titles or IMDb IDs.
+
+        Returns:
+            dict: Maps each distinct title to its OMDb response, to None if the movie
+                does not exist, or to the RequestException its lookup raised.
+        """
+        titles = list(dict.fromkeys(titles))
+        return dict(zip(titles, self.executor.map(self._outcome, titles)))
+
+    def _outcome(self, title):
+        try:
+            return self.lookup(title)
+        except requests.exceptions.RequestException as e:
+            return e
+
+    async def lookup_async(self, title):
+        """
+        Coroutine version of ``lookup``, calling OMDb through ``async_fetch``.
+        """
+        key = normalize_title(title)
+        loop = asyncio.get_running_loop()
+        call = self._async_calls.get(key)
+        if call is not None and call.get_loop() is loop:
+            self._async_coalesced += 1
+            return await asyncio.shield(call)
+
+        call = self._async_calls[key] = loop.create_future()
+        try:
+            result = await self.cache.lookup_async(title, self._async_counted)
+        except asyncio.CancelledError:
+            call.cancel()
+            raise
+        except BaseException as e:
+            call.set_exception(e)
+            call.exception()  # Retrieved, in case no other caller was waiting
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            if self._async_calls.get(key) is call:
+                del self._async_calls[key]
+
+    async def _async_counted(self, title):
+        if self.quota is not None:
+            # Counting may write to the database, which is kept off the event loop
+            delay = await asyncio.to_thread(self.quota.reserve)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        return await self.async_fetch(title)
+
+    def stats(self):
+        """
+        Returns how many lookups were coalesced, and the quota's consumption.
+        """
+        stats = {"coalesced": self.flight.coalesced + self._async_coalesced}
+        if self.quota is not None:
+            stats.update({f"quota_{name}": value
+                          for name, value in self.quota.stats().items()})
+        return stats
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
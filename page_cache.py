@@ -0,0 +1,163 @@
+import asyncio
+import functools
+import hashlib
+import inspect
+import threading
+from datetime import datetime, timezone
+
+from flask import make_response, request
+from werkzeug.http import is_resource_modified
+
+from omdb.cache import MISS
+
+
+class PageCache:
+    """
+    Caches rendered pages, keyed on the versions of the data they show.
+
+    Each cached view names the scopes it depends on, such as 'catalogue' or
+    'user:{user_id}', and the data manager bumps a scope's version whenever a write
+    changes it. The ETag of a page is derived from those versions, so a browser or CDN
+    revalidating an unchanged page gets a 304 without the page being rendered, and a
+    stale copy is never served: it is simply no longer looked up.
+    """
+
+    def __init__(self, backend, versions, ttl=3600, salt='', enabled=True,
+                 async_versions=None):
+        """
+        Args:
+            backend (CacheBackend): Where rendered pages are stored, e.g. a MemoryCache,
+                or a TieredCache over a shared SQLiteCache.
+            versions (callable): Returns {scope: (version, updated_at)} for a list of
+                scopes, usually ``data_manager.get_cache_versions``.
+            ttl (float): Seconds a rendered page is kept.
+            salt (str): Mixed into every ETag; change it when templates change.
+            enabled (bool): When False, views are rendered on every request.
+            async_versions (callable): Coroutine function returning the same as
+                ``versions``, used by coroutine views.
+        """
+        self.backend = backend
+        self.versions = versions
+        self.async_versions = async_versions
+        self.ttl = ttl
+        self.salt = salt
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self._lock = threading.Lock()
+
+    def validators(self, scopes, versions=None):
+        """
+        Computes the ETag and Last-Modified date of the current request's page.
+
+        Args:
+            scopes (list): The scopes the page depends on.
+            versions (dict): Their versions, read through ``versions`` when omitted.
+
+        Returns:
+            tuple: (etag, last_modified), where last_modified is None until one of the
+                scopes has been written.
+        """
+        if versions is None:
+            versions = self.versions(scopes)
+        digest = hashlib.sha1(self.salt.encode('utf-8'))
+        digest.update(request.full_path.encode('utf-8'))
+        for scope in sorted(scopes):
+            version, _ = versions.get(scope, (0, None))
+            digest.update(f'\0{scope}={version}'.encode('utf-8'))
+
+        updated = [updated_at for _, updated_at in versions.values()]
+        last_modified = (datetime.fromtimestamp(max(updated), timezone.utc)
+                         if updated else None)
+        return digest.hexdigest()[:32], last_modified
+
+    def cached(self, *scopes):
+        """
+        Decorates a view whose page changes only when one of ``scopes`` is written.
+
+        Scopes are formatted with the view's arguments, e.g. 'user:{user_id}'. Only
+        successful responses are cached. Coroutine views read the scope versions
+        through ``async_versions``.
+        """
+        def decorator(view):
+            if inspect.iscoroutinefunction(view):
+                @functools.wraps(view)
+                async def async_wrapper(**kwargs):
+                    if not self.enabled:
+                        return await view(**kwargs)
+                    page_scopes = [scope.format(**kwargs) for scope in scopes]
+                    etag, last_modified = self.validators(
+                        page_scopes, await self.async_versions(page_scopes))
+                    # The backend's shared tier queries SQLite, so it is kept off the loop
+                    response = await asyncio.to_thread(self._lookup, etag, last_modified)
+                    if response is None:
+                        response = make_response(await view(**kwargs))
+                        await asyncio.to_thread(self._store, response, etag, last_modified)
+                    return response
+                return async_wrapper
+
+            @functools.wraps(view)
+            def wrapper(**kwargs):
+                if not self.enabled:
+                    return view(**kwargs)
+                etag, last_modified = self.validators(
+                    [scope.format(**kwargs) for scope in scopes])
+                response = self._lookup(etag, last_modified)
+                if response is None:
+                    response = make_response(view(**kwargs))
+                    self._store(response, etag, last_modified)
+                return response
+            return wrapper
+        return decorator
+
+    def _lookup(self, etag, last_modified):
+        """
+        Returns a 304 if the client's copy is current, the cached page if there is one,
+        or None when the page must be rendered.
+        """
+        if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+            with self._lock:
+                self.not_modified += 1
+            response = make_response('', 304)
+            return self._set_validators(response, etag, last_modified)
+
+        page = self.backend.get(f'page:{etag}')
+        if page is not MISS:
+            with self._lock:
+                self.hits += 1
+            response = make_response(page['body'])
+            response.mimetype = page['mimetype']
+            return self._set_validators(response, etag, last_modified)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _store(self, response, etag, last_modified):
+        if response.status_code == 200 and not response.direct_passthrough:
+            self.backend.set(f'page:{etag}', {'body': response.get_data(as_text=True),
+                                              'mimetype': response.mimetype}, self.ttl)
+            self._set_validators(response, etag, last_modified)
+
+    @staticmethod
+    def _set_validators(response, etag, last_modified):
+        response.set_etag(etag)
+        if last_modified is not None:
+            response.last_modified = last_modified
+        # Shared caches may store the page but must revalidate it on every request
+        response.cache_control.no_cache = True
+        return response
+
+    def stats(self):
+        """
+        Returns the hit, miss and 304 counters of the cache.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,255 @@
+import functools
+import inspect
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from flask import request
+from sqlalchemy import Column, Float, MetaData, String, Table, case, delete, select
+from werkzeug.exceptions import TooManyRequests
+
+from omdb.cache import upsert
+
+
+def client_address(**view_args):
+    """
+    Identifies the client of the current request by its address.
+    """
+    return request.remote_addr or 'unknown'
+
+
+class RateLimitStore(ABC):
+    """
+    Interface for where the token buckets of a rate limiter are kept.
+    """
+
+    @abstractmethod
+    def consume(self, key, rate, burst, cost=1):
+        """
+        Takes tokens from a bucket, refilled at ``rate`` tokens per second up to ``burst``.
+
+        Args:
+            key (str): The bucket.
+            rate (float): Tokens added per second.
+            burst (int): Most tokens the bucket holds; a new bucket is full.
+            cost (int): Tokens taken.
+
+        Returns:
+            float: 0 if the tokens were taken, otherwise the seconds until the bucket
+                   holds enough of them.
+        """
+        pass
+
+
+class MemoryRateLimitStore(RateLimitStore):
+    """
+    Buckets kept by this process, the least recently used dropped beyond ``max_keys``.
+    """
+
+    def __init__(self, max_keys=100_000, clock=time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, rate, burst, cost=1):
+        with self._lock:
+            now = self.clock()
+            tokens, updated_at = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated_at) * rate)
+            wait = 0.0
+            if tokens >= cost:
+                tokens -= cost
+            else:
+                wait = (cost - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+
+class DatabaseRateLimitStore(RateLimitStore):
+    """
+    Buckets kept in the ``rate_limits`` table of an SQLAlchemy engine, SQLite or
+    PostgreSQL, so every process using the database shares them.
+
+    A bucket is refilled and taken from by one upsert. Buckets that have refilled are
+    deleted every ``prune_interval`` calls: a missing bucket is a full one.
+    """
+
+    def __init__(self, engine, prune_interval=1000, clock=time.time,
+                 table_name='rate_limits'):
+        self.metadata = MetaData()
+        self.table = Table(
+            table_name, self.metadata,
+            Column('key', String, primary_key=True),
+            Column('tokens', Float, nullable=False),
+            Column('updated_at', Float, nullable=False),
+            Column('full_at', Float, nullable=False, index=True),
+        )
+        self.engine = engine
+        self.prune_interval = prune_interval
+        self.clock = clock
+        self._calls = 0
+        self._lock = threading.Lock()
+        self.metadata.create_all(engine)
+
+    def consume(self, key, rate, burst, cost=1):
+        now = self.clock()
+        table = self.table
+        accrued = table.c.tokens + (now - table.c.updated_at) * rate
+        refilled = case((accrued > burst, burst), else_=accrued)
+        statement = upsert(self.engine, table).values(
+            key=key, tokens=burst - cost, updated_at=now, full_at=now + cost / rate)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.key],
+            set_={'tokens': refilled - cost, 'updated_at': now,
+                  'full_at': now + (burst - refilled + cost) / rate},
+            where=refilled >= cost)
+        with self.engine.begin() as connection:
+            taken = connection.execute(statement.returning(table.c.key)).first() is not None
+            if not taken:
+                tokens = connection.execute(select(refilled).where(table.c.key == key)).scalar()
+        with self._lock:
+            self._calls += 1
+            prune = self._calls % self.prune_interval == 0
+        if prune:
+            self.prune()
+        return 0.0 if taken else (cost - (tokens or 0.0)) / rate
+
+    def prune(self):
+        """
+        Removes the buckets that have refilled.
+        """
+        with self.engine.begin() as connection:
+            connection.execute(delete(self.table).where(self.table.c.full_at <= self.clock()))
+
+
+class RateLimiter:
+    """
+    Limits how often each client may call a view, with token buckets in a store.
+
+    A client may send ``burst`` requests at once, then one request every 1 / ``rate``
+    seconds. Requests beyond that get a 429 Too Many Requests with a Retry-After header
+    saying when the client may try again, before the view does any work.
+    """
+
+    def __init__(self, store=None, limits=None, enabled=True):
+        """
+        Args:
+            store (RateLimitStore): Where the buckets are kept, e.g. a
+                MemoryRateLimitStore, or a DatabaseRateLimitStore shared by processes.
+                Defaults to a MemoryRateLimitStore.
+            limits (dict): {name: (per_minute, burst)}: the requests allowed per minute
+                once a burst of ``burst`` requests is spent. Views may be decorated
+                with a limit before it is set; a limit that is not set lets every
+                request through.
+            enabled (bool): When False, every request is let through.
+        """
+        self.store = store if store is not None else MemoryRateLimitStore()
+        self.limits = dict(limits or {})
+        self.enabled = enabled
+        self.limited = {}
+        self._lock = threading.Lock()
+
+    def check(self, name, key):
+        """
+        Counts a request against the ``name`` limit of a client.
+
+        Raises:
+            TooManyRequests: If the client is over the limit.
+        """
+        if not self.enabled or name not in self.limits:
+            return
+        per_minute, burst = self.limits[name]
+        wait = self.store.consume(f'{name}:{key}', per_minute / 60, burst)
+        if wait > 0:
+            with self._lock:
+                self.limited[name] = self.limited.get(name, 0) + 1
+            raise TooManyRequests(f"Too many requests, try again in {math.ceil(wait)} s.",
+                                  retry_after=math.ceil(wait))
+
+    def limit(self, name, key=client_address, methods=('POST',)):
+        """
+        Decorates a view, or a coroutine view, so its requests count against a limit.
+
+        Args:
+            name (str): The limit, shared by the views using the same name.
+            key (callable): Returns the client to limit from the view's arguments, by
+                default its address.
+            methods (tuple): The HTTP methods limited; others are let through.
+        """
+        def decorator(view):
+            def check(kwargs):
+                if request.method in methods:
+                    self.check(name, key(**kwargs))
+
+            if inspect.iscoroutinefunction(view):
+                @functools.wraps(view)
+                async def limited_async_view(*args, **kwargs):
+                    check(kwargs)
+                    return await view(*args, **kwargs)
+                return limited_async_view
+
+            @functools.wraps(view)
+            def limited_view(*args, **kwargs):
+                check(kwargs)
+                return view(*args, **kwargs)
+            return limited_view
+        return decorator
+
+    def stats(self):
+        """
+        Returns the number of requests refused by each limit.
+        """
+        with self._lock:
+            return dict(self.limited)
+
+
+class ConcurrencyLimiter:
+    """
+    Caps the requests of this process doing a slow kind of work at once.
+
+    A request over the cap is refused at once with a 429 and a Retry-After header,
+    rather than waiting for a slot while it holds a worker, so load beyond capacity
+    is shed before requests pile up and time out.
+    """
+
+    def __init__(self, max_concurrent, retry_after=5):
+        """
+        Args:
+            max_concurrent (int): Requests admitted at once, or None for no cap.
+            retry_after (int): Seconds refused clients are told to wait.
+        """
+        self.max_concurrent = max_concurrent
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.shed = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def admit(self):
+        """
+        Holds a slot while the block runs.
+
+        Raises:
+            TooManyRequests: If every slot is taken.
+        """
+        with self._lock:
+            if self.max_concurrent is not None and self.in_flight >= self.max_concurrent:
+                self.shed += 1
+                raise TooManyRequests("The server is busy, try again shortly.",
+                                      retry_after=self.retry_after)
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def stats(self):
+        with self._lock:
+            return {'in_flight': self.in_flight, 'shed': self.shed}
@@ -0,0 +1,305 @@
+import os
+import threading
+import time
+
+try:
+    import numpy as np
+except ImportError:  # Optional: without it there are no recommendations
+    np = None
+
+try:
+    from scipy import sparse
+except ImportError:  # Optional: only needed to build the index
+    sparse = None
+
+# Neighbour index file: magic, movie and neighbour counts, then the arrays movie_ids
+# (int64, sorted), indptr (int64, one more than the movies), neighbours (uint32
+# positions in movie_ids) and scores (float32). Movie i's neighbours are
+# neighbours[indptr[i]:indptr[i + 1]], best first.
+_MAGIC = b'MWRECS1\n'
+_HEADER = np.dtype([('magic', 'S8'), ('movies', '<u8'), ('edges', '<u8')]) if np else None
+
+
+def write_index(path, movie_ids, indptr, neighbours, scores):
+    """
+    Writes a neighbour index, replacing the file at ``path`` atomically.
+
+    Args:
+        path (str): The index file.
+        movie_ids (ndarray): The sorted IDs of the indexed movies.
+        indptr (ndarray): Where each movie's neighbours start, and where the last end.
+        neighbours (ndarray): The neighbours' positions in ``movie_ids``.
+        scores (ndarray): The neighbours' similarities.
+    """
+    header = np.array([(_MAGIC, len(movie_ids), len(neighbours))], dtype=_HEADER)
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as f:
+        for array in (header, np.asarray(movie_ids, '<i8'), np.asarray(indptr, '<i8'),
+                      np.asarray(neighbours, '<u4'), np.asarray(scores, '<f4')):
+            f.write(array.tobytes())
+    os.replace(temporary, path)
+
+
+class NeighbourIndex:
+    """
+    The similar movies of every indexed movie, memory-mapped from an index file.
+
+    Pages of the file are read on demand and shared by every process mapping it, so
+    loading costs nothing whatever the size of the index.
+    """
+
+    def __init__(self, path):
+        header = np.fromfile(path, dtype=_HEADER, count=1)
+        if len(header) != 1 or header['magic'][0] != _MAGIC:
+            raise ValueError(f"Not a neighbour index: {path}")
+        movies, edges = int(header['movies'][0]), int(header['edges'][0])
+        offset = _HEADER.itemsize
+        arrays = []
+        for dtype, count in (('<i8', movies), ('<i8', movies + 1), ('<u4', edges),
+                             ('<f4', edges)):
+            arrays.append(np.memmap(path, dtype=dtype, mode='r', offset=offset,
+                                    shape=(count,)) if count else np.empty(0, dtype))
+            offset += np.dtype(dtype).itemsize * count
+        self.movie_ids, self.indptr, self.neighbours, self.scores = arrays
+        self.mtime = os.stat(path).st_mtime
+
+    def __len__(self):
+        return len(self.movie_ids)
+
+    def get(self, movie_id):
+        """
+        Returns the IDs and similarities of a movie's neighbours, or None if the movie
+        is not indexed.
+        """
+        position = np.searchsorted(self.movie_ids, movie_id)
+        if position == len(self.movie_ids) or self.movie_ids[position] != movie_id:
+            return None
+        start, end = self.indptr[position], self.indptr[position + 1]
+        return self.movie_ids[self.neighbours[start:end]], self.scores[start:end]
+
+
+def _top(ids, scores, k):
+    """
+    Returns the ``k`` best (ids, scores), best first.
+    """
+    if len(scores) > k:
+        keep = np.argpartition(-scores, k - 1)[:k]
+        ids, scores = ids[keep], scores[keep]
+    order = np.lexsort((ids, -scores))
+    return ids[order], scores[order]
+
+
+class Recommender:
+    """
+    Recommends movies from those favorited by the users who favorited the same movies.
+
+    Movies are similar by the cosine of their columns in the users x movies favorites
+    matrix: the users they share over the geometric mean of their favorite counts.
+    ``build`` computes every movie's ``neighbours`` most similar movies offline, with
+    SciPy, into an index file memory-mapped by every app process. A user's
+    recommendations add up the similarities of the neighbours of their favorites,
+    without a query beyond reading those favorites.
+
+    When a favorite is added or removed, ``favorite_changed`` recomputes the movie's
+    neighbours from one query, and its similarity in the neighbours of the user's
+    other favorites. Those rows are stored through the data manager, and every process
+    reads the rows it has not seen before recommending, so all of them serve the same
+    neighbours. The next build includes and deletes them; other processes pick it up
+    within ``reload_interval`` seconds.
+    """
+
+    def __init__(self, data_manager, path, neighbours=50, reload_interval=30):
+        """
+        Args:
+            data_manager (DataManagerInterface): Where the favorites are read.
+            path (str): The index file.
+            neighbours (int): Similar movies kept per movie.
+            reload_interval (float): Seconds between checks for a newer index file.
+        """
+        self.data_manager = data_manager
+        self.path = path
+        self.neighbours = neighbours
+        self.reload_interval = reload_interval
+        self.index = None
+        self.updated = {}
+        # The ID of the last stored neighbour update read into ``updated``
+        self.updates_read = 0
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return np is not None
+
+    def load(self):
+        """
+        Maps the index file, if there is one, dropping the rows updated since the last.
+
+        The stored updates the build did not include are read again on top of it.
+        """
+        self._checked_at = time.monotonic()
+        try:
+            index = NeighbourIndex(self.path)
+        except FileNotFoundError:
+            return
+        with self._lock:
+            self.index, self.updated, self.updates_read = index, {}, 0
+
+    def read_updates(self):
+        """
+        Applies the neighbour rows other processes, or this one, stored since the last
+        read.
+        """
+        rows = self.data_manager.get_neighbour_updates(after=self.updates_read)
+        if not rows:
+            return
+        with self._lock:
+            for update_id, movie_id, neighbours, scores in rows:
+                self.updated[movie_id] = (np.frombuffer(neighbours, '<i8'),
+                                          np.frombuffer(scores, '<f4'))
+                self.updates_read = max(self.updates_read, update_id)
+
+    def _reload_if_changed(self):
+        if time.monotonic() - self._checked_at < self.reload_interval:
+            return
+        self._checked_at = time.monotonic()
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return
+        if self.index is None or mtime != self.index.mtime:
+            self.load()
+
+    def build(self, batch_size=10000):
+        """
+        Computes the neighbours of every movie from the favorites and writes the index.
+
+        Returns:
+            dict: The number of users, movies and neighbours indexed and the seconds taken.
+
+        Raises:
+            RuntimeError: If NumPy or SciPy is not installed.
+        """
+        if np is None or sparse is None:
+            raise RuntimeError("Building recommendations requires numpy and scipy")
+        start = time.perf_counter()
+        # Updates stored from here on may miss favorites the build reads, so they stay
+        updates = self.data_manager.get_neighbour_updates(after=0)
+        included = updates[-1][0] if updates else 0
+        users, movies = [], []
+        for rows in self.data_manager.iter_favorite_pairs(batch_size=batch_size):
+            pairs = np.array(rows, dtype=np.int64).reshape(-1, 2)
+            users.append(pairs[:, 0])
+            movies.append(pairs[:, 1])
+        users = np.concatenate(users) if users else np.empty(0, np.int64)
+        movies = np.concatenate(movies) if movies else np.empty(0, np.int64)
+
+        user_ids, user_rows = np.unique(users, return_inverse=True)
+        movie_ids, movie_columns = np.unique(movies, return_inverse=True)
+        favorites = sparse.csr_matrix(
+            (np.ones(len(users), np.float32), (user_rows, movie_columns)),
+            shape=(len(user_ids), len(movie_ids)))
+
+        # Users shared by each pair of movies, scaled to cosine similarities
+        shared = (favorites.T @ favorites).tocsr()
+        counts = shared.diagonal()
+        shared.setdiag(0)
+        shared.eliminate_zeros()
+        norms = np.sqrt(counts)
+        rows = np.repeat(np.arange(len(movie_ids)), np.diff(shared.indptr))
+        similarities = shared.data / (norms[rows] * norms[shared.indices])
+
+        indptr = np.zeros(len(movie_ids) + 1, np.int64)
+        neighbours, scores = [], []
+        for row in range(len(movie_ids)):
+            start_, end = shared.indptr[row], shared.indptr[row + 1]
+            columns, values = _top(shared.indices[start_:end], similarities[start_:end],
+                                   self.neighbours)
+            neighbours.append(columns)
+            scores.append(values)
+            indptr[row + 1] = indptr[row] + len(columns)
+        neighbours = np.concatenate(neighbours) if neighbours else np.empty(0, np.uint32)
+        scores = np.concatenate(scores) if scores else np.empty(0, np.float32)
+
+        write_index(self.path, movie_ids, indptr, neighbours, scores)
+        if included:
+            self.data_manager.clear_neighbour_updates(included)
+        self.load()
+        return {'users': len(user_ids), 'movies': len(movie_ids),
+                'neighbours': len(neighbours), 'seconds': time.perf_counter() - start}
+
+    def similar(self, movie_id):
+        """
+        Returns the IDs and similarities of a movie's neighbours, best first.
+        """
+        with self._lock:
+            row = self.updated.get(movie_id)
+            if row is None and self.index is not None:
+                row = self.index.get(movie_id)
+        if row is None:
+            return np.empty(0, np.int64), np.empty(0, np.float32)
+        return row
+
+    def recommend(self, user_id, limit=10):
+        """
+        Returns the IDs of the movies recommended to a user, best first.
+
+        Movies score the sum of their similarities to the user's favorites; the
+        favorites themselves are left out.
+        """
+        if np is None:
+            return []
+        self._reload_if_changed()
+        self.read_updates()
+        favorites = self.data_manager.get_favorite_movie_ids(user_id)
+        rows = [self.similar(movie_id) for movie_id in favorites]
+        if not rows:
+            return []
+        ids = np.concatenate([row[0] for row in rows])
+        scores = np.concatenate([row[1] for row in rows]).astype(np.float64)
+        candidates, positions = np.unique(ids, return_inverse=True)
+        totals = np.bincount(positions, weights=scores, minlength=len(candidates))
+        unseen = ~np.isin(candidates, favorites)
+        candidates, totals = _top(candidates[unseen], totals[unseen], limit)
+        return candidates.tolist()
+
+    def favorite_changed(self, user_id, movie_id):
+        """
+        Updates the neighbours of a movie after a user added it to or removed it from
+        their favorites.
+
+        The movie's row is recomputed. In the rows of the user's other favorites only
+        the movie's own similarity is updated: the neighbours it pushes out, or that
+        would take its place, are put right by the next build. The rows are stored for
+        every process to read.
+        """
+        if np is None:
+            return
+        self.read_updates()
+        count, others = self.data_manager.get_co_favorites(movie_id)
+        favorites = set(self.data_manager.get_favorite_movie_ids(user_id))
+        favorites.discard(movie_id)
+
+        if others:
+            other_ids = np.array([other for other, _, _ in others], np.int64)
+            similarity = np.array([shared / np.sqrt(count * other_count)
+                                   for _, shared, other_count in others], np.float32)
+        else:
+            other_ids, similarity = np.empty(0, np.int64), np.empty(0, np.float32)
+        changed = {movie_id: _top(other_ids, similarity, self.neighbours)}
+
+        updates = dict(zip(other_ids.tolist(), similarity.tolist()))
+        for other in favorites:
+            ids, scores = self.similar(other)
+            keep = ids != movie_id
+            ids, scores = ids[keep], scores[keep]
+            if other in updates:
+                ids = np.append(ids, np.int64(movie_id))
+                scores = np.append(scores, np.float32(updates[other]))
+            changed[other] = _top(ids, scores, self.neighbours)
+        self.data_manager.add_neighbour_updates(
+            [{'movie_id': int(movie), 'neighbours': np.asarray(ids, '<i8').tobytes(),
+              'scores': np.asarray(scores, '<f4').tobytes()}
+             for movie, (ids, scores) in changed.items()])
+        with self._lock:
+            self.updated.update(changed)
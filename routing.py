@@ -0,0 +1,50 @@
+from flask.cli import AppGroup
+
+
+class Routes:
+    """
+    Views, error handlers and CLI commands declared before the app exists, and added
+    to the app by ``init_app`` under the endpoints ``@app.route`` would give them.
+
+    Usage:
+        routes = Routes()
+
+        @routes.route('/users/<int:user_id>')
+        def user_movies(user_id):
+            ...
+
+        @routes.cli.command('rebuild-stats')
+        def rebuild_stats_command():
+            ...
+
+        def create_app():
+            app = Flask(__name__)
+            routes.init_app(app)
+            return app
+    """
+
+    def __init__(self):
+        self.rules = []
+        self.error_handlers = []
+        self.cli = AppGroup()
+
+    def route(self, rule, **options):
+        def decorator(view):
+            self.rules.append((rule, options, view))
+            return view
+        return decorator
+
+    def errorhandler(self, code):
+        def decorator(handler):
+            self.error_handlers.append((code, handler))
+            return handler
+        return decorator
+
+    def init_app(self, app):
+        for rule, options, view in self.rules:
+            options = dict(options)
+            app.add_url_rule(rule, options.pop('endpoint', None), view, **options)
+        for code, handler in self.error_handlers:
+            app.register_error_handler(code, handler)
+        for command in self.cli.commands.values():
+            app.cli.add_command(command)
@@ -1,3 +1,45 @@
 import sys
 import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
\ No newline at end of file
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from benchmarks.omdb_stub import start_stub, stop_stub
+
+STUB_MOVIES = {
+    "tt1375666": {"Title": "Inception", "Director": "Christopher Nolan", "Year": "2010",
+                  "imdbRating": "8.8", "imdbID": "tt1375666", "Response": "True"},
+    "tt0499549": {"Title": "Avatar", "Director": "James Cameron", "Year": "2009",
+                  "imdbRating": "7.9", "imdbID": "tt0499549", "Response": "True"},
+}
+
+
+@pytest.fixture
+def omdb_stub():
+    """
+    Runs a local stand-in for omdbapi.com and yields it.
+
+    ``requests`` records the query parameters of every request, ``failures`` is a list
+    of HTTP status codes returned by the next requests and ``delay`` slows responses.
+    """
+    server = start_stub(STUB_MOVIES)
+    yield server
+    stop_stub(server)
+
+
+@pytest.fixture(scope='session')
+def postgres_url(tmp_path_factory):
+    """
+    Yields the URL of a PostgreSQL server: TEST_DATABASE_URL if it is set, otherwise a
+    throwaway server run by the pgserver package. Tests using it are skipped when
+    neither is available.
+    """
+    url = os.environ.get('TEST_DATABASE_URL')
+    if url:
+        yield url
+        return
+    pytest.importorskip('psycopg')
+    pgserver = pytest.importorskip('pgserver')
+    server = pgserver.get_server(str(tmp_path_factory.mktemp('postgres')), cleanup_mode='stop')
+    yield server.get_uri()
+    server.cleanup()
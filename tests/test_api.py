@@ -0,0 +1,91 @@
+import gzip
+import json
+
+from flask import Flask
+import pytest
+
+from api import api_v1
+from datamanager import SQLiteDataManager
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = SQLiteDataManager(str(tmp_path / "api.sqlite"))
+    manager.add_users(["Ann", "Bob", "Cid"])
+    return manager
+
+
+@pytest.fixture
+def client(manager):
+    app = Flask(__name__)
+    app.config.from_object('config.TestingConfig')
+    manager.init_app(app)
+    app.register_blueprint(api_v1)
+    with app.test_client() as client:
+        yield client
+
+
+def test_users_are_paginated_with_next_links(client):
+    response = client.get('/api/v1/users?limit=2')
+    body = response.get_json()
+    assert body['data'] == [{"id": 1, "name": "Ann"}, {"id": 2, "name": "Bob"}]
+
+    body = client.get(body['links']['next']).get_json()
+    assert body['data'] == [{"id": 3, "name": "Cid"}]
+    assert body['next_cursor'] is None and body['links'] == {}
+
+
+def test_next_links_keep_url_arguments_over_query_arguments(client, manager):
+    for name in ("Inception", "Avatar"):
+        manager.add_movie(1, name, "Director", 2010, 8.0)
+
+    response = client.get('/api/v1/users/1/favorites?limit=1&user_id=5&_external=1')
+    assert response.status_code == 200
+    next_link = response.get_json()['links']['next']
+    assert next_link.startswith('/api/v1/users/1/favorites?')
+    assert 'user_id' not in next_link and '_external' not in next_link
+
+    body = client.get(next_link).get_json()
+    assert [movie['name'] for movie in body['data']] == ["Avatar"]
+
+
+def test_field_selection_and_validation(client, manager):
+    manager.add_movie(1, "Inception", "Christopher Nolan", 2010, 8.8)
+    body = client.get('/api/v1/users/1/favorites?fields=name,review_count').get_json()
+    assert body['data'] == [{"name": "Inception", "review_count": 0}]
+
+    response = client.get('/api/v1/movies?fields=name,password')
+    assert response.status_code == 400
+    assert response.get_json()['error']['message'] == "Unknown fields: password"
+    assert client.get('/api/v1/movies?limit=0').status_code == 400
+    assert client.get('/api/v1/movies?sort=id').status_code == 400
+    assert client.get('/api/v1/movies?after=garbage').status_code == 400
+    assert client.get('/api/v1/users/99/favorites').get_json()['error']['code'] == 404
+
+
+def test_catalogue_reviews_and_search(client, manager):
+    movie = manager.add_movie(1, "Inception", "Christopher Nolan", 2010, 8.8)
+    manager.add_review(2, movie.id, "Dreams within dreams")
+
+    movies = client.get('/api/v1/movies').get_json()['data']
+    assert movies == [{"id": movie.id, "name": "Inception", "director": "Christopher Nolan",
+                       "year": 2010, "rating": 8.8}]
+    reviews = client.get(f'/api/v1/movies/{movie.id}/reviews').get_json()['data']
+    assert reviews == [{"id": 1, "user_id": 2, "review_text": "Dreams within dreams"}]
+    assert client.get('/api/v1/movies/99/reviews').status_code == 404
+    found = client.get('/api/v1/search?q=dream&fields=id').get_json()['data']
+    assert found == [{"id": movie.id}]
+
+
+def test_large_responses_are_compressed(client, manager):
+    manager.add_users([f"User {i}" for i in range(100)])
+
+    response = client.get('/api/v1/users?limit=100', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert len(json.loads(gzip.decompress(response.data))['data']) == 100
+
+    response = client.get('/api/v1/users?limit=100')
+    assert 'Content-Encoding' not in response.headers
+    response = client.get('/api/v1/users?limit=1', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
@@ -1,12 +1,17 @@
 import sys
 import os
 
-from MovieWeb_App.MovieWeb_app import data_manager
-
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import sqlite3
+
 import pytest
-from MovieWeb_app import app
+from sqlalchemy import event
+
+import migrations
+import MovieWeb_app
+from MovieWeb_app import app, data_manager
+from datamanager import SQLiteDataManager
 
 
 @pytest.fixture
@@ -34,6 +39,34 @@ def test_user_movies(client):
     assert b"Favorite Movies" in response.data
 
 
+def test_request_uses_one_connection(client):
+    checkouts = []
+    listener = lambda *args: checkouts.append(args)
+    engine = MovieWeb_app.data_manager.engine
+    event.listen(engine, 'checkout', listener)
+    try:
+        response = client.get('/users/1')
+    finally:
+        event.remove(engine, 'checkout', listener)
+    assert response.status_code == 200
+    assert len(checkouts) == 1
+
+
+def test_unit_of_work_commits_once(tmp_path):
+    manager = SQLiteDataManager(str(tmp_path / "unit.sqlite"))
+    with pytest.raises(RuntimeError):
+        with manager.unit_of_work() as session:
+            manager.add_user("Ann", session=session)
+            raise RuntimeError("abort")
+    assert manager.get_all_users() == []
+
+    with manager.unit_of_work() as session:
+        manager.add_user("Ann", session=session)
+        manager.add_user("Bob", session=session)
+        assert len(manager.get_all_users(session=session)) == 2
+    assert [user.name for user in manager.get_all_users()] == ["Ann", "Bob"]
+
+
 def test_add_user(client):
     response = client.post('/add_user', data={'name': 'Test User'})
     assert response.status_code == 302  # Redirect after adding
@@ -66,3 +99,165 @@ def test_add_review(client):
 def test_delete_review(client):
     response = client.post('/users/1/delete_review/1')
     assert response.status_code == 302  # Redirect after deleting
+
+
+def test_all_movies(client):
+    response = client.get('/movies')
+    assert response.status_code == 200
+    assert b"All Users' Favorite Movies" in response.data
+
+
+def test_all_movies_rejects_invalid_sort(client):
+    response = client.get('/movies?sort=user_id')
+    assert response.status_code == 400
+
+
+def test_movie_catalogue_pages_are_distinct():
+    movies, next_cursor = data_manager.get_movie_catalogue(limit=1, sort='year', descending=True)
+    seen = [(m.name, m.director, m.year) for m in movies]
+    while next_cursor:
+        movies, next_cursor = data_manager.get_movie_catalogue(
+            limit=1, after=next_cursor, sort='year', descending=True)
+        seen.extend((m.name, m.director, m.year) for m in movies)
+    assert len(seen) == len(set(seen))
+    assert [year for _, _, year in seen] == sorted((year for _, _, year in seen), reverse=True)
+
+
+def test_add_movie_shares_catalogue_entry(tmp_path):
+    manager = SQLiteDataManager(str(tmp_path / "catalogue.sqlite"))
+    manager.add_user("Ann")
+    manager.add_user("Bob")
+    first = manager.add_movie(1, "Inception", "Christopher Nolan", 2010, 8.8, imdb_id="tt1375666")
+    second = manager.add_movie(2, "Inception", "Christopher Nolan", 2010, 8.8, imdb_id="tt1375666")
+    manager.add_movie(2, "Inception", "Christopher Nolan", 2010, 8.8, imdb_id="tt1375666")
+
+    assert first.id == second.id
+    assert [movie.id for movie in manager.get_user_movies(2)] == [first.id]
+    movies, _ = manager.get_movie_catalogue()
+    assert len(movies) == 1
+
+    manager.delete_movie(1, first.id)
+    assert manager.get_user_movies(1) == []
+    assert manager.find_movie("inception").id == first.id
+
+
+def test_migration_collapses_duplicate_movies(tmp_path):
+    db_file = tmp_path / "legacy.sqlite"
+    connection = sqlite3.connect(db_file)
+    connection.executescript("""
+        CREATE TABLE users (id INTEGER PRIMARY KEY, name VARCHAR NOT NULL);
+        CREATE TABLE movies (id INTEGER PRIMARY KEY, name VARCHAR NOT NULL, director VARCHAR,
+                             year INTEGER, rating INTEGER, user_id INTEGER REFERENCES users (id));
+        CREATE TABLE reviews (id INTEGER PRIMARY KEY, user_id INTEGER REFERENCES users (id),
+                              movie_id INTEGER REFERENCES movies (id), review_text VARCHAR NOT NULL);
+        INSERT INTO users VALUES (1, 'Ann'), (2, 'Bob');
+        INSERT INTO movies VALUES (1, 'Inception', 'Christopher Nolan', 2010, 8.8, 1),
+                                  (2, 'inception', 'Christopher Nolan', 2010, 8.8, 2),
+                                  (3, 'Avatar', 'James Cameron', 2009, 7.9, 2);
+        INSERT INTO reviews VALUES (1, 2, 2, 'Great');
+    """)
+    connection.commit()
+    connection.close()
+
+    assert migrations.upgrade(str(db_file))[0] == '0001_shared_catalogue'
+    assert migrations.upgrade(str(db_file)) == []
+
+    manager = SQLiteDataManager(str(db_file))
+    assert [movie.id for movie in manager.get_user_movies(2)] == [1, 3]
+    assert [review.id for review in manager.get_movie_reviews(1)] == [1]
+    movies, _ = manager.get_movie_catalogue()
+    assert [movie.name for movie in movies] == ['Avatar', 'Inception']
+
+    manager.delete_user(2)
+    assert manager.get_user_movies(2) == []
+    assert manager.get_movie_reviews(1) == []
+
+
+def test_user_movies_rejects_invalid_sort(client):
+    response = client.get('/users/1?sort=user_id')
+    assert response.status_code == 400
+
+
+def test_user_movie_pages_and_review_counts(tmp_path):
+    manager = SQLiteDataManager(str(tmp_path / "pages.sqlite"))
+    manager.add_user("Ann")
+    ids = [manager.add_movie(1, f"Movie {i}", "Director", 2000 + i % 3, i / 2).id
+           for i in range(5)]
+    for i in range(3):
+        manager.add_review(1, ids[0], f"Review {i}")
+
+    movies, cursor = manager.get_user_movie_page(1, limit=2)
+    assert [movie.id for movie in movies] == ids[:2]
+    assert movies[0].review_count == 3
+
+    seen = []
+    cursor = None
+    while True:
+        movies, cursor = manager.get_user_movie_page(1, limit=2, after=cursor,
+                                                     sort='year', descending=True)
+        seen.extend(movies)
+        if not cursor:
+            break
+    assert sorted(movie.id for movie in seen) == ids
+    assert [movie.year for movie in seen] == sorted((m.year for m in seen), reverse=True)
+
+    reviews, cursor = manager.get_review_page(ids[0], limit=2)
+    assert [review.review_text for review in reviews] == ["Review 0", "Review 1"]
+    reviews, cursor = manager.get_review_page(ids[0], limit=2, after=cursor)
+    assert [review.review_text for review in reviews] == ["Review 2"] and cursor is None
+
+
+def test_movie_reviews_endpoint(client):
+    response = client.get('/users/1/movies/4/reviews')
+    assert response.status_code == 200
+    assert 'reviews' in response.get_json()
+
+
+def test_search_ranks_prefix_matches_and_follows_reviews(tmp_path):
+    manager = SQLiteDataManager(str(tmp_path / "search.sqlite"))
+    manager.add_user("Ann")
+    inception = manager.add_movie(1, "Inception", "Christopher Nolan", 2010, 8.8).id
+    avatar = manager.add_movie(1, "Avatar", "James Cameron", 2009, 7.9).id
+    manager.add_movie(1, "Heat", "Michael Mann", 1995, 8.3)
+
+    movies, _ = manager.search("incep")
+    assert [movie.id for movie in movies] == [inception]
+
+    # A name match outranks a match in review text
+    manager.add_review(1, avatar, "The inception of a franchise")
+    movies, _ = manager.search("inception")
+    assert [movie.id for movie in movies] == [inception, avatar]
+
+    review_id = manager.get_movie_reviews(avatar)[0].id
+    manager.delete_review(review_id)
+    assert [movie.id for movie in manager.search("franchise")[0]] == []
+
+    # Every word must match, and FTS5 syntax in the input is taken literally
+    assert [movie.id for movie in manager.search("nolan inc")[0]] == [inception]
+    assert manager.search('"nolan" (*') == manager.search("nolan")
+    assert manager.search("  ") == ([], None)
+
+
+def test_search_pages_and_drops_deleted_movies(tmp_path):
+    manager = SQLiteDataManager(str(tmp_path / "search_pages.sqlite"))
+    manager.add_user("Ann")
+    ids = [manager.add_movie(1, f"Star Movie {i}", "Director", 2000, 7.0).id
+           for i in range(5)]
+
+    seen, cursor = [], None
+    while True:
+        movies, cursor = manager.search("star", limit=2, after=cursor)
+        seen.extend(movie.id for movie in movies)
+        if not cursor:
+            break
+    assert sorted(seen) == ids
+
+    manager.delete_movie(1, ids[0])
+    assert ids[0] not in [movie.id for movie in manager.search("star", limit=10)[0]]
+
+
+def test_search_route(client):
+    response = client.get('/search?q=a')
+    assert response.status_code == 200
+    assert b"Search Movies" in response.data
+    assert client.get('/search?q=a&after=garbage').status_code == 400
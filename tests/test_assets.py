@@ -0,0 +1,108 @@
+import gzip
+import os
+import shutil
+
+import pytest
+from flask import Flask, render_template_string
+
+import assets
+from assets import AssetBuilder, Assets, fingerprint, minify_css
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def static_dir(tmp_path):
+    """
+    A copy of static/ whose images are replaced by small generated ones.
+    """
+    Image = pytest.importorskip('PIL.Image')
+    static = tmp_path / 'static'
+    shutil.copytree(os.path.join(ROOT, 'static'), static,
+                    ignore=shutil.ignore_patterns('images', 'sass', 'dist'))
+    (static / 'assets' / 'images').mkdir()
+    Image.new('RGB', (1200, 600), 'red').save(static / 'assets' / 'images' / 'bg.jpg')
+    Image.new('RGBA', (64, 64)).save(static / 'assets' / 'images' / 'overlay.png')
+    return static
+
+
+@pytest.fixture
+def build(static_dir, tmp_path):
+    output = tmp_path / 'dist'
+    templates = os.path.join(ROOT, 'templates')
+    manifest = AssetBuilder(str(static_dir), str(output), template_dirs=[templates],
+                            image_widths=(300, 600)).build()
+    return output, manifest
+
+
+def test_minify_css_keeps_strings_and_licenses():
+    css = '/*! License */\n/* note */\na  >  b , c {\n  color : red ;\n  content: "a  ;  b" ;\n}\n'
+    assert minify_css(css) == '/*! License */a>b,c{color :red;content:"a  ;  b"}'
+
+
+def test_build_bundles_and_fingerprints(build):
+    output, manifest = build
+    files = manifest['files']
+    for name in ('app.css', 'app.js', 'noscript.css'):
+        data = (output / files[name]).read_bytes()
+        assert files[name] == fingerprint(name, data)
+        assert gzip.decompress((output / (files[name] + '.gz')).read_bytes()) == data
+
+    css = (output / files['app.css']).read_text()
+    assert css.startswith('@import url("https://fonts.googleapis.com')
+    assert '.fa-home:before' in css and '.fa-twitter:before' not in css
+    assert '.eot' not in css and '.svg' not in css and 'fa-brands' not in css
+    assert f'url("{files["assets/webfonts/fa-solid-900.woff"]}")' in css
+
+    js = (output / files['app.js']).read_text()
+    assert js.index('jQuery') < js.index('breakpoints') < js.index('#wrapper')
+
+
+def test_build_writes_image_variants_and_font_subsets(build, static_dir):
+    output, manifest = build
+    assert manifest['images']['assets/images/bg.jpg']['image/webp'] \
+        == [[300, manifest['files']['assets/images/bg-300.webp']],
+            [600, manifest['files']['assets/images/bg-600.webp']]]
+    assert manifest['images']['assets/images/bg.jpg']['image/jpeg'][-1] \
+        == [1200, manifest['files']['assets/images/bg.jpg']]
+
+    if assets.optional_module('fontTools.subset') is not None:
+        font = 'assets/webfonts/fa-solid-900.woff'
+        assert (output / manifest['files'][font]).stat().st_size \
+            < (static_dir / font).stat().st_size / 10
+
+
+def test_built_assets_are_served_precompressed_and_immutable(build):
+    output, manifest = build
+    app = Flask(__name__, static_folder=None)
+    app.add_url_rule('/static/<path:filename>', 'static', lambda filename: '')
+    Assets(str(output)).init_app(app)
+    css = manifest['files']['app.css']
+
+    with app.test_request_context():
+        assert render_template_string("{{ asset_urls('app.css')|join }}") == f"/assets/{css}"
+        assert render_template_string("{{ asset_srcset('assets/images/bg.jpg', 'image/webp') }}") \
+            .startswith(f"/assets/{manifest['files']['assets/images/bg-300.webp']} 300w, ")
+
+    with app.test_client() as client:
+        response = client.get(f'/assets/{css}', headers={'Accept-Encoding': 'gzip'})
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert response.headers['Content-Type'].startswith('text/css')
+        assert 'Accept-Encoding' in response.headers['Vary']
+        assert response.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+        assert gzip.decompress(response.data) == (output / css).read_bytes()
+
+        response = client.get(f'/assets/{css}')
+        assert 'Content-Encoding' not in response.headers
+        assert response.data == (output / css).read_bytes()
+        assert client.get('/assets/manifest.json').status_code == 404
+        assert client.get('/assets/../config.py').status_code == 404
+
+
+def test_without_a_build_the_sources_are_served(tmp_path):
+    app = Flask(__name__)
+    Assets(str(tmp_path / 'missing')).init_app(app)
+    with app.test_request_context():
+        assert render_template_string("{{ asset_urls('app.js')|length }}") == '5'
+        assert render_template_string("{{ asset_url('assets/images/bg.jpg') }}") \
+            == '/static/assets/images/bg.jpg'
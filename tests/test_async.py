@@ -0,0 +1,160 @@
+import asyncio
+
+import httpx
+import pytest
+import requests
+
+import MovieWeb_app
+from MovieWeb_app import app
+from asgi import AsyncApp
+from datamanager import SQLiteDataManager
+from datamanager.AsyncSQLiteDatamanager import AsyncSQLiteDataManager
+from omdb import AsyncOMDbClient, MemoryCache, OMDbCache
+
+
+def test_async_manager_runs_the_sync_queries(tmp_path):
+    db_file = str(tmp_path / "async.sqlite")
+    manager = AsyncSQLiteDataManager(db_file, serialize_writes=True)
+
+    async def scenario():
+        await manager.add_user("Ann")
+        movie = await manager.add_movie(1, "Inception", "Christopher Nolan", 2010, 8.8)
+        await asyncio.gather(*(manager.add_review(1, movie.id, f"Review {i}")
+                               for i in range(10)))
+        pages = await asyncio.gather(manager.get_user_movie_page(1),
+                                     manager.search("incep"),
+                                     manager.get_cache_versions(['users', 'user:1']))
+        await manager.dispose()
+        return pages
+
+    (favorites, _), (found, _), versions = asyncio.run(scenario())
+    assert favorites[0].review_count == 10
+    assert [movie.name for movie in found] == ["Inception"]
+    assert set(versions) == {'users', 'user:1'}
+    # Both managers see the same database
+    assert SQLiteDataManager(db_file).get_user(1).name == "Ann"
+
+
+def test_async_client_retries_and_raises_requests_errors(omdb_stub):
+    client = AsyncOMDbClient(omdb_stub.url, "test-key", timeout=2, max_retries=1,
+                             backoff_factor=0)
+
+    async def scenario():
+        omdb_stub.failures = [503]
+        movie = await client.get_movie("Inception")
+        omdb_stub.failures = [500, 500]
+        with pytest.raises(requests.exceptions.HTTPError):
+            await client.get_movie("Avatar")
+        missing = await client.get_movie("No Such Movie")
+        await client.aclose()
+        return movie, missing
+
+    movie, missing = asyncio.run(scenario())
+    assert movie['imdbID'] == "tt1375666"
+    assert missing is None
+    assert len(omdb_stub.requests) == 5
+    assert client.stats()['errors'] == 1
+
+
+def test_async_client_is_closed_with_its_event_loop(omdb_stub):
+    client = AsyncOMDbClient(omdb_stub.url, "test-key", timeout=2)
+
+    async def scenario():
+        await client.get_movie("Inception")
+        return client.client()
+
+    first = asyncio.run(scenario())
+    second = asyncio.run(scenario())
+    assert first is not second
+    assert first.is_closed and second.is_closed
+
+    async def closed_early():
+        await client.get_movie("Avatar")
+        http = client.client()
+        await client.aclose()
+        return http, client.client()
+
+    closed, reopened = asyncio.run(closed_early())
+    assert closed.is_closed and reopened is not closed and reopened.is_closed
+
+
+def add_user(name):
+    MovieWeb_app.data_manager.add_user(name)
+    return max(user.id for user in MovieWeb_app.data_manager.get_user_summaries()
+               if user.name == name)
+
+
+@pytest.fixture
+def asgi_client(omdb_stub, monkeypatch):
+    """
+    Yields a function sending requests to the app in async mode, through its ASGI entry.
+    """
+    async_manager = AsyncSQLiteDataManager(app.config['DATABASE'])
+    omdb_client = AsyncOMDbClient(omdb_stub.url, "test-key", timeout=2, backoff_factor=0)
+    monkeypatch.setattr(MovieWeb_app, 'async_data_manager', async_manager)
+    monkeypatch.setattr(MovieWeb_app, 'async_omdb_client', omdb_client)
+    monkeypatch.setattr(MovieWeb_app.omdb_lookup, 'cache', OMDbCache(MemoryCache()))
+    asgi_app = AsyncApp(app, MovieWeb_app.async_routes)
+
+    def send(*requests_):
+        async def scenario():
+            transport = httpx.ASGITransport(app=asgi_app)
+            async with httpx.AsyncClient(transport=transport,
+                                         base_url="http://localhost") as client:
+                responses = await asyncio.gather(*(client.request(method, url, **kwargs)
+                                                   for method, url, kwargs in requests_))
+            await omdb_client.aclose()
+            return responses
+        return asyncio.run(scenario())
+
+    yield send
+    asyncio.run(async_manager.dispose())
+
+
+def test_asgi_app_serves_async_and_wsgi_routes(asgi_client):
+    user_id = add_user("Async Tester")
+    home, users, movies, search, missing = asgi_client(
+        ('GET', '/', {}), ('GET', '/users', {}), ('GET', '/movies?sort=year&order=desc', {}),
+        ('GET', '/search?q=incep', {}), ('GET', '/users/999999', {}))
+
+    assert home.status_code == 200 and b"Welcome to MovieWeb App!" in home.content
+    assert users.status_code == 200 and b"Async Tester" in users.content
+    assert movies.status_code == 200 and search.status_code == 200
+    assert missing.status_code == 404
+
+    page, = asgi_client(('GET', f'/users/{user_id}', {}))
+    revalidated, = asgi_client(('GET', f'/users/{user_id}',
+                                {'headers': {'If-None-Match': page.headers['ETag']}}))
+    assert page.status_code == 200 and b"Favorite Movies" in page.content
+    assert revalidated.status_code == 304
+
+
+def test_async_add_movie_adds_a_favorite(asgi_client):
+    user_id = add_user("Async Adder")
+    added, bad_sort = asgi_client(
+        ('POST', f'/users/{user_id}/add_movie', {'data': {'title': "Avatar"}}),
+        ('GET', f'/users/{user_id}?sort=nope', {}))
+
+    assert added.status_code == 302
+    assert added.headers['Location'].endswith(f'/users/{user_id}')
+    assert bad_sort.status_code == 400
+    assert [movie.name for movie in MovieWeb_app.data_manager.get_user_movies(user_id)] \
+        == ["Avatar"]
+
+
+def test_async_add_movie_updates_the_recommender(asgi_client, tmp_path, monkeypatch):
+    pytest.importorskip('numpy')
+    from recommender import Recommender
+
+    recommender = Recommender(MovieWeb_app.data_manager, str(tmp_path / "recs.idx"))
+    monkeypatch.setattr(MovieWeb_app, 'recommender', recommender)
+    user_id = add_user("Async Recommended")
+    inception = MovieWeb_app.data_manager.add_movie(user_id, "Inception", "Christopher Nolan",
+                                                    2010, 8.8, imdb_id="tt1375666")
+
+    added, = asgi_client(('POST', f'/users/{user_id}/add_movie', {'data': {'title': "Avatar"}}))
+    assert added.status_code == 302
+    avatar, = [movie for movie in MovieWeb_app.data_manager.get_user_movies(user_id)
+               if movie.name == "Avatar"]
+    neighbours, _ = recommender.similar(avatar.id)
+    assert inception.id in neighbours.tolist()
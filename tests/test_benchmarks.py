@@ -0,0 +1,93 @@
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+import MovieWeb_app
+from benchmarks import (SCENARIOS, Workload, compare, generate_dataset, run_scenario,
+                        start_stub, stop_stub)
+from benchmarks.startup import measure_startup
+from bulk_import import BulkImporter
+from datamanager import SQLiteDataManager
+from omdb import MemoryCache, OMDbCache, OMDbClient
+from recommender import Recommender
+
+
+def test_generated_dataset_is_reproducible_and_skewed(tmp_path):
+    counts = generate_dataset(str(tmp_path / "a.sqlite"), users=50, movies=200,
+                              reviews=500, seed=7)
+    again = generate_dataset(str(tmp_path / "b.sqlite"), users=50, movies=200,
+                             reviews=500, seed=7)
+    assert counts == again
+    assert counts['users'] == 50 and counts['reviews'] == 500
+
+    connection = sqlite3.connect(tmp_path / "a.sqlite")
+    popular, rare = connection.execute(
+        "SELECT sum(movie_id <= 20), sum(movie_id > 180) FROM favorites").fetchone()
+    assert popular > 5 * rare
+    # Generated rows reach the search index through its triggers
+    assert connection.execute("SELECT count(*) FROM review_search").fetchone()[0] == 500
+
+
+@pytest.fixture
+def benchmark_app(tmp_path, monkeypatch):
+    """
+    Points the app at a small generated database and a synthesizing OMDb stand-in.
+    """
+    db_file = str(tmp_path / "bench.sqlite")
+    generate_dataset(db_file, users=30, movies=100, reviews=200, favorites_per_user=5)
+    manager = SQLiteDataManager(db_file)
+    stub = start_stub(synthesize=True)
+    cache = OMDbCache(MemoryCache())
+    monkeypatch.setattr(MovieWeb_app, 'data_manager', manager)
+    monkeypatch.setitem(MovieWeb_app.app.extensions, 'data_manager', manager)
+    monkeypatch.setattr(MovieWeb_app, 'omdb_client', OMDbClient(stub.url, 'key'))
+    monkeypatch.setattr(MovieWeb_app, 'omdb_cache', cache)
+    monkeypatch.setattr(MovieWeb_app.omdb_lookup, 'cache', cache)
+    monkeypatch.setattr(MovieWeb_app, 'bulk_importer',
+                        BulkImporter(manager, MovieWeb_app.lookup_movie_details))
+    monkeypatch.setattr(MovieWeb_app, 'recommender',
+                        Recommender(manager, str(tmp_path / "recs.idx")))
+    yield MovieWeb_app.app, Workload.from_database(db_file)
+    stop_stub(stub)
+
+
+def test_every_scenario_runs_without_errors(benchmark_app):
+    app, workload = benchmark_app
+    for scenario in SCENARIOS:
+        result = run_scenario(app, scenario, workload, iterations=2, concurrency=2)
+        assert result.errors == 0, result.first_error
+        assert result.count == 4
+        assert result.percentile(99) >= result.percentile(50) > 0
+
+
+def test_benchmark_command_runs_every_scenario_without_errors(tmp_path):
+    # The production settings, rate limits included, in a process of its own
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = tmp_path / "results.json"
+    run = subprocess.run([sys.executable, '-m', 'benchmarks', '--db', str(tmp_path / "cli.sqlite"),
+                          '--users', '50', '--movies', '200', '--reviews', '300',
+                          '--duration', '0.3', '--concurrency', '2', '--output', str(output)],
+                         cwd=root, capture_output=True, text=True, timeout=300)
+    assert run.returncode == 0, run.stdout + run.stderr
+    results = json.loads(output.read_text())
+    assert all(result['errors'] == 0 for result in results.values())
+
+
+def test_compare_flags_slower_scenarios():
+    baseline = {"users": {"p95_ms": 10.0, "requests_per_second": 100.0}}
+    assert compare({"users": {"p95_ms": 12.0, "requests_per_second": 90.0}}, baseline) == []
+    regressions = compare({"users": {"p95_ms": 20.0, "requests_per_second": 50.0}}, baseline)
+    assert len(regressions) == 2
+
+
+def test_startup_defers_the_database_and_optional_dependencies(tmp_path):
+    db_file = str(tmp_path / "startup.sqlite")
+    generate_dataset(db_file, users=5, movies=20, reviews=10, favorites_per_user=2)
+    result = measure_startup(db_file, runs=1)
+    assert result['status'] == 200
+    assert result['deferred_loaded'] == []
+    assert not result['database_opened_at_import']
@@ -0,0 +1,80 @@
+import io
+import json
+
+import pytest
+import requests
+
+import MovieWeb_app
+from bulk_import import BulkImporter, read_rows
+from datamanager import SQLiteDataManager
+from omdb import MemoryCache, OMDbCache, OMDbLookup
+from tests.conftest import STUB_MOVIES
+
+MOVIES_BY_KEY = {**STUB_MOVIES, **{movie['Title'].lower(): movie for movie in STUB_MOVIES.values()}}
+
+
+def stub_lookup(key):
+    if key == "Offline":
+        raise requests.exceptions.ConnectionError("OMDb is down")
+    return MOVIES_BY_KEY.get(key.lower())
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = SQLiteDataManager(str(tmp_path / "import.sqlite"))
+    manager.add_user("Ann")
+    return manager
+
+
+def test_import_users_from_csv(manager):
+    importer = BulkImporter(manager, stub_lookup, chunk_size=2)
+    report = importer.import_users(read_rows(io.StringIO("name\nBob\nCid\n\nDee\n"), 'csv'))
+    assert report.imported == 3
+    assert [user.name for user in manager.get_all_users()] == ["Ann", "Bob", "Cid", "Dee"]
+
+
+def test_import_favorites_reports_errors_and_duplicates(manager):
+    lines = [json.dumps({"title": "Inception"}), json.dumps({"imdb_id": "tt0499549"}),
+             json.dumps({"title": "inception"}), json.dumps({"title": "Unknown"}),
+             json.dumps({"title": "Offline"}), "not json", json.dumps({"year": 2010})]
+    importer = BulkImporter(manager, stub_lookup, max_workers=2, chunk_size=3)
+    report = importer.import_favorites(1, read_rows(io.StringIO("\n".join(lines)), 'jsonl'))
+
+    assert (report.rows, report.imported, report.skipped, report.error_count) == (7, 2, 1, 4)
+    assert sorted(error['line'] for error in report.errors) == [4, 5, 6, 7]
+    assert sorted(movie.name for movie in manager.get_user_movies(1)) == ["Avatar", "Inception"]
+
+    again = importer.import_favorites(1, read_rows(io.StringIO(lines[0]), 'jsonl'))
+    assert (again.imported, again.skipped) == (0, 1)
+
+
+def test_import_favorites_through_a_batch_lookup(manager):
+    lookup = OMDbLookup(OMDbCache(MemoryCache()), stub_lookup, max_concurrency=2)
+    importer = BulkImporter(manager, None, chunk_size=10, lookup_many=lookup.lookup_many)
+    lines = [json.dumps({"title": title})
+             for title in ("Inception", "Avatar", "Offline", "Unknown", "inception")]
+    report = importer.import_favorites(1, read_rows(io.StringIO("\n".join(lines)), 'jsonl'))
+
+    assert (report.imported, report.skipped, report.error_count) == (2, 1, 2)
+    assert [error['error'] for error in report.errors] == [
+        "Error accessing the OMDb API: OMDb is down", "Movie 'Unknown' not found in OMDb."]
+    lookup.shutdown()
+
+
+def test_import_route_accepts_csv_upload(manager, monkeypatch):
+    monkeypatch.setattr(MovieWeb_app, 'data_manager', manager)
+    monkeypatch.setattr(MovieWeb_app, 'bulk_importer', BulkImporter(manager, stub_lookup))
+    with MovieWeb_app.app.test_client() as client:
+        response = client.post('/users/1/import', data={
+            'file': (io.BytesIO(b"title\nInception\nAvatar\n"), 'favorites.csv')})
+    assert response.status_code == 200
+    assert response.get_json()['imported'] == 2
+
+
+def test_import_cli_command(manager, monkeypatch, tmp_path):
+    path = tmp_path / "users.jsonl"
+    path.write_text('{"name": "Bob"}\n{"name": ""}\n')
+    monkeypatch.setattr(MovieWeb_app, 'bulk_importer', BulkImporter(manager, stub_lookup))
+    result = MovieWeb_app.app.test_cli_runner().invoke(args=['import-users', str(path)])
+    assert "2 rows, 1 imported" in result.output
+    assert "line 2: Missing name" in result.output
@@ -0,0 +1,238 @@
+"""
+Behaviour every DataManagerInterface backend must share, run against SQLite and PostgreSQL.
+"""
+import time
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from datamanager import PostgresDataManager, SQLiteDataManager, create_data_manager
+from datamanager.PostgresDatamanager import postgres_url as psycopg_url
+
+
+@pytest.fixture(params=['sqlite', 'postgresql'])
+def manager(request, tmp_path):
+    if request.param == 'sqlite':
+        manager = create_data_manager(f"sqlite:///{tmp_path / 'contract.sqlite'}")
+        assert isinstance(manager, SQLiteDataManager)
+    else:
+        url = request.getfixturevalue('postgres_url')
+        engine = create_engine(psycopg_url(url))
+        with engine.begin() as connection:
+            connection.execute(text("DROP SCHEMA public CASCADE"))
+            connection.execute(text("CREATE SCHEMA public"))
+        engine.dispose()
+        manager = create_data_manager(url)
+        assert isinstance(manager, PostgresDataManager)
+    yield manager
+    manager.engine.dispose()
+
+
+def add_users(manager, *names):
+    manager.add_users(list(names))
+    ids = {user.name: user.id for user in manager.get_user_summaries()}
+    return [ids[name] for name in names]
+
+
+def test_users(manager):
+    ann, bob, cid = add_users(manager, "Ann", "Bob", "Cid")
+    manager.add_user("Dee")
+
+    assert [user.name for user in manager.get_all_users()] == ["Ann", "Bob", "Cid", "Dee"]
+    users, cursor = manager.get_users_page(limit=3)
+    assert [user.id for user in users] == [ann, bob, cid]
+    users, cursor = manager.get_users_page(limit=3, after=cursor)
+    assert [user.name for user in users] == ["Dee"] and cursor is None
+    assert manager.get_user(bob).name == "Bob"
+
+    manager.delete_user(bob)
+    assert manager.get_user(bob) is None
+
+
+def test_favorites_are_idempotent_and_share_the_catalogue(manager):
+    ann, bob = add_users(manager, "Ann", "Bob")
+    first = manager.add_movie(ann, "Inception", "Christopher Nolan", 2010, 8.8,
+                              imdb_id="tt1375666")
+    again = manager.add_movie(ann, "Inception", "Christopher Nolan", 2010, 8.8,
+                              imdb_id="tt1375666")
+    shared = manager.add_movie(bob, "Inception", "Christopher Nolan", 2010, 8.8)
+
+    assert first.id == again.id == shared.id
+    assert [movie.id for movie in manager.get_user_movies(ann)] == [first.id]
+    assert manager.find_movie(" inception ").id == first.id
+    assert len(manager.get_all_movies()) == 1
+
+    movies = [
+        {"name": "Inception", "director": "Christopher Nolan", "year": 2010, "rating": 8.8,
+         "imdb_id": "tt1375666"},
+        {"name": "Avatar", "director": "James Cameron", "year": 2009, "rating": 7.9,
+         "imdb_id": "tt0499549"},
+        {"name": "Heat", "director": "Michael Mann", "year": 1995, "rating": 8.3},
+        {"name": "Heat", "director": "Michael Mann", "year": 1995, "rating": 8.3},
+    ]
+    assert manager.add_favorites(ann, movies) == 2
+    assert manager.add_favorites(ann, movies) == 0
+    assert manager.add_favorites(bob, movies[1:]) == 2
+    assert [movie.name for movie in manager.get_user_movies(ann)] \
+        == ["Inception", "Avatar", "Heat"]
+    assert len(manager.get_all_movies()) == 3
+
+    manager.delete_movie(ann, first.id)
+    assert [movie.name for movie in manager.get_user_movies(ann)] == ["Avatar", "Heat"]
+
+
+def test_find_movie_prefers_the_imdb_id_and_ratings_stay_per_user(manager):
+    ann, bob = add_users(manager, "Ann", "Bob")
+    heat = manager.add_movie(ann, "Heat", "Michael Mann", 1995, 8.3, imdb_id="tt0113277",
+                             user_rating=9.5)
+    manager.add_movie(bob, "Heat", "Michael Mann", 1995, 8.3, imdb_id="tt0113277")
+
+    assert manager.find_movie("heat").id == heat.id
+    remake = manager.add_movie(bob, "Heat", "Ben Elton", 2028, 6.1, imdb_id="tt9999998")
+    # Two catalogue movies share the title: only the IMDb ID tells them apart
+    assert manager.find_movie("Heat") is None
+    assert manager.find_movie("Heat", imdb_id="tt9999998").id == remake.id
+    assert manager.find_movie("tt0113277", imdb_id="tt0113277").id == heat.id
+
+    movies, _ = manager.get_user_movie_page(ann)
+    assert [movie.user_rating for movie in movies] == [9.5]
+    movies, _ = manager.get_user_movie_page(bob)
+    assert [movie.user_rating for movie in movies] == [None, None]
+    manager.add_movie(bob, "Heat", "Michael Mann", 1995, 8.3, imdb_id="tt0113277",
+                      user_rating=7)
+    movies, _ = manager.get_user_movie_page(bob)
+    assert [movie.user_rating for movie in movies] == [7, None]
+
+
+def test_catalogue_and_user_pages(manager):
+    ann, bob = add_users(manager, "Ann", "Bob")
+    for i in range(5):
+        manager.add_movie(ann, f"Movie {i}", f"Director {i % 2}", 2000 + i, 5 + i / 2)
+    unlisted = manager.add_movie(bob, "Unlisted", "Nobody", 1990, 1.0)
+    manager.delete_movie(bob, unlisted.id)
+
+    seen, cursor = [], None
+    while True:
+        movies, cursor = manager.get_movie_catalogue(limit=2, after=cursor, sort='rating',
+                                                     descending=True)
+        seen.extend(movie.name for movie in movies)
+        if cursor is None:
+            break
+    assert seen == [f"Movie {i}" for i in reversed(range(5))]
+
+    movies, cursor = manager.get_movie_catalogue(limit=3, sort='director')
+    assert [movie.director for movie in movies] == ["Director 0"] * 3 and cursor
+
+    movies, _ = manager.get_user_movie_page(ann, limit=10, sort='year', descending=True)
+    assert [movie.year for movie in movies] == [2004, 2003, 2002, 2001, 2000]
+    with pytest.raises(ValueError):
+        manager.get_movie_catalogue(sort='user_id')
+
+
+def test_reviews(manager):
+    ann, bob = add_users(manager, "Ann", "Bob")
+    movie = manager.add_movie(ann, "Inception", "Christopher Nolan", 2010, 8.8)
+    reviews = [manager.add_review(user_id, movie.id, f"Review {i}")
+               for i, user_id in enumerate([ann, bob, ann])]
+
+    page, cursor = manager.get_review_page(movie.id, limit=2)
+    assert [review.review_text for review in page] == ["Review 0", "Review 1"]
+    page, cursor = manager.get_review_page(movie.id, limit=2, after=cursor)
+    assert [review.user_id for review in page] == [ann] and cursor is None
+    favorites, _ = manager.get_user_movie_page(ann)
+    assert favorites[0].review_count == 3
+
+    manager.delete_review(reviews[1].id)
+    assert len(manager.get_movie_reviews(movie.id)) == 2
+    manager.delete_user(ann)
+    assert manager.get_movie_reviews(movie.id) == []
+
+
+def test_search(manager):
+    ann, = add_users(manager, "Ann")
+    inception = manager.add_movie(ann, "Inception", "Christopher Nolan", 2010, 8.8)
+    heat = manager.add_movie(ann, "Heat", "Michael Mann", 1995, 8.3)
+    manager.add_movie(ann, "Avatar", "James Cameron", 2009, 7.9)
+    manager.add_review(ann, heat.id, "Better than inception, honestly")
+
+    found, _ = manager.search("incep")
+    assert [movie.id for movie in found] == [inception.id, heat.id]
+    found, _ = manager.search("nolan inc")
+    assert [movie.id for movie in found] == [inception.id]
+    found, cursor = manager.search("inc", limit=1)
+    assert [movie.id for movie in found] == [inception.id]
+    found, cursor = manager.search("inc", limit=1, after=cursor)
+    assert [movie.id for movie in found] == [heat.id] and cursor is None
+    assert manager.search("  ") == ([], None)
+
+
+def test_enrichment_jobs(manager):
+    ann, bob = add_users(manager, "Ann", "Bob")
+    existing = manager.add_movie(ann, "Inception", "Christopher Nolan", 2010, 8.8,
+                                 imdb_id="tt1375666")
+    job = manager.add_movie_placeholder(bob, "inception")
+    manager.add_review(bob, job.movie_id, "Great")
+    assert [job.id for job in manager.get_pending_enrichment_jobs()] == [job.id]
+    assert manager.start_enrichment_job(job.id) == 1
+    # A running job is claimed once, and only offered again once its lease expired
+    assert manager.start_enrichment_job(job.id) is None
+    assert manager.get_pending_enrichment_jobs() == []
+    time.sleep(0.01)
+    assert [job.id for job in manager.get_pending_enrichment_jobs(lease_timeout=0)] \
+        == [job.id]
+    assert manager.start_enrichment_job(job.id, lease_timeout=0) == 2
+
+    manager.complete_enrichment_job(job.id, "Inception", "Christopher Nolan", 2010, 8.8,
+                                    imdb_id="tt1375666")
+    assert [movie.id for movie in manager.get_user_movies(bob)] == [existing.id]
+    assert len(manager.get_movie_reviews(existing.id)) == 1
+    assert manager.get_pending_enrichment_jobs() == []
+
+    failed = manager.add_movie_placeholder(bob, "No Such Movie")
+    manager.fail_enrichment_job(failed.id, "Not found")
+    assert manager.get_movie(failed.movie_id).status == 'failed'
+
+
+def test_statistics(manager):
+    ann, bob = add_users(manager, "Ann", "Bob")
+    inception = manager.add_movie(ann, "Inception", "Christopher Nolan", 2010, 8.8)
+    manager.add_movie(bob, "Inception", "Christopher Nolan", 2010, 8.8)
+    manager.add_favorites(bob, [{"name": "Tenet", "director": "Christopher Nolan",
+                                 "year": 2020, "rating": 7.4, "imdb_id": "tt6723592"}])
+    manager.add_review(bob, inception.id, "Great")
+
+    def snapshot():
+        return (manager.get_most_favorited_movies(), manager.get_most_active_reviewers(),
+                manager.get_top_directors(), manager.get_year_stats())
+
+    movies, reviewers, directors, years = before = snapshot()
+    assert [(movie.name, movie.favorite_count) for movie in movies] \
+        == [("Inception", 2), ("Tenet", 1)]
+    assert [(user.name, user.review_count, user.favorite_count) for user in reviewers] \
+        == [("Bob", 1, 2)]
+    assert [(row.director, row.movie_count) for row in directors] \
+        == [("Christopher Nolan", 2)]
+    assert round(directors[0].average_rating, 2) == 8.1
+    assert [row.year for row in years] == [2020, 2010]
+
+    manager.rebuild_stats()
+    assert snapshot() == before
+
+
+def test_cache_versions_follow_writes(manager):
+    ann, = add_users(manager, "Ann")
+    scopes = ['users', 'catalogue', f'user:{ann}']
+    before = manager.get_cache_versions(scopes)
+    movie = manager.add_movie(ann, "Inception", "Christopher Nolan", 2010, 8.8)
+    after = manager.get_cache_versions(scopes)
+    assert after['users'] == before['users']
+    assert after['catalogue'][0] == before.get('catalogue', (0, None))[0] + 1
+    assert after[f'user:{ann}'][0] == before.get(f'user:{ann}', (0, None))[0] + 1
+
+    # A review bumps the movie, which Ann's page follows through her favorites
+    user_movies = f'user_movies:{ann}'
+    favorites = manager.get_cache_versions([user_movies]).get(user_movies, (0, None))
+    manager.add_review(ann, movie.id, "Great")
+    reviewed = manager.get_cache_versions(scopes + [user_movies])
+    assert reviewed[f'user:{ann}'] == after[f'user:{ann}']
+    assert reviewed[user_movies][0] == favorites[0] + 1
@@ -0,0 +1,158 @@
+import time
+
+import pytest
+import requests
+
+import MovieWeb_app
+from datamanager import SQLiteDataManager
+from enrichment import EnrichmentQueue
+from recommender import Recommender
+from tests.conftest import STUB_MOVIES
+
+INCEPTION = STUB_MOVIES["tt1375666"]
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = SQLiteDataManager(str(tmp_path / "enrichment.sqlite"))
+    manager.add_user("Ann")
+    manager.add_user("Bob")
+    return manager
+
+
+def run_job(manager, lookup, job, **kwargs):
+    queue = EnrichmentQueue(manager, lookup, max_workers=1, **kwargs)
+    queue.enqueue(job.id, job.title).result(timeout=5)
+    queue.shutdown()
+
+
+def test_placeholder_is_filled_in(manager):
+    job = manager.add_movie_placeholder(1, "inception")
+    movie = manager.get_user_movies(1)[0]
+    assert movie.status == 'pending'
+
+    run_job(manager, lambda title: INCEPTION, job)
+
+    movie = manager.get_user_movies(1)[0]
+    assert (movie.name, movie.director, movie.year, movie.status) == \
+        ("Inception", "Christopher Nolan", 2010, 'ready')
+    assert manager.get_pending_enrichment_jobs() == []
+
+
+def test_placeholder_is_merged_into_existing_movie(manager):
+    existing = manager.add_movie(2, "Inception", "Christopher Nolan", 2010, 8.8,
+                                 imdb_id="tt1375666")
+    job = manager.add_movie_placeholder(1, "Inception")
+
+    run_job(manager, lambda title: INCEPTION, job)
+
+    assert [movie.id for movie in manager.get_user_movies(1)] == [existing.id]
+    assert len(manager.get_all_movies()) == 1
+
+
+def test_resolved_favorites_are_reported_under_the_catalogue_movie(manager):
+    existing = manager.add_movie(2, "Inception", "Christopher Nolan", 2010, 8.8,
+                                 imdb_id="tt1375666")
+    merged = manager.add_movie_placeholder(1, "Inception")
+    filled = manager.add_movie_placeholder(1, "Avatar")
+    resolved = []
+
+    run_job(manager, lambda title: INCEPTION, merged,
+            on_resolved=lambda *favorite: resolved.append(favorite))
+    run_job(manager, lambda title: STUB_MOVIES["tt0499549"], filled,
+            on_resolved=lambda *favorite: resolved.append(favorite))
+
+    assert resolved == [(1, existing.id), (1, filled.movie_id)]
+
+
+def test_unknown_title_fails(manager):
+    job = manager.add_movie_placeholder(1, "No Such Movie")
+    run_job(manager, lambda title: None, job)
+    assert manager.get_user_movies(1)[0].status == 'failed'
+
+
+def test_errors_are_retried_until_attempts_run_out(manager):
+    calls = []
+
+    def lookup(title):
+        calls.append(title)
+        raise requests.exceptions.ConnectionError("OMDb is down")
+
+    job = manager.add_movie_placeholder(1, "Inception")
+    queue = EnrichmentQueue(manager, lookup, max_workers=1, max_attempts=2, retry_delay=0)
+    queue.enqueue(job.id, job.title).result(timeout=5)
+    for _ in range(50):
+        if manager.get_user_movies(1)[0].status == 'failed':
+            break
+        time.sleep(0.05)
+    queue.shutdown()
+    assert len(calls) == 2
+    assert manager.get_user_movies(1)[0].status == 'failed'
+
+
+def test_unfinished_jobs_resume_after_restart(manager):
+    manager.add_movie_placeholder(1, "Inception")
+    queue = EnrichmentQueue(manager, lambda title: INCEPTION, max_workers=1)
+    assert queue.resume() == 1
+    queue.shutdown()
+    assert manager.get_user_movies(1)[0].status == 'ready'
+
+
+def test_workers_of_several_processes_run_a_job_once(manager):
+    job = manager.add_movie_placeholder(1, "Inception")
+    lookups = []
+
+    def lookup(title):
+        lookups.append(title)
+        return INCEPTION
+
+    queues = [EnrichmentQueue(manager, lookup, max_workers=2) for _ in range(4)]
+    # Each process resumes the job it found unfinished at start
+    for queue in queues:
+        queue.enqueue(job.id, job.title)
+    for queue in queues:
+        queue.shutdown()
+    assert lookups == ["Inception"]
+    assert manager.get_user_movies(1)[0].status == 'ready'
+
+
+def test_add_movie_route_in_async_mode(manager, monkeypatch):
+    queue = EnrichmentQueue(manager, lambda title: INCEPTION, max_workers=1)
+    monkeypatch.setattr(MovieWeb_app, 'data_manager', manager)
+    monkeypatch.setattr(MovieWeb_app, 'enrichment_queue', queue)
+    monkeypatch.setitem(MovieWeb_app.app.config, 'OMDB_ASYNC_ENRICHMENT', True)
+
+    with MovieWeb_app.app.test_client() as client:
+        response = client.post('/users/1/add_movie', data={'title': 'Inception'})
+        assert response.status_code == 302
+        queue.shutdown()
+        response = client.get('/users/1')
+    assert b"Christopher Nolan" in response.data
+
+
+def test_add_movie_route_stores_the_users_rating(manager, monkeypatch, tmp_path):
+    queue = EnrichmentQueue(manager, lambda title: INCEPTION, max_workers=1)
+    monkeypatch.setattr(MovieWeb_app, 'data_manager', manager)
+    monkeypatch.setattr(MovieWeb_app, 'recommender',
+                        Recommender(manager, str(tmp_path / "recs.idx")))
+    monkeypatch.setattr(MovieWeb_app, 'enrichment_queue', queue)
+    monkeypatch.setitem(MovieWeb_app.app.config, 'OMDB_ASYNC_ENRICHMENT', True)
+
+    with MovieWeb_app.app.test_client() as client:
+        response = client.post('/users/1/add_movie',
+                               data={'title': 'Inception', 'user_rating': '11'})
+        assert response.status_code == 200
+        assert manager.get_user_movies(1) == []
+
+        response = client.post('/users/1/add_movie',
+                               data={'title': 'Inception', 'user_rating': '9.5'})
+        assert response.status_code == 302
+        queue.shutdown()
+        # Found in the catalogue by its IMDb ID this time
+        response = client.post('/users/2/add_movie',
+                               data={'title': INCEPTION['imdbID'], 'user_rating': '7'})
+        assert response.status_code == 302
+
+    assert [movie.user_rating for movie in manager.get_user_movie_page(1)[0]] == [9.5]
+    assert [movie.user_rating for movie in manager.get_user_movie_page(2)[0]] == [7]
+    assert len(manager.get_all_movies()) == 1
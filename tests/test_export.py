@@ -0,0 +1,66 @@
+import csv
+import io
+import json
+
+import pytest
+
+import MovieWeb_app
+from datamanager import SQLiteDataManager
+from datamanager.projections import ExportedFavorite, ExportedMovie, field_names
+from export import export_rows
+
+
+@pytest.fixture
+def manager(tmp_path):
+    """
+    A data manager where Ann likes Inception, which she reviewed, and Bob likes Avatar.
+    """
+    manager = SQLiteDataManager(str(tmp_path / "export.sqlite"))
+    manager.add_users(["Ann", "Bob"])
+    inception = manager.add_movie(1, "Inception", "Christopher Nolan", 2010, 8.8,
+                                  imdb_id="tt1375666")
+    manager.add_movie(2, "Avatar", "James Cameron", 2009, 7.9, imdb_id="tt0499549")
+    manager.add_review(1, inception.id, 'Dreams, "within" dreams')
+    return manager
+
+
+def test_exports_stream_one_chunk_per_batch(manager):
+    chunks = list(export_rows(ExportedMovie, manager.export_movies(batch_size=1), 'csv'))
+    assert len(chunks) == 2
+    rows = list(csv.reader(io.StringIO(b''.join(chunks).decode())))
+    assert rows[0] == list(field_names(ExportedMovie))
+    assert rows[1] == ['1', 'tt1375666', 'Inception', 'Christopher Nolan', '2010', '8.8',
+                      'ready', '1', '1']
+
+    lines = b''.join(export_rows(ExportedFavorite, manager.export_favorites(2), 'ndjson'))
+    assert [json.loads(line)['name'] for line in lines.splitlines()] == ["Avatar"]
+    assert list(export_rows(ExportedFavorite, manager.export_favorites(3), 'ndjson')) == []
+
+
+def test_parquet_export(manager):
+    parquet = pytest.importorskip('pyarrow.parquet')
+    data = b''.join(export_rows(ExportedMovie, manager.export_movies(batch_size=1), 'parquet'))
+    table = parquet.read_table(io.BytesIO(data))
+    assert table.column('name').to_pylist() == ["Inception", "Avatar"]
+    assert str(table.schema.field('rating').type) == 'double'
+    assert parquet.ParquetFile(io.BytesIO(data)).num_row_groups == 2
+
+
+def test_export_routes(manager, monkeypatch):
+    monkeypatch.setattr(MovieWeb_app, 'data_manager', manager)
+    with MovieWeb_app.app.test_client() as client:
+        response = client.get('/users/1/export?data=reviews&format=ndjson')
+        assert response.status_code == 200
+        assert response.is_streamed
+        assert response.headers['Content-Disposition'] \
+            == 'attachment; filename="user-1-reviews.ndjson"'
+        assert json.loads(response.data)['review_text'] == 'Dreams, "within" dreams'
+        assert client.get('/users/9/export').status_code == 404
+        assert client.get('/users/1/export?format=xml').status_code == 400
+
+        monkeypatch.setitem(MovieWeb_app.app.config, 'EXPORT_TOKEN', None)
+        assert client.get('/movies/export').status_code == 404
+        monkeypatch.setitem(MovieWeb_app.app.config, 'EXPORT_TOKEN', 'secret')
+        assert client.get('/movies/export').status_code == 403
+        response = client.get('/movies/export', headers={'Authorization': 'Bearer secret'})
+        assert response.data.decode().splitlines()[2].startswith('2,tt0499549,Avatar')
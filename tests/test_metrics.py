@@ -0,0 +1,127 @@
+import json
+import logging
+import os
+import subprocess
+import sys
+
+from flask import Flask
+import pytest
+
+import MovieWeb_app
+from datamanager import SQLiteDataManager
+from metrics import Metrics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def instrumented(tmp_path):
+    """
+    Builds an instrumented app with one route listing users. Returns (app, metrics).
+    """
+    manager = SQLiteDataManager(str(tmp_path / "metrics.sqlite"))
+    manager.add_users(["Ann", "Bob"])
+    app = Flask(__name__)
+    metrics = Metrics(prefix='test')
+    metrics.instrument_engine(manager.engine)
+    metrics.instrument_app(app, slow_request_seconds=0, max_logged_queries=1)
+    manager.init_app(app)
+
+    @app.route('/users')
+    def users():
+        manager.get_user_summaries()
+        manager.get_user(1)
+        return "ok"
+
+    return app, metrics
+
+
+def test_requests_are_timed_and_their_queries_counted(instrumented, caplog):
+    app, metrics = instrumented
+    with caplog.at_level(logging.WARNING, logger='movieweb.slow_requests'):
+        app.test_client().get('/users?page=1')
+        app.test_client().get('/missing')
+
+    output = metrics.render()
+    assert 'test_http_requests_total{endpoint="users",method="GET",status="200"} 1' in output
+    assert 'test_http_requests_total{endpoint="unmatched",method="GET",status="404"} 1' in output
+    assert 'test_http_request_duration_seconds_count{endpoint="users"} 1' in output
+    assert 'test_http_request_queries_bucket{endpoint="users",le="1.0"} 0' in output
+    assert 'test_http_request_queries_bucket{endpoint="users",le="2.0"} 1' in output
+    assert '# TYPE test_http_request_duration_seconds histogram' in output
+
+    # Every request is slow with a threshold of 0; only the slowest statement is listed
+    record = caplog.records[0]
+    assert "GET /users?page=1" in record.getMessage()
+    assert "ran 2 SQL statements" in record.getMessage()
+    assert record.getMessage().count("SELECT") == 1
+
+
+def test_registered_collectors_are_rendered():
+    metrics = Metrics(prefix='test')
+    metrics.register('queue_length', 'gauge', 'Jobs waiting.', lambda: 3)
+    metrics.register('lookups_total', 'counter', 'Lookups.',
+                     lambda: [('', {'cache': 'a"b'}, 1), ('', {'cache': 'c'}, None)])
+    output = metrics.render()
+    assert 'test_queue_length 3\n' in output
+    assert 'test_lookups_total{cache="a\\"b"} 1\n' in output
+    assert 'test_lookups_total{cache="c"} NaN\n' in output
+
+
+def test_metrics_endpoint(monkeypatch):
+    with MovieWeb_app.app.test_client() as client:
+        client.get('/movies')
+        response = client.get('/metrics')
+        assert response.status_code == 200
+        assert response.mimetype == 'text/plain'
+        body = response.get_data(as_text=True)
+        assert 'movieweb_http_requests_total{endpoint="get_all_movies"' in body
+        assert '# TYPE movieweb_omdb_request_duration_seconds summary' in body
+        assert 'movieweb_cache_hit_ratio{cache="page"}' in body
+
+        monkeypatch.setitem(MovieWeb_app.app.config, 'METRICS_TOKEN', 'secret')
+        assert client.get('/metrics').status_code == 403
+        response = client.get('/metrics', headers={'Authorization': 'Bearer secret'})
+        assert response.status_code == 200
+
+        monkeypatch.setitem(MovieWeb_app.app.config, 'METRICS_ENABLED', False)
+        assert client.get('/metrics').status_code == 404
+
+
+# Runs in a fresh interpreter, so the app is created with the settings of the environment
+_SCRAPE = """
+import json, sys
+import MovieWeb_app
+from lazy import is_built
+app = MovieWeb_app.create_app()
+with app.test_client() as client:
+    response = client.get('/metrics', headers=json.loads(sys.argv[1]))
+print(json.dumps({'status': response.status_code, 'body': response.get_data(as_text=True),
+                  'built': [name for name in ('data_manager', 'omdb_client', 'omdb_cache',
+                                              'omdb_lookup')
+                            if is_built(getattr(MovieWeb_app, name))]}))
+"""
+
+
+def scrape(tmp_path, token=None, headers=None):
+    env = dict(os.environ, APP_SETTINGS='config.ProductionConfig',
+               MOVIEWEB_DATABASE=str(tmp_path / "scrape.sqlite"))
+    env.pop('MOVIEWEB_METRICS_TOKEN', None)
+    if token:
+        env['MOVIEWEB_METRICS_TOKEN'] = token
+    child = subprocess.run([sys.executable, '-c', _SCRAPE, json.dumps(headers or {})],
+                           cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return json.loads(child.stdout.splitlines()[-1])
+
+
+def test_production_serves_metrics_only_to_token_holders(tmp_path):
+    assert scrape(tmp_path)['status'] == 404
+    assert scrape(tmp_path, token='secret')['status'] == 403
+
+    result = scrape(tmp_path, token='secret', headers={'Authorization': 'Bearer secret'})
+    assert result['status'] == 200
+    # A scrape reports the services built so far, and builds none
+    assert result['built'] == []
+    assert 'movieweb_omdb_request_duration_seconds_count' not in result['body']
+    assert 'movieweb_cache_hit_ratio{cache="omdb"}' not in result['body']
+    assert 'movieweb_cache_hit_ratio{cache="page"}' in result['body']
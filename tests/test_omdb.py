@@ -0,0 +1,194 @@
+import asyncio
+import threading
+
+import pytest
+import requests
+from sqlalchemy import create_engine
+
+import MovieWeb_app
+from omdb.cache import MISS
+from omdb import (AsyncOMDbClient, CircuitBreaker, CircuitOpenError, DailyQuota, MemoryCache,
+                  OMDbCache, OMDbClient, OMDbLookup, QuotaExceededError, SQLiteCache,
+                  TieredCache, normalize_title)
+
+
+@pytest.fixture
+def stub_cache(omdb_stub, tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'cache.sqlite'}")
+    cache = OMDbCache(TieredCache(MemoryCache(16), SQLiteCache(engine)), ttl=60, negative_ttl=60)
+    client = OMDbClient(omdb_stub.url, "test-key", timeout=2, backoff_factor=0)
+    monkeypatch.setattr(MovieWeb_app, 'omdb_client', client)
+    monkeypatch.setattr(MovieWeb_app, 'omdb_cache', cache)
+    monkeypatch.setattr(MovieWeb_app.omdb_lookup, 'cache', cache)
+    yield cache
+    client.close()
+    engine.dispose()
+
+
+def test_normalize_title():
+    assert normalize_title("  The   Matrix ") == normalize_title("the matrix") == "title:the matrix"
+    assert normalize_title("TT0133093") == "imdb:tt0133093"
+
+
+def test_fetch_is_served_from_cache(omdb_stub, stub_cache):
+    assert MovieWeb_app.fetch_movie_details("Inception")['imdbID'] == "tt1375666"
+    assert MovieWeb_app.fetch_movie_details(" inception ")['Title'] == "Inception"
+    assert MovieWeb_app.fetch_movie_details("tt1375666")['Title'] == "Inception"
+    assert len(omdb_stub.requests) == 1
+    assert stub_cache.stats()['hits'] == 2
+
+
+def test_not_found_is_cached(omdb_stub, stub_cache):
+    assert MovieWeb_app.fetch_movie_details("No Such Movie") is None
+    assert MovieWeb_app.fetch_movie_details("no such movie") is None
+    assert len(omdb_stub.requests) == 1
+    assert stub_cache.stats()['negative_hits'] == 1
+
+
+def test_errors_are_not_cached(omdb_stub, stub_cache):
+    omdb_stub.failures = [500, 500, 500]
+    assert MovieWeb_app.fetch_movie_details("Avatar") is None
+    assert MovieWeb_app.fetch_movie_details("Avatar")['Title'] == "Avatar"
+    assert len(omdb_stub.requests) == 4
+
+
+def test_title_is_url_encoded(omdb_stub, stub_cache):
+    MovieWeb_app.fetch_movie_details("Fast & Furious")
+    assert omdb_stub.requests[0]['t'] == "Fast & Furious"
+
+
+def test_memory_cache_expires_and_evicts():
+    now = [0.0]
+    cache = MemoryCache(max_entries=2, clock=lambda: now[0])
+    cache.set("a", 1, ttl=10)
+    cache.set("b", 2, ttl=10)
+    cache.get("a")
+    cache.set("c", 3, ttl=10)
+    assert cache.get("b") is MISS and cache.evictions == 1
+    assert cache.get("a") == 1
+    now[0] = 11
+    assert cache.get("a") is MISS
+
+
+def test_sqlite_cache_persists_and_prunes(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'cache.sqlite'}")
+    cache = SQLiteCache(engine, max_entries=2, prune_interval=1)
+    cache.set("a", {"Title": "A"}, ttl=10)
+    cache.set("b", None, ttl=20)
+    cache.set("c", {"Title": "C"}, ttl=30)
+    reopened = SQLiteCache(engine)
+    assert reopened.get("b") is None
+    assert reopened.get("c") == {"Title": "C"}
+    assert cache.evictions == 1
+    engine.dispose()
+
+
+def test_client_retries_server_errors(omdb_stub):
+    client = OMDbClient(omdb_stub.url, "test-key", max_retries=2, backoff_factor=0)
+    omdb_stub.failures = [503, 502]
+    assert client.get_movie("Avatar")['imdbID'] == "tt0499549"
+    assert len(omdb_stub.requests) == 3
+    assert client.stats()['calls'] == 1
+    assert client.stats()['latency_p99'] is not None
+    client.close()
+
+
+def test_client_circuit_breaker_fails_fast(omdb_stub):
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=lambda: now[0])
+    client = OMDbClient(omdb_stub.url, "test-key", max_retries=0, breaker=breaker)
+    omdb_stub.failures = [500, 500]
+    for _ in range(2):
+        with pytest.raises(requests.exceptions.HTTPError):
+            client.get_movie("Avatar")
+    with pytest.raises(CircuitOpenError):
+        client.get_movie("Avatar")
+    assert len(omdb_stub.requests) == 2
+
+    now[0] = 10
+    assert client.get_movie("Avatar")['Title'] == "Avatar"
+    assert breaker.state == CircuitBreaker.CLOSED
+    client.close()
+
+
+def test_concurrent_lookups_of_a_title_share_one_call(omdb_stub):
+    client = OMDbClient(omdb_stub.url, "test-key", backoff_factor=0)
+    lookup = OMDbLookup(OMDbCache(MemoryCache()), client.get_movie)
+    omdb_stub.delay = 0.2
+    results = []
+    threads = [threading.Thread(target=lambda title=title: results.append(lookup.lookup(title)))
+               for title in ("Inception", " inception", "INCEPTION ", "Inception")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [movie['imdbID'] for movie in results] == ["tt1375666"] * 4
+    assert len(omdb_stub.requests) == 1
+    assert lookup.stats()['coalesced'] == 3
+    lookup.shutdown()
+    client.close()
+
+
+def test_concurrent_async_lookups_share_one_call(omdb_stub):
+    client = AsyncOMDbClient(omdb_stub.url, "test-key", backoff_factor=0)
+    lookup = OMDbLookup(OMDbCache(MemoryCache()), None, async_fetch=client.get_movie)
+    omdb_stub.delay = 0.2
+
+    async def scenario():
+        results = await asyncio.gather(*(lookup.lookup_async("Avatar") for _ in range(5)))
+        await client.aclose()
+        return results
+
+    assert [movie['Title'] for movie in asyncio.run(scenario())] == ["Avatar"] * 5
+    assert len(omdb_stub.requests) == 1
+    assert lookup.stats()['coalesced'] == 4
+
+
+def test_lookup_many_resolves_titles_and_reports_errors(omdb_stub):
+    client = OMDbClient(omdb_stub.url, "test-key", max_retries=0)
+    lookup = OMDbLookup(OMDbCache(MemoryCache()), client.get_movie, max_concurrency=2)
+    omdb_stub.failures = [500]
+
+    results = lookup.lookup_many(["Avatar", "Inception", "No Such Movie", "Avatar"])
+    assert list(results) == ["Avatar", "Inception", "No Such Movie"]
+    errors = [title for title, result in results.items()
+              if isinstance(result, requests.exceptions.RequestException)]
+    assert len(errors) == 1
+    assert all(results[title] is None or results[title]['Title'] == title
+               for title in results if title not in errors)
+    lookup.shutdown()
+    client.close()
+
+
+def test_quota_refuses_calls_beyond_the_daily_limit(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'quota.sqlite'}")
+    now = [0.0]
+    quota = DailyQuota(daily_limit=2, engine=engine, clock=lambda: now[0])
+    # Another process sharing the database sees the same count
+    other = DailyQuota(daily_limit=2, engine=engine, clock=lambda: now[0])
+    lookup = OMDbLookup(OMDbCache(MemoryCache()), lambda title: {"Title": title}, quota=quota)
+
+    assert lookup.lookup("A")['Title'] == "A"
+    assert lookup.lookup("a")['Title'] == "A"  # Cached, not counted
+    other.acquire()
+    with pytest.raises(QuotaExceededError):
+        lookup.lookup("B")
+    assert quota.stats() == {"daily_limit": 2, "used": 2, "remaining": 0, "rejected": 1,
+                             "rate_limited": 0}
+
+    now[0] += 24 * 3600
+    assert lookup.lookup("B")['Title'] == "B"
+    assert other.used() == 1
+    lookup.shutdown()
+    engine.dispose()
+
+
+def test_quota_spaces_calls_by_the_rate_limit():
+    waits = []
+    quota = DailyQuota(daily_limit=None, per_second=10, sleep=waits.append)
+    for _ in range(3):
+        quota.acquire()
+    assert len(waits) == 2
+    assert all(0 < wait <= 0.2 for wait in waits)
+    assert quota.stats()['remaining'] is None
@@ -0,0 +1,125 @@
+from flask import Flask
+from sqlalchemy import create_engine
+import pytest
+
+from datamanager import SQLiteDataManager
+from omdb import MemoryCache, SQLiteCache, TieredCache
+from page_cache import PageCache
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = SQLiteDataManager(str(tmp_path / "pages.sqlite"))
+    manager.add_user("Ann")
+    manager.add_user("Bob")
+    return manager
+
+
+def make_app(manager, backend=None):
+    """
+    Builds an app with one cached view per scope that counts how often it renders.
+    """
+    app = Flask(__name__)
+    cache = PageCache(backend or MemoryCache(), manager.get_cache_versions)
+    renders = []
+
+    @app.route('/users/<int:user_id>')
+    @cache.cached('user:{user_id}', 'user_movies:{user_id}')
+    def user_page(user_id):
+        renders.append(user_id)
+        return f"user {user_id} has {len(manager.get_user_movies(user_id))} movies"
+
+    @app.route('/movies')
+    @cache.cached('catalogue')
+    def catalogue():
+        renders.append('catalogue')
+        return "catalogue"
+
+    return app, cache, renders
+
+
+def test_writes_bump_only_the_scopes_they_change(manager):
+    movie = manager.add_movie(1, "Inception", "Christopher Nolan", 2010, 8.8)
+    scopes = ['users', 'catalogue', 'user:1', 'user:2', 'user_movies:1', 'user_movies:2']
+    before = manager.get_cache_versions(scopes)
+    assert 'user:2' not in before
+
+    manager.add_movie(2, "Inception", "Christopher Nolan", 2010, 8.8)
+    manager.add_review(2, movie.id, "Great")
+    after = manager.get_cache_versions(scopes)
+
+    assert after['users'] == before['users']
+    assert after['catalogue'][0] == before['catalogue'][0] + 1
+    assert 'user:2' in after
+    # The review is versioned once on the movie, not on the page of each favoriter
+    assert after['user:1'] == before['user:1']
+    assert manager.get_cache_versions(['movie:' + str(movie.id)])
+    # but the review count on both users' pages changed
+    assert after['user_movies:1'][0] > before.get('user_movies:1', (0, None))[0]
+    assert after['user_movies:2'][0] == after['user_movies:1'][0]
+
+
+def test_deleting_a_user_bumps_the_movies_they_reviewed(manager):
+    movie = manager.add_movie(1, "Inception", "Christopher Nolan", 2010, 8.8)
+    manager.add_movie(2, "Inception", "Christopher Nolan", 2010, 8.8)
+    manager.add_review(1, movie.id, "Great")
+    before = manager.get_cache_versions(['user_movies:2'])
+
+    manager.delete_user(1)
+    # Ann's review went with her, so Bob's page shows one review less
+    assert manager.get_cache_versions(['user_movies:2'])['user_movies:2'][0] \
+        == before['user_movies:2'][0] + 1
+
+
+def test_cached_page_is_rendered_once_until_a_write(manager):
+    app, cache, renders = make_app(manager)
+    with app.test_client() as client:
+        first = client.get('/users/1')
+        second = client.get('/users/1')
+        assert second.data == first.data == b"user 1 has 0 movies"
+        assert renders == [1]
+
+        client.get('/users/2')
+        manager.add_movie(1, "Heat", "Michael Mann", 1995, 8.3)
+        # User 2's page and the catalogue are unaffected by user 1's page
+        assert client.get('/users/1').data == b"user 1 has 1 movies"
+        client.get('/users/2')
+        assert renders == [1, 2, 1]
+    assert cache.stats()['hits'] == 2
+
+
+def test_revalidation_returns_304_without_rendering(manager):
+    app, cache, renders = make_app(manager)
+    with app.test_client() as client:
+        response = client.get('/movies')
+        etag = response.headers['ETag']
+        assert response.headers['Cache-Control'] == 'no-cache'
+
+        # Nothing was written to the catalogue yet, so there is no Last-Modified date
+        assert 'Last-Modified' not in response.headers
+        response = client.get('/movies', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert renders == ['catalogue']
+
+        manager.add_movie(1, "Heat", "Michael Mann", 1995, 8.3)
+        response = client.get('/movies', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+        last_modified = response.headers['Last-Modified']
+
+        response = client.get('/movies', headers={'If-Modified-Since': last_modified})
+        assert response.status_code == 304
+    assert cache.stats()['not_modified'] == 2
+
+
+def test_shared_backend_serves_pages_rendered_by_another_process(manager, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'shared.sqlite'}")
+
+    def shared():
+        return TieredCache(MemoryCache(), SQLiteCache(engine, table_name='page_cache'))
+
+    app, _, renders = make_app(manager, shared())
+    other_app, _, other_renders = make_app(manager, shared())
+    assert app.test_client().get('/users/1').data == \
+        other_app.test_client().get('/users/1').data
+    assert renders == [1] and other_renders == []
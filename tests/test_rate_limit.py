@@ -0,0 +1,95 @@
+import io
+
+import pytest
+from sqlalchemy import create_engine
+from werkzeug.exceptions import TooManyRequests
+
+import MovieWeb_app
+from datamanager import SQLiteDataManager
+from rate_limit import ConcurrencyLimiter, DatabaseRateLimitStore, MemoryRateLimitStore
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(params=['memory', 'database'])
+def stores(request, tmp_path):
+    """
+    Yields a clock and two stores sharing their buckets, except in memory.
+    """
+    clock = Clock()
+    if request.param == 'memory':
+        store = MemoryRateLimitStore(clock=clock)
+        yield clock, store, store
+    else:
+        engine = create_engine(f"sqlite:///{tmp_path / 'limits.sqlite'}")
+        yield clock, DatabaseRateLimitStore(engine, clock=clock), \
+            DatabaseRateLimitStore(engine, clock=clock)
+        engine.dispose()
+
+
+def test_token_bucket(stores):
+    clock, store, other = stores
+    # A burst of 3, then one request every 2 seconds
+    assert [store.consume('ann', 0.5, 3) for _ in range(3)] == [0, 0, 0]
+    assert other.consume('ann', 0.5, 3) == pytest.approx(2.0)
+    assert store.consume('bob', 0.5, 3) == 0
+
+    clock.now += 1.5
+    assert store.consume('ann', 0.5, 3) == pytest.approx(0.5)
+    clock.now += 0.5
+    assert other.consume('ann', 0.5, 3) == 0
+    clock.now += 60
+    assert [store.consume('ann', 0.5, 3) for _ in range(4)][-1] > 0
+
+
+def test_refilled_buckets_are_pruned(tmp_path):
+    clock = Clock()
+    store = DatabaseRateLimitStore(create_engine(f"sqlite:///{tmp_path / 'limits.sqlite'}"),
+                                   prune_interval=2, clock=clock)
+    store.consume('ann', 1, 5)
+    clock.now += 2
+    store.consume('bob', 1, 5)
+    with store.engine.connect() as connection:
+        assert [row.key for row in connection.execute(store.table.select())] == ['bob']
+
+
+def test_concurrency_limiter_sheds_requests_over_the_cap():
+    limiter = ConcurrencyLimiter(1, retry_after=7)
+    with limiter.admit():
+        with pytest.raises(TooManyRequests) as refused:
+            with limiter.admit():
+                pass
+    assert ('Retry-After', '7') in refused.value.get_headers()
+    with limiter.admit():
+        assert limiter.stats() == {'in_flight': 1, 'shed': 1}
+
+
+def test_write_routes_answer_429_with_retry_after(tmp_path, monkeypatch):
+    manager = SQLiteDataManager(str(tmp_path / "limits.sqlite"))
+    manager.add_user("Ann")
+    monkeypatch.setattr(MovieWeb_app, 'data_manager', manager)
+    monkeypatch.setattr(MovieWeb_app.rate_limiter, 'store', MemoryRateLimitStore())
+    monkeypatch.setattr(MovieWeb_app, 'omdb_admission', ConcurrencyLimiter(0, retry_after=3))
+    burst = MovieWeb_app.app.config['WRITE_RATE_BURST']
+
+    with MovieWeb_app.app.test_client() as client:
+        assert client.get('/add_user').status_code == 200
+        for _ in range(burst - 1):
+            assert client.post('/add_user', data={'name': 'Bob'}).status_code == 302
+
+        response = client.post('/users/1/import', data={
+            'file': (io.BytesIO(b"title\nInception\n"), 'favorites.csv')})
+        assert response.status_code == 429
+        assert response.headers['Retry-After'] == '3'
+
+        response = client.post('/add_user', data={'name': 'Bob'})
+        assert response.status_code == 429
+        assert int(response.headers['Retry-After']) >= 1
+        assert client.get('/add_user').status_code == 200
+    assert len(manager.get_all_users()) == burst
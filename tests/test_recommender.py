@@ -0,0 +1,98 @@
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('scipy')
+
+from datamanager import SQLiteDataManager
+from recommender import NeighbourIndex, Recommender
+
+MOVIES = {
+    'A': ("Inception", "Christopher Nolan", 2010, 8.8),
+    'B': ("Tenet", "Christopher Nolan", 2020, 7.3),
+    'C': ("Avatar", "James Cameron", 2009, 7.9),
+    'D': ("Titanic", "James Cameron", 1997, 7.9),
+}
+
+
+@pytest.fixture
+def catalogue(tmp_path):
+    """
+    Returns a data manager where Ann likes A and B, Bob A, B and C, and Cid A, C and D,
+    and the IDs of the movies.
+    """
+    manager = SQLiteDataManager(str(tmp_path / "recommender.sqlite"))
+    manager.add_users(["Ann", "Bob", "Cid"])
+    ids = {}
+    for user_id, letters in ((1, 'AB'), (2, 'ABC'), (3, 'ACD')):
+        for letter in letters:
+            ids[letter] = manager.add_movie(user_id, *MOVIES[letter]).id
+    return manager, ids
+
+
+def test_build_indexes_cosine_neighbours(catalogue, tmp_path):
+    manager, ids = catalogue
+    recommender = Recommender(manager, str(tmp_path / "recs.idx"), neighbours=2)
+    summary = recommender.build()
+    assert (summary['users'], summary['movies']) == (3, 4)
+
+    index = NeighbourIndex(str(tmp_path / "recs.idx"))
+    neighbours, scores = index.get(ids['A'])
+    # A shares two users with B (2 / sqrt(3 * 2)) and with C, one with D (1 / sqrt(3))
+    assert neighbours.tolist() == [ids['B'], ids['C']]
+    assert scores.tolist() == pytest.approx([2 / 6 ** 0.5] * 2)
+    assert index.get(ids['D'] + 1) is None
+
+    # D is not among the two nearest neighbours of A or B
+    assert recommender.recommend(1) == [ids['C']]
+    assert manager.get_movie_summaries([ids['D'], ids['C']])[0].name == "Titanic"
+
+
+def test_favorite_changes_update_the_neighbours(catalogue, tmp_path):
+    manager, ids = catalogue
+    recommender = Recommender(manager, str(tmp_path / "recs.idx"))
+    recommender.build()
+
+    manager.add_movie(1, *MOVIES['D'])
+    recommender.favorite_changed(1, ids['D'])
+    assert ids['D'] not in recommender.recommend(1)
+
+    rebuilt = Recommender(manager, str(tmp_path / "rebuilt.idx"))
+    rebuilt.build()
+    for letter in 'ABD':
+        assert recommender.similar(ids[letter])[0].tolist() \
+            == rebuilt.similar(ids[letter])[0].tolist()
+        assert recommender.similar(ids[letter])[1].tolist() \
+            == pytest.approx(rebuilt.similar(ids[letter])[1].tolist())
+
+    manager.delete_movie(3, ids['D'])
+    recommender.favorite_changed(3, ids['D'])
+    assert ids['C'] not in recommender.similar(ids['D'])[0].tolist()
+
+
+def test_favorite_changes_reach_every_process(catalogue, tmp_path):
+    manager, ids = catalogue
+    path = str(tmp_path / "recs.idx")
+    worker, other = Recommender(manager, path), Recommender(manager, path)
+    worker.build()
+    other.load()
+    assert ids['B'] not in other.similar(ids['D'])[0].tolist()
+
+    manager.add_movie(1, *MOVIES['D'])
+    worker.favorite_changed(1, ids['D'])
+    # The other process reads the stored rows before recommending
+    assert ids['D'] not in other.recommend(1)
+    assert other.similar(ids['D'])[0].tolist() == worker.similar(ids['D'])[0].tolist()
+    assert ids['B'] in other.similar(ids['D'])[0].tolist()
+
+    # A build includes the stored rows and deletes them
+    worker.build()
+    assert manager.get_neighbour_updates() == []
+    other.load()
+    assert other.similar(ids['D'])[0].tolist() == worker.similar(ids['D'])[0].tolist()
+
+
+def test_without_an_index_nothing_is_recommended(catalogue, tmp_path):
+    manager, _ = catalogue
+    recommender = Recommender(manager, str(tmp_path / "missing.idx"))
+    recommender.load()
+    assert recommender.recommend(1) == []
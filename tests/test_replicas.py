@@ -0,0 +1,84 @@
+import shutil
+
+from flask import Flask
+from sqlalchemy import create_engine
+
+from datamanager import SQLiteDataManager, create_data_manager
+from datamanager.replicas import ReplicaSet
+
+
+def stale_replica(tmp_path):
+    """
+    Returns a primary with one user and a replica copied before a second user was added.
+    """
+    primary = SQLiteDataManager(str(tmp_path / "primary.sqlite"))
+    primary.add_user("Ann")
+    primary.engine.dispose()
+    shutil.copy(tmp_path / "primary.sqlite", tmp_path / "replica.sqlite")
+    primary.add_user("Bob")
+    return primary
+
+
+def names(manager, session=None):
+    return [user.name for user in manager.get_all_users(session=session)]
+
+
+def test_reads_go_to_the_replica_until_the_session_writes(tmp_path):
+    manager = stale_replica(tmp_path)
+    manager.use_replicas([str(tmp_path / "replica.sqlite")])
+
+    assert names(manager) == ["Ann"]
+    with manager.unit_of_work() as session:
+        manager.add_user("Cid", session=session)
+        assert names(manager, session) == ["Ann", "Bob", "Cid"]
+
+    replica = manager.replicas.replicas[0]
+    assert replica.failures == 0 and replica.latency is not None
+
+
+def test_unreachable_or_lagging_replicas_fall_back_to_the_primary(tmp_path):
+    manager = stale_replica(tmp_path)
+    manager.use_replicas([str(tmp_path / "missing" / "replica.sqlite")])
+    assert names(manager) == ["Ann", "Bob"]
+    assert list(manager.replicas.stats().values())[0]['failures'] == 1
+
+    lagging = ReplicaSet([create_engine(f"sqlite:///{tmp_path / 'replica.sqlite'}")],
+                         max_lag=5, lag_query="SELECT 10")
+    assert lagging.choose() is None
+    lagging.max_lag = 15
+    assert lagging.choose() is lagging.engines[0]
+
+
+def test_replica_selection(tmp_path):
+    engines = [create_engine(f"sqlite:///{tmp_path / name}") for name in ("a.db", "b.db")]
+    replicas = ReplicaSet(engines)
+    assert [replicas.choose() for _ in range(4)] == engines * 2
+
+    replicas = ReplicaSet(engines, selection='least_latency')
+    replicas.replicas[0].latency, replicas.replicas[1].latency = 0.02, 0.01
+    assert replicas.choose() is engines[1]
+
+
+def test_clients_read_their_own_writes(tmp_path):
+    create_data_manager(f"sqlite:///{tmp_path / 'primary.sqlite'}").add_user("Ann")
+    shutil.copy(tmp_path / "primary.sqlite", tmp_path / "replica.sqlite")
+    manager = create_data_manager(f"sqlite:///{tmp_path / 'primary.sqlite'}",
+                                  replica_urls=[f"sqlite:///{tmp_path / 'replica.sqlite'}"])
+
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    manager.init_app(app)
+
+    @app.get('/users')
+    def list_users():
+        return names(manager)
+
+    @app.post('/users')
+    def add_user():
+        manager.add_user("Bob")
+        return '', 204
+
+    with app.test_client() as writer, app.test_client() as reader:
+        assert writer.post('/users').status_code == 204
+        assert writer.get('/users').json == ["Ann", "Bob"]
+        assert reader.get('/users').json == ["Ann"]
@@ -0,0 +1,88 @@
+from sqlalchemy import text
+
+from MovieWeb_app import app
+from datamanager import SQLiteDataManager
+
+AGGREGATES = {
+    'movie_stats': "SELECT movie_id, favorite_count, review_count FROM movie_stats "
+                   "WHERE favorite_count > 0 OR review_count > 0 ORDER BY movie_id",
+    'user_stats': "SELECT user_id, favorite_count, review_count FROM user_stats "
+                  "WHERE favorite_count > 0 OR review_count > 0 ORDER BY user_id",
+    'director_stats': "SELECT director, movie_count, rated_count, round(rating_sum, 6) "
+                      "FROM director_stats WHERE movie_count > 0 ORDER BY director",
+    'year_stats': "SELECT year, movie_count, rated_count, round(rating_sum, 6) "
+                  "FROM year_stats WHERE movie_count > 0 ORDER BY year",
+}
+
+
+def read_aggregates(manager):
+    with manager.engine.connect() as connection:
+        return {name: connection.execute(text(query)).all()
+                for name, query in AGGREGATES.items()}
+
+
+def test_incremental_aggregates_match_a_rebuild(tmp_path):
+    manager = SQLiteDataManager(str(tmp_path / "stats.sqlite"))
+    manager.add_users(["Ann", "Bob", "Cid"])
+    inception = manager.add_movie(1, "Inception", "Christopher Nolan", 2010, 8.8,
+                                  imdb_id="tt1375666")
+    manager.add_movie(2, "Inception", "Christopher Nolan", 2010, 8.8, imdb_id="tt1375666")
+    manager.add_favorites(3, [
+        {"name": "Tenet", "director": "Christopher Nolan", "year": 2020, "rating": 7.3,
+         "imdb_id": "tt6723592"},
+        {"name": "Avatar", "director": "James Cameron", "year": 2009, "rating": None,
+         "imdb_id": "tt0499549"},
+    ])
+    review = manager.add_review(1, inception.id, "Great")
+    manager.add_review(2, inception.id, "Confusing")
+    manager.delete_review(review.id)
+    manager.delete_movie(2, inception.id)
+
+    # A pending movie completed as one already in the catalogue is merged into it
+    job = manager.add_movie_placeholder(2, "tenet")
+    pending_id = job.movie_id
+    manager.add_review(2, pending_id, "Again")
+    manager.complete_enrichment_job(job.id, "Tenet", "Christopher Nolan", 2020, 7.3,
+                                    imdb_id="tt6723592")
+    manager.delete_user(3)
+
+    incremental = read_aggregates(manager)
+    manager.rebuild_stats()
+    assert read_aggregates(manager) == incremental
+    assert incremental['user_stats'] == [(1, 1, 0), (2, 1, 2)]
+
+
+def test_leaderboards_are_read_from_the_aggregates(tmp_path):
+    manager = SQLiteDataManager(str(tmp_path / "leaderboards.sqlite"))
+    manager.add_users(["Ann", "Bob", "Cid"])
+    inception = manager.add_movie(1, "Inception", "Christopher Nolan", 2010, 8.8)
+    tenet = manager.add_movie(1, "Tenet", "Christopher Nolan", 2020, 7.4)
+    avatar = manager.add_movie(2, "Avatar", "James Cameron", 2009, 7.9)
+    manager.add_movie(3, "Avatar", "James Cameron", 2009, 7.9)
+    manager.add_movie(3, "Unknown", "N/A", 2009, None)
+    for user_id in (1, 2, 2):
+        manager.add_review(user_id, avatar.id, "Blue")
+
+    assert [(movie.name, movie.favorite_count, movie.review_count)
+            for movie in manager.get_most_favorited_movies(limit=2)] \
+        == [("Avatar", 2, 3), ("Unknown", 1, 0)]
+    assert [(user.name, user.review_count) for user in manager.get_most_active_reviewers()] \
+        == [("Bob", 2), ("Ann", 1)]
+    assert [(row.director, row.movie_count, round(row.average_rating, 2))
+            for row in manager.get_top_directors()] \
+        == [("Christopher Nolan", 2, 8.1), ("James Cameron", 1, 7.9)]
+    assert manager.get_top_directors(min_movies=2)[0].director == "Christopher Nolan"
+    assert [(row.year, row.movie_count) for row in manager.get_year_stats()] \
+        == [(2020, 1), (2010, 1), (2009, 2)]
+
+    manager.delete_movie(1, tenet.id)
+    manager.delete_movie(1, inception.id)
+    assert "Inception" not in [movie.name for movie in manager.get_most_favorited_movies()]
+
+
+def test_stats_page_renders():
+    with app.test_client() as client:
+        response = client.get('/stats')
+    assert response.status_code == 200
+    assert b"Most Favorited Movies" in response.data
+    assert b"Top Rated Directors" in response.data
@@ -0,0 +1,95 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import inspect, text
+
+import MovieWeb_app
+from config import ProductionConfig
+from datamanager import SQLiteDataManager
+
+
+def production_manager(db_file):
+    return SQLiteDataManager(str(db_file), pragmas=ProductionConfig.SQLITE_PRAGMAS,
+                             serialize_writes=ProductionConfig.SQLITE_SERIALIZE_WRITES)
+
+
+def test_production_pragmas_are_applied(tmp_path):
+    manager = production_manager(tmp_path / "wal.sqlite")
+    with manager.engine.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == 'wal'
+        assert connection.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert connection.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+
+
+def test_concurrent_writers_and_readers_do_not_lock(tmp_path):
+    db_file = tmp_path / "concurrent.sqlite"
+    # Two managers stand in for two worker processes sharing the database file
+    managers = [production_manager(db_file), production_manager(db_file)]
+    managers[0].add_user("Ann")
+
+    def write(i):
+        manager = managers[i % 2]
+        with manager.unit_of_work() as session:
+            if manager.get_user(1, session=session):
+                manager.add_movie(1, f"Movie {i}", "Director", 2000 + i, 7.0, session=session)
+        manager.add_user(f"User {i}")
+
+    def read(i):
+        return len(managers[i % 2].get_all_users())
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        writes = [executor.submit(write, i) for i in range(40)]
+        reads = [executor.submit(read, i) for i in range(40)]
+        for future in writes + reads:
+            future.result()
+
+    assert len(managers[0].get_all_users()) == 41
+    assert len(managers[1].get_user_movies(1)) == 40
+    assert managers[0].engine.pool.checkedout() == 0
+
+
+def test_delete_user_cascades_to_favorites_and_reviews(tmp_path):
+    manager = SQLiteDataManager(str(tmp_path / "cascade.sqlite"))
+    manager.add_user("Ann")
+    movie = manager.add_movie(1, "Inception", "Christopher Nolan", 2010, 8.8)
+    manager.add_review(1, movie.id, "Great")
+
+    manager.delete_user(1)
+
+    with manager.engine.connect() as connection:
+        assert connection.execute(text("SELECT COUNT(*) FROM favorites")).scalar() == 0
+        assert connection.execute(text("SELECT COUNT(*) FROM reviews")).scalar() == 0
+        assert connection.execute(text("PRAGMA foreign_key_check")).all() == []
+
+
+def test_schema_is_left_to_init_db(tmp_path, monkeypatch):
+    manager = SQLiteDataManager(str(tmp_path / "empty.sqlite"), create_schema=False)
+    assert inspect(manager.engine).get_table_names() == []
+
+    monkeypatch.setattr(MovieWeb_app, 'data_manager', manager)
+    result = MovieWeb_app.app.test_cli_runner().invoke(args=['init-db'])
+    assert result.exit_code == 0
+    manager.add_user("Ann")
+    assert [user.name for user in manager.get_all_users()] == ["Ann"]
+
+
+def query_plan(manager, sql, **params):
+    with manager.engine.connect() as connection:
+        rows = connection.execute(text(f"EXPLAIN QUERY PLAN {sql}"), params).all()
+    return " | ".join(row[-1] for row in rows)
+
+
+def test_queries_use_indexes(tmp_path):
+    manager = SQLiteDataManager(str(tmp_path / "plans.sqlite"))
+
+    plan = query_plan(manager, "SELECT * FROM favorites WHERE user_id = :u ORDER BY id", u=1)
+    assert "USING INDEX ix_favorites_user_id" in plan and "TEMP B-TREE" not in plan
+
+    plan = query_plan(manager, "SELECT * FROM reviews WHERE movie_id = :m", m=1)
+    assert "USING INDEX ix_reviews_movie_id" in plan
+
+    plan = query_plan(manager, "SELECT id FROM movies WHERE lower(name) = :t", t="inception")
+    assert "USING INDEX ix_movies_lower_name" in plan
+
+    plan = query_plan(manager, "SELECT id FROM movies WHERE status = 'ready' "
+                               "ORDER BY coalesce(year, 0) DESC, name DESC, id DESC LIMIT 50")
+    assert "ix_movies_year_name" in plan and "TEMP B-TREE" not in plan